@@ -31,6 +31,20 @@ a = Analysis(
         'qrcode.image.pil',
         'PIL',
         'PIL.Image',
+        # ui.dialogs 按名字延迟导入各弹窗模块，静态分析看不到
+        'ui.dialogs.pairing_dialog',
+        'ui.dialogs.manual_connect_dialog',
+        'ui.dialogs.device_path_dialog',
+        'ui.dialogs.app_selection_dialog',
+        'ui.dialogs.perf_monitor_dialog',
+        'ui.dialogs.screen_preview_dialog',
+        'ui.dialogs.device_farm_dialog',
+        'ui.dialogs.workflow_dialog',
+        'ui.dialogs.diagnostics_dialog',
+        'ui.dialogs.transfer_dialog',
+        'ui.dialogs.link_bench_dialog',
+        'ui.dialogs.log_capture_dialog',
+        'ui.dialogs.log_search_dialog',
     ],
     hookspath=[],
     hooksconfig={},
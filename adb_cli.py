@@ -0,0 +1,625 @@
+# -*- coding: utf-8 -*-
+"""
+ADB 快捷操作 - 命令行入口（无界面，不加载 PyQt6），供 CI 与脚本使用。
+
+    python -m adb_cli devices --json
+    python -m adb_cli -s SERIAL install app.apk
+    python -m adb_cli --all -j 8 screenshot shots/{serial}.png
+    python -m adb_cli --all pull-apk com.example.app apks/
+    python -m adb_cli -s SERIAL hierarchy --text-prefix 设置 --clickable
+    python -m adb_cli pair 192.168.1.20:37123 123456 --connect 192.168.1.20:41235
+    python -m adb_cli --all workflow provision.json --resume
+    python -m adb_cli --all link-bench --size 16
+    python -m adb_cli --all logcat-capture --dir logs/ --rotate-mb 64
+    python -m adb_cli log-search "tag:ActivityManager level>=W 'ANR' last 2h"
+    python -m adb_cli serve --port 8765
+
+多设备时每台设备并发执行（-j 控制并发数）；--json 输出结构化结果，任一设备失败时退出码为 1。
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Optional
+
+import adb_helper
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+# ---------- 每台设备上执行的操作，均返回 (code, out, err) ----------
+
+
+def _op_install(args) -> Callable[[str], tuple[int, str, str]]:
+    apk = str(Path(args.apk).resolve())
+    return lambda device: adb_helper.install_apk(device, apk, replace=not args.no_replace)
+
+
+def _op_screenshot(args) -> Callable[[str], tuple[int, str, str]]:
+    def run(device: str):
+        path = _device_path(args.output, device, "png")
+        code, data, err = adb_helper.screencap_png(device)
+        if code != 0 or not data:
+            return code or -1, "", err or "截图失败"
+        path.write_bytes(data)
+        return 0, str(path), ""
+    return run
+
+
+def _op_pull_apk(args) -> Callable[[str], tuple[int, str, str]]:
+    def run(device: str):
+        code, remote, err = adb_helper.get_package_path(device, args.package)
+        if code != 0:
+            return code, "", err
+        path = _device_path(args.output, device, "apk", default_name=f"{args.package}.apk")
+        code, out, err = adb_helper.pull(device, remote, str(path), timeout=args.timeout or 120)
+        return code, str(path) if code == 0 else out, err
+    return run
+
+
+def _op_shell(args) -> Callable[[str], tuple[int, str, str]]:
+    command = " ".join(args.command)
+    return lambda device: adb_helper.shell(device, command, timeout=args.timeout or 30)
+
+
+def _op_reboot(args) -> Callable[[str], tuple[int, str, str]]:
+    return lambda device: adb_helper.reboot(device, args.mode or "")
+
+
+def _op_info(args) -> Callable[[str], tuple[int, str, str]]:
+    from core.device_metadata import fetch_metadata
+
+    def run(device: str):
+        md, err = fetch_metadata(device)
+        if md is None:
+            return -1, "", err
+        info = md._asdict()
+        info.pop("props")
+        info["abis"] = list(md.abis)
+        return 0, json.dumps(info, ensure_ascii=False), ""
+    return run
+
+
+def _node_line(node, indent: bool) -> str:
+    l, t, r, b = node.bounds
+    x, y = node.center
+    parts = ["  " * node.depth if indent else "", node.class_name.rpartition(".")[2]]
+    if node.resource_id:
+        parts.append(f" #{node.resource_id}")
+    for value in (node.text, node.content_desc):
+        if value:
+            parts.append(f" {value!r}")
+    parts.append(f" [{l},{t}][{r},{b}] @({x},{y})")
+    if node.clickable:
+        parts.append(" 可点击")
+    return "".join(parts)
+
+
+def _op_hierarchy(args) -> Callable[[str], tuple[int, str, str]]:
+    from core.ui_hierarchy import capture_hierarchy
+    selector = {
+        key: value for key, value in (
+            ("resource_id", args.id), ("text", args.text),
+            ("class_name", args.class_name), ("text_prefix", args.text_prefix),
+        ) if value is not None
+    }
+    if args.clickable:
+        selector["clickable"] = True
+
+    def run(device: str):
+        tree, err = capture_hierarchy(device, compressed=args.compressed, timeout=args.timeout or 20)
+        if tree is None:
+            return -1, "", err
+        nodes = tree.query(**selector)
+        if args.json:
+            rows = [dict(n._asdict(), bounds=list(n.bounds), center=list(n.center)) for n in nodes]
+            return 0, json.dumps(rows, ensure_ascii=False), ""
+        # 不筛选时按层级缩进输出整棵树，筛选时平铺匹配到的节点
+        lines = [_node_line(n, indent=not selector) for n in nodes]
+        lines.append(f"匹配 {len(nodes)}/{len(tree)} 个节点")
+        return 0, "\n".join(lines), ""
+    return run
+
+
+DEVICE_OPS = {
+    "install": _op_install,
+    "screenshot": _op_screenshot,
+    "pull-apk": _op_pull_apk,
+    "shell": _op_shell,
+    "reboot": _op_reboot,
+    "info": _op_info,
+    "hierarchy": _op_hierarchy,
+}
+
+# 这些操作在 --json 时 out 为 JSON 文本，解析后放到结果的对应字段
+_JSON_OUTPUT_FIELDS = {"info": "info", "hierarchy": "nodes"}
+
+
+def _device_path(output: str, device: str, suffix: str, default_name: str = "") -> Path:
+    """
+    输出路径：含 {serial} 时按设备替换；是目录（或以 / 结尾）时在其中按设备命名；
+    否则直接使用（仅适合单台设备）。
+    """
+    safe = device.replace(":", "_").replace("@", "_").replace("/", "_")
+    if "{serial}" in output:
+        path = Path(output.replace("{serial}", safe))
+    elif output.endswith(("/", "\\")) or Path(output).is_dir():
+        name = f"{safe}_{default_name}" if default_name else f"{safe}.{suffix}"
+        path = Path(output) / name
+    else:
+        path = Path(output)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+# ---------- 执行与输出 ----------
+
+
+def run_on_devices(
+    devices: list[str],
+    func: Callable[[str], tuple[int, str, str]],
+    jobs: int,
+    on_result: Optional[Callable[[dict], None]] = None,
+) -> list[dict]:
+    """在多台设备上并发执行 func，结果按完成顺序返回。"""
+    def timed(device: str) -> dict:
+        started = time.monotonic()
+        try:
+            code, out, err = func(device)
+        except Exception as e:
+            code, out, err = -1, "", str(e)
+        return {"serial": device, "code": code, "out": out, "err": err,
+                "seconds": round(time.monotonic() - started, 3)}
+
+    results = []
+    if not devices:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(devices)))) as pool:
+        for fut in as_completed([pool.submit(timed, d) for d in devices]):
+            result = fut.result()
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
+
+
+def _print_text_result(result: dict):
+    mark = "OK " if result["code"] == 0 else "ERR"
+    lines = [f"[{mark}] {result['serial']} ({result['seconds']:.2f}s)"]
+    for text in (result["out"], result["err"]):
+        text = (text or "").rstrip()
+        if text:
+            lines.extend("    " + line for line in text.splitlines())
+    print("\n".join(lines), flush=True)
+
+
+def _emit(payload: dict, as_json: bool):
+    if as_json:
+        print(json.dumps(payload, ensure_ascii=False))
+
+
+def _resolve_devices(args) -> tuple[list[str], str]:
+    """返回目标设备列表；无法确定目标时返回错误信息。"""
+    if args.serial:
+        return list(dict.fromkeys(args.serial)), ""
+    online = [d["serial"] for d in adb_helper.get_devices()]
+    if args.all:
+        return online, "" if online else "未检测到设备"
+    if len(online) == 1:
+        return online, ""
+    if not online:
+        return [], "未检测到设备"
+    return [], f"检测到 {len(online)} 台设备，请用 -s 指定或使用 --all"
+
+
+def cmd_devices(args) -> int:
+    devices = adb_helper.get_devices()
+    if args.json:
+        for d in devices:
+            md = d.pop("metadata", None)
+            if md is not None:
+                d["sdk"], d["release"] = md.sdk, md.release
+        _emit({"devices": devices, "servers": adb_helper.get_adb_servers()}, True)
+    else:
+        for d in devices:
+            where = f"  @{d['server']}" if d.get("server") else ""
+            print(f"{d['serial']}\t{d['status']}\t{d.get('model', '')}{where}")
+    return EXIT_OK
+
+
+def cmd_connect(args) -> int:
+    from core.utils import is_success_connect_output
+    host, _, port = args.address.rpartition(":")
+    if not host or not port.isdigit():
+        print(f"无效地址：{args.address}（应为 host:port）", file=sys.stderr)
+        return EXIT_USAGE
+    code, out, err = adb_helper.adb_connect(host, int(port))
+    ok = code == 0 and is_success_connect_output(out)
+    _emit({"ok": ok, "code": code, "out": out, "err": err}, args.json)
+    if not args.json:
+        print((out or err).strip())
+    return EXIT_OK if ok else EXIT_FAILED
+
+
+def cmd_pair(args) -> int:
+    from core.utils import pair_then_connect, is_success_pair_output, is_success_connect_output
+    host, _, port = args.address.rpartition(":")
+    if not host or not port.isdigit():
+        print(f"无效地址：{args.address}（应为 host:port）", file=sys.stderr)
+        return EXIT_USAGE
+    if args.connect:
+        c_host, _, c_port = args.connect.rpartition(":")
+        if not c_host or not c_port.isdigit():
+            print(f"无效地址：{args.connect}（应为 host:port）", file=sys.stderr)
+            return EXIT_USAGE
+        code, out, err = pair_then_connect(host, int(port), args.code, c_host, int(c_port))
+        ok = code == 0 and is_success_connect_output(out)
+    else:
+        code, out, err = adb_helper.adb_pair(host, int(port), args.code)
+        ok = code == 0 and is_success_pair_output(out)
+    _emit({"ok": ok, "code": code, "out": out, "err": err}, args.json)
+    if not args.json:
+        print((out or err).strip())
+    return EXIT_OK if ok else EXIT_FAILED
+
+
+def cmd_workflow(args) -> int:
+    """按工作流文件在目标设备上执行（各设备并发，--resume 从上次中断处续跑）。"""
+    from core.workflow import FAILED, OK, RUNNING, SKIPPED, WorkflowError, WorkflowRunner, load_workflow
+    devices, error = _resolve_devices(args)
+    if not devices:
+        _emit({"ok": False, "error": error}, args.json)
+        if not args.json:
+            print(error, file=sys.stderr)
+        return EXIT_FAILED
+    marks = {OK: "OK ", FAILED: "ERR", SKIPPED: "---"}
+
+    def on_event(serial, step_id, status, result):
+        if args.json or status == RUNNING:
+            return
+        line = f"[{marks.get(status, status)}] {serial} {step_id}"
+        if (serial, step_id) in runner.resumed:
+            line += "（上次已完成）"
+        elif result.attempts:
+            line += f" ({result.seconds:.2f}s, 第 {result.attempts} 次)"
+        if status != OK and result.message:
+            line += "\n" + "\n".join("    " + m for m in result.message.splitlines()[-5:])
+        print(line, flush=True)
+
+    runner = None
+    try:
+        workflow = load_workflow(args.file)
+        runner = WorkflowRunner(
+            workflow, devices, state_path=args.state, resume=args.resume,
+            max_workers=args.jobs, per_device=args.per_device, on_event=on_event,
+        )
+    except WorkflowError as e:
+        _emit({"ok": False, "error": str(e)}, args.json)
+        if not args.json:
+            print(str(e), file=sys.stderr)
+        return EXIT_USAGE
+    try:
+        results = runner.run()
+    except KeyboardInterrupt:
+        runner.stop()
+        print(f"已中断，可加 --resume 续跑（状态文件：{runner.state_path}）", file=sys.stderr)
+        return EXIT_FAILED
+    failed = [d for d in devices if not runner.succeeded(d)]
+    if args.json:
+        _emit({
+            "ok": not failed,
+            "workflow": workflow.name,
+            "state": str(runner.state_path),
+            "devices": {d: {k: r._asdict() for k, r in steps.items()} for d, steps in results.items()},
+        }, True)
+    else:
+        print(f"完成：成功 {len(devices) - len(failed)}/{len(devices)}")
+        if failed:
+            print(f"失败的设备可加 --resume 续跑（状态文件：{runner.state_path}）")
+    return EXIT_OK if not failed else EXIT_FAILED
+
+
+def cmd_link_bench(args) -> int:
+    """并发测量目标设备的链路延迟与吞吐，写入历史，并与该设备的历史中位数比较。"""
+    from core.link_bench import compare_with_history, format_rate, load_history, run_link_bench, save_results
+    devices, error = _resolve_devices(args)
+    if not devices:
+        _emit({"ok": False, "error": error, "results": []}, args.json)
+        if not args.json:
+            print(error, file=sys.stderr)
+        return EXIT_FAILED
+    history = load_history()
+    benched = {}
+
+    def run(device: str):
+        result = run_link_bench(device, args.size * 1024 * 1024)
+        benched[device] = result
+        if result.error:
+            return -1, "", result.error
+        lines = [
+            f"{result.link} {result.port}".rstrip(),
+            f"往返 {result.rtt_ms:.1f}ms（P95 {result.rtt_p95_ms:.1f}ms），命令 {result.command_ms:.0f}ms",
+            f"下行 {format_rate(result.download)}，上行 {format_rate(result.upload)}，"
+            f"sync 推送 {format_rate(result.sync_push)}，拉取 {format_rate(result.sync_pull)}",
+        ]
+        lines += [f"比历史变差：{note}" for note in compare_with_history(result, history)]
+        return 0, "\n".join(lines), ""
+
+    results = run_on_devices(devices, run, args.jobs, on_result=None if args.json else _print_text_result)
+    save_results(list(benched.values()))
+    failed = sum(1 for r in results if r["code"] != 0)
+    if args.json:
+        for r in results:
+            result = benched.get(r["serial"])
+            if result is not None:
+                r.pop("out")
+                r["link"] = result._asdict()
+                r["regressions"] = compare_with_history(result, history)
+        _emit({"ok": failed == 0, "succeeded": len(results) - failed, "failed": failed, "results": results}, True)
+    elif len(results) > 1:
+        print(f"完成：成功 {len(results) - failed}/{len(results)}")
+    return EXIT_OK if failed == 0 else EXIT_FAILED
+
+
+def cmd_logcat_capture(args) -> int:
+    """前台持续采集目标设备的 logcat 到轮转压缩文件，Ctrl+C 结束；再次运行从上次结束的位置接着采集。"""
+    from core.logcat_capture import STATE_LABELS, get_capture_service
+    devices, error = _resolve_devices(args)
+    if not devices:
+        print(error, file=sys.stderr)
+        return EXIT_FAILED
+    service = get_capture_service()
+    # 只改动命令行给出的项，其余沿用图形界面里保存的设置
+    changes = {}
+    if args.dir:
+        changes["directory"] = str(Path(args.dir).resolve())
+    if args.compression:
+        changes["compression"] = args.compression
+    if args.rotate_mb:
+        changes["rotate_bytes"] = args.rotate_mb * 1024 * 1024
+    if args.rotate_min:
+        changes["rotate_seconds"] = args.rotate_min * 60
+    if args.keep_mb:
+        changes["keep_bytes"] = args.keep_mb * 1024 * 1024
+    try:
+        service.set_settings(**changes)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_USAGE
+    for device in devices:
+        service.start(device)
+    print(f"正在采集 {len(devices)} 台设备的 logcat 到 {service.settings.root()}，Ctrl+C 结束", flush=True)
+    try:
+        while True:
+            time.sleep(args.interval)
+            stats = [s for s in service.stats() if s.serial in devices]
+            if args.json:
+                _emit({"time": time.time(), "devices": [s._asdict() for s in stats]}, True)
+                continue
+            for s in stats:
+                line = (f"{s.serial}\t{STATE_LABELS.get(s.state, s.state)}\t{s.rate / 1024:.1f} KB/s\t"
+                        f"{s.lines} 行\t{s.files} 个文件 {s.disk_bytes / 1024 / 1024:.1f} MB")
+                print(line + (f"\t{s.error}" if s.error else ""), flush=True)
+    except KeyboardInterrupt:
+        pass
+    for device in devices:
+        service.stop(device)
+    service.shutdown()
+    return EXIT_OK
+
+
+def cmd_log_search(args) -> int:
+    """在采集的 logcat 归档中检索；未指定 -s 时查所有有归档的设备（不需要设备在线）。"""
+    from core.log_archive import LogSearch, archived_devices, parse_query
+    from core.logcat_capture import device_dir_name, get_capture_service
+    try:
+        query = parse_query(args.query)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_USAGE
+    root = Path(args.dir).resolve() if args.dir else get_capture_service().settings.root()
+    available = archived_devices(root)
+    names = [device_dir_name(s) for s in args.serial] if args.serial else available
+    missing = [n for n in names if n not in available]
+    if missing or not names:
+        print(f"{root} 下没有这些设备的日志：{', '.join(missing)}" if missing else f"{root} 下没有采集的日志",
+              file=sys.stderr)
+        return EXIT_FAILED
+    results = []
+    for name in names:
+        search = LogSearch(root / name, query, args.newest_first)
+        entries = []
+        while not search.done and (not args.limit or len(entries) < args.limit):
+            page = search.fetch(min(1000, args.limit - len(entries)) if args.limit else 1000)
+            entries.extend(page)
+            if not args.json:
+                for entry in page:
+                    print(f"{name}\t{entry.line}" if len(names) > 1 else entry.line)
+        results.append({"device": name, "count": len(entries), "blocks": search.total, "scanned": search.scanned,
+                        "truncated": not search.done, "entries": [e._asdict() for e in entries]})
+    if args.json:
+        _emit({"ok": True, "query": query._asdict(), "results": results}, True)
+    else:
+        for r in results:
+            more = "，还有更多结果（用 --limit 调整）" if r["truncated"] else ""
+            print(f"{r['device']}：{r['count']} 条，检查 {r['scanned']}/{r['blocks']} 个候选块{more}", file=sys.stderr)
+    return EXIT_OK
+
+
+def cmd_serve(args) -> int:
+    """前台运行本机控制接口，Ctrl+C 退出。"""
+    import asyncio
+    from core.control_server import TOKEN_FILE, ControlServer
+    from core.storage import app_data_dir
+    try:
+        server = ControlServer(args.host, args.port, token=args.token)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_USAGE
+
+    async def serve():
+        port = await server.start()
+        print(f"控制接口已启动：http://{args.host}:{port}", flush=True)
+        if not args.token:
+            print(f"访问令牌见 {app_data_dir() / TOKEN_FILE}", flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"控制接口启动失败：{e}", file=sys.stderr)
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+def cmd_device_op(args) -> int:
+    devices, error = _resolve_devices(args)
+    if not devices:
+        _emit({"ok": False, "error": error, "results": []}, args.json)
+        if not args.json:
+            print(error, file=sys.stderr)
+        return EXIT_FAILED
+    func = DEVICE_OPS[args.command_name](args)
+    results = run_on_devices(devices, func, args.jobs, on_result=None if args.json else _print_text_result)
+    failed = sum(1 for r in results if r["code"] != 0)
+    if args.json:
+        field = _JSON_OUTPUT_FIELDS.get(args.command_name)
+        if field:
+            for r in results:
+                if r["code"] == 0:
+                    r[field] = json.loads(r.pop("out"))
+        _emit({"ok": failed == 0, "succeeded": len(results) - failed, "failed": failed, "results": results}, True)
+    elif len(results) > 1:
+        print(f"完成：成功 {len(results) - failed}/{len(results)}")
+    return EXIT_OK if failed == 0 else EXIT_FAILED
+
+
+def _common_options() -> argparse.ArgumentParser:
+    """全局选项：既可写在子命令前，也可写在子命令后。"""
+    common = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    common.add_argument("-s", "--serial", action="append", help="目标设备序列号，可重复指定多台")
+    common.add_argument("--all", action="store_true", help="对所有在线设备执行")
+    common.add_argument("-j", "--jobs", type=int, help="多设备并发数（默认 8）")
+    common.add_argument("--server", action="append", help="额外的 adb server（host:port），可重复")
+    common.add_argument("--timeout", type=int, help="单条命令超时秒数（0 为默认值）")
+    common.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    common.add_argument(
+        "--metrics", metavar="FILE", help="记录每条 adb 命令的阶段耗时，结束时导出（.json 为 JSON，否则 Prometheus 文本）"
+    )
+    return common
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m adb_cli", description="ADB 快捷操作命令行（无界面）", parents=[_common_options()]
+    )
+    parser.set_defaults(serial=None, all=False, jobs=8, server=[], timeout=0, json=False, metrics=None)
+    sub = parser.add_subparsers(dest="command_name", required=True, metavar="命令")
+
+    def add(name: str, help_text: str, handler) -> argparse.ArgumentParser:
+        # 每个子命令用独立的选项对象：主解析器 set_defaults 会改写共享动作的默认值，
+        # 导致写在子命令前的选项被子命令的默认值覆盖
+        p = sub.add_parser(name, help=help_text, parents=[_common_options()])
+        p.set_defaults(handler=handler)
+        return p
+
+    add("devices", "列出在线设备", cmd_devices)
+
+    p = add("connect", "无线连接 host:port", cmd_connect)
+    p.add_argument("address")
+
+    p = add("pair", "配对码配对（Android 11+），可选随后连接", cmd_pair)
+    p.add_argument("address", help="配对地址 host:port")
+    p.add_argument("code", help="六位配对码")
+    p.add_argument("--connect", metavar="HOST:PORT", help="配对成功后连接的地址")
+
+    p = add("install", "安装 APK", cmd_device_op)
+    p.add_argument("apk")
+    p.add_argument("--no-replace", action="store_true", help="不覆盖安装")
+
+    p = add("screenshot", "截图保存到本地", cmd_device_op)
+    p.add_argument("output", help="文件路径、目录，或含 {serial} 的路径模板")
+
+    p = add("pull-apk", "导出已安装应用的 APK", cmd_device_op)
+    p.add_argument("package")
+    p.add_argument("output", help="文件路径、目录，或含 {serial} 的路径模板")
+
+    p = add("shell", "执行 shell 命令", cmd_device_op)
+    p.add_argument("command", nargs=argparse.REMAINDER)
+
+    p = add("reboot", "重启设备", cmd_device_op)
+    p.add_argument("mode", nargs="?", choices=("bootloader", "recovery"))
+
+    add("info", "设备信息（型号、系统版本、ABI、屏幕、存储）", cmd_device_op)
+
+    p = add("hierarchy", "抓取当前界面控件树，可按 resource-id / 文本 / 类名筛选，输出节点坐标", cmd_device_op)
+    p.add_argument("--id", help="resource-id，如 com.android.settings:id/title")
+    p.add_argument("--text", help="文本（完全匹配）")
+    p.add_argument("--text-prefix", help="文本前缀")
+    p.add_argument("--class", dest="class_name", help="类名，如 android.widget.Button")
+    p.add_argument("--clickable", action="store_true", help="只输出可点击的节点")
+    p.add_argument("--compressed", action="store_true", help="uiautomator dump --compressed，省略无意义的布局节点")
+
+    p = add("workflow", "执行工作流文件（JSON/YAML，按依赖图执行，可续跑）", cmd_workflow)
+    p.add_argument("file")
+    p.add_argument("--resume", action="store_true", help="跳过上次已完成的步骤")
+    p.add_argument("--state", help="状态文件路径（默认在数据目录 workflows/ 下）")
+    p.add_argument("--per-device", type=int, default=2, help="每台设备同时执行的独立步骤数")
+
+    p = add("link-bench", "链路测速（延迟、上下行吞吐、sync 速率），结果写入历史并与之比较", cmd_link_bench)
+    p.add_argument("--size", type=int, default=16, help="吞吐与 sync 测试的数据量（MB）")
+
+    p = add("logcat-capture", "持续采集 logcat 到按大小/时间轮转的压缩文件（Ctrl+C 结束）", cmd_logcat_capture)
+    p.add_argument("--dir", help="保存目录（默认在数据目录 logcat/ 下），每台设备一个子目录")
+    p.add_argument("--compression", choices=("gzip", "zstd"), help="默认 gzip；zstd 需要安装 zstandard")
+    p.add_argument("--rotate-mb", type=int, help="单个文件的未压缩大小上限（MB，默认 64）")
+    p.add_argument("--rotate-min", type=int, help="单个文件的时长上限（分钟，默认 60）")
+    p.add_argument("--keep-mb", type=int, help="每台设备保留的压缩文件总大小（MB，默认 2048）")
+    p.add_argument("--interval", type=float, default=30, help="输出统计的间隔（秒）")
+
+    p = add("log-search", "在采集的 logcat 归档中按 tag/pid/级别/文本/时间检索", cmd_log_search)
+    p.add_argument("query", help="例如 \"tag:ActivityManager level>=W pid:1234 'ANR' last 2h\"，空串为全部")
+    p.add_argument("--dir", help="归档目录（默认同 logcat-capture）")
+    p.add_argument("--limit", type=int, default=1000, help="每台设备最多输出的条数，0 为不限")
+    p.add_argument("--newest-first", action="store_true", help="从最新的日志往前查")
+
+    p = add("serve", "运行本机控制接口（HTTP/JSON-RPC，仅回环地址）", cmd_serve)
+    p.add_argument("--host", default="127.0.0.1", choices=("127.0.0.1", "::1", "localhost"))
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--token", help="访问令牌（默认使用数据目录 api_token 中的随机令牌），请求需带 Authorization: Bearer <token>")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.server:
+        try:
+            adb_helper.set_adb_servers(adb_helper.get_adb_servers() + args.server)
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            return EXIT_USAGE
+    if args.command_name == "shell" and not args.command:
+        print("缺少 shell 命令", file=sys.stderr)
+        return EXIT_USAGE
+    if not args.metrics:
+        return args.handler(args)
+    from core import metrics
+    metrics.enable()
+    try:
+        return args.handler(args)
+    finally:
+        try:
+            metrics.export(args.metrics)
+        except OSError as e:
+            print(f"导出指标失败：{e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,16 @@
 # -*- coding: utf-8 -*-
 """ADB 命令封装，通过 subprocess 调用系统 adb。"""
 
+import functools
 import os
 import subprocess
 import shutil
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, NamedTuple, Optional
 
 
 def _get_base_dir() -> Path:
@@ -19,73 +23,571 @@ def _get_base_dir() -> Path:
 # 项目内 platform-tools 目录（开发时与 adb_helper.py 同级，打包后在 exe 同目录）
 _PLATFORM_TOOLS_DIR = _get_base_dir() / "platform-tools"
 _ADB_NAME = "adb.exe" if os.name == "nt" else "adb"
+_ADB_NOT_FOUND = "未找到 adb，请将 Android SDK platform-tools 置于项目 platform-tools 目录或加入系统 PATH"
 
 
+@functools.lru_cache(maxsize=1)
 def _find_adb() -> Optional[str]:
-    """优先使用项目内 platform-tools 下的 adb，否则查找系统 PATH。"""
+    """
+    优先使用项目内 platform-tools 下的 adb，否则查找系统 PATH。
+    结果在进程内缓存（每条命令都会调用，PATH 较长时查找并不便宜）；安装 adb 后需重启程序，
+    或调用 _find_adb.cache_clear()。
+    """
     local_adb = _PLATFORM_TOOLS_DIR / _ADB_NAME
     if local_adb.is_file():
         return str(local_adb)
     return shutil.which("adb")
 
 
-def run_adb(*args: str, device: Optional[str] = None, timeout: int = 30) -> tuple[int, str, str]:
+# ---------- 多 adb server ----------
+# 设备可能分布在多个 adb server 上（本机不同端口、实验室其他主机）。
+# server 用 "host:port" 表示，空字符串表示本机默认 server（不加 -H/-P，行为与单 server 时完全一致）。
+
+DEFAULT_SERVER = ""
+_servers: list[str] = [DEFAULT_SERVER]
+_device_servers: dict[str, str] = {}  # 序列号 -> 所在 server，由 get_devices 维护
+_servers_lock = threading.Lock()
+
+
+def normalize_server(spec: str) -> str:
+    """"host:port" / "port" / "host" 统一为 "host:port"；本机 5037 视为默认 server。"""
+    spec = (spec or "").strip()
+    if not spec:
+        return DEFAULT_SERVER
+    host, sep, port = spec.rpartition(":")
+    if not sep:
+        host, port = (("127.0.0.1", spec) if spec.isdigit() else (spec, "5037"))
+    host = host or "127.0.0.1"
+    if not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"无效的 adb server 地址：{spec}")
+    if host in ("127.0.0.1", "localhost") and port == "5037":
+        return DEFAULT_SERVER
+    return f"{host}:{port}"
+
+
+def set_adb_servers(specs: list[str]) -> list[str]:
+    """设置要聚合的 adb server 列表（自动去重，始终包含本机默认 server），返回规范化后的列表。"""
+    servers = [DEFAULT_SERVER]
+    for spec in specs:
+        server = normalize_server(spec)
+        if server not in servers:
+            servers.append(server)
+    with _servers_lock:
+        _servers[:] = servers
+        for serial in [s for s, srv in _device_servers.items() if srv not in servers]:
+            del _device_servers[serial]
+    return list(servers)
+
+
+def get_adb_servers() -> list[str]:
+    with _servers_lock:
+        return list(_servers)
+
+
+def server_label(server: str) -> str:
+    return server or "本机"
+
+
+def _server_args(server: str) -> list[str]:
+    if not server:
+        return []
+    host, _, port = server.rpartition(":")
+    return ["-H", host, "-P", port]
+
+
+def resolve_target(device: Optional[str], server: Optional[str] = None) -> tuple[Optional[str], str]:
     """
-    执行 adb 命令。
-    :param args: adb 子命令及参数，如 ("devices", "-l")
-    :param device: 设备序列号，None 表示不指定设备
-    :param timeout: 超时秒数
-    :return: (returncode, stdout, stderr)
+    确定命令发往哪个 server。device 可写作 "serial@host:port" 显式指定 server；
+    否则按 get_devices 记录的归属路由，未知设备走默认 server。
     """
+    if device and "@" in device:
+        serial, _, explicit = device.rpartition("@")
+        return serial, normalize_server(explicit) if server is None else server
+    if server is None:
+        with _servers_lock:
+            server = _device_servers.get(device, DEFAULT_SERVER) if device else DEFAULT_SERVER
+    return device, server
+
+
+def server_address(server: str) -> tuple[str, int]:
+    """server 的套接字地址；默认 server 为本机 ANDROID_ADB_SERVER_PORT（缺省 5037）。"""
+    if not server:
+        port = os.environ.get("ANDROID_ADB_SERVER_PORT", "")
+        return "127.0.0.1", int(port) if port.isdigit() else 5037
+    host, _, port = server.rpartition(":")
+    return host, int(port)
+
+
+_last_latency: dict[str, float] = {}  # 设备 -> 最近一条命令耗时（秒），供设备墙显示
+
+
+def last_command_latency(device: str) -> Optional[float]:
+    """设备最近一次 run_adb 命令的耗时（秒），没有记录时返回 None。"""
+    return _last_latency.get(device)
+
+
+def _servers_from_env(value: str) -> list[str]:
+    """解析 GUI_ADB_SERVERS（逗号分隔）；无效的条目在 stderr 提示后跳过，不让导入失败。"""
+    servers = []
+    for spec in value.split(","):
+        if not spec.strip():
+            continue
+        try:
+            servers.append(normalize_server(spec))
+        except ValueError as e:
+            print(f"GUI_ADB_SERVERS：{e}，已忽略", file=sys.stderr)
+    return servers
+
+
+if os.environ.get("GUI_ADB_SERVERS"):
+    # CI/命令行可用环境变量预置，如 GUI_ADB_SERVERS="5038,192.168.1.20:5037"
+    set_adb_servers(_servers_from_env(os.environ["GUI_ADB_SERVERS"]))
+
+
+def _adb_command(args: tuple, device: Optional[str], server: Optional[str] = None) -> Optional[list[str]]:
+    """拼出完整 adb 命令行（含 server 路由）；未找到 adb 时返回 None。"""
     adb_path = _find_adb()
     if not adb_path:
-        return -1, "", "未找到 adb，请将 Android SDK platform-tools 置于项目 platform-tools 目录或加入系统 PATH"
-    cmd = [adb_path]
-    if device:
-        cmd.extend(["-s", device])
+        return None
+    serial, server = resolve_target(device, server)
+    cmd = [adb_path] + _server_args(server)
+    if serial:
+        cmd.extend(["-s", serial])
     cmd.extend(args)
+    return cmd
+
+
+def adb_command_line(*args: str, device: Optional[str] = None, server: Optional[str] = None) -> list[str]:
+    """
+    返回完整的 adb 命令行（含 server 路由），供 asyncio 子进程等需要自行启动进程的场景使用。
+    未找到 adb 时抛出 FileNotFoundError。
+    """
+    cmd = _adb_command(args, device, server)
+    if not cmd:
+        raise FileNotFoundError(_ADB_NOT_FOUND)
+    return cmd
+
+
+# ---------- 设备健康状态（由 core.health.HealthMonitor 维护） ----------
+# 已知离线/未授权/无响应的设备上的命令直接失败，不再等满超时；离线/未授权/断开时正在执行的命令也会被终止，
+# 仅无响应（可能只是链路繁忙）时不终止。
+
+_unhealthy: dict[tuple[str, str], str] = {}  # (序列号, server) -> 原因
+_inflight: dict[tuple[str, str], set] = {}  # (序列号, server) -> 正在执行的 Popen 或其他可 kill() 的句柄
+_health_lock = threading.Lock()
+# 这些子命令本身用于恢复或查询状态，不受健康状态限制
+_FAIL_FAST_EXEMPT = frozenset(("connect", "disconnect", "reconnect", "devices", "get-state", "pair", "kill-server"))
+
+
+def _health_key(device: Optional[str], server: Optional[str]) -> Optional[tuple[str, str]]:
+    if not device:
+        return None
+    serial, server = resolve_target(device, server)
+    return serial, server
+
+
+def set_device_unhealthy(
+    device: str, reason: str, server: Optional[str] = None, kill_inflight: bool = True
+) -> int:
+    """
+    标记设备不可用：之后发往它的命令立即返回失败。
+    :param kill_inflight: 是否同时终止正在执行的命令；False 时只让新命令立即失败
+    :return: 被终止的正在执行的命令数
+    """
+    key = _health_key(device, server)
+    with _health_lock:
+        _unhealthy[key] = reason
+        procs = list(_inflight.get(key, ())) if kill_inflight else []
+    for proc in procs:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+    return len(procs)
+
+
+def clear_device_unhealthy(device: str, server: Optional[str] = None) -> None:
+    key = _health_key(device, server)
+    with _health_lock:
+        _unhealthy.pop(key, None)
+
+
+def device_unhealthy_reason(device: str, server: Optional[str] = None) -> Optional[str]:
+    key = _health_key(device, server)
+    with _health_lock:
+        return _unhealthy.get(key)
+
+
+def fail_fast_reason(device: str, server: Optional[str] = None) -> Optional[str]:
+    """设备被标记为不可用时返回命令应立即失败的原因，否则返回 None。"""
+    return _fail_fast_reason((), _health_key(device, server))
+
+
+def register_inflight(device: str, server: Optional[str], handle) -> None:
+    """
+    登记一个正在执行的操作（任何有 kill() 方法的对象，如 asyncio 客户端的任务句柄），
+    设备被标记不可用时与子进程一样被终止。结束后需调用 unregister_inflight。
+    """
+    key = _health_key(device, server)
+    with _health_lock:
+        _inflight.setdefault(key, set()).add(handle)
+
+
+def inflight_count(device: str, server: Optional[str] = None) -> int:
+    """设备上正在执行的命令与长流（传输、logcat 采集、测速等）数量。"""
+    key = _health_key(device, server)
+    with _health_lock:
+        return len(_inflight.get(key, ()))
+
+
+def unregister_inflight(device: str, server: Optional[str], handle) -> None:
+    key = _health_key(device, server)
+    with _health_lock:
+        handles = _inflight.get(key)
+        if handles is not None:
+            handles.discard(handle)
+            if not handles:
+                del _inflight[key]
+
+
+def _fail_fast_reason(args: tuple, key: Optional[tuple[str, str]]) -> Optional[str]:
+    if key is None or (args and args[0] in _FAIL_FAST_EXEMPT):
+        return None
+    with _health_lock:
+        reason = _unhealthy.get(key)
+    return f"设备 {key[0]} {reason}，命令未执行" if reason else None
+
+
+def _communicate(
+    cmd: list[str], key, timeout: int, input_data: Optional[bytes], phases: Optional[dict] = None
+) -> tuple[int, bytes, bytes]:
+    """
+    启动 adb 子进程并等待结束；进程登记在 _inflight 中，设备被标记不可用时会被直接终止。
+    :param phases: 不为 None 时写入 spawn / wait 阶段耗时（秒）
+    """
+    spawn_started = time.monotonic()
     # Windows 下禁止 adb 子进程弹出控制台，避免黑框一闪而过
     creationflags = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if input_data is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        creationflags=creationflags,
+    )
+    if phases is not None:
+        phases["spawn"] = time.monotonic() - spawn_started
+    if key is not None:
+        with _health_lock:
+            _inflight.setdefault(key, set()).add(proc)
+    wait_started = time.monotonic()
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-            timeout=timeout,
-            creationflags=creationflags,
+        out, err = proc.communicate(input_data, timeout=timeout)
+        if phases is not None:
+            phases["wait"] = time.monotonic() - wait_started
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        raise
+    finally:
+        if key is not None:
+            with _health_lock:
+                procs = _inflight.get(key)
+                if procs is not None:
+                    procs.discard(proc)
+                    if not procs:
+                        del _inflight[key]
+    if proc.returncode != 0 and key is not None:
+        with _health_lock:
+            reason = _unhealthy.get(key)
+        if reason:
+            note = f"设备 {key[0]} {reason}，命令已中止".encode("utf-8")
+            err = (err.rstrip() + b"\n" + note) if err and err.strip() else note
+    return proc.returncode, out or b"", err or b""
+
+
+# ---------- 命令耗时指标（由 core.metrics 挂载，未开启时只多一次 None 判断） ----------
+
+_metrics_hook = None  # (op, device, phases, bytes_in, bytes_out, outcome) -> None
+
+
+def set_metrics_hook(hook) -> None:
+    global _metrics_hook
+    _metrics_hook = hook
+
+
+def get_metrics_hook():
+    return _metrics_hook
+
+
+def _local_payload_size(args: tuple) -> int:
+    """push / install 发往设备的本地文件大小。"""
+    if not args or args[0] not in ("push", "install", "install-multiple"):
+        return 0
+    paths = args[1:-1] if args[0] == "push" else args[1:]
+    total = 0
+    for path in paths:
+        if not path.startswith("-"):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+    return total
+
+
+def _record_metrics(hook, args: tuple, key, phases: Optional[dict], elapsed: float, received: int,
+                    outcome: str, sent: Optional[int] = None) -> None:
+    phases = phases or {}
+    if outcome != "fail_fast":
+        phases["total"] = elapsed
+    try:
+        hook(
+            args[0] if args else "", key[0] if key else None, phases,
+            _local_payload_size(args) if sent is None else sent, received, outcome,
         )
-        return result.returncode, result.stdout or "", result.stderr or ""
+    except Exception:
+        pass
+
+
+def run_adb(
+    *args: str,
+    device: Optional[str] = None,
+    timeout: int = 30,
+    server: Optional[str] = None,
+    force: bool = False,
+) -> tuple[int, str, str]:
+    """
+    执行 adb 命令。
+    :param args: adb 子命令及参数，如 ("devices", "-l")
+    :param device: 设备序列号，None 表示不指定设备；可写作 "serial@host:port" 指定 server
+    :param timeout: 超时秒数
+    :param server: 目标 adb server（"host:port"），None 表示按设备归属自动路由
+    :param force: 忽略设备健康状态强制执行（健康探测用）
+    :return: (returncode, stdout, stderr)
+    """
+    cmd = _adb_command(args, device, server)
+    if not cmd:
+        return -1, "", _ADB_NOT_FOUND
+    key = _health_key(device, server)
+    hook = _metrics_hook
+    if not force:
+        reason = _fail_fast_reason(args, key)
+        if reason:
+            if hook is not None:
+                _record_metrics(hook, args, key, {}, 0.0, 0, "fail_fast")
+            return -1, "", reason
+    phases = {} if hook is not None else None
+    outcome, received = "exception", 0
+    started = time.monotonic()
+    try:
+        code, out, err = _communicate(cmd, key, timeout, None, phases)
+        decode_started = time.monotonic()
+        result = code, out.decode("utf-8", "replace"), err.decode("utf-8", "replace")
+        if phases is not None:
+            phases["decode"] = time.monotonic() - decode_started
+            outcome, received = ("ok" if code == 0 else "error"), len(out) + len(err)
+        return result
     except subprocess.TimeoutExpired:
+        outcome = "timeout"
         return -1, "", "命令执行超时"
     except Exception as e:
         return -1, "", str(e)
+    finally:
+        elapsed = time.monotonic() - started
+        if device:
+            _last_latency[device] = elapsed
+        if hook is not None:
+            _record_metrics(hook, args, key, phases, elapsed, received, outcome)
+
+
+def run_adb_bytes(
+    *args: str,
+    device: Optional[str] = None,
+    timeout: int = 30,
+    input_data: Optional[bytes] = None,
+    server: Optional[str] = None,
+) -> tuple[int, bytes, str]:
+    """
+    执行 adb 命令并返回原始字节输出，用于 exec-out 截图等二进制数据。
+    :param input_data: 写入子进程 stdin 的数据（exec-in 等场景）
+    :return: (returncode, stdout 字节, stderr 文本)
+    """
+    cmd = _adb_command(args, device, server)
+    if not cmd:
+        return -1, b"", _ADB_NOT_FOUND
+    key = _health_key(device, server)
+    hook = _metrics_hook
+    reason = _fail_fast_reason(args, key)
+    if reason:
+        if hook is not None:
+            _record_metrics(hook, args, key, {}, 0.0, 0, "fail_fast")
+        return -1, b"", reason
+    phases = {} if hook is not None else None
+    outcome, received = "exception", 0
+    started = time.monotonic()
+    try:
+        code, out, err = _communicate(cmd, key, timeout, input_data, phases)
+        if phases is not None:
+            outcome, received = ("ok" if code == 0 else "error"), len(out) + len(err)
+        return code, out, err.decode("utf-8", "replace")
+    except subprocess.TimeoutExpired:
+        outcome = "timeout"
+        return -1, b"", "命令执行超时"
+    except Exception as e:
+        return -1, b"", str(e)
+    finally:
+        if hook is not None:
+            _record_metrics(
+                hook, args, key, phases, time.monotonic() - started, received, outcome,
+                sent=len(input_data) if input_data else 0,
+            )
 
 
-def get_devices() -> list[dict]:
+_warm_up_lock = threading.Lock()
+_warm_up_thread: Optional[threading.Thread] = None
+
+
+def warm_up_server() -> None:
     """
-    获取已连接设备列表。
-    :return: [{"serial": "xxx", "status": "device", "model": "..."}, ...]
+    后台执行一次 adb start-server（同时解析 adb 路径），进程内只执行一次。
+    程序启动时尽早调用，第一次查询设备列表就不必再等 adb server 启动（首次启动通常要 1～3 秒）。
     """
-    code, out, err = run_adb("devices", "-l")
-    if code != 0:
-        return []
-    devices = []
-    for line in out.strip().splitlines()[1:]:  # 跳过 "List of devices attached"
-        if not line.strip():
-            continue
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is not None:
+            return
+        _warm_up_thread = threading.Thread(
+            target=run_adb, args=("start-server",), kwargs={"timeout": 15}, name="adb-warm-up", daemon=True
+        )
+        _warm_up_thread.start()
+
+
+def popen_adb(*args: str, device: Optional[str] = None, server: Optional[str] = None, **kwargs) -> subprocess.Popen:
+    """
+    以长驻进程方式启动 adb 命令（持久 shell、logcat 流等），调用方负责读写与关闭。
+    kwargs 透传给 subprocess.Popen；未找到 adb 时抛出 FileNotFoundError。
+    """
+    cmd = _adb_command(args, device, server)
+    if not cmd:
+        raise FileNotFoundError(_ADB_NOT_FOUND)
+    if os.name == "nt":
+        kwargs.setdefault("creationflags", subprocess.CREATE_NO_WINDOW)
+    return subprocess.Popen(cmd, **kwargs)
+
+
+# ---------- 输出解析 ----------
+# 解析函数接受任意行迭代器（str.splitlines()、子进程 stdout、adb_async 行流），逐行单遍处理，
+# 不先拼出整段输出再 strip/split/重建列表；目录可能有数万个条目。
+
+
+def iter_devices(lines: Iterable[str]) -> Iterator[dict]:
+    """逐行解析 `adb devices -l` 输出，跳过表头与 "* daemon ..." 提示行。"""
+    for line in lines:
         parts = line.split()
-        if len(parts) < 2:
+        if len(parts) < 2 or line.startswith(("List of devices", "*")):
             continue
-        serial, status = parts[0], parts[1]
         model = ""
         for p in parts[2:]:
             if p.startswith("model:"):
-                model = p.replace("model:", "").strip()
+                model = p[6:]
                 break
-        devices.append({"serial": serial, "status": status, "model": model})
-    return [d for d in devices if d["status"] == "device"]
+        yield {"serial": parts[0], "status": parts[1], "model": model}
+
+
+def parse_devices_output(out: str) -> list[dict]:
+    """解析 `adb devices -l` 输出（含 offline/unauthorized 等所有状态）。"""
+    return list(iter_devices(out.splitlines()))
+
+
+class DirEntry(NamedTuple):
+    """目录条目；is_dir 对符号链接也为 True（有 target 时进入目标路径）。"""
+    name: str
+    is_dir: bool
+    target: Optional[str] = None
+
+
+PARENT_ENTRY = DirEntry("..", True)
+
+
+def iter_ls_entries(lines: Iterable[str]) -> Iterator[DirEntry]:
+    """
+    逐行解析 `ls -la` 输出，产出 DirEntry（不含 "."；".." 原样产出）。
+    名称紧跟在时间列（HH:MM）之后，可含空格——toybox 为 perm nlink user group size YYYY-MM-DD HH:MM name，
+    busybox/GNU 为 perm nlink user group size month day HH:MM name；时间列是年份等其他格式时按列切分，
+    名称取第 9 列起（只有 8 列时取第 8 列）。
+    """
+    new_entry = tuple.__new__  # 跳过 NamedTuple 的 Python 层 __new__，数万条目时明显更快
+    for line in lines:
+        if not line:
+            continue
+        if line[0] not in "dl-":
+            line = line.lstrip()
+            if not line or line[0] not in "dl-":
+                continue  # "total N"、权限位不是目录/链接/文件的条目
+        colon = line.find(":")
+        if colon > 0 and line[colon + 3:colon + 4] == " ":
+            name = line[colon + 4:].strip()
+        else:
+            parts = line.split(None, 8)
+            if len(parts) < 8:
+                continue
+            name = parts[-1].strip()
+        target = None
+        if " -> " in name:
+            name, target = name.split(" -> ", 1)
+            name, target = name.strip(), target.strip()
+        if name == "." or not name:
+            continue
+        # d=目录，l=符号链接（有 target 时点击进入目标路径）
+        yield PARENT_ENTRY if name == ".." else new_entry(DirEntry, (name, line[0] != "-", target))
+
+
+def iter_packages(lines: Iterable[str]) -> Iterator[str]:
+    """逐行解析 `pm list packages` 输出（每行 "package:com.example.app"），产出包名。"""
+    for line in lines:
+        if line.startswith("package:"):
+            name = line[8:].strip()
+            if name:
+                yield name
+
+
+def get_devices() -> list[dict]:
+    """
+    获取已连接设备列表；配置了多个 adb server 时并发查询并合并，每台设备标注所在 server。
+    不同 server 上出现相同序列号时，后者的 serial 写作 "serial@host:port" 以便区分路由。
+    :return: [{"serial": "xxx", "status": "device", "model": "...", "server": "host:port" 或 "",
+              "metadata": DeviceMetadata 或 None（尚未获取）}, ...]
+    """
+    servers = get_adb_servers()
+    if len(servers) == 1:
+        results = [(servers[0], run_adb("devices", "-l", server=servers[0]))]
+    else:
+        with ThreadPoolExecutor(max_workers=len(servers)) as pool:
+            futures = [(srv, pool.submit(run_adb, "devices", "-l", server=srv, timeout=10)) for srv in servers]
+            results = [(srv, fut.result()) for srv, fut in futures]
+    devices = []
+    routes: dict[str, str] = {}
+    for server, (code, out, err) in results:
+        if code != 0:
+            continue
+        for d in parse_devices_output(out):
+            d["server"] = server
+            if d["serial"] in routes:
+                d["serial"] = f"{d['serial']}@{server or '127.0.0.1:5037'}"
+            else:
+                routes[d["serial"]] = server
+            devices.append(d)
+    with _servers_lock:
+        _device_servers.clear()
+        _device_servers.update(routes)
+    online = [d for d in devices if d["status"] == "device"]
+    # 附上已缓存的元数据（不发额外命令）；不在线的设备缓存随之失效，重新上线时再获取
+    from core.device_metadata import get_metadata_cache
+    cache = get_metadata_cache()
+    cache.retain(d["serial"] for d in online)
+    for d in online:
+        d["metadata"] = cache.peek(d["serial"])
+    return online
 
 
 def install_apk(device: str, apk_path: str, replace: bool = True) -> tuple[int, str, str]:
@@ -109,6 +611,11 @@ def screenshot(device: str, save_path: str) -> tuple[int, str, str]:
     return run_adb("pull", remote, save_path, device=device)
 
 
+def screencap_png(device: str, timeout: int = 15) -> tuple[int, bytes, str]:
+    """通过 exec-out 直接取回 PNG 截图字节，不经过设备存储。"""
+    return run_adb_bytes("exec-out", "screencap", "-p", device=device, timeout=timeout)
+
+
 def start_screen_record(device: str, save_path: str, duration: int = 180) -> tuple[int, str, str]:
     """开始录屏（在设备上录制，结束后需 pull）。duration 秒。"""
     remote = "/sdcard/adb_record.mp4"
@@ -136,55 +643,22 @@ def pull(device: str, remote: str, local: str, timeout: int = 60) -> tuple[int,
     return run_adb("pull", remote, local, device=device, timeout=timeout)
 
 
-def list_device_path(device: str, path: str) -> tuple[list[dict], Optional[str]]:
+def list_device_path(device: str, path: str) -> tuple[list[DirEntry], Optional[str]]:
     """
     列出设备上指定路径下的目录和文件。
     兼容不同 Android 的 ls -la 输出（列数可能为 7/8/9 等），并正确处理符号链接名称。
     :param device: 设备序列号
     :param path: 设备上的绝对路径，如 /sdcard 或 /storage/emulated/0
-    :return: (entries, error)。entries 为 [{"name": str, "is_dir": bool, "target": str|None}, ...]；error 非空表示失败原因。
+    :return: (entries, error)。entries 为 DirEntry(name, is_dir, target) 列表，非根目录时总含 ".."；
+             error 非空表示失败原因。
     """
     path = path.strip().rstrip("/") or "/"
     code, out, err = run_adb("shell", "ls", "-la", path, device=device, timeout=15)
     if code != 0:
         return [], err.strip() or out.strip() or "无法访问该路径"
-    entries = []
-    lines = out.strip().splitlines()
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith("total "):
-            continue
-        # 兼容不同列数：标准为 perm nlink user group size month day time name；部分设备无 group 则 8 列。
-        parts = line.split()
-        if len(parts) < 8:
-            if len(parts) >= 2 and parts[-1] in (".", ".."):
-                if parts[-1] == "..":
-                    entries.append({"name": "..", "is_dir": True, "target": None})
-                continue
-            continue
-        perm = parts[0]
-        if perm[0] not in ("d", "l", "-"):
-            continue
-        if len(parts) >= 9:
-            raw_name = " ".join(parts[8:]).strip()
-        else:
-            raw_name = parts[7] if len(parts) >= 8 else ""
-        if " -> " in raw_name:
-            name, target = raw_name.split(" -> ", 1)
-            name = name.strip()
-            target = target.strip()
-        else:
-            name = raw_name
-            target = None
-        if name in (".", ".."):
-            if name == "..":
-                entries.append({"name": "..", "is_dir": True, "target": None})
-            continue
-        # d=目录，l=符号链接（有 target 时点击进入目标路径）
-        is_dir = perm.startswith("d") or perm.startswith("l")
-        entries.append({"name": name, "is_dir": is_dir, "target": target})
-    if path != "/" and not any(e["name"] == ".." for e in entries):
-        entries.insert(0, {"name": "..", "is_dir": True, "target": None})
+    entries = list(iter_ls_entries(out.splitlines()))
+    if path != "/" and PARENT_ENTRY not in entries:
+        entries.insert(0, PARENT_ENTRY)
     return entries, None
 
 
@@ -195,14 +669,7 @@ def get_installed_packages(device: str, include_system: bool = False) -> tuple[i
     code, out, err = run_adb("shell", "pm", "list", "packages", *flags, device=device)
     if code != 0:
         return code, [], err
-    
-    packages = []
-    for line in out.strip().splitlines():
-        # output format: "package:com.example.app"
-        line = line.strip()
-        if line.startswith("package:"):
-            packages.append(line.replace("package:", ""))
-    return 0, "\n".join(sorted(packages)), ""
+    return 0, "\n".join(sorted(iter_packages(out.splitlines()))), ""
 
 
 def get_package_path(device: str, package: str) -> tuple[int, str, str]:
@@ -232,6 +699,8 @@ def logcat(device: str, clear: bool = False, max_lines: Optional[int] = None) ->
 
 def reboot(device: str, mode: str = "") -> tuple[int, str, str]:
     """重启设备。mode: 空=普通重启, bootloader, recovery。"""
+    from core.device_metadata import get_metadata_cache
+    get_metadata_cache().invalidate(device)
     if mode:
         return run_adb("reboot", mode, device=device)
     return run_adb("reboot", device=device)
@@ -245,9 +714,9 @@ def adb_pair(host: str, port: int, code: str) -> tuple[int, str, str]:
     return run_adb("pair", f"{host}:{port}", code, timeout=30)
 
 
-def adb_connect(host: str, port: int) -> tuple[int, str, str]:
-    """无线连接：adb connect host:port。"""
-    return run_adb("connect", f"{host}:{port}", timeout=15)
+def adb_connect(host: str, port: int, server: Optional[str] = None) -> tuple[int, str, str]:
+    """无线连接：adb connect host:port。server 为 None 时使用本机默认 adb server。"""
+    return run_adb("connect", f"{host}:{port}", timeout=15, server=server)
 
 
 def qr_string_for_phone_scan(name: str, password: str) -> str:
@@ -257,3 +726,7 @@ def qr_string_for_phone_scan(name: str, password: str) -> str:
     格式：WIFI:T:ADB;S:<name>;P:<password>;;
     """
     return f"WIFI:T:ADB;S:{name};P:{password};;"
+
+
+if os.environ.get("GUI_ADB_METRICS", "").strip() not in ("", "0"):
+    import core.metrics  # noqa: F401  导入即按环境变量开启命令耗时统计
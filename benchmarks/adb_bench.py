@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+adb 操作基准：在进程内启动模拟 adb server（fake_adb_server.py），对常用路径计时，结果按提交保存，便于跨提交比较。
+
+用例：
+    devices          adb_helper.get_devices（子进程）与 adb_async.devices（原生协议）
+    list_path        adb_helper.list_device_path 列出 /sdcard/bench（dir_entries 个条目）
+    packages         adb_helper.get_installed_packages（全部应用）
+    shell            所有设备并发执行 echo：子进程与原生协议各一轮
+    transfer         拉取 / 推送 blob.bin 的吞吐：子进程与原生协议
+    logcat           logcat -d 整段输出耗时；所有设备持续 logcat 流的每秒接收行数
+    ui_refresh       主窗口一次设备列表刷新（后台查询 + 界面更新，offscreen）
+
+子进程路径需要本机有 adb 客户端（项目 platform-tools 或 PATH），没有时这些指标跳过；
+客户端通过 ANDROID_ADB_SERVER_PORT 连到模拟 server，不会碰本机真实的 adb server。
+
+用法：
+    python benchmarks/adb_bench.py                          # 全部用例，结果写到 benchmarks/results/
+    python benchmarks/adb_bench.py --cases shell,transfer --devices 16 --latency-ms 3 --bandwidth-mbps 40
+    python benchmarks/adb_bench.py --compare last           # 与上一次结果比较
+    python benchmarks/adb_bench.py --compare benchmarks/results/xxx.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_adb_server import FakeAdbServer, add_config_arguments, config_from_args  # noqa: E402
+
+CASES = ("devices", "list_path", "packages", "shell", "transfer", "logcat", "ui_refresh")
+
+
+class Skip(Exception):
+    """用例在当前环境无法运行（如缺少 adb 客户端或 PyQt6）。"""
+
+
+def _median_ms(func: Callable[[], object], runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def _check(result: tuple, what: str):
+    if result[0] != 0:
+        raise RuntimeError(f"{what} 失败：{result[2] or result[1]}")
+    return result
+
+
+class Bench:
+    def __init__(self, server: FakeAdbServer, runs: int, workdir: Path):
+        self.server = server
+        self.runs = runs
+        self.workdir = workdir
+        self.serials = list(server.devices)
+        self.has_client = self._probe_client()
+
+    @staticmethod
+    def _probe_client() -> bool:
+        import adb_helper
+        path = adb_helper._find_adb()
+        if not path:
+            return False
+        try:
+            return subprocess.run([path, "version"], capture_output=True, timeout=10).returncode == 0
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+
+    def _need_client(self):
+        if not self.has_client:
+            raise Skip("未找到可用的 adb 客户端")
+
+    # ---------- 用例 ----------
+
+    def case_devices(self) -> dict:
+        import adb_helper
+        from core import adb_async
+        result = {"native_ms": _median_ms(lambda: adb_async.run_sync(adb_async.devices()), self.runs)}
+        if self.has_client:
+            result["subprocess_ms"] = _median_ms(adb_helper.get_devices, self.runs)
+        return result
+
+    def case_list_path(self) -> dict:
+        import adb_helper
+        self._need_client()
+        serial = self.serials[0]
+        entries, err = adb_helper.list_device_path(serial, "/sdcard/bench")
+        if err:
+            raise RuntimeError(err)
+        return {
+            "entries": len(entries),
+            "subprocess_ms": _median_ms(lambda: adb_helper.list_device_path(serial, "/sdcard/bench"), self.runs),
+        }
+
+    def case_packages(self) -> dict:
+        import adb_helper
+        self._need_client()
+        serial = self.serials[0]
+        return {
+            "subprocess_ms": _median_ms(
+                lambda: _check(adb_helper.get_installed_packages(serial, include_system=True), "pm list"), self.runs
+            ),
+        }
+
+    def case_shell(self) -> dict:
+        """每台设备 10 条 echo，全部设备并发。"""
+        import adb_helper
+        from concurrent.futures import ThreadPoolExecutor
+        from core import adb_async
+        per_device = 10
+        total = per_device * len(self.serials)
+
+        async def _native():
+            await asyncio.gather(*(
+                adb_async.shell(s, "echo ok") for s in self.serials for _ in range(per_device)
+            ))
+
+        result = {"commands": total, "native_ms": _median_ms(lambda: adb_async.run_sync(_native()), self.runs)}
+        if self.has_client:
+            def _subprocess():
+                with ThreadPoolExecutor(max_workers=min(32, total)) as pool:
+                    list(pool.map(lambda s: adb_helper.shell(s, "echo ok"), [s for s in self.serials for _ in range(per_device)]))
+            result["subprocess_ms"] = _median_ms(_subprocess, self.runs)
+        return result
+
+    def case_transfer(self) -> dict:
+        import adb_helper
+        from core import adb_async
+        serial = self.serials[0]
+        size_mb = self.server.config.blob_size / (1024 * 1024)
+        local = self.workdir / "blob.bin"
+        result = {}
+
+        def _rate(func) -> float:
+            return round(size_mb / (_median_ms(func, self.runs) / 1000), 2)
+
+        result["native_pull_mbps"] = _rate(
+            lambda: _check(adb_async.run_sync(adb_async.pull(serial, "/sdcard/bench/blob.bin", str(local))), "pull")
+        )
+        result["native_push_mbps"] = _rate(
+            lambda: _check(adb_async.run_sync(adb_async.push(serial, str(local), "/sdcard/up.bin")), "push")
+        )
+        if self.has_client:
+            result["subprocess_pull_mbps"] = _rate(
+                lambda: _check(adb_helper.pull(serial, "/sdcard/bench/blob.bin", str(local)), "pull")
+            )
+            result["subprocess_push_mbps"] = _rate(
+                lambda: _check(adb_helper.push(serial, str(local), "/sdcard/up.bin"), "push")
+            )
+        return result
+
+    def case_logcat(self, seconds: float = 2.0) -> dict:
+        import adb_helper
+        from core import adb_async
+        result = {}
+        if self.has_client:
+            result["dump_subprocess_ms"] = _median_ms(lambda: _check(adb_helper.logcat(self.serials[0]), "logcat -d"), self.runs)
+
+        async def _ingest():
+            counts = [0] * len(self.serials)
+
+            async def _one(i, serial):
+                async for _ in adb_async.logcat(serial):
+                    counts[i] += 1
+
+            tasks = [asyncio.create_task(_one(i, s)) for i, s in enumerate(self.serials)]
+            await asyncio.sleep(seconds)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            return sum(counts)
+
+        lines = adb_async.run_sync(_ingest())
+        result["stream_lines_per_s"] = round(lines / seconds, 1)
+        result["stream_expected_per_s"] = self.server.config.logcat_rate * len(self.serials)
+        return result
+
+    def case_ui_refresh(self) -> dict:
+        self._need_client()
+        try:
+            from PyQt6.QtWidgets import QApplication
+            from PyQt6.QtCore import QEventLoop, QTimer
+        except ImportError:
+            raise Skip("未安装 PyQt6")
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        app = QApplication.instance() or QApplication(sys.argv[:1])
+        from ui.main_window import MainWindow
+        win = MainWindow()
+        loop = QEventLoop()
+        done = {}
+        on_ready = win._on_devices_ready
+
+        def _ready(devices):
+            on_ready(devices)
+            done["count"] = len(devices)
+            loop.quit()
+
+        win._on_devices_ready = _ready
+        # 等启动时的那次刷新结束，再计时
+        QTimer.singleShot(10000, loop.quit)
+        loop.exec()
+
+        def _refresh():
+            done.clear()
+            win._refresh_devices()
+            QTimer.singleShot(10000, loop.quit)
+            loop.exec()
+            if "count" not in done:
+                raise RuntimeError("设备列表刷新超时")
+
+        result = {"subprocess_ms": _median_ms(_refresh, self.runs), "devices": done.get("count", 0)}
+        win.close()
+        app.processEvents()
+        return result
+
+
+# ---------- 结果 ----------
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=str(ROOT), capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+
+
+def _lower_is_better(metric: str) -> Optional[bool]:
+    if metric.endswith("_ms"):
+        return True
+    if metric.endswith(("_mbps", "_per_s")) and "expected" not in metric:
+        return False
+    return None
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\n与 {baseline.get('commit') or '?'}（{baseline.get('time', '')}）比较：")
+    for case, metrics in current["results"].items():
+        base = baseline.get("results", {}).get(case, {})
+        for metric, value in metrics.items():
+            direction = _lower_is_better(metric)
+            old = base.get(metric)
+            if direction is None or not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old * 100
+            better = (change < 0) == direction
+            mark = "" if abs(change) < 5 else ("  更快" if better else "  变慢")
+            print(f"  {case:10s} {metric:22s} {old:12.2f} -> {value:12.2f}  {change:+6.1f}%{mark}")
+
+
+def _latest_result(exclude: Optional[Path] = None) -> Optional[Path]:
+    files = sorted(p for p in RESULTS_DIR.glob("*.json") if p != exclude)
+    return files[-1] if files else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="GUI-ADB adb 操作基准（模拟 adb server）")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"逗号分隔的用例（默认全部：{','.join(CASES)}）")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="每项重复次数，取中位数（默认 5）")
+    parser.add_argument("--compare", metavar="FILE", help="与之前的结果比较（last 表示最近一次）")
+    parser.add_argument("--no-save", action="store_true", help="不保存本次结果")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"未知用例：{', '.join(sorted(unknown))}")
+
+    config = config_from_args(args)
+    server = FakeAdbServer(config)
+    port = server.start_in_thread()
+    # 子进程 adb 客户端与 adb_helper / adb_async 都按这个端口找默认 server
+    os.environ["ANDROID_ADB_SERVER_PORT"] = str(port)
+    workdir = Path(tempfile.mkdtemp(prefix="gui-adb-bench-"))
+    os.environ["GUI_ADB_DATA_DIR"] = str(workdir / "data")
+
+    bench = Bench(server, args.runs, workdir)
+    print(f"模拟 adb server 127.0.0.1:{port}，{config.devices} 台设备；adb 客户端：{'有' if bench.has_client else '无（跳过子进程路径）'}")
+    results, skipped = {}, {}
+    try:
+        for case in cases:
+            try:
+                results[case] = getattr(bench, f"case_{case}")()
+            except Skip as e:
+                skipped[case] = str(e)
+                print(f"{case:10s} 跳过：{e}")
+                continue
+            print(f"{case:10s} " + "  ".join(f"{k}={v}" for k, v in results[case].items()))
+    finally:
+        server.stop()
+
+    record = {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(config),
+        "runs": args.runs,
+        "results": results,
+        "skipped": skipped,
+    }
+    saved = None
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        saved = RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{record['commit'] or 'nogit'}.json"
+        saved.write_text(json.dumps(record, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n结果已保存：{saved.relative_to(ROOT)}")
+    if args.compare:
+        path = _latest_result(exclude=saved) if args.compare == "last" else Path(args.compare)
+        if path is None or not path.is_file():
+            print("没有可比较的结果")
+        else:
+            compare(record, json.loads(path.read_text(encoding="utf-8")))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,524 @@
+# -*- coding: utf-8 -*-
+"""
+模拟 adb server：实现 adb 客户端与 server 之间的 TCP 协议（host 服务、设备传输、shell v1/v2、sync 推送/拉取），
+后面挂 N 台虚拟设备，可配置每次请求的延迟、每台设备的链路带宽和各类输出的体量。
+基准测试用它代替真实设备，结果可复现；真实 adb 客户端（adb -P PORT ...）与 core.adb_async 都能直接连上。
+
+虚拟设备支持的 shell 命令（其余返回 127 “not found”）：
+    ls -la PATH / pm list packages [-3] / pm path PKG / logcat [-d] [-t N] [-c] / getprop [NAME]
+    echo / cat / mkdir / true / settings put / input ...（后两者只返回成功）
+文件系统：/sdcard/bench 下有 dir_entries 个条目与一个 blob.bin（blob_size 字节）；推送的文件只记录大小。
+
+命令行独立运行：
+    python benchmarks/fake_adb_server.py --port 5137 --devices 8 --latency-ms 2 --bandwidth-mbps 40
+    adb -P 5137 devices -l
+"""
+
+import argparse
+import asyncio
+import re
+import shlex
+import stat as stat_module
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+# 真实 adb 客户端连接时先比较 host:version，不一致会尝试重启 server；1.0.41 对应 0x29
+DEFAULT_ADB_VERSION = 41
+_FEATURES = "shell_v2,cmd"
+_SYNC_CHUNK = 64 * 1024
+_LEGACY_EXIT = re.compile(r"^\((.*)\); echo (\S+)\$\?$", re.S)
+_LOG_TAGS_PREFIX = re.compile(r"^export ANDROID_LOG_TAGS=\S*;\s*exec\s+")
+_BLOB_PATTERN = bytes(range(256)) * 256
+
+_ID_STDOUT = 1
+_ID_STDERR = 2
+_ID_EXIT = 3
+
+
+@dataclass
+class FakeConfig:
+    devices: int = 4
+    latency_ms: float = 0.0  # 每次 host 查询 / 切换设备传输通道前的延迟
+    bandwidth_mbps: float = 0.0  # 每台设备链路带宽（MB/s），0 表示不限
+    dir_entries: int = 200
+    packages: int = 300
+    third_party: int = 100
+    logcat_lines: int = 5000  # logcat -d 输出行数
+    logcat_rate: int = 2000  # logcat 持续输出时每秒行数
+    blob_size: int = 16 * 1024 * 1024
+    adb_version: int = DEFAULT_ADB_VERSION
+    serial_prefix: str = "bench"  # 虚拟设备序列号前缀，同时运行多个 server 时可区分
+
+
+class _Link:
+    """按设备共享的带宽令牌：同一台设备上的并发传输分摊带宽。"""
+
+    def __init__(self, mbps: float):
+        self.rate = mbps * 1024 * 1024
+        self._free_at = 0.0
+
+    async def consume(self, n: int) -> None:
+        if not self.rate:
+            return
+        now = time.monotonic()
+        self._free_at = max(now, self._free_at) + n / self.rate
+        delay = self._free_at - now
+        if delay > 0.001:
+            await asyncio.sleep(delay)
+
+
+class FakeDevice:
+    def __init__(self, index: int, config: FakeConfig):
+        self.serial = f"{config.serial_prefix}-{index:03d}"
+        self.model = f"Bench_{index % 5}"
+        self.config = config
+        self.link = _Link(config.bandwidth_mbps)
+        self.pushed: dict[str, int] = {}  # 推送的文件：路径 -> 大小
+        self.props = {
+            "ro.product.model": self.model,
+            "ro.product.manufacturer": "Bench",
+            "ro.build.version.release": "14",
+            "ro.build.version.sdk": "34",
+            "ro.serialno": self.serial,
+            "sys.boot_completed": "1",
+        }
+        self._logcat_seq = 0
+
+    # ---------- 文件系统 ----------
+
+    def stat(self, path: str) -> tuple[int, int, int]:
+        """(mode, size, mtime)，不存在时全 0（与 adb sync STAT 一致）。"""
+        path = path.rstrip("/") or "/"
+        mtime = 1700000000
+        if path in ("/", "/sdcard", "/sdcard/bench", "/data/local/tmp") or path.startswith("/sdcard/bench/dir_"):
+            return stat_module.S_IFDIR | 0o775, 4096, mtime
+        if path == "/sdcard/bench/blob.bin":
+            return stat_module.S_IFREG | 0o664, self.config.blob_size, mtime
+        if path.startswith("/sdcard/bench/file_"):
+            return stat_module.S_IFREG | 0o664, 1024, mtime
+        if path in self.pushed:
+            return stat_module.S_IFREG | 0o664, self.pushed[path], mtime
+        return 0, 0, 0
+
+    def ls(self, path: str) -> tuple[int, str]:
+        path = path.rstrip("/") or "/"
+        mode, _, _ = self.stat(path)
+        if not mode:
+            return 1, f"ls: {path}: No such file or directory\n"
+        if not stat_module.S_ISDIR(mode):
+            return 0, f"-rw-rw---- 1 root sdcard_rw 1024 2024-01-01 12:00 {path}\n"
+        lines = ["total 0", "drwxrwx--x 2 root sdcard_rw 4096 2024-01-01 12:00 .",
+                 "drwxrwx--x 2 root sdcard_rw 4096 2024-01-01 12:00 .."]
+        if path == "/":
+            names = [("d", "sdcard"), ("d", "data"), ("d", "system"), ("l", "etc -> /system/etc")]
+        elif path == "/sdcard":
+            names = [("d", "bench"), ("d", "Download"), ("d", "DCIM")]
+        elif path == "/sdcard/bench":
+            n = self.config.dir_entries
+            names = [("d", f"dir_{i:05d}") for i in range(n // 2)] + [("-", f"file_{i:05d}") for i in range(n - n // 2)]
+            names.append(("-", "blob.bin"))
+        else:
+            names = []
+        prefix = path.rstrip("/") + "/"
+        names += [("-", p[len(prefix):]) for p in self.pushed if p.startswith(prefix) and "/" not in p[len(prefix):]]
+        for kind, name in names:
+            perm = {"d": "drwxrwx--x", "l": "lrwxrwxrwx", "-": "-rw-rw----"}[kind]
+            size = self.config.blob_size if name == "blob.bin" else 4096 if kind == "d" else 1024
+            lines.append(f"{perm} 2 root sdcard_rw {size} 2024-01-01 12:00 {name}")
+        return 0, "\n".join(lines) + "\n"
+
+    # ---------- shell ----------
+
+    def _logcat_line(self) -> str:
+        self._logcat_seq += 1
+        n = self._logcat_seq
+        return f"01-01 12:00:{n % 60:02d}.{n % 1000:03d}  {1000 + n % 50:5d}  {1000 + n % 7:5d} I Bench{n % 13}: line {n} payload {'x' * (n % 40)}"
+
+    def run(self, command: str) -> tuple[int, str, str]:
+        """执行一条非持续输出的命令，返回 (code, stdout, stderr)。"""
+        command = _LOG_TAGS_PREFIX.sub("", command.strip())
+        try:
+            argv = shlex.split(command)
+        except ValueError:
+            return 2, "", "sh: syntax error\n"
+        if not argv:
+            return 0, "", ""
+        name, args = argv[0], argv[1:]
+        if name == "true" or name in ("mkdir", "input", "settings", "am", "wm"):
+            return 0, "", ""
+        if name == "echo":
+            return 0, " ".join(args) + "\n", ""
+        if name == "ls":
+            paths = [a for a in args if not a.startswith("-")] or ["/"]
+            code, out = self.ls(paths[-1])
+            return (code, out, "") if code == 0 else (code, "", out)
+        if name == "cat":
+            mode, size, _ = self.stat(args[0] if args else "")
+            if not mode:
+                return 1, "", f"cat: {args[0] if args else ''}: No such file or directory\n"
+            return 0, "x" * min(size, 4096), ""
+        if name == "getprop":
+            if args:
+                return 0, self.props.get(args[0], "") + "\n", ""
+            return 0, "".join(f"[{k}]: [{v}]\n" for k, v in self.props.items()), ""
+        if name == "pm" and args[:2] == ["list", "packages"]:
+            third = [f"com.bench.app{i:04d}" for i in range(self.config.third_party)]
+            system = [f"com.android.sys{i:04d}" for i in range(max(0, self.config.packages - self.config.third_party))]
+            names = third if "-3" in args else system + third
+            return 0, "".join(f"package:{p}\n" for p in names), ""
+        if name == "pm" and args[:1] == ["path"] and len(args) > 1:
+            return 0, f"package:/data/app/~~bench/{args[1]}-1/base.apk\n", ""
+        if name == "logcat":
+            if "-c" in args:
+                return 0, "", ""
+            count = self.config.logcat_lines
+            if "-t" in args:
+                try:
+                    count = min(count, int(args[args.index("-t") + 1]))
+                except (IndexError, ValueError):
+                    pass
+            return 0, "".join(self._logcat_line() + "\n" for _ in range(count)), ""
+        return 127, "", f"/system/bin/sh: {name}: inaccessible or not found\n"
+
+    def is_streaming(self, command: str) -> bool:
+        argv = _LOG_TAGS_PREFIX.sub("", command.strip()).split()
+        return bool(argv) and argv[0] == "logcat" and not {"-d", "-c", "-t"} & set(argv)
+
+
+class FakeAdbServer:
+    """
+    用法：
+        server = FakeAdbServer(FakeConfig(devices=8, latency_ms=2))
+        port = server.start_in_thread()
+        ...
+        server.stop()
+    """
+
+    def __init__(self, config: Optional[FakeConfig] = None):
+        self.config = config or FakeConfig()
+        self.devices = {d.serial: d for d in (FakeDevice(i, self.config) for i in range(self.config.devices))}
+        self.requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- 生命周期 ----------
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """在独立线程的事件循环中运行，返回实际端口。"""
+        started = threading.Event()
+        result: dict = {}
+
+        def _run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                result["port"] = self._loop.run_until_complete(self.start(host, port))
+            except OSError as e:
+                result["error"] = e
+                started.set()
+                return
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=_run, name="fake-adb-server", daemon=True)
+        self._thread.start()
+        started.wait()
+        if "error" in result:
+            raise result["error"]
+        return result["port"]
+
+    async def _shutdown(self):
+        self._server.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self) -> None:
+        """停止 start_in_thread 启动的 server，断开所有连接。"""
+        loop = self._loop
+        if loop is None or self._server is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(5)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            if self._thread:
+                self._thread.join(2)
+            loop.close()
+            self._loop = self._thread = None
+
+    # ---------- 协议 ----------
+
+    async def _delay(self):
+        if self.config.latency_ms:
+            await asyncio.sleep(self.config.latency_ms / 1000)
+
+    @staticmethod
+    def _okay(writer, payload: Optional[str] = None):
+        if payload is None:
+            writer.write(b"OKAY")
+        else:
+            data = payload.encode("utf-8")
+            writer.write(b"OKAY%04x%s" % (len(data), data))
+
+    @staticmethod
+    def _fail(writer, message: str):
+        data = message.encode("utf-8")
+        writer.write(b"FAIL%04x%s" % (len(data), data))
+
+    def _device_list(self, long: bool) -> str:
+        if long:
+            return "".join(
+                f"{d.serial}\tdevice product:bench model:{d.model} device:bench transport_id:{i + 1}\n"
+                for i, d in enumerate(self.devices.values())
+            )
+        return "".join(f"{d.serial}\tdevice\n" for d in self.devices.values())
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        device: Optional[FakeDevice] = None
+        try:
+            while True:
+                size = int(await reader.readexactly(4), 16)
+                service = (await reader.readexactly(size)).decode("utf-8", "replace")
+                self.requests += 1
+                if device is None:
+                    device, done = await self._host_service(service, reader, writer)
+                    if done:
+                        break
+                    continue
+                await self._device_service(device, service, reader, writer)
+                break
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, asyncio.CancelledError):
+            pass  # 客户端断开或 server 停止
+        finally:
+            writer.close()
+
+    def _find(self, serial: str) -> Optional[FakeDevice]:
+        if serial in ("", "any"):
+            return next(iter(self.devices.values()), None)
+        return self.devices.get(serial)
+
+    async def _host_service(self, service: str, reader, writer) -> tuple[Optional[FakeDevice], bool]:
+        """处理 host 服务；返回 (切换到的设备, 连接是否结束)。"""
+        await self._delay()
+        if service == "host:version":
+            self._okay(writer, f"{self.config.adb_version:04x}")
+            return None, True
+        if service == "host:kill":
+            self._okay(writer)
+            return None, True
+        if service in ("host:devices", "host:devices-l"):
+            self._okay(writer, self._device_list(service.endswith("-l")))
+            return None, True
+        if service in ("host:track-devices", "host:track-devices-l"):
+            writer.write(b"OKAY")
+            body = self._device_list(service.endswith("-l")).encode("utf-8")
+            writer.write(b"%04x%s" % (len(body), body))
+            await writer.drain()
+            await reader.read()  # 设备不变化，保持连接直到客户端断开
+            return None, True
+        if service in ("host:features", "host:host-features"):
+            self._okay(writer, _FEATURES)
+            return None, True
+        match = re.match(r"^host-serial:(.+):(features|get-state|get-serialno)$", service)
+        if match:
+            target = self._find(match.group(1))
+            if target is None:
+                self._fail(writer, f"device '{match.group(1)}' not found")
+            else:
+                self._okay(writer, {"features": _FEATURES, "get-state": "device"}.get(match.group(2), target.serial))
+            return None, True
+        for prefix, with_id in (("host:transport:", False), ("host:tport:serial:", True)):
+            if service.startswith(prefix):
+                serial = service[len(prefix):]
+                break
+        else:
+            if service in ("host:transport-any", "host:transport-usb", "host:tport:any", "host:tport:usb"):
+                serial, with_id = "any", service.startswith("host:tport")
+            else:
+                self._fail(writer, f"unknown host service '{service}'")
+                return None, True
+        target = self._find(serial)
+        if target is None:
+            self._fail(writer, f"device '{serial}' not found")
+            return None, True
+        writer.write(b"OKAY")
+        if with_id:
+            writer.write(struct.pack("<Q", list(self.devices).index(target.serial) + 1))
+        return target, False
+
+    async def _device_service(self, device: FakeDevice, service: str, reader, writer):
+        if service.startswith("shell"):
+            head, _, command = service.partition(":")
+            options = head.split(",")[1:]
+            writer.write(b"OKAY")
+            if "v2" in options:
+                await self._shell_v2(device, command, writer)
+            else:
+                await self._shell_legacy(device, command, writer)
+        elif service.startswith("exec:"):
+            writer.write(b"OKAY")
+            code, out, err = device.run(service[5:])
+            await self._send(device, writer, (out + err).encode("utf-8"))
+        elif service == "sync:":
+            writer.write(b"OKAY")
+            await self._sync(device, reader, writer)
+        else:
+            self._fail(writer, f"unknown service '{service}'")
+
+    async def _send(self, device: FakeDevice, writer, data: bytes, packet: Optional[int] = None):
+        """按设备带宽分块写出；packet 非空时包成 shell v2 包。"""
+        for i in range(0, len(data), _SYNC_CHUNK):
+            chunk = data[i:i + _SYNC_CHUNK]
+            await device.link.consume(len(chunk))
+            if packet is not None:
+                writer.write(struct.pack("<BI", packet, len(chunk)))
+            writer.write(chunk)
+            await writer.drain()
+
+    async def _stream_logcat(self, device: FakeDevice, writer, packet: Optional[int]):
+        """持续输出 logcat，每 10ms 一批，直到客户端断开。"""
+        per_batch = max(1, self.config.logcat_rate // 100)
+        while not writer.is_closing():
+            data = "".join(device._logcat_line() + "\n" for _ in range(per_batch)).encode("utf-8")
+            await self._send(device, writer, data, packet)
+            await asyncio.sleep(0.01)
+
+    async def _shell_v2(self, device: FakeDevice, command: str, writer):
+        if device.is_streaming(command):
+            await self._stream_logcat(device, writer, _ID_STDOUT)
+            return
+        code, out, err = device.run(command)
+        await self._send(device, writer, out.encode("utf-8"), _ID_STDOUT)
+        if err:
+            await self._send(device, writer, err.encode("utf-8"), _ID_STDERR)
+        writer.write(struct.pack("<BIB", _ID_EXIT, 1, code & 0xFF))
+
+    async def _shell_legacy(self, device: FakeDevice, command: str, writer):
+        match = _LEGACY_EXIT.match(command)
+        inner = match.group(1) if match else command
+        if device.is_streaming(inner):
+            await self._stream_logcat(device, writer, None)
+            return
+        code, out, err = device.run(inner)
+        text = out + err
+        if match:
+            text += f"{match.group(2)}{code}\n"
+        await self._send(device, writer, text.replace("\n", "\r\n").encode("utf-8"))
+
+    async def _sync(self, device: FakeDevice, reader, writer):
+        while True:
+            header = await reader.readexactly(8)
+            command, length = header[:4], struct.unpack("<I", header[4:])[0]
+            if command == b"QUIT":
+                return
+            path = (await reader.readexactly(length)).decode("utf-8", "replace")
+            if command == b"STAT":
+                writer.write(b"STAT" + struct.pack("<III", *device.stat(path)))
+            elif command == b"LIST":
+                _, out = device.ls(path)
+                for line in out.splitlines()[1:]:
+                    parts = line.split()
+                    name = " ".join(parts[7:]).split(" -> ")[0].encode("utf-8")
+                    mode, size, mtime = device.stat(path.rstrip("/") + "/" + name.decode())
+                    writer.write(b"DENT" + struct.pack("<IIII", mode, size, mtime, len(name)) + name)
+                writer.write(b"DONE" + struct.pack("<IIII", 0, 0, 0, 0))
+            elif command == b"RECV":
+                mode, size, _ = device.stat(path)
+                if not mode or stat_module.S_ISDIR(mode):
+                    message = f"remote object '{path}' does not exist".encode("utf-8")
+                    writer.write(b"FAIL" + struct.pack("<I", len(message)) + message)
+                else:
+                    await self._send_file(device, writer, size)
+            elif command == b"SEND":
+                remote, _, _ = path.rpartition(",")
+                received = 0
+                while True:
+                    header = await reader.readexactly(8)
+                    kind, length = header[:4], struct.unpack("<I", header[4:])[0]
+                    if kind == b"DONE":
+                        break
+                    if kind != b"DATA":
+                        return
+                    await device.link.consume(length)
+                    received += len(await reader.readexactly(length))
+                device.pushed[remote] = received
+                writer.write(b"OKAY" + struct.pack("<I", 0))
+            else:
+                message = b"unsupported sync command"
+                writer.write(b"FAIL" + struct.pack("<I", len(message)) + message)
+                return
+            await writer.drain()
+
+    async def _send_file(self, device: FakeDevice, writer, size: int):
+        sent = 0
+        while sent < size:
+            n = min(_SYNC_CHUNK, size - sent)
+            await device.link.consume(n)
+            writer.write(b"DATA" + struct.pack("<I", n) + _BLOB_PATTERN[:n])
+            await writer.drain()
+            sent += n
+        writer.write(b"DONE" + struct.pack("<I", 0))
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """模拟参数（基准脚本复用）。"""
+    defaults = FakeConfig()
+    parser.add_argument("--devices", type=int, default=defaults.devices, help="虚拟设备数")
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="每次请求的延迟（毫秒）")
+    parser.add_argument("--bandwidth-mbps", type=float, default=defaults.bandwidth_mbps, help="每台设备带宽（MB/s，0 不限）")
+    parser.add_argument("--dir-entries", type=int, default=defaults.dir_entries, help="/sdcard/bench 条目数")
+    parser.add_argument("--packages", type=int, default=defaults.packages, help="应用总数")
+    parser.add_argument("--third-party", type=int, default=defaults.third_party, help="第三方应用数")
+    parser.add_argument("--logcat-lines", type=int, default=defaults.logcat_lines, help="logcat -d 输出行数")
+    parser.add_argument("--logcat-rate", type=int, default=defaults.logcat_rate, help="logcat 持续输出的每秒行数")
+    parser.add_argument("--blob-size", type=int, default=defaults.blob_size, help="/sdcard/bench/blob.bin 字节数")
+    parser.add_argument("--adb-version", type=int, default=defaults.adb_version, help="host:version 返回的协议版本")
+
+
+def config_from_args(args: argparse.Namespace) -> FakeConfig:
+    return FakeConfig(
+        devices=args.devices,
+        latency_ms=args.latency_ms,
+        bandwidth_mbps=args.bandwidth_mbps,
+        dir_entries=args.dir_entries,
+        packages=args.packages,
+        third_party=args.third_party,
+        logcat_lines=args.logcat_lines,
+        logcat_rate=args.logcat_rate,
+        blob_size=args.blob_size,
+        adb_version=args.adb_version,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="模拟 adb server（基准测试用）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5137)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    server = FakeAdbServer(config_from_args(args))
+
+    async def _serve():
+        port = await server.start(args.host, args.port)
+        print(f"模拟 adb server：{args.host}:{port}，{args.devices} 台设备（Ctrl+C 退出）", flush=True)
+        async with server._server:
+            await server._server.serve_forever()
+
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+输出解析微基准：把 fixtures/ 下录制的 adb 输出放大到目标规模（默认 ls 4 万条、devices 500 台、pm 5000 个包），
+对比 adb_helper 当前的逐行解析与改写前的实现（_legacy_*，原样保留作参照），并核对两者结果一致。
+
+用法：
+    python benchmarks/parser_bench.py                      # 打印耗时与加速比
+    python benchmarks/parser_bench.py --min-speedup 1.2    # ls 各项加速比低于该值时退出码为 1（防回退）
+    python benchmarks/parser_bench.py --fixture-ls my_ls.txt   # 用自己录制的 `adb shell ls -la DIR` 输出
+
+旧实现在 toybox 输出上把含空格的名称与符号链接取错列（已修正），核对结果时跳过这类条目。
+"""
+
+import argparse
+import gc
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+sys.path.insert(0, str(ROOT))
+
+import adb_helper  # noqa: E402
+
+
+# ---------- 改写前的实现（参照） ----------
+
+
+def _legacy_parse_devices_output(out: str) -> list[dict]:
+    devices = []
+    for line in out.strip().splitlines()[1:]:
+        if not line.strip():
+            continue
+        parts = line.split()
+        if len(parts) < 2:
+            continue
+        serial, status = parts[0], parts[1]
+        model = ""
+        for p in parts[2:]:
+            if p.startswith("model:"):
+                model = p.replace("model:", "").strip()
+                break
+        devices.append({"serial": serial, "status": status, "model": model})
+    return devices
+
+
+def _legacy_parse_ls(out: str, path: str) -> list[dict]:
+    entries = []
+    for line in out.strip().splitlines():
+        line = line.strip()
+        if not line or line.startswith("total "):
+            continue
+        parts = line.split()
+        if len(parts) < 8:
+            if len(parts) >= 2 and parts[-1] in (".", ".."):
+                if parts[-1] == "..":
+                    entries.append({"name": "..", "is_dir": True, "target": None})
+                continue
+            continue
+        perm = parts[0]
+        if perm[0] not in ("d", "l", "-"):
+            continue
+        if len(parts) >= 9:
+            raw_name = " ".join(parts[8:]).strip()
+        else:
+            raw_name = parts[7] if len(parts) >= 8 else ""
+        if " -> " in raw_name:
+            name, target = raw_name.split(" -> ", 1)
+            name = name.strip()
+            target = target.strip()
+        else:
+            name = raw_name
+            target = None
+        if name in (".", ".."):
+            if name == "..":
+                entries.append({"name": "..", "is_dir": True, "target": None})
+            continue
+        is_dir = perm.startswith("d") or perm.startswith("l")
+        entries.append({"name": name, "is_dir": is_dir, "target": target})
+    if path != "/" and not any(e["name"] == ".." for e in entries):
+        entries.insert(0, {"name": "..", "is_dir": True, "target": None})
+    return entries
+
+
+def _legacy_order(entries: list[dict]) -> list[dict]:
+    """原 DevicePathDialog._load_list 的三次筛选 + 两次排序。"""
+    dirs = [e for e in entries if e["is_dir"] and e["name"] != ".."]
+    files = [e for e in entries if not e["is_dir"]]
+    up = [e for e in entries if e["name"] == ".."]
+    return up + sorted(dirs, key=lambda x: x["name"].lower()) + sorted(files, key=lambda x: x["name"].lower())
+
+
+def _legacy_packages(out: str) -> str:
+    packages = []
+    for line in out.strip().splitlines():
+        line = line.strip()
+        if line.startswith("package:"):
+            packages.append(line.replace("package:", ""))
+    return "\n".join(sorted(packages))
+
+
+# ---------- 当前实现 ----------
+
+
+def _current_parse_ls(out: str, path: str) -> list:
+    entries = list(adb_helper.iter_ls_entries(out.splitlines()))
+    if path != "/" and adb_helper.PARENT_ENTRY not in entries:
+        entries.insert(0, adb_helper.PARENT_ENTRY)
+    return entries
+
+
+def _current_order(entries: list) -> list:
+    from ui.dialogs.device_path_dialog import _sorted_entries
+    return _sorted_entries(entries)
+
+
+def _current_packages(out: str) -> str:
+    return "\n".join(sorted(adb_helper.iter_packages(out.splitlines())))
+
+
+# ---------- 放大 fixture ----------
+
+
+def _scale_ls(text: str, count: int) -> str:
+    """保留表头与 "."/".."，其余条目循环复制并在名称前加序号，直到 count 条。"""
+    lines = text.splitlines()
+    head = [l for l in lines if l.startswith("total ") or l.rstrip().endswith((" .", " .."))]
+    body = [l for l in lines if l not in head and l.strip()]
+    out = list(head)
+    for i in range(count):
+        line = body[i % len(body)]
+        parts = line.split(None, 7)
+        # 名称所在列：ISO 日期为第 8 列，否则第 9 列
+        if len(parts[5]) == 10 and parts[5][4] == "-":
+            out.append(line[: line.rindex(parts[7])] + f"{i:06d}_{parts[7]}")
+        else:
+            prefix, _, name = line.rpartition(" ")
+            if " -> " in line:
+                prefix, _, rest = line.partition(" -> ")
+                prefix, _, name = prefix.rpartition(" ")
+                name = f"{name} -> {rest}"
+            out.append(f"{prefix} {i:06d}_{name}")
+    return "\n".join(out) + "\n"
+
+
+def _scale_devices(text: str, count: int) -> str:
+    lines = text.splitlines()
+    head = [l for l in lines if l.startswith(("List of devices", "*"))]
+    body = [l for l in lines if l.strip() and l not in head]
+    rows = [f"{i:05d}{body[i % len(body)]}" for i in range(count)]
+    return "\n".join(head + rows) + "\n"
+
+
+def _scale_packages(text: str, count: int) -> str:
+    body = [l for l in text.splitlines() if l.strip()]
+    return "".join(f"{body[i % len(body)]}.n{i}\n" for i in range(count))
+
+
+# ---------- 计时 ----------
+
+
+def _best_ms(func: Callable[[], object], runs: int) -> float:
+    """取最快一次；计时期间关闭 GC，免得上一用例留下的垃圾算到这一用例头上。"""
+    best = float("inf")
+    for _ in range(runs):
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+        finally:
+            gc.enable()
+    return best * 1000
+
+
+def _same_ls(legacy: list[dict], current: list) -> bool:
+    """逐条核对；旧实现把 toybox 中含空格的名称与符号链接取错列，这类条目跳过。"""
+    if len(legacy) != len(current):
+        return False
+    for old, new in zip(legacy, current):
+        if (old["name"], old["is_dir"], old["target"]) == tuple(new):
+            continue
+        if " " in new.name or (new.target and old["name"].startswith("->")):
+            continue
+        return False
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="adb 输出解析微基准")
+    parser.add_argument("--entries", type=int, default=40000, help="ls 条目数（默认 40000）")
+    parser.add_argument("--devices", type=int, default=500, help="devices 行数（默认 500）")
+    parser.add_argument("--packages", type=int, default=5000, help="包数量（默认 5000）")
+    parser.add_argument("-n", "--runs", type=int, default=7, help="重复次数，取最快一次（默认 7）")
+    parser.add_argument("--fixture-ls", type=Path, default=FIXTURES / "ls_dcim.txt", help="ls -la 录制输出")
+    parser.add_argument("--min-speedup", type=float, default=0.0, help="ls 各项加速比下限，低于时退出码为 1")
+    args = parser.parse_args()
+
+    ls_text = _scale_ls(args.fixture_ls.read_text(encoding="utf-8"), args.entries)
+    busybox_text = _scale_ls((FIXTURES / "ls_busybox.txt").read_text(encoding="utf-8"), args.entries)
+    devices_text = _scale_devices((FIXTURES / "devices_l.txt").read_text(encoding="utf-8"), args.devices)
+    pm_text = _scale_packages((FIXTURES / "pm_list_packages.txt").read_text(encoding="utf-8"), args.packages)
+    path = "/sdcard/DCIM"
+
+    checks = {
+        "ls(toybox)": _same_ls(_legacy_parse_ls(ls_text, path), _current_parse_ls(ls_text, path)),
+        "ls(busybox)": _same_ls(_legacy_parse_ls(busybox_text, path), _current_parse_ls(busybox_text, path)),
+        # 旧实现在 toybox 输出上名称有误，排序结果无从比较，用 busybox 输出核对排序
+        "ls+排序": _same_ls(
+            _legacy_order(_legacy_parse_ls(busybox_text, path)), _current_order(_current_parse_ls(busybox_text, path))
+        ),
+        "devices": _legacy_parse_devices_output("List of devices attached\n" + devices_text.split("List of devices attached\n", 1)[1])
+        == adb_helper.parse_devices_output(devices_text),
+        "pm": _legacy_packages(pm_text) == _current_packages(pm_text),
+    }
+    cases = [
+        ("ls(toybox)", lambda: _legacy_parse_ls(ls_text, path), lambda: _current_parse_ls(ls_text, path)),
+        ("ls(busybox)", lambda: _legacy_parse_ls(busybox_text, path), lambda: _current_parse_ls(busybox_text, path)),
+        (
+            "ls+排序",
+            lambda: _legacy_order(_legacy_parse_ls(ls_text, path)),
+            lambda: _current_order(_current_parse_ls(ls_text, path)),
+        ),
+        (
+            "devices",
+            lambda: _legacy_parse_devices_output(devices_text),
+            lambda: adb_helper.parse_devices_output(devices_text),
+        ),
+        ("pm", lambda: _legacy_packages(pm_text), lambda: _current_packages(pm_text)),
+    ]
+
+    failed = [name for name, ok in checks.items() if not ok]
+    slow = []
+    print(f"{'用例':12s} {'旧实现':>10s} {'当前':>10s} {'加速比':>8s}  结果一致")
+    for name, legacy, current in cases:
+        old_ms, new_ms = _best_ms(legacy, args.runs), _best_ms(current, args.runs)
+        speedup = old_ms / new_ms if new_ms else float("inf")
+        if name.startswith("ls") and speedup < args.min_speedup:
+            slow.append(name)
+        print(f"{name:12s} {old_ms:8.2f}ms {new_ms:8.2f}ms {speedup:7.2f}x  {'是' if checks[name] else '否'}")
+    if failed:
+        print(f"结果不一致：{', '.join(failed)}")
+    if slow:
+        print(f"加速比低于 {args.min_speedup}：{', '.join(slow)}")
+    return 1 if failed or slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准：每轮启动一个全新的 Python 进程，按 main.py 的启动路径创建主窗口，测量
+
+    import     导入主窗口及其依赖
+    window     进程启动到主窗口显示后事件循环第一次空闲
+    devices    进程启动到第一次拿到设备列表（含 adb server 冷启动，受本机 adb 状态影响）
+
+用法：
+    python benchmarks/startup_bench.py                 # 默认 5 轮，打印中位数与最小值
+    python benchmarks/startup_bench.py --save base.json
+    python benchmarks/startup_bench.py --baseline base.json --tolerance 0.2   # 中位数变慢超过 20% 时退出码为 1
+
+无显示环境下自动使用 offscreen 平台插件。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+METRICS = ("import", "window", "devices")
+
+
+def _child() -> None:
+    """子进程：与 main.py 相同的启动顺序，结果以 JSON 写到 stdout 最后一行。"""
+    started = float(os.environ["GUI_ADB_BENCH_T0"])
+    sys.path.insert(0, str(ROOT))
+    t = time.time()
+    import adb_helper
+    adb_helper.warm_up_server()
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QTimer
+    from ui.theme import apply_modern_theme
+    from ui.main_window import MainWindow
+    result = {"import": time.time() - t}
+
+    app = QApplication(sys.argv[:1])
+    app.setStyle("Fusion")
+    apply_modern_theme(app)
+
+    on_devices_ready = MainWindow._on_devices_ready
+
+    def _devices_ready(self, devices):
+        on_devices_ready(self, devices)
+        result.setdefault("devices", time.time() - started)
+        QTimer.singleShot(0, app.quit)
+
+    MainWindow._on_devices_ready = _devices_ready
+    win = MainWindow()
+    win.show()
+    QTimer.singleShot(0, lambda: result.setdefault("window", time.time() - started))
+    QTimer.singleShot(30000, app.quit)
+    app.exec()
+    win.close()
+    print(json.dumps(result))
+
+
+def _run_once(extra_env: dict) -> dict:
+    env = dict(os.environ, **extra_env)
+    env["GUI_ADB_BENCH_T0"] = repr(time.time())
+    proc = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--child"],
+        cwd=str(ROOT), env=env, capture_output=True, text=True, timeout=120,
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"子进程失败（{proc.returncode}）：{proc.stderr.strip()[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="GUI-ADB 启动耗时基准")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("-n", "--runs", type=int, default=5, help="启动次数（默认 5）")
+    parser.add_argument("--save", metavar="FILE", help="把本次结果保存为基线")
+    parser.add_argument("--baseline", metavar="FILE", help="与基线比较")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许中位数变慢的比例（默认 0.2）")
+    args = parser.parse_args()
+    if args.child:
+        _child()
+        return 0
+
+    extra_env = {}
+    if not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY") and sys.platform.startswith("linux"):
+        extra_env["QT_QPA_PLATFORM"] = "offscreen"
+    runs = [_run_once(extra_env) for _ in range(args.runs)]
+    summary = {}
+    for metric in METRICS:
+        values = [r[metric] for r in runs if metric in r]
+        if values:
+            summary[metric] = {"median": statistics.median(values), "min": min(values), "runs": len(values)}
+            print(f"{metric:8s} 中位数 {summary[metric]['median'] * 1000:8.1f}ms  最小 {min(values) * 1000:8.1f}ms")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressed = [
+            m for m, s in summary.items()
+            if m in baseline and s["median"] > baseline[m]["median"] * (1 + args.tolerance)
+        ]
+        for m in regressed:
+            print(f"变慢：{m} {baseline[m]['median'] * 1000:.1f}ms -> {summary[m]['median'] * 1000:.1f}ms")
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
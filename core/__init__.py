@@ -1,22 +1,28 @@
 # -*- coding: utf-8 -*-
-"""与 UI 无关的线程与工具。"""
+"""
+与 UI 无关的线程与工具。
+包级名称按需导入：只用 core.xxx 子模块（如命令行）时不会因为 core.workers 而加载 PyQt6。
+"""
 
-from core.workers import Worker, PairingNotifier, ZeroconfThread
-from core.utils import (
-    make_qr_pixmap,
-    is_success_connect_output,
-    is_success_pair_output,
-    pair_then_connect,
-    connect_only,
-)
+import importlib
 
-__all__ = [
-    "Worker",
-    "PairingNotifier",
-    "ZeroconfThread",
-    "make_qr_pixmap",
-    "is_success_connect_output",
-    "is_success_pair_output",
-    "pair_then_connect",
-    "connect_only",
-]
+_EXPORTS = {
+    "Worker": "core.workers",
+    "DiscoveryNotifier": "core.workers",
+    "make_qr_pixmap": "core.utils",
+    "is_success_connect_output": "core.utils",
+    "is_success_pair_output": "core.utils",
+    "pair_then_connect": "core.utils",
+    "connect_only": "core.utils",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'core' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
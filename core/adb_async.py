@@ -0,0 +1,557 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio 版 adb 客户端：直接通过 TCP 与 adb server 通信（host 服务、shell v2、sync 推送/拉取、
+track-devices、logcat 流），不为每条命令启动 adb 进程，也不占用线程——成百上千个设备流
+可以跑在同一个事件循环里。server 套接字不可达（未启动且无法拉起、远端不接受连接）时
+退回 asyncio 子进程执行 adb 命令行，结果格式不变。
+
+协程可以在任意事件循环中使用（如控制接口）；同步代码与 Qt 界面通过共享的后台循环线程调用：
+
+    from core import adb_async
+    code, out, err = adb_async.run_sync(adb_async.shell("emu1", "getprop ro.product.model"))
+    future = adb_async.submit(adb_async.pull("emu1", "/sdcard/a.txt", "a.txt"))
+
+设备参数与 adb_helper 一致（可写作 "serial@host:port"），同样遵守设备健康状态的快速失败。
+"""
+
+import asyncio
+import contextvars
+import os
+import stat as stat_module
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import adb_helper
+
+_SYNC_CHUNK = 64 * 1024
+_CONNECT_TIMEOUT = 3
+# 套接字不可达的 server 在这段时间内直接走子进程，不反复尝试连接与拉起
+_NATIVE_RETRY_AFTER = 30.0
+
+# shell v2 包类型
+_ID_STDOUT = 1
+_ID_STDERR = 2
+_ID_EXIT = 3
+
+
+class AdbProtocolError(Exception):
+    """adb server 返回 FAIL 或协议数据不符合预期。"""
+
+
+class _ServerUnavailable(Exception):
+    """无法连上 server 套接字（调用方退回子进程）。"""
+
+
+_native_down: dict[str, float] = {}  # server -> 不可达的时间
+# 开启耗时指标时，当前调用的阶段耗时（connect / handshake）写到这里
+_phases: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("adb_async_phases", default=None)
+
+
+# ---------- 连接与 host 服务 ----------
+
+
+async def _read_status(reader: asyncio.StreamReader) -> None:
+    status = await reader.readexactly(4)
+    if status == b"OKAY":
+        return
+    if status == b"FAIL":
+        size = int(await reader.readexactly(4), 16)
+        raise AdbProtocolError((await reader.readexactly(size)).decode("utf-8", "replace"))
+    raise AdbProtocolError(f"意外的响应：{status!r}")
+
+
+async def _request(writer: asyncio.StreamWriter, reader: asyncio.StreamReader, service: str) -> None:
+    data = service.encode("utf-8")
+    writer.write(b"%04x%s" % (len(data), data))
+    await writer.drain()
+    await _read_status(reader)
+
+
+async def _start_server() -> bool:
+    try:
+        cmd = adb_helper.adb_command_line("start-server")
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+        return await asyncio.wait_for(proc.wait(), 15) == 0
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+
+async def _open(server: str, serial: Optional[str] = None):
+    """
+    连上 server，指定 serial 时切换到该设备的传输通道。本机默认 server 未启动时先拉起一次。
+    :raises _ServerUnavailable: 套接字不可达
+    """
+    down_since = _native_down.get(server)
+    if down_since is not None and time.monotonic() - down_since < _NATIVE_RETRY_AFTER:
+        raise _ServerUnavailable(server)
+    host, port = adb_helper.server_address(server)
+    started = time.monotonic()
+    for attempt in range(2):
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), _CONNECT_TIMEOUT)
+            break
+        except (OSError, asyncio.TimeoutError):
+            if attempt == 0 and not server and await _start_server():
+                continue
+            _native_down[server] = time.monotonic()
+            raise _ServerUnavailable(server)
+    _native_down.pop(server, None)
+    phases = _phases.get()
+    if phases is not None:
+        phases["connect"] = phases.get("connect", 0.0) + time.monotonic() - started
+        started = time.monotonic()
+    if serial:
+        try:
+            await _request(writer, reader, f"host:transport:{serial}")
+        except BaseException:
+            writer.close()
+            raise
+        if phases is not None:
+            phases["handshake"] = phases.get("handshake", 0.0) + time.monotonic() - started
+    return reader, writer
+
+
+async def _host_query(server: str, service: str) -> str:
+    reader, writer = await _open(server)
+    try:
+        await _request(writer, reader, service)
+        size = int(await reader.readexactly(4), 16)
+        return (await reader.readexactly(size)).decode("utf-8", "replace")
+    finally:
+        writer.close()
+
+
+async def _run_subprocess(args: tuple, device: Optional[str], server: Optional[str], timeout: float):
+    """退回路径：asyncio 子进程执行 adb 命令行。"""
+    try:
+        cmd = adb_helper.adb_command_line(*args, device=device, server=server)
+    except FileNotFoundError as e:
+        return -1, b"", str(e)
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return -1, b"", "命令执行超时"
+    except asyncio.CancelledError:
+        proc.kill()
+        raise
+    return proc.returncode, out, err.decode("utf-8", "replace")
+
+
+class _TaskHandle:
+    """登记到 adb_helper 的在途操作：设备被标记不可用时取消对应任务（可跨线程调用）。"""
+
+    __slots__ = ("task", "loop")
+
+    def __init__(self):
+        self.task = asyncio.current_task()
+        self.loop = asyncio.get_running_loop()
+
+    def kill(self):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+
+
+async def _device_call(
+    device: str, server: Optional[str], force: bool, native, fallback_args: tuple, timeout: float, sent: int = 0
+):
+    """
+    对设备执行一次操作：先检查健康状态，原生协议不可用时退回子进程；超时、被健康监控取消
+    都转成 (-1, ..., 原因)。native(serial, server) 为协程函数。开启耗时指标时记录各阶段耗时。
+    """
+    serial, server = adb_helper.resolve_target(device, server)
+    hook = adb_helper.get_metrics_hook()
+    if not force:
+        reason = adb_helper.fail_fast_reason(serial, server)
+        if reason:
+            if hook is not None:
+                _record(hook, fallback_args, serial, {}, sent, (-1, b"", reason), "fail_fast")
+            return -1, b"", reason
+    phases = {} if hook is not None else None
+    token = _phases.set(phases)
+    handle = _TaskHandle()
+    adb_helper.register_inflight(serial, server, handle)
+    started = time.monotonic()
+    result, outcome = (-1, b"", ""), "exception"
+    try:
+        try:
+            result = await asyncio.wait_for(native(serial, server), timeout)
+        except _ServerUnavailable:
+            if phases is not None:
+                phases.clear()  # 退回子进程：只记总耗时
+            result = await _run_subprocess(fallback_args, serial, server, timeout)
+        except asyncio.TimeoutError:
+            result, outcome = (-1, b"", "命令执行超时"), "timeout"
+        except (AdbProtocolError, OSError, asyncio.IncompleteReadError) as e:
+            result, outcome = (-1, b"", str(e) or "连接已断开"), "error"
+        if outcome == "exception":
+            outcome = "ok" if result[0] == 0 else "error"
+        return result
+    except asyncio.CancelledError:
+        reason = adb_helper.device_unhealthy_reason(serial, server)
+        if reason is None:
+            raise
+        result = (-1, b"", f"设备 {serial} {reason}，命令已中止")
+        return result
+    finally:
+        _phases.reset(token)
+        adb_helper.unregister_inflight(serial, server, handle)
+        if phases is not None:
+            total = time.monotonic() - started
+            if "connect" in phases:
+                phases["transfer"] = max(0.0, total - phases["connect"] - phases.get("handshake", 0.0))
+            phases["total"] = total
+            _record(hook, fallback_args, serial, phases, sent, result, outcome)
+
+
+def _record(hook, args: tuple, serial: str, phases: dict, sent: int, result: tuple, outcome: str):
+    _, out, err = result
+    try:
+        hook(args[0], serial, phases, sent, len(out) + len(err or ""), outcome)
+    except Exception:
+        pass
+
+
+# ---------- 设备列表 ----------
+
+
+async def devices(server: str = "") -> list[dict]:
+    """server 上的完整设备列表（含 offline/unauthorized），格式同 adb_helper.parse_devices_output。"""
+    try:
+        out = await _host_query(server, "host:devices-l")
+    except _ServerUnavailable:
+        code, raw, _ = await _run_subprocess(("devices", "-l"), None, server, 10)
+        return adb_helper.parse_devices_output(raw.decode("utf-8", "replace")) if code == 0 else []
+    return adb_helper.parse_devices_output("List of devices attached\n" + out)
+
+
+async def track_devices(server: str = "") -> AsyncIterator[list[dict]]:
+    """设备列表每次变化产出一次完整列表；连接断开时结束（调用方决定是否重连）。"""
+    reader, writer = await _open(server)
+    try:
+        await _request(writer, reader, "host:track-devices-l")
+        while True:
+            size = int(await reader.readexactly(4), 16)
+            payload = (await reader.readexactly(size)).decode("utf-8", "replace") if size else ""
+            yield adb_helper.parse_devices_output("List of devices attached\n" + payload)
+    except asyncio.IncompleteReadError:
+        return
+    finally:
+        writer.close()
+
+
+# ---------- shell ----------
+
+
+async def _shell_v2(serial: str, server: str, command: str) -> tuple[int, bytes, str]:
+    reader, writer = await _open(server, serial)
+    try:
+        try:
+            await _request(writer, reader, f"shell,v2,raw:{command}")
+        except AdbProtocolError:
+            writer.close()
+            return await _shell_legacy(serial, server, command)
+        out, err, code = bytearray(), bytearray(), -1
+        while True:
+            try:
+                header = await reader.readexactly(5)
+            except asyncio.IncompleteReadError:
+                break
+            packet_id, size = header[0], struct.unpack("<I", header[1:])[0]
+            data = await reader.readexactly(size)
+            if packet_id == _ID_STDOUT:
+                out += data
+            elif packet_id == _ID_STDERR:
+                err += data
+            elif packet_id == _ID_EXIT:
+                code = data[0] if data else 0
+                break
+        return code, bytes(out), err.decode("utf-8", "replace")
+    finally:
+        writer.close()
+
+
+_EXIT_MARK = b"@@GUIADB_EXIT@@"
+
+
+async def _shell_legacy(serial: str, server: str, command: str) -> tuple[int, bytes, str]:
+    """
+    不支持 shell v2 的旧设备：在子 shell 中执行（命令里的 exit 不会跳过标记），
+    输出末尾追加退出码标记来取得返回值；stderr 混在 stdout 中。
+    """
+    reader, writer = await _open(server, serial)
+    try:
+        await _request(writer, reader, f"shell:({command}); echo {_EXIT_MARK.decode()}$?")
+        data = (await reader.read(-1)).replace(b"\r\n", b"\n")
+    finally:
+        writer.close()
+    head, sep, tail = data.rpartition(_EXIT_MARK)
+    code = tail.strip()
+    if not sep or not code.isdigit():
+        return -1, data, ""
+    return int(code), head, ""
+
+
+async def shell(
+    device: str, command: str, timeout: float = 30, server: Optional[str] = None, force: bool = False
+) -> tuple[int, str, str]:
+    """
+    执行 shell 命令，返回 (退出码, stdout, stderr)，与 adb_helper.shell 一致。
+    :param server: 同 adb_helper.run_adb，None 表示按设备归属路由
+    :param force: 忽略设备健康状态（健康探测用）
+    """
+    code, out, err = await _device_call(
+        device, server, force, lambda serial, server: _shell_v2(serial, server, command), ("shell", command), timeout
+    )
+    return code, out.decode("utf-8", "replace"), err
+
+
+class _StreamHandle:
+    """长流的在途登记：设备被标记不可用时关闭连接（或结束子进程），读取方随之读到结束。"""
+
+    __slots__ = ("close", "loop")
+
+    def __init__(self, close):
+        self.close = close
+        self.loop = asyncio.get_running_loop()
+
+    def kill(self):
+        self.loop.call_soon_threadsafe(self.close)
+
+
+async def _stream_chunks(device: str, command: str, read_size: int, raw: bool) -> AsyncIterator[bytes]:
+    """
+    长时间运行的 shell 命令的输出流：raw 时按块产出，否则逐行产出。登记为设备的在途操作。
+    退回子进程时，raw 模式的 stderr 单独收集，非零退出时作为 AdbProtocolError 抛出（不混进数据）。
+    """
+    serial, server = adb_helper.resolve_target(device, None)
+    reason = adb_helper.fail_fast_reason(serial, server)
+    if reason:
+        raise AdbProtocolError(reason)
+    proc = None
+    try:
+        reader, writer = await _open(server, serial)
+        try:
+            await _request(writer, reader, f"shell:{command}")
+        except BaseException:
+            writer.close()
+            raise
+        handle = _StreamHandle(writer.close)
+    except _ServerUnavailable:
+        cmd = adb_helper.adb_command_line("shell", command, device=serial, server=server)
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE if raw else asyncio.subprocess.STDOUT,
+        )
+        reader, writer = proc.stdout, None
+        handle = _StreamHandle(proc.kill)
+    adb_helper.register_inflight(serial, server, handle)
+    try:
+        while True:
+            data = await (reader.read(read_size) if raw else reader.readline())
+            if not data:
+                break
+            yield data
+        if raw and proc is not None and await proc.wait() != 0:
+            err = (await proc.stderr.read()).decode("utf-8", "replace").strip()
+            raise AdbProtocolError(err.splitlines()[-1] if err else f"adb 退出码 {proc.returncode}")
+    finally:
+        adb_helper.unregister_inflight(serial, server, handle)
+        if writer is not None:
+            writer.close()
+        if proc is not None and proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+
+async def stream_shell(device: str, command: str) -> AsyncIterator[str]:
+    """逐行产出长时间运行的 shell 命令输出（如 logcat、getevent）；消费方停止迭代即断开。"""
+    async for line in _stream_chunks(device, command, 0, raw=False):
+        yield line.decode("utf-8", "replace").rstrip("\r\n")
+
+
+async def stream_shell_raw(device: str, command: str, read_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """按块产出原始输出（不切行、不解码），供大流量写盘；旧设备 PTY 输出的换行可能是 \\r\\n。"""
+    async for chunk in _stream_chunks(device, command, read_size, raw=True):
+        yield chunk
+
+
+def logcat(device: str, *args: str, raw: bool = False) -> AsyncIterator:
+    """logcat 流，args 为 logcat 参数（如 "-v", "time"）；默认逐行产出字符串，raw 时按块产出字节。"""
+    import shlex
+    command = " ".join(["logcat", *(shlex.quote(a) for a in args)])
+    return stream_shell_raw(device, command) if raw else stream_shell(device, command)
+
+
+# ---------- sync：推送 / 拉取 ----------
+
+
+async def _sync_open(serial: str, server: str):
+    reader, writer = await _open(server, serial)
+    try:
+        await _request(writer, reader, "sync:")
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer
+
+
+def _sync_packet(command: bytes, data: bytes) -> bytes:
+    return command + struct.pack("<I", len(data)) + data
+
+
+async def _sync_stat(reader, writer, remote: str) -> tuple[int, int, int]:
+    writer.write(_sync_packet(b"STAT", remote.encode("utf-8")))
+    await writer.drain()
+    reply = await reader.readexactly(16)
+    if reply[:4] != b"STAT":
+        raise AdbProtocolError(f"意外的响应：{reply[:4]!r}")
+    return struct.unpack("<III", reply[4:])  # mode, size, mtime
+
+
+async def _sync_fail_message(reader, size: int) -> str:
+    return (await reader.readexactly(size)).decode("utf-8", "replace")
+
+
+async def _pull_native(serial: str, server: str, remote: str, local: str) -> tuple[int, bytes, str]:
+    reader, writer = await _sync_open(serial, server)
+    try:
+        mode, size, _ = await _sync_stat(reader, writer, remote)
+        if mode == 0:
+            return 1, b"", f"adb: error: remote object '{remote}' does not exist"
+        if stat_module.S_ISDIR(mode):
+            raise _ServerUnavailable(server)  # 目录交给 adb 命令行递归拉取
+        target = Path(local)
+        if target.is_dir():
+            target = target / Path(remote).name
+        started = time.monotonic()
+        tmp = target.with_name(f".{target.name}.part")
+        received = 0
+        writer.write(_sync_packet(b"RECV", remote.encode("utf-8")))
+        await writer.drain()
+        with open(tmp, "wb") as f:
+            while True:
+                header = await reader.readexactly(8)
+                command, length = header[:4], struct.unpack("<I", header[4:])[0]
+                if command == b"DATA":
+                    f.write(await reader.readexactly(length))
+                    received += length
+                elif command == b"DONE":
+                    break
+                elif command == b"FAIL":
+                    message = await _sync_fail_message(reader, length)
+                    f.close()
+                    tmp.unlink(missing_ok=True)
+                    return 1, b"", f"adb: error: {message}"
+                else:
+                    raise AdbProtocolError(f"意外的响应：{command!r}")
+        os.replace(tmp, target)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        summary = f"{remote}: 1 file pulled. {received / elapsed / 1e6:.1f} MB/s ({received} bytes in {elapsed:.3f}s)\n"
+        return 0, summary.encode("utf-8"), ""
+    finally:
+        writer.write(_sync_packet(b"QUIT", b""))
+        writer.close()
+
+
+async def _push_native(serial: str, server: str, local: str, remote: str) -> tuple[int, bytes, str]:
+    path = Path(local)
+    if path.is_dir():
+        raise _ServerUnavailable(server)  # 目录交给 adb 命令行递归推送
+    info = path.stat()
+    reader, writer = await _sync_open(serial, server)
+    try:
+        if remote.endswith("/"):
+            remote += path.name
+        else:
+            mode, _, _ = await _sync_stat(reader, writer, remote)
+            if stat_module.S_ISDIR(mode):
+                remote = f"{remote}/{path.name}"
+        started = time.monotonic()
+        spec = f"{remote},{stat_module.S_IMODE(info.st_mode) | stat_module.S_IFREG}".encode("utf-8")
+        writer.write(_sync_packet(b"SEND", spec))
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(_SYNC_CHUNK)
+                if not chunk:
+                    break
+                writer.write(_sync_packet(b"DATA", chunk))
+                await writer.drain()
+        writer.write(b"DONE" + struct.pack("<I", int(info.st_mtime)))
+        await writer.drain()
+        header = await reader.readexactly(8)
+        command, length = header[:4], struct.unpack("<I", header[4:])[0]
+        if command == b"FAIL":
+            return 1, b"", f"adb: error: {await _sync_fail_message(reader, length)}"
+        if command != b"OKAY":
+            raise AdbProtocolError(f"意外的响应：{command!r}")
+        elapsed = max(time.monotonic() - started, 1e-6)
+        summary = f"{local}: 1 file pushed. {info.st_size / elapsed / 1e6:.1f} MB/s ({info.st_size} bytes in {elapsed:.3f}s)\n"
+        return 0, summary.encode("utf-8"), ""
+    finally:
+        writer.write(_sync_packet(b"QUIT", b""))
+        writer.close()
+
+
+async def pull(device: str, remote: str, local: str, timeout: float = 60) -> tuple[int, str, str]:
+    code, out, err = await _device_call(
+        device, None, False, lambda serial, server: _pull_native(serial, server, remote, local),
+        ("pull", remote, local), timeout,
+    )
+    return code, out.decode("utf-8", "replace"), err
+
+
+async def push(device: str, local: str, remote: str, timeout: float = 60) -> tuple[int, str, str]:
+    try:
+        sent = os.path.getsize(local)
+    except OSError:
+        sent = 0
+    code, out, err = await _device_call(
+        device, None, False, lambda serial, server: _push_native(serial, server, local, remote),
+        ("push", local, remote), timeout, sent=sent,
+    )
+    return code, out.decode("utf-8", "replace"), err
+
+
+# ---------- 共享后台事件循环（供同步代码与 Qt 调用） ----------
+
+
+class _LoopThread:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="adb-async", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+
+_loop_thread = _LoopThread()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """共享的后台事件循环（首次调用时启动线程）。"""
+    return _loop_thread.loop()
+
+
+def submit(coro) -> Future:
+    """把协程提交到共享循环，返回 concurrent.futures.Future（可在任意线程等待或取消）。"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """在共享循环中执行协程并阻塞等待结果（不能在共享循环线程内调用）。"""
+    return submit(coro).result(timeout)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+传输压缩的协商与选择（供 core.transfers 使用）。
+
+- 设备与本机 adb 都支持 sync v2 压缩（features 含 sendrecv_v2_zstd / lz4 / brotli，adb 帮助含 -z）时，
+  用 `adb push/pull -z 算法`；
+- 否则设备上有 gzip（toybox 或 busybox）时，经 exec-out / exec-in 流式传输 gzip 数据，本机用 zlib 压缩/解压；
+- 按文件类型（已压缩格式不压缩，推送时另取文件开头试压）与测得的链路速率决定是否压缩：
+  快速链路（USB、模拟器或实测超过阈值）上压缩省下的时间抵不过压缩本身的开销。
+"""
+
+import functools
+import os
+import threading
+import zlib
+from typing import Callable, NamedTuple, Optional
+
+from adb_helper import run_adb
+from core.device_info import LINK_WIFI, link_type
+
+GZIP = "gzip"
+SYNC_CODECS = ("zstd", "lz4", "brotli")
+
+# 低于该速率（字节/秒）视为慢速链路，值得压缩；未测过速时无线连接按慢速处理
+SLOW_LINK = 20 * 1024 * 1024
+# 低于该速率时压缩率优先（brotli），否则速度优先（zstd、lz4）
+VERY_SLOW_LINK = 2 * 1024 * 1024
+MIN_COMPRESS_SIZE = 64 * 1024
+_SAMPLE_SIZE = 64 * 1024
+_SAMPLE_RATIO = 0.9  # 试压后仍大于原大小的 90% 视为不可压缩
+_EWMA_ALPHA = 0.3
+
+# 本身已压缩的格式：再压缩只浪费 CPU
+_INCOMPRESSIBLE = frozenset((
+    ".apk", ".apks", ".aab", ".jar", ".zip", ".gz", ".tgz", ".xz", ".bz2", ".zst", ".br", ".lz4", ".7z", ".rar",
+    ".obb", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif", ".avif", ".mp4", ".mkv", ".webm", ".mov",
+    ".3gp", ".mp3", ".aac", ".m4a", ".ogg", ".opus", ".flac",
+))
+_COMPRESSIBLE = frozenset((
+    ".txt", ".log", ".json", ".xml", ".csv", ".tsv", ".html", ".htm", ".js", ".css", ".md", ".yaml", ".yml",
+    ".ini", ".conf", ".cfg", ".properties", ".sql", ".db", ".sqlite", ".trace", ".hprof", ".bmp", ".wav", ".svg",
+    ".so", ".dex", ".odex", ".vdex", ".oat", ".bin", ".img", ".tar",
+))
+
+
+class Capabilities(NamedTuple):
+    sync_codecs: tuple  # 设备与本机 adb 都支持的 sync v2 压缩算法
+    gzip: bool  # 设备上可用 gzip（用于 exec-out / exec-in 流式压缩）
+
+
+@functools.lru_cache(maxsize=1)
+def host_supports_sync_compression() -> bool:
+    """本机 adb 是否支持 push/pull -z（platform-tools 31 起）。"""
+    code, out, err = run_adb("help", timeout=10)
+    return "-z ALGORITHM" in out or "-z ALGORITHM" in err
+
+
+def parse_features(text: str) -> set[str]:
+    """解析 `adb features` 输出（逗号或换行分隔）。"""
+    return {f.strip() for f in text.replace(",", "\n").splitlines() if f.strip()}
+
+
+def device_capabilities(device: str) -> Capabilities:
+    sync_codecs: tuple = ()
+    if host_supports_sync_compression():
+        code, out, _ = run_adb("features", device=device, timeout=10)
+        features = parse_features(out) if code == 0 else set()
+        sync_codecs = tuple(c for c in SYNC_CODECS if f"sendrecv_v2_{c}" in features)
+    code, out, _ = run_adb("shell", "echo x | gzip -c -1 | gzip -d -c", device=device, timeout=10)
+    return Capabilities(sync_codecs, code == 0 and out.strip() == "x")
+
+
+def guess_compressible(path: str, sample: Optional[bytes] = None) -> Optional[bool]:
+    """按扩展名判断；扩展名不明确时用样本试压。无法判断返回 None。"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in _INCOMPRESSIBLE:
+        return False
+    if ext in _COMPRESSIBLE:
+        return True
+    if sample:
+        return len(zlib.compress(sample, 1)) < len(sample) * _SAMPLE_RATIO
+    return None
+
+
+def read_sample(path: str) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read(_SAMPLE_SIZE)
+    except OSError:
+        return b""
+
+
+def choose_codec(
+    serial: str,
+    path: str,
+    size: int,
+    caps_getter: Callable[[], Capabilities],
+    link_rate: Optional[float],
+    offset: int = 0,
+    sample_path: Optional[str] = None,
+    allow_sync: bool = True,
+) -> str:
+    """
+    选择本次传输的压缩方式：""（不压缩）、"gzip" 或 sync v2 算法名。
+    :param caps_getter: 返回设备的 Capabilities；只在确实考虑压缩时才调用，免得快速链路上多发命令
+    :param offset: 续传起点；sync 模式不能从中间继续，续传时只考虑 gzip 流
+    :param sample_path: 本地文件（推送时），扩展名判断不了时取开头试压
+    :param allow_sync: 上次 sync 压缩传输失败时为 False，改用 gzip 流
+    """
+    if size - offset < MIN_COMPRESS_SIZE:
+        return ""
+    compressible = guess_compressible(path)
+    if compressible is False:
+        return ""
+    slow = link_rate < SLOW_LINK if link_rate else link_type(serial) == LINK_WIFI
+    if not slow:
+        return ""
+    if compressible is None and sample_path and guess_compressible("", read_sample(sample_path)) is False:
+        return ""
+    caps = caps_getter()
+    if offset == 0 and allow_sync and caps.sync_codecs:
+        order = ("brotli", "zstd", "lz4") if link_rate and link_rate < VERY_SLOW_LINK else SYNC_CODECS
+        return next(c for c in order if c in caps.sync_codecs)
+    return GZIP if caps.gzip else ""
+
+
+class GzipEncoder:
+    """本机侧 gzip 流压缩（设备端 gzip -d 解压）。level 1：CPU 开销小，文本类仍有 3～10 倍压缩。"""
+
+    def __init__(self, level: int = 1):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def feed(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush()
+
+
+class GzipDecoder:
+    """本机侧 gzip 流解压（设备端 gzip -c 压缩）。"""
+
+    def __init__(self):
+        self._z = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def feed(self, data: bytes) -> bytes:
+        return self._z.decompress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush()
+
+
+class LinkEstimator:
+    """按设备记录实测链路速率（链路上实际传输的字节 / 耗时，指数移动平均）。线程安全。"""
+
+    def __init__(self, rates: Optional[dict] = None):
+        self._lock = threading.Lock()
+        self._rates: dict[str, float] = {
+            k: float(v) for k, v in (rates or {}).items() if isinstance(v, (int, float)) and v > 0
+        }
+
+    def observe(self, device: str, wire_bytes: int, seconds: float) -> None:
+        if seconds <= 0 or wire_bytes <= 0:
+            return
+        rate = wire_bytes / seconds
+        with self._lock:
+            old = self._rates.get(device)
+            self._rates[device] = rate if old is None else old + _EWMA_ALPHA * (rate - old)
+
+    def rate(self, device: str) -> Optional[float]:
+        with self._lock:
+            return self._rates.get(device)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return dict(self._rates)
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+"""
+本机控制接口：仅监听回环地址的 HTTP/JSON 服务（asyncio，仅用标准库），供同机的测试脚本调用
+设备列表、shell、安装、推送/拉取、截图与 logcat 流。设备操作经共享调度器按设备排队，
+与界面对同一设备的操作不会交错；不同请求、不同设备之间并发处理。
+
+    GET  /devices
+    POST /shell        {"serial", "command", "timeout"?}
+    POST /install      {"serial", "path", "replace"?}
+    POST /push         {"serial", "local", "remote"}
+    POST /pull         {"serial", "remote", "local"}
+    GET  /screenshot?serial=...           -> image/png
+    GET  /hierarchy?serial=...[&id=&text=&text_prefix=&class=&clickable=1&compressed=1&force=1]
+                                          -> 控件树节点（界面未变时复用缓存）
+    GET  /logcat?serial=...&args=-v+time  -> 分块传输的文本流，客户端断开即停止
+    GET  /metrics[?format=json]           -> 命令耗时指标（Prometheus 文本，需开启 GUI_ADB_METRICS）
+    POST /rpc          JSON-RPC 2.0（可批量），方法同上（screenshot 返回 base64）
+
+参数可放在查询串或 JSON 请求体中。
+
+浏览器中任意网页都能向本机端口发请求，因此：
+- 所有请求都需带 "Authorization: Bearer <token>"；未指定 token 时随机生成并保存在数据目录 api_token 中；
+- Host 必须是回环地址加实际端口（防 DNS 重绑定），带 Origin 头的请求（来自网页）一律拒绝；
+- POST 请求体必须是 Content-Type: application/json（跨域 "简单请求" 无法设置该类型）。
+"""
+
+import asyncio
+import base64
+import hmac
+import ipaddress
+import json
+import os
+import secrets
+import shlex
+import threading
+from typing import Optional
+from urllib.parse import parse_qsl
+
+import adb_helper
+from core import adb_async
+from core.scheduler import DeviceScheduler, get_scheduler
+from core.ui_hierarchy import get_hierarchy_cache
+from core.storage import app_data_dir
+
+DEFAULT_PORT = 8765
+_MAX_BODY = 1 << 20
+_LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+_HOST_NAMES = ("127.0.0.1", "[::1]", "localhost")
+TOKEN_FILE = "api_token"
+
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large", 415: "Unsupported Media Type",
+            500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _require(params: dict, *names: str) -> list:
+    missing = [n for n in names if params.get(n) in (None, "")]
+    if missing:
+        raise ApiError(400, f"缺少参数：{', '.join(missing)}")
+    return [params[n] for n in names]
+
+
+def load_or_create_token() -> str:
+    """数据目录中保存的访问令牌；不存在时随机生成（文件权限仅限当前用户）。"""
+    path = app_data_dir() / TOKEN_FILE
+    try:
+        token = path.read_text(encoding="utf-8").strip()
+        if token:
+            return token
+    except OSError:
+        pass
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token + "\n")
+    return token
+
+
+def _result(code: int, out, err: str) -> dict:
+    return {"ok": code == 0, "code": code, "out": out, "err": err}
+
+
+def _flag(params: dict, name: str) -> bool:
+    return str(params.get(name, "")).lower() in ("1", "true", "yes")
+
+
+class ControlServer:
+    """
+    :param host: 只允许回环地址
+    :param port: 0 表示随机端口（start 后从 port 属性读取）
+    :param token: 访问令牌；不指定时使用数据目录中保存的令牌（没有则生成）
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        token: Optional[str] = None,
+        scheduler: Optional[DeviceScheduler] = None,
+    ):
+        if host not in _LOOPBACK_HOSTS:
+            raise ValueError("控制接口只允许监听回环地址")
+        self.host = host
+        self.port = port
+        self.token = token or load_or_create_token()
+        self._scheduler = scheduler or get_scheduler()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._methods = {
+            "devices": self._devices,
+            "shell": self._shell,
+            "install": self._install,
+            "push": self._push,
+            "pull": self._pull,
+            "screenshot": self._screenshot,
+            "hierarchy": self._hierarchy,
+        }
+
+    # ---------- 生命周期 ----------
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def start_in_thread(self) -> int:
+        """在独立线程的事件循环中运行（供界面进程使用），返回实际端口；端口被占用等错误直接抛出。"""
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        error: list[BaseException] = []
+
+        def run():
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.start())
+            except BaseException as e:
+                error.append(e)
+                ready.set()
+                loop.close()
+                return
+            ready.set()
+            loop.run_forever()
+            loop.run_until_complete(self.close())
+            loop.close()
+
+        self._loop = loop
+        self._thread = threading.Thread(target=run, name="control-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if error:
+            self._loop = self._thread = None
+            raise error[0]
+        return self.port
+
+    def stop(self) -> None:
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(3)
+        self._loop = self._thread = None
+
+    # ---------- 设备操作（经调度器按设备排队） ----------
+
+    async def _call(self, serial: Optional[str], func, *args):
+        return await asyncio.wrap_future(self._scheduler.submit(serial, func, *args))
+
+    async def _devices(self, params: dict) -> dict:
+        devices = await self._call(None, adb_helper.get_devices)
+        for d in devices:
+            md = d.pop("metadata", None)
+            if md is not None:
+                d.update(sdk=md.sdk, release=md.release, abi=md.abi, screen=md.screen_size)
+        return {"devices": devices}
+
+    async def _shell(self, params: dict) -> dict:
+        serial, command = _require(params, "serial", "command")
+        timeout = int(params.get("timeout") or 30)
+        return _result(*await self._call(serial, adb_helper.shell, serial, command, timeout))
+
+    async def _install(self, params: dict) -> dict:
+        serial, path = _require(params, "serial", "path")
+        replace = str(params.get("replace", "1")).lower() not in ("0", "false", "no")
+        return _result(*await self._call(serial, adb_helper.install_apk, serial, path, replace))
+
+    async def _push(self, params: dict) -> dict:
+        serial, local, remote = _require(params, "serial", "local", "remote")
+        return _result(*await self._call(serial, adb_helper.push, serial, local, remote))
+
+    async def _pull(self, params: dict) -> dict:
+        serial, remote, local = _require(params, "serial", "remote", "local")
+        return _result(*await self._call(serial, adb_helper.pull, serial, remote, local))
+
+    async def _screenshot(self, params: dict) -> dict:
+        (serial,) = _require(params, "serial")
+        code, data, err = await self._call(serial, adb_helper.screencap_png, serial)
+        return _result(code, base64.b64encode(data).decode("ascii") if code == 0 else "", err)
+
+    async def _hierarchy(self, params: dict) -> dict:
+        (serial,) = _require(params, "serial")
+        selector = {
+            key: params[name] for key, name in (
+                ("resource_id", "id"), ("text", "text"), ("text_prefix", "text_prefix"), ("class_name", "class"),
+            ) if params.get(name) is not None
+        }
+        if _flag(params, "clickable"):
+            selector["clickable"] = True
+        tree, err = await self._call(
+            serial, get_hierarchy_cache().get, serial, _flag(params, "force"), _flag(params, "compressed")
+        )
+        if tree is None:
+            return {"ok": False, "nodes": [], "err": err}
+        nodes = [dict(n._asdict(), bounds=list(n.bounds), center=list(n.center)) for n in tree.query(**selector)]
+        return {"ok": True, "nodes": nodes, "total": len(tree), "captured_at": tree.captured_at}
+
+    # ---------- HTTP ----------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            peer = writer.get_extra_info("peername")
+            if peer and not ipaddress.ip_address(peer[0]).is_loopback:
+                return
+            try:
+                method, path, params = await self._read_request(reader)
+                await self._route(method, path, params, writer)
+            except ApiError as e:
+                await self._send_json(writer, e.status, {"ok": False, "error": e.message})
+            except Exception as e:
+                await self._send_json(writer, 500, {"ok": False, "error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise ApiError(400, "无效的请求行")
+        method, target, _ = parts
+        headers: dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        self._check_headers(method.upper(), headers)
+        length = int(headers.get("content-length") or 0)
+        if length > _MAX_BODY:
+            raise ApiError(413, "请求体过大")
+        body = await reader.readexactly(length) if length else b""
+        path, _, query = target.partition("?")
+        params: dict = dict(parse_qsl(query))
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise ApiError(400, "请求体不是有效的 JSON")
+            if path == "/rpc":
+                params["__rpc__"] = data
+            elif isinstance(data, dict):
+                params.update(data)
+        return method.upper(), path.rstrip("/") or "/", params
+
+    def _check_headers(self, method: str, headers: dict):
+        """拒绝来自网页的请求：Host 须为回环地址加本端口，不得带 Origin；再核对令牌。"""
+        if headers.get("host", "").lower() not in {f"{name}:{self.port}" for name in _HOST_NAMES}:
+            raise ApiError(403, "Host 不是本机回环地址")
+        if "origin" in headers:
+            raise ApiError(403, "不接受来自网页的请求")
+        expected = f"Bearer {self.token}".encode("utf-8")
+        if not hmac.compare_digest(headers.get("authorization", "").encode("utf-8"), expected):
+            raise ApiError(401, "缺少或错误的访问令牌")
+        if method == "POST" and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+            raise ApiError(415, "POST 请求需使用 Content-Type: application/json")
+
+    async def _route(self, method: str, path: str, params: dict, writer: asyncio.StreamWriter):
+        name = path.lstrip("/")
+        if path == "/":
+            await self._send_json(
+                writer, 200, {"ok": True, "endpoints": sorted([*self._methods, "logcat", "metrics", "rpc"])}
+            )
+        elif name == "rpc":
+            if method != "POST" or "__rpc__" not in params:
+                raise ApiError(405, "JSON-RPC 需使用 POST 并携带请求体")
+            response = await self._rpc(params["__rpc__"])
+            await self._send_json(writer, 200, response)
+        elif name == "logcat":
+            await self._stream_logcat(params, writer)
+        elif name == "metrics":
+            from core import metrics
+            registry = metrics.get_registry()
+            if params.get("format") == "json":
+                await self._send_json(writer, 200, dict(registry.to_json(), enabled=metrics.is_enabled()))
+            else:
+                data = registry.to_prometheus().encode("utf-8")
+                await self._send(writer, 200, "text/plain; version=0.0.4; charset=utf-8", data)
+        elif name == "screenshot":
+            (serial,) = _require(params, "serial")
+            code, data, err = await self._call(serial, adb_helper.screencap_png, serial)
+            if code != 0 or not data:
+                await self._send_json(writer, 200, _result(code or -1, "", err or "截图失败"))
+            else:
+                await self._send(writer, 200, "image/png", data)
+        elif name in self._methods:
+            await self._send_json(writer, 200, await self._methods[name](params))
+        else:
+            raise ApiError(404, f"未知接口：{path}")
+
+    async def _rpc(self, request):
+        if isinstance(request, list):
+            # 批量请求并发处理
+            responses = await asyncio.gather(*(self._rpc_one(r) for r in request))
+            return [r for r in responses if r is not None]
+        return await self._rpc_one(request)
+
+    async def _rpc_one(self, request) -> Optional[dict]:
+        if not isinstance(request, dict):
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}}
+        req_id = request.get("id")
+        handler = self._methods.get(request.get("method"))
+        if handler is None:
+            response = {"jsonrpc": "2.0", "id": req_id, "error": {"code": -32601, "message": "Method not found"}}
+        else:
+            params = request.get("params") or {}
+            try:
+                response = {"jsonrpc": "2.0", "id": req_id, "result": await handler(params)}
+            except ApiError as e:
+                response = {"jsonrpc": "2.0", "id": req_id, "error": {"code": -32602, "message": e.message}}
+            except Exception as e:
+                response = {"jsonrpc": "2.0", "id": req_id, "error": {"code": -32000, "message": str(e)}}
+        return response if "id" in request else None  # 通知不返回
+
+    async def _stream_logcat(self, params: dict, writer: asyncio.StreamWriter):
+        """logcat 是长连接流，不进设备队列（否则会一直占着该设备的队列）。"""
+        (serial,) = _require(params, "serial")
+        extra = shlex.split(params.get("args") or "")
+        lines = adb_async.logcat(serial, *extra)
+        try:
+            first = await lines.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except (adb_async.AdbProtocolError, FileNotFoundError, OSError) as e:
+            raise ApiError(500, str(e))
+        writer.write(self._head(200, "text/plain; charset=utf-8", chunked=True))
+        try:
+            if first is not None:
+                await self._write_chunk(writer, first)
+                async for line in lines:
+                    await self._write_chunk(writer, line)  # 客户端断开时抛 ConnectionError
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            await lines.aclose()
+
+    @staticmethod
+    async def _write_chunk(writer: asyncio.StreamWriter, line: str):
+        data = (line + "\n").encode("utf-8")
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+
+    @staticmethod
+    def _head(status: int, content_type: str, length: Optional[int] = None, chunked: bool = False) -> bytes:
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}", "Connection: close"]
+        if chunked:
+            lines.append("Transfer-Encoding: chunked")
+        elif length is not None:
+            lines.append(f"Content-Length: {length}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, content_type: str, data: bytes):
+        writer.write(self._head(status, content_type, len(data)) + data)
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await self._send(writer, status, "application/json; charset=utf-8", data)
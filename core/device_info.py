@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+设备墙用的行信息：型号、Android 版本、电量等按需懒加载并按设备缓存，
+每台设备一次 shell 往返取全（静态属性来自共享的元数据缓存），后台限并发获取，
+几百台设备也不会同时压出几百条命令。
+另含设备标签的持久化。
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from adb_helper import run_adb
+from core.device_metadata import build_metadata_command, get_metadata_cache, parse_metadata
+from core.shell_sections import SECTION_MARK, section, split_sections
+from core.storage import load_json, save_json
+
+LINK_USB = "USB"
+LINK_WIFI = "WLAN"
+LINK_EMULATOR = "模拟器"
+
+_BATTERY_COMMAND = "dumpsys battery 2>/dev/null | grep -m1 ' level:'; true"
+
+
+def link_type(serial: str) -> str:
+    """按序列号判断连接方式：emulator-5554 为模拟器，host:port 或 mDNS 名称为无线，其余为 USB。"""
+    serial = serial.rpartition("@")[0] if "@" in serial else serial
+    if serial.startswith("emulator-"):
+        return LINK_EMULATOR
+    if ":" in serial or "._adb-tls-connect." in serial:
+        return LINK_WIFI
+    return LINK_USB
+
+
+def parse_battery_level(text: str) -> Optional[int]:
+    _, _, level = text.partition(":")
+    level = level.strip()
+    return int(level) if level.isdigit() else None
+
+
+def fetch_summary(device: str) -> Optional[dict]:
+    """
+    设备墙一行所需信息。静态属性取自共享的元数据缓存；未缓存时与电量合并成同一次 shell 往返，
+    顺便填充元数据缓存，之后每次刷新只查电量。
+    """
+    cache = get_metadata_cache()
+    md = cache.peek(device)
+    if md is None:
+        command = f"{build_metadata_command()}; {section('battery')}; {_BATTERY_COMMAND}"
+    else:
+        command = _BATTERY_COMMAND
+    code, out, err = run_adb("shell", command, device=device, timeout=15)
+    if code != 0:
+        return None
+    if md is None:
+        if SECTION_MARK not in out:
+            return None
+        md = parse_metadata(device, out)
+        cache.put(md)
+        out = split_sections(out).get("battery", "")
+    return {"model": md.model, "release": md.release, "sdk": md.sdk, "battery": parse_battery_level(out)}
+
+
+class DeviceInfoCache:
+    """
+    懒加载缓存：get() 命中直接返回；未命中或过期时排队后台获取并先返回旧值（可能为 None），
+    获取完成后回调 on_ready(device)（在工作线程中调用）。同一设备同时只会有一个获取任务。
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Optional[dict]] = fetch_summary,
+        ttl: float = 60.0,
+        max_workers: int = 8,
+        on_ready: Optional[Callable[[str], None]] = None,
+    ):
+        self._fetch = fetch
+        self._ttl = ttl
+        self._on_ready = on_ready
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[float, dict]] = {}
+        self._pending: set[str] = set()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="device-info")
+
+    def get(self, device: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(device)
+            stale = entry is None or time.monotonic() - entry[0] > self._ttl
+            if stale and device not in self._pending:
+                self._pending.add(device)
+                try:
+                    self._pool.submit(self._load, device)
+                except RuntimeError:
+                    self._pending.discard(device)  # 已关闭
+        return entry[1] if entry else None
+
+    def peek(self, device: str) -> Optional[dict]:
+        """只读缓存，不触发获取。"""
+        with self._lock:
+            entry = self._entries.get(device)
+        return entry[1] if entry else None
+
+    def invalidate(self, device: str) -> None:
+        with self._lock:
+            self._entries.pop(device, None)
+
+    def _load(self, device: str):
+        try:
+            info = self._fetch(device)
+        except Exception:
+            info = None
+        with self._lock:
+            self._pending.discard(device)
+            if info is None:
+                return
+            self._entries[device] = (time.monotonic(), info)
+        if self._on_ready:
+            self._on_ready(device)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class DeviceTags:
+    """设备标签（序列号 -> 标签集合），持久化到数据目录。"""
+
+    def __init__(self, filename: str = "device_tags.json"):
+        self._filename = filename
+        data = load_json(filename, {})
+        self._tags: dict[str, set[str]] = {
+            k: set(v) for k, v in data.items() if isinstance(v, list)
+        } if isinstance(data, dict) else {}
+
+    def get(self, serial: str) -> list[str]:
+        return sorted(self._tags.get(serial, ()))
+
+    def add(self, serials: list[str], tag: str) -> None:
+        for serial in serials:
+            self._tags.setdefault(serial, set()).add(tag)
+        self._save()
+
+    def remove(self, serials: list[str], tag: str) -> None:
+        for serial in serials:
+            tags = self._tags.get(serial)
+            if tags:
+                tags.discard(tag)
+                if not tags:
+                    del self._tags[serial]
+        self._save()
+
+    def all_tags(self) -> list[str]:
+        return sorted(set().union(*self._tags.values())) if self._tags else []
+
+    def _save(self):
+        save_json(self._filename, {k: sorted(v) for k, v in self._tags.items()})
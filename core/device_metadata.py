@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+设备元数据：一次 shell 往返取回完整 getprop、wm size/density、/data 存储与 boot_id，
+解析成 DeviceMetadata 并按设备缓存；设备断开、离线或重启后失效。
+"""
+
+import re
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from adb_helper import resolve_target, run_adb
+from core.input_channel import parse_wm_size
+from core.shell_sections import SECTION_MARK, section, split_sections
+
+_PROP_RE = re.compile(r"^\[([^\]]+)\]: \[(.*)$")
+BOOT_ID_COMMAND = "cat /proc/sys/kernel/random/boot_id 2>/dev/null"
+
+
+class DeviceMetadata(NamedTuple):
+    serial: str
+    model: str
+    manufacturer: str
+    brand: str
+    device: str
+    release: str
+    sdk: int
+    abi: str
+    abis: tuple
+    fingerprint: str
+    screen_width: int
+    screen_height: int
+    density: int
+    storage_total_kb: int
+    storage_free_kb: int
+    boot_id: str
+    props: dict
+    fetched_at: float
+
+    @property
+    def screen_size(self) -> str:
+        return f"{self.screen_width}x{self.screen_height}" if self.screen_width else ""
+
+
+def build_metadata_command() -> str:
+    """所有元数据放在同一条 shell 脚本里，各段以标记分隔。"""
+    return "; ".join((
+        f"{section('getprop')}; getprop",
+        f"{section('wm')}; wm size; wm density",
+        f"{section('df')}; df -k /data 2>/dev/null",
+        f"{section('boot')}; {BOOT_ID_COMMAND}",
+        section("end"),
+    ))
+
+
+def parse_getprop(text: str) -> dict[str, str]:
+    """解析 `getprop` 全量输出（[key]: [value]，值可能跨行）。"""
+    props: dict[str, str] = {}
+    key, buf = None, []
+    for line in text.splitlines():
+        if key is None:
+            m = _PROP_RE.match(line)
+            if not m:
+                continue
+            key, rest = m.group(1), m.group(2)
+            buf = [rest]
+        else:
+            buf.append(line)
+        if buf[-1].endswith("]"):
+            buf[-1] = buf[-1][:-1]
+            props[key] = "\n".join(buf)
+            key, buf = None, []
+    return props
+
+
+def parse_density(text: str) -> int:
+    """解析 `wm density`，有 Override density 时以其为准。"""
+    density = 0
+    for line in text.splitlines():
+        if "density:" not in line:
+            continue
+        value = line.split(":", 1)[1].strip()
+        if value.isdigit():
+            density = int(value)
+            if line.startswith("Override"):
+                break
+    return density
+
+
+def parse_df(text: str) -> tuple[int, int]:
+    """解析 `df -k /data` 的数据行，返回 (总 KB, 可用 KB)；不同 toybox/busybox 版本列数一致取 2、4 列。"""
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) >= 4 and fields[1].isdigit() and fields[3].isdigit():
+            return int(fields[1]), int(fields[3])
+    return 0, 0
+
+
+def _to_int(value: str) -> int:
+    return int(value) if value.strip().isdigit() else 0
+
+
+def parse_metadata(serial: str, out: str, now: Optional[float] = None) -> DeviceMetadata:
+    sections = split_sections(out)
+    props = parse_getprop(sections.get("getprop", ""))
+    wm = sections.get("wm", "")
+    width, height = parse_wm_size(wm) or (0, 0)
+    total, free = parse_df(sections.get("df", ""))
+    abis = tuple(a for a in props.get("ro.product.cpu.abilist", "").split(",") if a)
+    return DeviceMetadata(
+        serial=serial,
+        model=props.get("ro.product.model", ""),
+        manufacturer=props.get("ro.product.manufacturer", ""),
+        brand=props.get("ro.product.brand", ""),
+        device=props.get("ro.product.device", ""),
+        release=props.get("ro.build.version.release", ""),
+        sdk=_to_int(props.get("ro.build.version.sdk", "")),
+        abi=props.get("ro.product.cpu.abi", "") or (abis[0] if abis else ""),
+        abis=abis,
+        fingerprint=props.get("ro.build.fingerprint", ""),
+        screen_width=width,
+        screen_height=height,
+        density=parse_density(wm),
+        storage_total_kb=total,
+        storage_free_kb=free,
+        boot_id=sections.get("boot", "").strip(),
+        props=props,
+        fetched_at=time.time() if now is None else now,
+    )
+
+
+def fetch_metadata(serial: str, timeout: int = 15) -> tuple[Optional[DeviceMetadata], str]:
+    code, out, err = run_adb("shell", build_metadata_command(), device=serial, timeout=timeout)
+    if code != 0 or SECTION_MARK not in out:
+        return None, err.strip() or out.strip() or "获取设备信息失败"
+    return parse_metadata(serial, out), ""
+
+
+def read_boot_id(serial: str, timeout: int = 5, force: bool = False) -> str:
+    """读取本次开机的 boot_id（每次重启都会变化），失败返回空字符串。force 同 run_adb。"""
+    code, out, _ = run_adb("shell", BOOT_ID_COMMAND, device=serial, timeout=timeout, force=force)
+    return out.strip() if code == 0 else ""
+
+
+class MetadataCache:
+    """
+    按设备缓存 DeviceMetadata，键为 resolve_target 得到的 (序列号, server)，
+    "serial@host:port" 与按路由解析到同一 server 的裸序列号命中同一条目。
+    线程安全；同一设备并发 get 只会发起一次获取，其余等待结果。
+    属性基本不变，默认不过期；断开/离线（retain）、重启（reboot 或 boot_id 变化）时失效。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[str, str], DeviceMetadata] = {}
+        self._inflight: dict[tuple[str, str], threading.Event] = {}
+
+    @staticmethod
+    def _key(serial: str) -> tuple[str, str]:
+        return resolve_target(serial)
+
+    def peek(self, serial: str) -> Optional[DeviceMetadata]:
+        """只读缓存，不发命令。"""
+        key = self._key(serial)
+        with self._lock:
+            return self._entries.get(key)
+
+    def get(self, serial: str, max_age: Optional[float] = None) -> Optional[DeviceMetadata]:
+        """
+        取元数据，未缓存（或超过 max_age 秒，用于关心剩余存储的场景）时获取一次。
+        :return: 获取失败返回 None
+        """
+        key = self._key(serial)
+        while True:
+            with self._lock:
+                md = self._entries.get(key)
+                if md is not None and (max_age is None or time.time() - md.fetched_at <= max_age):
+                    return md
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    break
+            event.wait()
+            with self._lock:
+                if key not in self._entries:
+                    return None  # 别的线程获取失败，不重复尝试
+        try:
+            md, _ = fetch_metadata(serial)
+            if md is not None:
+                self.put(md)
+            return md
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def put(self, md: DeviceMetadata) -> None:
+        key = self._key(md.serial)
+        with self._lock:
+            self._entries[key] = md
+
+    def invalidate(self, serial: str) -> None:
+        key = self._key(serial)
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def retain(self, serials) -> None:
+        """只保留仍在线的设备，其余（断开、离线、未授权）失效。"""
+        keep = {self._key(s) for s in serials}
+        with self._lock:
+            for key in [k for k in self._entries if k not in keep]:
+                del self._entries[key]
+
+    def check_boot(self, serial: str, boot_id: str) -> bool:
+        """用探测得到的 boot_id 校验缓存；不一致（设备已重启）时失效并返回 False。"""
+        key = self._key(serial)
+        with self._lock:
+            md = self._entries.get(key)
+            if md is None or not md.boot_id or not boot_id or md.boot_id == boot_id.strip():
+                return True
+            del self._entries[key]
+            return False
+
+
+_cache: Optional[MetadataCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_metadata_cache() -> MetadataCache:
+    """进程内共享的元数据缓存。"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetadataCache()
+        return _cache
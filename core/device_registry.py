@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+已配对无线设备登记表：持久化 host、连接端口、mDNS 名称与最后在线时间，
+启动或掉线时并发重连全部已知设备，失败按指数退避重试。
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
+
+from adb_helper import adb_connect
+from core.storage import load_json, save_json
+from core.utils import is_success_connect_output
+
+_REGISTRY_FILE = "paired_devices.json"
+
+
+class DeviceRegistry:
+    """
+    已知无线设备表，条目为 {"host", "connect_port", "mdns_name", "last_seen"}。
+    有 mDNS 名称时以名称识别设备（IP 变化也能对上）；只有没记下名称的条目才按 host 识别，
+    别的手机占用了同一 IP 不会顶替已知设备。线程安全。
+    """
+
+    def __init__(self, filename: str = _REGISTRY_FILE):
+        self._filename = filename
+        self._lock = threading.Lock()
+        data = load_json(filename, [])
+        self._entries: list[dict] = [e for e in data if isinstance(e, dict) and e.get("host")]
+
+    def entries(self) -> list[dict]:
+        with self._lock:
+            return [dict(e) for e in self._entries]
+
+    def _find(self, host: str, mdns_name: str = "") -> Optional[dict]:
+        if mdns_name:
+            for e in self._entries:
+                if e.get("mdns_name") == mdns_name:
+                    return e
+        for e in self._entries:
+            # 带名称查找时不匹配已有别的名称的条目；手动连接等不知道名称时仍按 host 更新
+            if e["host"] == host and not (mdns_name and e.get("mdns_name")):
+                return e
+        return None
+
+    def _save(self):
+        save_json(self._filename, self._entries)
+
+    def remember(self, host: str, port: int, mdns_name: str = "") -> None:
+        """连接成功后登记（或更新）设备。"""
+        with self._lock:
+            entry = self._find(host, mdns_name)
+            if entry is None:
+                entry = {"host": host, "connect_port": port, "mdns_name": mdns_name, "last_seen": 0}
+                self._entries.append(entry)
+            entry.update(host=host, connect_port=int(port), last_seen=int(time.time()))
+            if mdns_name:
+                entry["mdns_name"] = mdns_name
+            self._save()
+
+    def forget(self, host: str) -> None:
+        with self._lock:
+            self._entries = [e for e in self._entries if e["host"] != host]
+            self._save()
+
+    def update_from_announcement(self, mdns_name: str, host: str, port: int) -> Optional[dict]:
+        """
+        处理 _adb-tls-connect 广播：无线调试每次开启端口都会变，已知设备据此刷新 host/端口。
+        :return: 匹配到的已知设备条目（副本），未知设备返回 None
+        """
+        with self._lock:
+            entry = self._find(host, mdns_name)
+            if entry is None:
+                return None
+            changed = entry["host"] != host or entry["connect_port"] != port
+            if mdns_name and entry.get("mdns_name") != mdns_name:
+                entry["mdns_name"] = mdns_name
+                changed = True
+            entry.update(host=host, connect_port=int(port))
+            if changed:
+                self._save()
+            return dict(entry)
+
+    def mark_seen(self, serials: set[str]) -> None:
+        """刷新设备列表后，把在线的已知设备（序列号为 host:port）更新最后在线时间。"""
+        now = int(time.time())
+        with self._lock:
+            hit = False
+            for e in self._entries:
+                if f"{e['host']}:{e['connect_port']}" in serials:
+                    e["last_seen"] = now
+                    hit = True
+            if hit:
+                self._save()
+
+
+def connect_with_backoff(
+    host: str,
+    port: int,
+    attempts: int = 4,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    should_stop: Optional[Callable[[], bool]] = None,
+    server: Optional[str] = None,
+) -> tuple[bool, str]:
+    """adb connect，失败按 base_delay * 2^n（带抖动，封顶 max_delay）重试。返回 (是否成功, 最后一次输出)。"""
+    msg = ""
+    for attempt in range(max(1, attempts)):
+        if should_stop and should_stop():
+            break
+        code, out, err = adb_connect(host, port, server=server)
+        msg = (out or err).strip()
+        if code == 0 and is_success_connect_output(out):
+            return True, msg
+        if attempt + 1 < attempts:
+            delay = min(max_delay, base_delay * (2 ** attempt)) * random.uniform(0.8, 1.2)
+            deadline = time.monotonic() + delay
+            while (remaining := deadline - time.monotonic()) > 0:
+                if should_stop and should_stop():
+                    return False, msg
+                time.sleep(min(0.2, remaining))
+    return False, msg
+
+
+def reconnect_all(
+    entries: list[dict],
+    max_workers: int = 16,
+    attempts: int = 4,
+    on_result: Optional[Callable[[dict, bool, str], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> list[tuple[dict, bool, str]]:
+    """
+    并发重连一组已知设备，每台独立退避，互不阻塞。
+    :param on_result: 每台设备结束时回调 (entry, ok, msg)，在工作线程中调用
+    :return: [(entry, ok, msg), ...]，按完成顺序
+    """
+    results = []
+    if not entries:
+        return results
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(entries))) as pool:
+        futures = {
+            pool.submit(connect_with_backoff, e["host"], e["connect_port"], attempts, should_stop=should_stop): e
+            for e in entries
+        }
+        for fut in as_completed(futures):
+            entry = futures[fut]
+            try:
+                ok, msg = fut.result()
+            except Exception as e:
+                ok, msg = False, str(e)
+            results.append((entry, ok, msg))
+            if on_result:
+                on_result(entry, ok, msg)
+    return results
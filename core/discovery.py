@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+常驻 mDNS 发现服务：全程只用一个 Zeroconf 实例，同时浏览 _adb-tls-pairing、_adb-tls-connect、_adb._tcp，
+由 zeroconf 的增删改事件驱动（不轮询），维护带 TTL 的实时服务表，任意弹窗或设备栏都可订阅。
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+SERVICE_PAIRING = "_adb-tls-pairing._tcp.local."
+SERVICE_CONNECT = "_adb-tls-connect._tcp.local."
+SERVICE_ADB = "_adb._tcp.local."
+SERVICE_TYPES = (SERVICE_PAIRING, SERVICE_CONNECT, SERVICE_ADB)
+
+# 服务记录没有续期广播时的默认存活时间（秒），与 mDNS 常见的 120s 主机记录 TTL 一致
+_DEFAULT_TTL = 120.0
+
+# 事件类型
+ADDED = "added"
+UPDATED = "updated"
+REMOVED = "removed"
+
+
+class DiscoveredService:
+    """一条已解析的 mDNS 服务记录。"""
+
+    __slots__ = ("service_type", "name", "host", "port", "expires_at", "updated_at")
+
+    def __init__(self, service_type: str, name: str, host: str, port: int, ttl: float):
+        self.service_type = service_type
+        self.name = name
+        self.host = host
+        self.port = port
+        self.updated_at = time.time()
+        self.expires_at = time.monotonic() + ttl
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.service_type, self.name
+
+    def __repr__(self) -> str:
+        return f"DiscoveredService({self.service_type!r}, {self.name!r}, {self.host}:{self.port})"
+
+
+Subscriber = Callable[[str, DiscoveredService], None]
+
+
+class DiscoveryService:
+    """
+    mDNS 发现服务。回调在 zeroconf/解析线程中调用，Qt 侧请通过 DiscoveryNotifier 转成信号。
+    start() 可重复调用；zeroconf 未安装或网卡不可用时返回 False，其余功能照常（服务表为空）。
+    """
+
+    def __init__(self, service_types: Iterable[str] = SERVICE_TYPES, ttl: float = _DEFAULT_TTL):
+        self._types = tuple(service_types)
+        self._ttl = ttl
+        self._lock = threading.RLock()
+        self._services: dict[tuple[str, str], DiscoveredService] = {}
+        self._subscribers: dict[int, tuple[Subscriber, Optional[frozenset]]] = {}
+        self._ids = itertools.count(1)
+        self._zc = None
+        self._browser = None
+        self._resolver: Optional[ThreadPoolExecutor] = None
+        self._wake = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        self._running = False
+        self.last_error = ""
+
+    # ---------- 生命周期 ----------
+
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self) -> bool:
+        with self._lock:
+            if self._running:
+                return True
+            try:
+                from zeroconf import Zeroconf, ServiceBrowser
+                self._zc = Zeroconf()
+                # 解析（get_service_info）可能阻塞数秒，放到独立线程池，不占用 zeroconf 事件线程
+                self._resolver = ThreadPoolExecutor(max_workers=4, thread_name_prefix="mdns-resolve")
+                self._browser = ServiceBrowser(self._zc, list(self._types), handlers=[self._on_state_change])
+            except Exception as e:
+                self.last_error = str(e)
+                self._close_zeroconf()
+                return False
+            self._running = True
+            self._wake.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="mdns-ttl", daemon=True)
+            self._sweeper.start()
+            return True
+
+    def stop(self) -> None:
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._wake.set()
+        self._close_zeroconf()
+        with self._lock:
+            self._services.clear()
+
+    def _close_zeroconf(self):
+        browser, zc, resolver = self._browser, self._zc, self._resolver
+        self._browser = self._zc = self._resolver = None
+        for close in (
+            browser and browser.cancel,
+            resolver and (lambda: resolver.shutdown(wait=False, cancel_futures=True)),
+            zc and zc.close,
+        ):
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass
+
+    # ---------- 订阅 ----------
+
+    def subscribe(
+        self, callback: Subscriber, service_types: Optional[Iterable[str]] = None, replay: bool = True
+    ) -> int:
+        """
+        订阅服务变化，返回订阅 id。
+        :param service_types: 只关心的服务类型，None 表示全部
+        :param replay: 订阅时立即以 ADDED 回放当前仍存活的服务
+        """
+        types = frozenset(service_types) if service_types else None
+        with self._lock:
+            sub_id = next(self._ids)
+            self._subscribers[sub_id] = (callback, types)
+            current = [s for s in self._services.values() if types is None or s.service_type in types]
+        if replay:
+            for service in current:
+                self._safe_call(callback, ADDED, service)
+        return sub_id
+
+    def unsubscribe(self, sub_id: int) -> None:
+        with self._lock:
+            self._subscribers.pop(sub_id, None)
+
+    def services(self, service_type: Optional[str] = None) -> list[DiscoveredService]:
+        """当前存活的服务快照。"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                s for s in self._services.values()
+                if s.expires_at > now and (service_type is None or s.service_type == service_type)
+            ]
+
+    @staticmethod
+    def _safe_call(callback: Subscriber, event: str, service: DiscoveredService):
+        try:
+            callback(event, service)
+        except Exception:
+            pass
+
+    def _publish(self, event: str, service: DiscoveredService):
+        with self._lock:
+            targets = [cb for cb, types in self._subscribers.values() if types is None or service.service_type in types]
+        for cb in targets:
+            self._safe_call(cb, event, service)
+
+    # ---------- zeroconf 事件 ----------
+
+    def _on_state_change(self, zeroconf, service_type, name, state_change):
+        from zeroconf import ServiceStateChange
+        if state_change is ServiceStateChange.Removed:
+            with self._lock:
+                service = self._services.pop((service_type, name), None)
+            if service:
+                self._publish(REMOVED, service)
+            return
+        resolver = self._resolver
+        if resolver is not None:
+            try:
+                resolver.submit(self._resolve, zeroconf, service_type, name)
+            except RuntimeError:
+                pass  # 已停止
+
+    def _resolve(self, zeroconf, service_type: str, name: str):
+        from zeroconf import IPVersion
+        try:
+            info = zeroconf.get_service_info(service_type, name, timeout=3000)
+        except Exception:
+            return
+        if not info or not info.port:
+            return
+        addresses = info.parsed_addresses(IPVersion.V4Only) or info.parsed_addresses()
+        if not addresses or not self._running:
+            return
+        ttl = float(getattr(info, "host_ttl", 0) or self._ttl)
+        with self._lock:
+            old = self._services.get((service_type, name))
+            service = DiscoveredService(service_type, name, addresses[0], info.port, ttl)
+            self._services[service.key] = service
+        self._wake.set()
+        if old is None:
+            self._publish(ADDED, service)
+        elif (old.host, old.port) != (service.host, service.port):
+            self._publish(UPDATED, service)
+
+    def _still_cached(self, service: DiscoveredService) -> bool:
+        """zeroconf 静默续期时不会发 Updated 事件，到期前先查一次其缓存（不发网络请求）。"""
+        zc = self._zc
+        if zc is None:
+            return False
+        try:
+            from zeroconf import ServiceInfo
+            return ServiceInfo(service.service_type, service.name).load_from_cache(zc)
+        except Exception:
+            return False
+
+    def _sweep_loop(self):
+        """到期清理：睡到最近一条记录过期（或有新记录）再醒来，空闲时不占 CPU。"""
+        while self._running:
+            self._wake.clear()
+            with self._lock:
+                now = time.monotonic()
+                due = [s for s in self._services.values() if s.expires_at <= now]
+            expired = []
+            for s in due:
+                if self._still_cached(s):
+                    s.expires_at = time.monotonic() + self._ttl
+                else:
+                    expired.append(s)
+            with self._lock:
+                for s in expired:
+                    if self._services.get(s.key) is s:
+                        del self._services[s.key]
+                next_expiry = min((s.expires_at for s in self._services.values()), default=None)
+            for s in expired:
+                self._publish(REMOVED, s)
+            self._wake.wait(None if next_expiry is None else max(0.05, next_expiry - time.monotonic()))
+
+
+_instance: Optional[DiscoveryService] = None
+_instance_lock = threading.Lock()
+
+
+def get_discovery_service() -> DiscoveryService:
+    """进程内共享的发现服务单例（不会自动启动，由主窗口 start/stop）。"""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = DiscoveryService()
+        return _instance
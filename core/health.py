@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+连接健康监控：后台线程每秒读取各 adb server 的完整设备列表（含 offline/unauthorized），
+状态一变立即通知；对在线设备定期用 `shell echo` 探测往返延迟，连续无响应判为卡死。
+探测顺带读取 boot_id，设备在两次设备列表轮询之间自行重启时据此作废其元数据缓存。
+设备上有正在执行的命令或长流（传输、logcat 采集、测速）时探测失败不计数：链路繁忙不等于卡死。
+不可用的设备会在 adb_helper 中标记，发往它的命令立即失败；离线、未授权、断开时同时终止正在执行的操作，
+卡死只拒绝新命令。无线设备掉线后按退避自动重连。
+延迟探测跑在 core.adb_async 的共享事件循环上，设备再多也不为探测占用线程。
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from adb_helper import (
+    get_adb_servers,
+    inflight_count,
+    parse_devices_output,
+    run_adb,
+    set_device_unhealthy,
+    clear_device_unhealthy,
+)
+from core.device_metadata import BOOT_ID_COMMAND, get_metadata_cache
+
+ONLINE = "device"
+OFFLINE = "offline"
+UNAUTHORIZED = "unauthorized"
+STALLED = "stalled"
+GONE = "gone"
+
+STATE_LABELS = {
+    ONLINE: "在线",
+    OFFLINE: "已离线",
+    UNAUTHORIZED: "未授权",
+    STALLED: "无响应",
+    GONE: "已断开",
+}
+
+# 探测延迟的平滑系数（指数移动平均）
+_EWMA_ALPHA = 0.3
+
+
+def _is_wireless(serial: str) -> bool:
+    host, sep, port = serial.rpartition(":")
+    return bool(sep and host and port.isdigit())
+
+
+class DeviceHealth:
+    """一台设备的健康状态。rtt_ms 为最近一次探测往返，rtt_avg_ms 为平滑值。"""
+
+    __slots__ = ("serial", "server", "state", "rtt_ms", "rtt_avg_ms", "failures", "since", "reconnecting")
+
+    def __init__(self, serial: str, server: str, state: str):
+        self.serial = serial
+        self.server = server
+        self.state = state
+        self.rtt_ms: Optional[float] = None
+        self.rtt_avg_ms: Optional[float] = None
+        self.failures = 0
+        self.since = time.time()
+        self.reconnecting = False
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.serial, self.server
+
+    def copy(self) -> "DeviceHealth":
+        other = DeviceHealth(self.serial, self.server, self.state)
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
+
+
+ChangeCallback = Callable[[DeviceHealth, str], None]  # (新状态快照, 旧状态)
+
+
+class HealthMonitor:
+    """
+    :param poll_interval: 读取设备列表的间隔（秒），`adb devices` 只和本机 server 通信，开销很小
+    :param probe_interval: 对在线设备探测延迟的间隔（秒）
+    :param probe_timeout: 单次探测超时（秒），远小于普通命令的超时
+    :param stall_after: 连续几次探测无响应判为卡死
+    :param on_change: 状态变化回调 (health, old_state)，在监控线程中调用
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = 1.0,
+        probe_interval: float = 5.0,
+        probe_timeout: int = 3,
+        stall_after: int = 2,
+        reconnect: bool = True,
+        on_change: Optional[ChangeCallback] = None,
+    ):
+        self.poll_interval = poll_interval
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.stall_after = max(1, stall_after)
+        self.reconnect = reconnect
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._devices: dict[tuple[str, str], DeviceHealth] = {}
+        self._running = False
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._reconnect_pool: Optional[ThreadPoolExecutor] = None
+        self._probing: set[tuple[str, str]] = set()
+        self._probe_results: queue.SimpleQueue = queue.SimpleQueue()
+        self._next_probe = 0.0
+
+    # ---------- 生命周期 ----------
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._wake.clear()
+        # 只用于并发查询各 server 的设备列表；探测走异步客户端
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="health")
+        # 重连含退避等待，单独的线程池，不占用轮询与探测
+        self._reconnect_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="health-reconnect")
+        self._thread = threading.Thread(target=self._loop, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(3)
+            self._thread = None
+        for pool in (self._pool, self._reconnect_pool):
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._reconnect_pool = None
+        self._probing.clear()
+        with self._lock:
+            keys = list(self._devices)
+            self._devices.clear()
+        for serial, server in keys:
+            clear_device_unhealthy(serial, server=server)
+
+    def snapshot(self) -> list[DeviceHealth]:
+        with self._lock:
+            return [h.copy() for h in self._devices.values()]
+
+    def get(self, serial: str, server: str = "") -> Optional[DeviceHealth]:
+        with self._lock:
+            h = self._devices.get((serial, server))
+            return h.copy() if h else None
+
+    # ---------- 监控循环 ----------
+
+    def _loop(self):
+        while self._running:
+            self._wake.clear()
+            started = time.monotonic()
+            try:
+                self._handle_probe_results()
+                self._poll()
+                if started >= self._next_probe:
+                    self._next_probe = started + self.probe_interval
+                    self._probe_all()
+            except Exception:
+                pass  # 监控线程不因单次异常退出
+            self._wake.wait(max(0.05, self.poll_interval - (time.monotonic() - started)))
+
+    def _poll(self):
+        servers = get_adb_servers()
+        pool = self._pool
+        if pool is None:
+            return
+        futures = [(s, pool.submit(run_adb, "devices", "-l", server=s, timeout=5)) for s in servers]
+        seen: dict[tuple[str, str], str] = {}
+        reachable = set()
+        for server, fut in futures:
+            code, out, err = fut.result()
+            if code != 0:
+                continue  # server 不可达：保持原状态，不把整台 server 的设备误判为断开
+            reachable.add(server)
+            for d in parse_devices_output(out):
+                seen[(d["serial"], server)] = d["status"]
+        with self._lock:
+            known = dict(self._devices)
+        for key, status in seen.items():
+            health = known.get(key)
+            if health is None:
+                health = DeviceHealth(key[0], key[1], status)
+                with self._lock:
+                    self._devices[key] = health
+                self._apply(health, status, notify_old="")
+            elif health.state != status and not (health.state == STALLED and status == ONLINE):
+                self._apply(health, status)
+        for key, health in known.items():
+            if key not in seen and key[1] in reachable and health.state != GONE:
+                self._apply(health, GONE)
+
+    def _apply(self, health: DeviceHealth, state: str, notify_old: Optional[str] = None):
+        old = health.state if notify_old is None else notify_old
+        health.state = state
+        health.since = time.time()
+        if state == ONLINE:
+            health.failures = 0
+            clear_device_unhealthy(health.serial, server=health.server)
+        else:
+            # 卡死只拒绝新命令；正在进行的传输等自行超时或完成，不在这里打断
+            set_device_unhealthy(
+                health.serial, STATE_LABELS.get(state, state), server=health.server,
+                kill_inflight=state != STALLED,
+            )
+        if state == GONE:
+            with self._lock:
+                # 断开的设备不再跟踪（重新出现时按新设备处理），健康标记保留到重新上线
+                self._devices.pop(health.key, None)
+        if old != state and self.on_change:
+            try:
+                self.on_change(health.copy(), old)
+            except Exception:
+                pass
+        if self.reconnect and _is_wireless(health.serial) and (
+            state == OFFLINE or (state == STALLED and not inflight_count(health.serial, health.server))
+        ):
+            # 重连会先 disconnect，卡死但仍有操作在进行时不重连，以免打断它们
+            self._schedule_reconnect(health)
+
+    # ---------- 延迟探测 ----------
+
+    def _probe_all(self):
+        """并发探测在线/卡死设备；不等待结果，探测结果在下一轮循环中处理，慢设备不拖住状态轮询。"""
+        from core import adb_async
+        if not self._running:
+            return
+        with self._lock:
+            targets = [
+                h for h in self._devices.values()
+                if h.state in (ONLINE, STALLED) and h.key not in self._probing
+            ]
+            self._probing.update(h.key for h in targets)
+        for health in targets:
+            adb_async.submit(self._probe(health)).add_done_callback(
+                lambda fut, h=health: self._probe_results.put((h, fut))
+            )
+
+    def _handle_probe_results(self):
+        while True:
+            try:
+                health, fut = self._probe_results.get_nowait()
+            except queue.Empty:
+                return
+            with self._lock:
+                self._probing.discard(health.key)
+                tracked = self._devices.get(health.key) is health
+            if fut.cancelled() or fut.exception() is not None or not tracked:
+                continue
+            ok, rtt, boot_id = fut.result()
+            if ok:
+                if boot_id:
+                    target = f"{health.serial}@{health.server}" if health.server else health.serial
+                    get_metadata_cache().check_boot(target, boot_id)
+                health.rtt_ms = rtt
+                health.rtt_avg_ms = rtt if health.rtt_avg_ms is None else (
+                    _EWMA_ALPHA * rtt + (1 - _EWMA_ALPHA) * health.rtt_avg_ms
+                )
+                health.failures = 0
+                if health.state == STALLED:
+                    self._apply(health, ONLINE)
+            elif inflight_count(health.serial, health.server):
+                health.failures = 0  # 有操作在进行，探测慢可能只是链路被占满，暂停卡死判定
+            else:
+                health.failures += 1
+                if health.state == ONLINE and health.failures >= self.stall_after:
+                    self._apply(health, STALLED)
+
+    async def _probe(self, health: DeviceHealth) -> tuple[bool, float, str]:
+        """返回 (是否响应, 往返毫秒, boot_id)。"""
+        from core import adb_async
+        started = time.monotonic()
+        code, out, err = await adb_async.shell(
+            health.serial, f"{BOOT_ID_COMMAND}; echo ok", timeout=self.probe_timeout, server=health.server, force=True
+        )
+        rtt = (time.monotonic() - started) * 1000
+        lines = out.split()
+        if code != 0 or not lines or lines[-1] != "ok":
+            return False, rtt, ""
+        return True, rtt, lines[0] if len(lines) > 1 else ""
+
+    # ---------- 自动重连 ----------
+
+    def _schedule_reconnect(self, health: DeviceHealth):
+        with self._lock:
+            current = self._devices.get(health.key)
+            if current is None or current.reconnecting:
+                return
+            current.reconnecting = True
+        pool = self._reconnect_pool
+        if pool is None:
+            return
+        try:
+            pool.submit(self._reconnect, health.key)
+        except RuntimeError:
+            pass
+
+    def _reconnect(self, key: tuple[str, str]):
+        from core.device_registry import connect_with_backoff
+        serial, server = key
+        host, _, port = serial.rpartition(":")
+        try:
+            # 先断开陈旧的传输，否则 adb 会一直复用 offline 的连接
+            run_adb("disconnect", serial, server=server, timeout=5)
+            connect_with_backoff(
+                host, int(port), attempts=5, server=server,
+                should_stop=lambda: not self._running or self._reconnect_settled(key),
+            )
+        finally:
+            with self._lock:
+                health = self._devices.get(key)
+                if health:
+                    health.reconnecting = False
+        self._wake.set()  # 立即刷新一次设备列表
+
+    def _reconnect_settled(self, key: tuple[str, str]) -> bool:
+        """已恢复在线，或设备已从列表消失（交给已知设备重连逻辑）时停止退避重试。"""
+        with self._lock:
+            health = self._devices.get(key)
+            return health is None or health.state == ONLINE
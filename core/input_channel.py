@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+低延迟输入通道：保持一个长驻 adb shell，点击/滑动直接用 sendevent 写触摸设备，
+避免每次 `input tap` 都在设备上冷启动一个 app_process JVM（约 300ms）。
+无可写触摸设备或屏幕已旋转时，退回到同一长驻 shell 中执行 `input` 命令。
+"""
+
+import itertools
+import subprocess
+import threading
+from typing import Optional
+
+from adb_helper import popen_adb
+from core.ui_hierarchy import get_hierarchy_cache
+
+# linux/input-event-codes.h
+_EV_SYN, _EV_KEY, _EV_ABS = 0, 1, 3
+_SYN_REPORT = 0
+_BTN_TOUCH = 330
+_ABS_MT_SLOT = 47
+_ABS_MT_POSITION_X = 53
+_ABS_MT_POSITION_Y = 54
+_ABS_MT_TRACKING_ID = 57
+_ABS_MT_PRESSURE = 58
+
+# 常用按键（android.view.KeyEvent）
+KEYCODE_HOME = 3
+KEYCODE_BACK = 4
+KEYCODE_POWER = 26
+KEYCODE_ENTER = 66
+KEYCODE_DEL = 67
+KEYCODE_APP_SWITCH = 187
+
+_ACK = "__GUIADB_ACK_"
+
+
+class TouchDevice:
+    """getevent -pl 解析出的多点触摸设备及坐标范围。"""
+
+    __slots__ = ("path", "name", "max_x", "max_y", "has_slot", "has_pressure", "direct")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = ""
+        self.max_x = 0
+        self.max_y = 0
+        self.has_slot = False
+        self.has_pressure = False
+        self.direct = False
+
+
+def parse_getevent(out: str) -> list[TouchDevice]:
+    """解析 `getevent -pl` 输出，返回具备 ABS_MT_POSITION_X/Y 的触摸设备（直接触摸屏排在前面）。"""
+    devices: list[TouchDevice] = []
+    cur: Optional[TouchDevice] = None
+    for line in out.splitlines():
+        s = line.strip()
+        if s.startswith("add device"):
+            cur = TouchDevice(s.split(":", 1)[1].strip())
+            devices.append(cur)
+            continue
+        if cur is None:
+            continue
+        if s.startswith("name:"):
+            cur.name = s.split(":", 1)[1].strip().strip('"')
+        elif "ABS_MT_POSITION_X" in s or "ABS_MT_POSITION_Y" in s:
+            max_v = 0
+            for part in s.split(","):
+                part = part.strip()
+                if part.startswith("max "):
+                    max_v = int(part[4:])
+            if "ABS_MT_POSITION_X" in s:
+                cur.max_x = max_v
+            else:
+                cur.max_y = max_v
+        elif "ABS_MT_SLOT" in s:
+            cur.has_slot = True
+        elif "ABS_MT_PRESSURE" in s:
+            cur.has_pressure = True
+        elif "INPUT_PROP_DIRECT" in s:
+            cur.direct = True
+    touch = [d for d in devices if d.max_x > 0 and d.max_y > 0]
+    return sorted(touch, key=lambda d: not d.direct)
+
+
+def parse_wm_size(out: str) -> Optional[tuple[int, int]]:
+    """解析 `wm size`，有 Override size 时以其为准。"""
+    size = None
+    for line in out.splitlines():
+        if "size:" not in line:
+            continue
+        w, _, h = line.split(":", 1)[1].strip().partition("x")
+        if w.isdigit() and h.isdigit():
+            size = (int(w), int(h))
+            if line.startswith("Override"):
+                break
+    return size
+
+
+def _quote(s: str) -> str:
+    """单引号包裹供设备 shell 使用。"""
+    return "'" + s.replace("'", "'\\''") + "'"
+
+
+class InputChannel:
+    """
+    面向单台设备的输入通道。线程安全：多个线程可同时调用 tap/swipe/key/text，
+    命令按调用顺序写入同一个长驻 shell。
+
+        with InputChannel(serial) as ch:
+            ch.tap(540, 1200)
+            ch.text("hello")
+            ch.flush()
+    """
+
+    def __init__(self, device: str):
+        self.device = device
+        self._proc: Optional[subprocess.Popen] = None
+        self._write_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._reader: Optional[threading.Thread] = None
+        self._acked = 0
+        self._seq = itertools.count(1)
+        self._lines: list[str] = []
+        self._capturing = False
+        self._exec_lock = threading.Lock()
+        self._touch: Optional[TouchDevice] = None
+        self._screen: Optional[tuple[int, int]] = None
+        self._tracking_id = itertools.count(100)
+        self._injected = 0  # 最近一次注入输入的回执序号，执行完毕时使控件树缓存失效
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def mode(self) -> str:
+        """当前注入方式："sendevent" 或 "input"。"""
+        return "sendevent" if self._touch else "input"
+
+    def is_open(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def open(self, timeout: float = 10.0) -> str:
+        """启动长驻 shell 并探测触摸设备，返回通道描述；失败抛出 RuntimeError。"""
+        if self.is_open():
+            return self.describe()
+        try:
+            self._proc = popen_adb(
+                "shell",
+                device=self.device,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=0,
+            )
+        except (OSError, FileNotFoundError) as e:
+            raise RuntimeError(str(e)) from e
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        out = self.execute(
+            "getevent -pl 2>/dev/null; echo __SPLIT__; wm size; echo __SPLIT__; "
+            "dumpsys input | grep -m 1 SurfaceOrientation",
+            timeout=timeout,
+        )
+        if out is None:
+            self.close()
+            raise RuntimeError("无法建立设备 shell 通道")
+        getevent_out, _, rest = out.partition("__SPLIT__")
+        wm_out, _, orientation = rest.partition("__SPLIT__")
+        self._screen = parse_wm_size(wm_out)
+        rotated = orientation.strip().split(":")[-1].strip() not in ("", "0")
+        self._touch = None
+        if self._screen and not rotated:
+            for dev in parse_getevent(getevent_out):
+                writable = self.execute(f"[ -w {dev.path} ] && echo yes", timeout=timeout)
+                if writable and "yes" in writable:
+                    self._touch = dev
+                    break
+        return self.describe()
+
+    def describe(self) -> str:
+        if self._touch:
+            return f"sendevent {self._touch.path} ({self._touch.name})"
+        return "input（长驻 shell）"
+
+    def close(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.write(b"exit\n")
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _read_loop(self):
+        proc = self._proc
+        if proc is None or proc.stdout is None:
+            return
+        for raw in iter(proc.stdout.readline, b""):
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            with self._cond:
+                if line.startswith(_ACK):
+                    try:
+                        self._acked = max(self._acked, int(line[len(_ACK):]))
+                    except ValueError:
+                        pass
+                    if self._injected and self._acked >= self._injected:
+                        self._injected = 0
+                        get_hierarchy_cache().invalidate(self.device)
+                    self._cond.notify_all()
+                elif self._capturing:
+                    self._lines.append(line)
+        with self._cond:
+            self._cond.notify_all()
+
+    def _send(self, script: str) -> int:
+        """写入一行脚本并附带回执序号，返回该序号。"""
+        proc = self._proc
+        if proc is None or proc.stdin is None:
+            raise RuntimeError("输入通道未打开")
+        with self._write_lock:
+            seq = next(self._seq)
+            try:
+                proc.stdin.write(f"{script}; echo {_ACK}{seq}\n".encode("utf-8"))
+            except OSError as e:
+                raise RuntimeError(f"输入通道已断开：{e}") from e
+        return seq
+
+    def _inject(self, script: str) -> int:
+        """发送会改变界面的输入：发出时与执行完毕时各使一次该设备的控件树缓存失效。"""
+        seq = self._send(script)
+        with self._cond:
+            self._injected = max(self._injected, seq)
+        get_hierarchy_cache().invalidate(self.device)
+        return seq
+
+    def _wait_ack(self, seq: int, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._acked >= seq or not self.is_open(), timeout) and self._acked >= seq
+
+    def execute(self, script: str, timeout: float = 10.0) -> Optional[str]:
+        """在长驻 shell 中执行一段脚本并取回输出；超时或通道断开返回 None。"""
+        with self._exec_lock:
+            with self._cond:
+                self._lines = []
+                self._capturing = True
+            try:
+                seq = self._send(script)
+                ok = self._wait_ack(seq, timeout)
+                with self._cond:
+                    return "\n".join(self._lines) if ok else None
+            finally:
+                with self._cond:
+                    self._capturing = False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待此前发送的所有输入事件在设备端执行完毕。"""
+        return self._wait_ack(self._send(":"), timeout)
+
+    # ---------- 事件生成 ----------
+
+    def _to_touch(self, x: float, y: float) -> tuple[int, int]:
+        touch, (w, h) = self._touch, self._screen
+        tx = int(round(x * touch.max_x / max(1, w - 1)))
+        ty = int(round(y * touch.max_y / max(1, h - 1)))
+        return min(max(tx, 0), touch.max_x), min(max(ty, 0), touch.max_y)
+
+    def _ev(self, type_: int, code: int, value: int) -> str:
+        return f"sendevent {self._touch.path} {type_} {code} {value}"
+
+    def _touch_down(self, x: float, y: float) -> list[str]:
+        tx, ty = self._to_touch(x, y)
+        cmds = []
+        if self._touch.has_slot:
+            cmds.append(self._ev(_EV_ABS, _ABS_MT_SLOT, 0))
+        cmds += [
+            self._ev(_EV_ABS, _ABS_MT_TRACKING_ID, next(self._tracking_id) & 0xFFFF),
+            self._ev(_EV_ABS, _ABS_MT_POSITION_X, tx),
+            self._ev(_EV_ABS, _ABS_MT_POSITION_Y, ty),
+        ]
+        if self._touch.has_pressure:
+            cmds.append(self._ev(_EV_ABS, _ABS_MT_PRESSURE, 50))
+        cmds += [self._ev(_EV_KEY, _BTN_TOUCH, 1), self._ev(_EV_SYN, _SYN_REPORT, 0)]
+        return cmds
+
+    def _touch_move(self, x: float, y: float) -> list[str]:
+        tx, ty = self._to_touch(x, y)
+        return [
+            self._ev(_EV_ABS, _ABS_MT_POSITION_X, tx),
+            self._ev(_EV_ABS, _ABS_MT_POSITION_Y, ty),
+            self._ev(_EV_SYN, _SYN_REPORT, 0),
+        ]
+
+    def _touch_up(self) -> list[str]:
+        return [
+            self._ev(_EV_ABS, _ABS_MT_TRACKING_ID, -1),
+            self._ev(_EV_KEY, _BTN_TOUCH, 0),
+            self._ev(_EV_SYN, _SYN_REPORT, 0),
+        ]
+
+    def tap(self, x: float, y: float) -> int:
+        """在屏幕坐标 (x, y) 点击，返回回执序号（可传给 wait）。"""
+        if not self._touch:
+            return self._inject(f"input tap {int(x)} {int(y)}")
+        return self._inject("; ".join(self._touch_down(x, y) + self._touch_up()))
+
+    def swipe(self, x1: float, y1: float, x2: float, y2: float, duration_ms: int = 300) -> int:
+        """从 (x1, y1) 滑动到 (x2, y2)，按约 16ms 一帧插值。"""
+        duration_ms = max(0, int(duration_ms))
+        if not self._touch:
+            return self._inject(f"input swipe {int(x1)} {int(y1)} {int(x2)} {int(y2)} {duration_ms}")
+        steps = max(2, duration_ms // 16)
+        pause = f"sleep {duration_ms / steps / 1000:.3f}"
+        cmds = self._touch_down(x1, y1)
+        for i in range(1, steps + 1):
+            t = i / steps
+            cmds.append(pause)
+            cmds += self._touch_move(x1 + (x2 - x1) * t, y1 + (y2 - y1) * t)
+        cmds += self._touch_up()
+        return self._inject("; ".join(cmds))
+
+    def key(self, *keycodes: int) -> int:
+        """发送一个或多个按键，多个按键合并为一次 input 调用。"""
+        return self._inject("input keyevent " + " ".join(str(int(k)) for k in keycodes))
+
+    def text(self, s: str) -> int:
+        """输入文本（input text 不支持空格，转义为 %s）。"""
+        return self._inject("input text " + _quote(s.replace("%", "\\%").replace(" ", "%s")))
+
+    def wait(self, seq: int, timeout: float = 5.0) -> bool:
+        """等待指定回执序号对应的事件执行完毕。"""
+        return self._wait_ack(seq, timeout)
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+链路测速：区分慢在 USB 口/集线器、Wi-Fi 还是设备本身。
+
+每台设备依次测量：
+- 往返延迟：在一个长驻 adb shell 里连续 echo，取每次往返的中位数与 P95（不含 adb 进程启动）；
+- 命令延迟：每次新起 `adb shell echo`，即界面上单条命令的实际等待；
+- 上行 / 下行吞吐：exec-in 写入 cat > /dev/null、exec-out 读取 dd if=/dev/zero（不经设备存储）；
+- sync 速率：adb push / pull 一个随机内容的临时文件（关闭 sync 压缩，测的是链路而不是压缩率）。
+
+结果连同连接方式、USB 端口（adb get-devpath）写入数据目录 link_bench.json，
+与同一设备、同一连接方式的历史中位数比较，明显变差时给出提示；按端口汇总可看出哪个口变慢。
+"""
+
+import os
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+from adb_helper import popen_adb, register_inflight, run_adb, unregister_inflight
+from core.compression import host_supports_sync_compression
+from core.device_info import link_type
+from core.storage import load_json, save_json
+
+_HISTORY_FILE = "link_bench.json"
+_HISTORY_LIMIT = 2000  # 所有设备合计保留的最近结果数
+_BASELINE_RUNS = 10  # 与最近多少次历史结果的中位数比较
+_PING_MARK = "__GUIADB_PING_"
+_REMOTE_FILE = "/data/local/tmp/gui_adb_linkbench.bin"
+_CHUNK = 256 * 1024
+
+# 比历史中位数差到这个程度才提示：吞吐低于一半、延迟高于两倍且多出 2ms 以上
+_THROUGHPUT_DROP = 0.5
+_LATENCY_RISE = 2.0
+_LATENCY_MIN_DELTA_MS = 2.0
+
+STOPPED = "已停止"  # 被用户停止时 LinkResult.error 的值；这样的结果不写入历史
+
+_history_lock = threading.Lock()
+
+
+class LinkBenchError(Exception):
+    """某一项测量失败（设备断开、命令不可用等）。"""
+
+
+class _Stopped(Exception):
+    pass
+
+
+class LinkResult(NamedTuple):
+    serial: str
+    link: str  # LINK_USB / LINK_WIFI / LINK_EMULATOR
+    port: str  # USB 端口（如 usb:1-1.2），无线或取不到时为空
+    timestamp: float
+    rtt_ms: float = 0.0  # 长驻 shell 往返延迟中位数
+    rtt_p95_ms: float = 0.0
+    command_ms: float = 0.0  # 单条 adb shell 命令耗时中位数
+    upload: float = 0.0  # 字节/秒，0 表示未测
+    download: float = 0.0
+    sync_push: float = 0.0
+    sync_pull: float = 0.0
+    error: str = ""
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LinkResult":
+        return cls(**{name: data[name] for name in cls._fields if name in data})
+
+
+# 参与历史比较的指标：(字段, 显示名, 越大越好)
+METRICS = (
+    ("rtt_ms", "往返延迟", False),
+    ("command_ms", "命令延迟", False),
+    ("upload", "上行", True),
+    ("download", "下行", True),
+    ("sync_push", "sync 推送", True),
+    ("sync_pull", "sync 拉取", True),
+)
+
+
+class _Process:
+    """长驻 adb 子进程，登记为设备的进行中操作，设备被标记不可用时一并终止。"""
+
+    def __init__(self, device: str, args: tuple, **popen_kwargs):
+        self.device = device
+        self.proc = popen_adb(*args, device=device, stderr=subprocess.DEVNULL, **popen_kwargs)
+        register_inflight(device, None, self.proc)
+
+    def close(self, timeout: float = 30) -> int:
+        try:
+            self.proc.communicate(timeout=timeout)
+        except (subprocess.TimeoutExpired, OSError, ValueError):
+            self.proc.kill()
+            self.proc.wait()
+        finally:
+            unregister_inflight(self.device, None, self.proc)
+        return self.proc.returncode
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure_rtt(device: str, count: int = 50, should_stop: Callable[[], bool] = lambda: False) -> tuple[float, float]:
+    """长驻 shell 中连续 echo，返回 (中位数, P95) 毫秒；首次往返作为预热不计入。"""
+    shell = _Process(device, ("shell",), stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    samples = []
+    try:
+        for i in range(count + 1):
+            if should_stop():
+                raise _Stopped()
+            mark = f"{_PING_MARK}{i}"
+            started = time.perf_counter()
+            shell.proc.stdin.write(f"echo {mark}\n".encode())
+            shell.proc.stdin.flush()
+            while True:
+                line = shell.proc.stdout.readline()
+                if not line:
+                    raise LinkBenchError("shell 已断开")
+                if line.strip().decode("utf-8", "replace") == mark:
+                    break
+            if i:
+                samples.append((time.perf_counter() - started) * 1000)
+        shell.proc.stdin.write(b"exit\n")
+        shell.proc.stdin.flush()
+    except OSError as e:
+        raise LinkBenchError(f"shell 已断开：{e}")
+    finally:
+        shell.close(timeout=5)
+    return statistics.median(samples), _percentile(samples, 0.95)
+
+
+def measure_command(device: str, count: int = 5, should_stop: Callable[[], bool] = lambda: False) -> float:
+    """每次新起 adb shell echo 的耗时中位数（毫秒），含本机 adb 进程启动与连接建立。"""
+    samples = []
+    for _ in range(count):
+        if should_stop():
+            raise _Stopped()
+        started = time.perf_counter()
+        code, out, err = run_adb("shell", "echo ok", device=device, timeout=15)
+        if code != 0 or out.strip() != "ok":
+            raise LinkBenchError(f"shell 命令失败：{err.strip() or out.strip() or code}")
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def measure_download(device: str, size: int, should_stop: Callable[[], bool] = lambda: False) -> float:
+    """exec-out 读取设备上生成的 size 字节，返回字节/秒（从收到第一个字节开始计时，不含进程启动）。"""
+    blocks = max(1, size // 65536)
+    stream = _Process(device, ("exec-out", f"dd if=/dev/zero bs=65536 count={blocks} 2>/dev/null"), stdout=subprocess.PIPE)
+    received, first = 0, None
+    try:
+        while True:
+            if should_stop():
+                stream.proc.kill()
+                raise _Stopped()
+            chunk = stream.proc.stdout.read1(_CHUNK)
+            if not chunk:
+                break
+            if first is None:
+                first = time.perf_counter()
+            received += len(chunk)
+        elapsed = time.perf_counter() - first if first is not None else 0.0
+    finally:
+        stream.close(timeout=5)
+    if received < blocks * 65536:
+        raise LinkBenchError(f"下行中断（收到 {received}/{blocks * 65536} 字节）")
+    return received / elapsed if elapsed > 0 else 0.0
+
+
+def measure_upload(device: str, size: int, should_stop: Callable[[], bool] = lambda: False) -> float:
+    """exec-in 向设备写入 size 字节（设备端丢弃），返回字节/秒（到设备端读完并退出为止）。"""
+    stream = _Process(device, ("exec-in", "cat > /dev/null"), stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    block = bytes(_CHUNK)
+    sent = 0
+    started = time.perf_counter()
+    try:
+        while sent < size:
+            if should_stop():
+                stream.proc.kill()
+                stream.close(timeout=5)
+                raise _Stopped()
+            stream.proc.stdin.write(block[:min(_CHUNK, size - sent)])
+            sent += min(_CHUNK, size - sent)
+    except OSError as e:
+        stream.close(timeout=5)
+        raise LinkBenchError(f"上行中断（已发送 {sent}/{size} 字节）：{e}")
+    code = stream.close(timeout=120)
+    elapsed = time.perf_counter() - started
+    if code != 0:
+        raise LinkBenchError(f"上行失败：{code}")
+    return size / elapsed if elapsed > 0 else 0.0
+
+
+def measure_sync(device: str, size: int, should_stop: Callable[[], bool] = lambda: False) -> tuple[float, float]:
+    """adb push / pull 一个 size 字节的随机文件，返回 (推送, 拉取) 字节/秒；结束后删除两端的临时文件。"""
+    no_compress = ("-Z",) if host_supports_sync_compression() else ()
+    fd, local = tempfile.mkstemp(prefix="gui_adb_linkbench_", suffix=".bin")
+    back = local + ".back"
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(os.urandom(size))
+        rates = []
+        for args in (("push", *no_compress, local, _REMOTE_FILE), ("pull", *no_compress, _REMOTE_FILE, back)):
+            if should_stop():
+                raise _Stopped()
+            started = time.perf_counter()
+            code, out, err = run_adb(*args, device=device, timeout=300)
+            elapsed = time.perf_counter() - started
+            if code != 0:
+                raise LinkBenchError(f"adb {args[0]} 失败：{err.strip() or out.strip() or code}")
+            rates.append(size / elapsed if elapsed > 0 else 0.0)
+        return rates[0], rates[1]
+    finally:
+        run_adb("shell", f"rm -f {_REMOTE_FILE}", device=device, timeout=15)
+        for path in (local, back):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def usb_port(device: str) -> str:
+    """`adb get-devpath`：USB 设备返回 usb:总线-端口路径，其他为 unknown（返回空串）。"""
+    code, out, _ = run_adb("get-devpath", device=device, timeout=10)
+    out = out.strip()
+    return out if code == 0 and out.startswith("usb:") else ""
+
+
+def run_link_bench(
+    device: str,
+    size: int = 8 * 1024 * 1024,
+    pings: int = 50,
+    should_stop: Callable[[], bool] = lambda: False,
+    on_progress: Optional[Callable[[str], None]] = None,
+) -> LinkResult:
+    """
+    对一台设备依次测量各项；某项失败时停止并在 error 中说明，已测得的项保留。
+    :param size: 吞吐与 sync 测试的数据量（字节）
+    :param on_progress: 开始每一项前回调其显示名
+    """
+    values: dict = {}
+    error = ""
+    link = link_type(device)
+    port = usb_port(device)
+    steps = (
+        ("往返延迟", lambda: dict(zip(("rtt_ms", "rtt_p95_ms"), measure_rtt(device, pings, should_stop)))),
+        ("命令延迟", lambda: {"command_ms": measure_command(device, should_stop=should_stop)}),
+        ("下行", lambda: {"download": measure_download(device, size, should_stop)}),
+        ("上行", lambda: {"upload": measure_upload(device, size, should_stop)}),
+        ("sync", lambda: dict(zip(("sync_push", "sync_pull"), measure_sync(device, size, should_stop)))),
+    )
+    for label, step in steps:
+        if on_progress:
+            on_progress(label)
+        try:
+            values.update(step())
+        except _Stopped:
+            error = STOPPED
+            break
+        except LinkBenchError as e:
+            error = f"{label}：{e}"
+            break
+        except (OSError, ValueError, statistics.StatisticsError) as e:
+            error = f"{label}：{e or type(e).__name__}"
+            break
+    return LinkResult(device, link, port, time.time(), error=error, **values)
+
+
+# ---------- 历史 ----------
+
+
+def load_history(serial: Optional[str] = None) -> list[LinkResult]:
+    """按时间先后返回历史结果；指定 serial 时只返回该设备的。"""
+    with _history_lock:
+        data = load_json(_HISTORY_FILE, {})
+    results = []
+    for raw in data.get("results", []) if isinstance(data, dict) else []:
+        try:
+            result = LinkResult.from_dict(raw)
+        except (KeyError, TypeError):
+            continue
+        if serial is None or result.serial == serial:
+            results.append(result)
+    return results
+
+
+def save_results(results: list[LinkResult]) -> None:
+    """追加到历史（只保留最近 _HISTORY_LIMIT 条）。"""
+    if not results:
+        return
+    with _history_lock:
+        data = load_json(_HISTORY_FILE, {})
+        stored = data.get("results", []) if isinstance(data, dict) else []
+        stored.extend(r._asdict() for r in results)
+        save_json(_HISTORY_FILE, {"results": stored[-_HISTORY_LIMIT:]})
+
+
+def clear_history() -> None:
+    with _history_lock:
+        save_json(_HISTORY_FILE, {"results": []})
+
+
+def baseline(result: LinkResult, history: list[LinkResult]) -> dict[str, float]:
+    """同一设备、同一连接方式最近几次（不含 result 本身）各指标的中位数；没有历史的指标不出现。"""
+    previous = [
+        r for r in history
+        if r.serial == result.serial and r.link == result.link and r.timestamp < result.timestamp
+    ][-_BASELINE_RUNS:]
+    medians = {}
+    for name, _, _ in METRICS:
+        values = [getattr(r, name) for r in previous if getattr(r, name)]
+        if values:
+            medians[name] = statistics.median(values)
+    return medians
+
+
+def compare_with_history(result: LinkResult, history: list[LinkResult]) -> list[str]:
+    """与历史中位数相比明显变差的指标说明，如 ["下行 12.0 MB/s，历史 38.5 MB/s"]；端口变化也一并说明。"""
+    medians = baseline(result, history)
+    notes = []
+    for name, label, higher_better in METRICS:
+        value, usual = getattr(result, name), medians.get(name)
+        if not value or not usual:
+            continue
+        if higher_better and value < usual * _THROUGHPUT_DROP:
+            notes.append(f"{label} {format_rate(value)}，历史 {format_rate(usual)}")
+        elif not higher_better and value > usual * _LATENCY_RISE and value - usual > _LATENCY_MIN_DELTA_MS:
+            notes.append(f"{label} {value:.1f}ms，历史 {usual:.1f}ms")
+    if notes and result.port:
+        ports = {r.port for r in history if r.serial == result.serial and r.port and r.port != result.port}
+        if ports:
+            notes.append(f"当前端口 {result.port}，以往还用过 {', '.join(sorted(ports))}")
+    return notes
+
+
+def port_summary(history: list[LinkResult]) -> list[tuple[str, int, float, float]]:
+    """按 USB 端口汇总：[(端口, 次数, 下行中位数, 上行中位数)]，下行从慢到快排列，慢的口排在前面。"""
+    by_port: dict[str, list[LinkResult]] = {}
+    for r in history:
+        if r.port and not r.error:
+            by_port.setdefault(r.port, []).append(r)
+    rows = []
+    for port, results in by_port.items():
+        down = [r.download for r in results if r.download]
+        up = [r.upload for r in results if r.upload]
+        rows.append((port, len(results), statistics.median(down) if down else 0.0, statistics.median(up) if up else 0.0))
+    rows.sort(key=lambda row: row[2])
+    return rows
+
+
+def format_rate(rate: float) -> str:
+    """字节/秒 -> "12.3 MB/s"。"""
+    if rate >= 1024 * 1024:
+        return f"{rate / 1024 / 1024:.1f} MB/s"
+    return f"{rate / 1024:.0f} KB/s"
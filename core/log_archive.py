@@ -0,0 +1,833 @@
+# -*- coding: utf-8 -*-
+"""
+可检索的 logcat 归档：采集文件按块写入并建立索引，查询只解压可能命中的块，不必整体 grep。
+
+- 块：采集文件（.log.gz / .log.zst）由一个个独立的 gzip member / zstd frame 首尾相接组成，
+  每块约 256KB 原始日志或 1 分钟（先到为准）。文件仍是普通压缩文件，zcat / zstdcat 可直接读；
+  查询时按索引记录的偏移定位到块，单独解压。
+- 索引：每个设备目录下的 index.sqlite3。每块记录时间范围、出现过的级别（位掩码）、
+  tag 与 pid 位图（位号为字典表中的编号），以及消息文本的倒排词表（词 → 块）。
+  索引可以随时删除，下次查询时从采集文件重建。
+- 年份：threadtime 行首没有年份，按写入时的本机时间推断（导入旧文件时按文件修改时间）。
+- 查询语法（空格分隔，条件之间为“且”，同一字段多次出现为“或”，前缀 - 表示排除）：
+  tag:ActivityManager  pid:1234  tid:1240  level>=W（也可写 level:W，或 = > < <=）
+  'ANR' / "input dispatching"（按整词匹配消息，不区分大小写）  last 2h / last:30m
+  since:2026-10-19T08:00 / until:09:30 / since:3h（时间点或多久以前）
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+INDEX_NAME = "index.sqlite3"
+_SCHEMA_VERSION = 1
+BLOCK_BYTES = 256 * 1024  # 单块原始日志大小上限
+BLOCK_SECONDS = 60  # 单块时长上限（秒），采集中的日志最多晚这么久可被检索
+_REWRITE_BYTES = 4 * 1024 * 1024  # 旧文件中超过此大小的块（整文件一个 member）重写为按块存放
+_WRITING_SUFFIX = ".writing"  # 正在写的采集文件旁的标记文件，写入方持有其文件锁
+_READ_SIZE = 256 * 1024
+
+GZIP = "gzip"
+ZSTD = "zstd"
+SUFFIXES = {GZIP: ".log.gz", ZSTD: ".log.zst"}
+
+LEVELS = "VDIWEF"
+_LEVEL_BITS = {c: 1 << i for i, c in enumerate(LEVELS)}
+_LEVEL_BITS["A"] = _LEVEL_BITS["F"]  # assert 与 fatal 同级
+
+_LINE_RE = re.compile(r"(\d\d-\d\d \d\d:\d\d:\d\d\.\d{3}) +(\d+) +(\d+) ([VDIWEFA]) (.*?) *: ?(.*)")
+_WORD_RE = re.compile(r"\w+")
+_HEX_RE = re.compile(r"[0-9a-f]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    indexed_to INTEGER NOT NULL,
+    complete INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    t_start REAL NOT NULL,
+    t_end REAL NOT NULL,
+    lines INTEGER NOT NULL,
+    levels INTEGER NOT NULL,
+    tags BLOB NOT NULL,
+    pids BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_time ON blocks (t_end);
+CREATE INDEX IF NOT EXISTS blocks_file ON blocks (file);
+CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS pids (id INTEGER PRIMARY KEY, pid INTEGER NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS postings (
+    token TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    PRIMARY KEY (token, block)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_block ON postings (block);
+"""
+
+
+def compression_of(path: Path) -> str:
+    return ZSTD if path.name.endswith(SUFFIXES[ZSTD]) else GZIP
+
+
+def log_files(directory: Path) -> list[Path]:
+    """目录中的采集文件，按开始时间先后排列（文件名即开始时间）。"""
+    suffixes = tuple(SUFFIXES.values())
+    try:
+        return sorted(p for p in directory.iterdir() if p.name.endswith(suffixes))
+    except OSError:
+        return []
+
+
+def archived_devices(root: Path) -> list[str]:
+    """采集根目录下有日志的设备目录名。"""
+    try:
+        return sorted(p.name for p in root.iterdir() if p.is_dir() and log_files(p))
+    except OSError:
+        return []
+
+
+def infer_time(stamp: str, reference: float) -> Optional[float]:
+    """
+    threadtime 时间 "MM-DD hh:mm:ss.mmm" 转成时间戳：取 reference 所在年份，
+    若因此落在 reference 两天之后（跨年时读到去年 12 月的行），改为上一年。格式不对返回 None。
+    """
+    try:
+        year = time.localtime(reference).tm_year
+        parts = (int(stamp[0:2]), int(stamp[3:5]), int(stamp[6:8]), int(stamp[9:11]), int(stamp[12:14]))
+        base = time.mktime((year, *parts, 0, 0, -1))
+        if base > reference + 2 * 86400:
+            base = time.mktime((year - 1, *parts, 0, 0, -1))
+        return base + int(stamp[15:18]) / 1000
+    except (ValueError, OverflowError):
+        return None
+
+
+def _indexable(token: str) -> bool:
+    """进倒排表的词：2~32 个字符，且不是长串数字/十六进制（地址、哈希之类只会撑大索引）。"""
+    return 2 <= len(token) <= 32 and not (len(token) > 8 and _HEX_RE.fullmatch(token))
+
+
+def _tokens(text: str) -> list[str]:
+    return [t for t in _WORD_RE.findall(text.lower()) if _indexable(t)]
+
+
+def _bitmap(ids) -> bytes:
+    value = 0
+    for i in ids:
+        value |= 1 << i
+    return value.to_bytes((value.bit_length() + 7) // 8, "little")
+
+
+def _has_bit(blob: bytes, bit: int) -> int:
+    return 1 if blob and bit // 8 < len(blob) and blob[bit // 8] >> (bit % 8) & 1 else 0
+
+
+class _Member:
+    """一个块的压缩流（gzip member / zstd frame）：sync() 同步刷新，finish() 结束本块。"""
+
+    def __init__(self, compression: str):
+        if compression == ZSTD:
+            import zstandard
+            self._comp = zstandard.ZstdCompressor(level=3).compressobj()
+            self._sync_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._comp = zlib.compressobj(6, zlib.DEFLATED, 31)
+            self._sync_mode = zlib.Z_SYNC_FLUSH
+
+    def compress(self, data: bytes) -> bytes:
+        return self._comp.compress(data)
+
+    def sync(self) -> bytes:
+        return self._comp.flush(self._sync_mode)
+
+    def finish(self) -> bytes:
+        return self._comp.flush()
+
+
+def _decompressor(compression: str):
+    """支持 eof / unused_data 的解压对象，用来按块（member / frame）切分。"""
+    if compression == ZSTD:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj(31)
+
+
+def read_block(path: Path, offset: int, length: int) -> bytes:
+    """单独解压一个块；文件被删除或内容不完整时返回能解出的部分。"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        return _decompressor(compression_of(path)).decompress(data)
+    except Exception:  # OSError、zlib.error、zstandard.ZstdError
+        return b""
+
+
+class BlockBuilder:
+    """收集一个块的索引信息：时间范围、级别、tag、pid 与词表。"""
+
+    def __init__(self):
+        self.lines = 0
+        self.raw_bytes = 0
+        self.levels = 0
+        self.tags: set[str] = set()
+        self.pids: set[int] = set()
+        self.tokens: set[str] = set()
+        self.t_start: Optional[float] = None
+        self.t_end: Optional[float] = None
+        self.started = time.monotonic()
+        self._partial = b""
+        self._times: dict[str, Optional[float]] = {}  # "MM-DD hh:mm:ss" -> 时间戳（整秒）
+
+    def add(self, data: bytes, reference: float) -> None:
+        self.raw_bytes += len(data)
+        data = self._partial + data
+        end = data.rfind(b"\n") + 1
+        self._partial = data[end:]
+        self._add_lines(data[:end], reference)
+
+    def finish(self, reference: float) -> None:
+        if self._partial:
+            self._add_lines(self._partial, reference)
+            self._partial = b""
+
+    def _add_lines(self, data: bytes, reference: float) -> None:
+        for line in data.decode("utf-8", "replace").splitlines():
+            self.lines += 1
+            m = _LINE_RE.match(line)
+            if not m:
+                continue
+            stamp = m.group(1)
+            second = stamp[:14]
+            if second not in self._times:
+                self._times[second] = infer_time(stamp[:15] + "000", reference)
+            base = self._times[second]
+            if base is not None:
+                t = base + int(stamp[15:18]) / 1000
+                self.t_start = t if self.t_start is None else min(self.t_start, t)
+                self.t_end = t if self.t_end is None else max(self.t_end, t)
+            self.levels |= _LEVEL_BITS[m.group(4)]
+            self.tags.add(m.group(5))
+            self.pids.add(int(m.group(2)))
+            self.tokens.update(_tokens(m.group(6)))
+
+
+class FileState(NamedTuple):
+    indexed_to: int
+    complete: bool
+
+
+class ArchiveIndex:
+    """
+    一个设备目录的索引。连接可跨线程使用，但同一实例的调用须依次进行（写入线程、查询线程各开一个实例）。
+    文件损坏或版本不兼容时删掉重建（索引可从采集文件恢复）。
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.path = self.directory / INDEX_NAME
+        self._tag_ids: dict[str, int] = {}
+        self._pid_ids: dict[int, int] = {}
+        try:
+            self._conn = self._open()
+        except sqlite3.DatabaseError:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.unlink(f"{self.path}{suffix}")
+                except OSError:
+                    pass
+            self._conn = self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] not in (0, _SCHEMA_VERSION):
+                raise sqlite3.DatabaseError("schema version mismatch")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+            conn.create_function("has_bit", 2, _has_bit, deterministic=True)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # ---------- 写入 ----------
+
+    def _dictionary_ids(self, table: str, column: str, values, cache: dict) -> list[int]:
+        missing = [v for v in values if v not in cache]
+        if missing:
+            self._conn.executemany(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", [(v,) for v in missing])
+            for v in missing:
+                cache[v] = self._conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", (v,)).fetchone()[0]
+        return [cache[v] for v in values]
+
+    def add_block(self, file: str, offset: int, length: int, builder: BlockBuilder, reference: float) -> None:
+        """记录一个块，并把文件的已索引位置推进到块尾。"""
+        t_start = builder.t_start if builder.t_start is not None else reference
+        t_end = builder.t_end if builder.t_end is not None else t_start
+        with self._conn:
+            self._conn.execute("BEGIN")
+            tag_ids = self._dictionary_ids("tags", "name", builder.tags, self._tag_ids)
+            pid_ids = self._dictionary_ids("pids", "pid", builder.pids, self._pid_ids)
+            block = self._conn.execute(
+                "INSERT INTO blocks (file, offset, length, t_start, t_end, lines, levels, tags, pids)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (file, offset, length, t_start, t_end, builder.lines, builder.levels, _bitmap(tag_ids), _bitmap(pid_ids)),
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO postings (token, block) VALUES (?, ?)", [(t, block) for t in builder.tokens]
+            )
+            self._set_file(file, offset + length, False)
+
+    def set_file(self, file: str, indexed_to: int, complete: bool) -> None:
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._set_file(file, indexed_to, complete)
+
+    def _set_file(self, file: str, indexed_to: int, complete: bool) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (name, indexed_to, complete) VALUES (?, ?, ?)",
+            (file, indexed_to, int(complete)),
+        )
+
+    def remove_file(self, file: str) -> None:
+        """文件被删除（超出保留上限）或需要重建时，去掉它的所有块。"""
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM postings WHERE block IN (SELECT id FROM blocks WHERE file = ?)", (file,))
+            self._conn.execute("DELETE FROM blocks WHERE file = ?", (file,))
+            self._conn.execute("DELETE FROM files WHERE name = ?", (file,))
+
+    # ---------- 读取 ----------
+
+    def file_states(self) -> dict[str, FileState]:
+        rows = self._conn.execute("SELECT name, indexed_to, complete FROM files").fetchall()
+        return {name: FileState(to, bool(done)) for name, to, done in rows}
+
+    def candidate_blocks(self, query: "LogQuery", newest_first: bool = False) -> list[tuple]:
+        """可能含有命中行的块 [(文件名, 偏移, 长度, 结束时间)]，按时间排列。"""
+        conds, params = [], []
+        if query.since is not None:
+            conds.append("t_end >= ?")
+            params.append(query.since)
+        if query.until is not None:
+            conds.append("t_start <= ?")
+            params.append(query.until)
+        if query.levels != _ALL_LEVELS:
+            conds.append("levels & ? != 0")
+            params.append(query.levels)
+        for column, table, key, values in (("tags", "tags", "name", query.tags), ("pids", "pids", "pid", query.pids)):
+            if not values:
+                continue
+            marks = ",".join("?" * len(values))
+            ids = [r[0] for r in self._conn.execute(f"SELECT id FROM {table} WHERE {key} IN ({marks})", values)]
+            if not ids:
+                return []
+            conds.append("(" + " OR ".join(f"has_bit({column}, ?)" for _ in ids) + ")")
+            params.extend(ids)
+        for token in sorted({t for text in query.texts for t in _tokens(text)}):
+            conds.append("id IN (SELECT block FROM postings WHERE token = ?)")
+            params.append(token)
+        where = " WHERE " + " AND ".join(conds) if conds else ""
+        order = "DESC" if newest_first else "ASC"
+        return self._conn.execute(
+            f"SELECT file, offset, length, t_end FROM blocks{where} ORDER BY t_start {order}, id {order}", params
+        ).fetchall()
+
+
+def _lock(f, blocking: bool) -> bool:
+    try:
+        if os.name == "nt":
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(f) -> None:
+    try:
+        if os.name == "nt":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    except OSError:
+        pass
+
+
+def _writing_marker(path: Path) -> Path:
+    return path.with_name(path.name + _WRITING_SUFFIX)
+
+
+def _writer_alive(path: Path) -> bool:
+    """
+    文件是否仍有写入方（本进程或其他进程）：标记文件存在且锁被占用。
+    写入方崩溃时锁随进程释放，留下的标记在这里清掉。
+    """
+    marker = _writing_marker(path)
+    try:
+        f = open(marker, "r+b")
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return True
+    with f:
+        if not _lock(f, blocking=False):
+            return True
+        _unlock(f)
+    try:
+        marker.unlink()
+    except OSError:
+        pass
+    return False
+
+
+class BlockFileWriter:
+    """
+    按块写入的压缩日志文件：每块单独一个 member / frame，写满一块（或 flush 时已满一分钟）即结束该块并写入索引。
+    index 为 None 或索引出错时只写文件，之后查询时再补建索引。
+    打开期间持有旁边 .writing 标记文件的锁，查询方据此跳过正在写的文件，不会与写入方重复索引同一块。
+    """
+
+    def __init__(self, path: Path, compression: str, index: Optional[ArchiveIndex] = None, name: str = ""):
+        self.path = path
+        self.name = name or path.name  # 重写旧文件时先写临时文件，索引里记正式文件名
+        self.compression = compression
+        self.opened_at = time.time()
+        self.raw_bytes = 0
+        self._index = index
+        self._marker = open(_writing_marker(path), "a+b")
+        _lock(self._marker, blocking=True)
+        try:
+            self._file = open(path, "wb")
+        except OSError:
+            self._release()
+            raise
+        self._reference = self.opened_at
+        self._start_block()
+
+    def _start_block(self) -> None:
+        self._member = _Member(self.compression)
+        self._offset = self._file.tell()
+        self._builder = BlockBuilder()
+
+    def write(self, data: bytes, reference: Optional[float] = None) -> None:
+        """data 应为整行；reference 为推断年份用的时间（默认当前时间）。"""
+        self._reference = reference if reference is not None else time.time()
+        self._file.write(self._member.compress(data))
+        self._builder.add(data, self._reference)
+        self.raw_bytes += len(data)
+        if self._builder.raw_bytes >= BLOCK_BYTES:
+            self._seal()
+
+    def flush(self) -> None:
+        """同步刷新：到此为止写入的数据不必等文件关闭即可解压。"""
+        if self._builder.raw_bytes and time.monotonic() - self._builder.started >= BLOCK_SECONDS:
+            self._seal()
+        else:
+            self._file.write(self._member.sync())
+        self._file.flush()
+
+    def _seal(self) -> None:
+        if not self._builder.raw_bytes:
+            return
+        self._file.write(self._member.finish())
+        self._file.flush()
+        builder, offset = self._builder, self._offset
+        builder.finish(self._reference)
+        self._start_block()
+        if self._index is not None:
+            try:
+                self._index.add_block(self.name, offset, self._offset - offset, builder, self._reference)
+            except sqlite3.Error:
+                self._index = None
+
+    def disk_size(self) -> int:
+        return self._file.tell()
+
+    def close(self) -> None:
+        try:
+            self._seal()
+        finally:
+            self._file.close()
+        try:
+            if self._index is not None:
+                try:
+                    self._index.set_file(self.name, self._offset, True)
+                except sqlite3.Error:
+                    pass
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        if self._marker.closed:
+            return
+        _unlock(self._marker)
+        self._marker.close()
+        try:
+            os.unlink(self._marker.name)
+        except OSError:
+            pass
+
+
+class _DeferredIndex:
+    """重写旧文件时先记下块，文件替换成功后再写入真正的索引。"""
+
+    def __init__(self):
+        self.blocks: list[tuple] = []
+
+    def add_block(self, *args) -> None:
+        self.blocks.append(args)
+
+    def set_file(self, *args) -> None:
+        pass
+
+
+def _iter_members(path: Path, start: int):
+    """从 start 起逐块解压：yield (偏移, 长度, 原始数据, 是否完整)。最后一块可能被截断（采集中途崩溃）。"""
+    compression = compression_of(path)
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = consumed = start
+        decoder = _decompressor(compression)
+        parts: list[bytes] = []
+        pending = b""
+        while True:
+            chunk = pending or f.read(_READ_SIZE)
+            pending = b""
+            if not chunk:
+                break
+            consumed += len(chunk)
+            parts.append(decoder.decompress(chunk))
+            if decoder.eof:
+                pending = decoder.unused_data
+                end = consumed - len(pending)
+                consumed = end
+                yield offset, end - offset, b"".join(parts), True
+                offset, parts = end, []
+                decoder = _decompressor(compression)
+        if consumed > offset:
+            yield offset, consumed - offset, b"".join(parts), False
+
+
+def index_file(index: ArchiveIndex, path: Path, start: int = 0) -> None:
+    """
+    为文件从 start 起尚未索引的部分建索引；整文件只有一个大块的旧文件重写为按块存放。
+    只用于已没有写入方的文件：末尾缺 EOF 的块是崩溃时截断的，照样索引并把文件记为写完。
+    """
+    reference = path.stat().st_mtime
+    blocks = []
+    for offset, length, data, _ in _iter_members(path, start):
+        if len(data) > _REWRITE_BYTES:
+            _rewrite(index, path, reference)
+            return
+        builder = BlockBuilder()
+        builder.add(data, reference)
+        builder.finish(reference)
+        blocks.append((offset, length, builder))
+    for offset, length, builder in blocks:
+        index.add_block(path.name, offset, length, builder, reference)
+    index.set_file(path.name, path.stat().st_size, True)
+
+
+def _rewrite(index: ArchiveIndex, path: Path, reference: float) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    deferred = _DeferredIndex()
+    writer = BlockFileWriter(tmp, compression_of(path), deferred, name=path.name)
+    try:
+        leftover = b""
+        for _, _, data, _ in _iter_members(path, 0):
+            data, pos = leftover + data, 0
+            while len(data) - pos >= BLOCK_BYTES:
+                end = data.rfind(b"\n", pos, pos + BLOCK_BYTES) + 1
+                if end <= pos:  # 超长的一行，直接截断成块
+                    end = pos + BLOCK_BYTES
+                writer.write(data[pos:end], reference)
+                pos = end
+            leftover = data[pos:]
+        if leftover:
+            writer.write(leftover, reference)
+        writer.close()
+        mtime = path.stat().st_mtime
+        os.replace(tmp, path)
+        os.utime(path, (mtime, mtime))
+    except BaseException:
+        writer.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    index.remove_file(path.name)
+    for args in deferred.blocks:
+        index.add_block(*args)
+    index.set_file(path.name, path.stat().st_size, True)
+
+
+def index_pending(index: ArchiveIndex) -> int:
+    """
+    补建索引：旧版本写的文件、崩溃时没写完的文件；去掉已删除文件的块。返回处理的文件数。
+    仍有写入方的文件（哪怕很久没有新日志）由写入方自己索引，这里跳过。
+    """
+    files = log_files(index.directory)
+    states = index.file_states()
+    names = {p.name for p in files}
+    for name in states:
+        if name not in names:
+            index.remove_file(name)
+    done = 0
+    for path in files:
+        state = states.get(path.name)
+        if state is not None and state.complete:
+            continue
+        try:
+            stat = path.stat()
+            if (state is not None and state.indexed_to >= stat.st_size) or _writer_alive(path):
+                continue
+            index_file(index, path, state.indexed_to if state else 0)
+            done += 1
+        except (OSError, zlib.error, sqlite3.Error):
+            continue
+    return done
+
+
+# ---------- 查询 ----------
+
+_ALL_LEVELS = (1 << len(LEVELS)) - 1
+_TERM_RE = re.compile(r"""(-?)(?:(\w+)(>=|<=|:|=|>|<)("[^"]*"|'[^']*'|\S+)|"([^"]*)"|'([^']*)'|(\S+))""")
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(s|sec|m|min|h|d)?", re.IGNORECASE)
+_DURATION_UNITS = {"s": 1, "sec": 1, "m": 60, "min": 60, "h": 3600, "d": 86400}
+_TIME_FORMATS = ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+_CLOCK_FORMATS = ("%H:%M:%S", "%H:%M")
+_LEVEL_NAMES = ("VERBOSE", "DEBUG", "INFO", "WARN", "WARNING", "ERROR", "FATAL", "ASSERT")
+
+
+class LogQuery(NamedTuple):
+    tags: tuple = ()
+    exclude_tags: tuple = ()
+    pids: tuple = ()
+    exclude_pids: tuple = ()
+    tids: tuple = ()
+    levels: int = _ALL_LEVELS
+    texts: tuple = ()
+    exclude_texts: tuple = ()
+    since: Optional[float] = None
+    until: Optional[float] = None
+
+    def has_line_filters(self) -> bool:
+        """除时间外是否还有条件（没有时连 "--------- beginning of" 之类的非日志行也一起显示）。"""
+        return bool(
+            self.tags or self.exclude_tags or self.pids or self.exclude_pids or self.tids
+            or self.levels != _ALL_LEVELS or self.texts or self.exclude_texts
+        )
+
+
+class LogEntry(NamedTuple):
+    time: float  # 推断出年份后的时间戳；非日志行为所在块的时间
+    pid: int
+    tid: int
+    level: str
+    tag: str
+    message: str
+    line: str
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    m = _DURATION_RE.fullmatch(value)
+    if not m:
+        return None
+    return float(m.group(1)) * _DURATION_UNITS[(m.group(2) or "s").lower()]
+
+
+def _parse_time(value: str, now: float) -> float:
+    """时间点（2026-10-19T08:00、2026-10-19、今天的 08:00）或多久以前（3h）。"""
+    ago = _parse_duration(value)
+    if ago is not None and not value.isdigit():
+        return now - ago
+    for fmt in _TIME_FORMATS:
+        try:
+            return time.mktime(time.strptime(value, fmt))
+        except ValueError:
+            pass
+    for fmt in _CLOCK_FORMATS:
+        try:
+            clock = time.strptime(value, fmt)
+        except ValueError:
+            continue
+        today = time.localtime(now)
+        return time.mktime(
+            (today.tm_year, today.tm_mon, today.tm_mday, clock.tm_hour, clock.tm_min, clock.tm_sec, 0, 0, -1)
+        )
+    raise ValueError(f"无法识别的时间：{value}（例如 2026-10-19T08:00、08:00 或 2h）")
+
+
+def _level_mask(op: str, value: str) -> int:
+    level = value[:1].upper()
+    if level not in _LEVEL_BITS or (len(value) > 1 and value.upper() not in _LEVEL_NAMES):
+        raise ValueError(f"无法识别的级别：{value}（V D I W E F）")
+    i = LEVELS.index("F" if level == "A" else level)
+    below = (1 << i) - 1
+    bit = 1 << i
+    return {
+        ":": _ALL_LEVELS & ~below, ">=": _ALL_LEVELS & ~below, "=": bit,
+        ">": _ALL_LEVELS & ~below & ~bit, "<=": below | bit, "<": below,
+    }[op]
+
+
+def parse_query(text: str, now: Optional[float] = None) -> LogQuery:
+    """解析查询语句（语法见模块说明）；有误时抛 ValueError。"""
+    now = time.time() if now is None else now
+    keys = ("tags", "exclude_tags", "pids", "exclude_pids", "tids", "texts", "exclude_texts")
+    fields: dict[str, list] = {k: [] for k in keys}
+    levels = _ALL_LEVELS
+    since = until = None
+    terms = [m.groups() for m in _TERM_RE.finditer(text)]
+    i = 0
+    while i < len(terms):
+        neg, key, op, value, dq, sq, word = terms[i]
+        i += 1
+        if key is None:
+            phrase = dq if dq is not None else sq if sq is not None else word
+            if word is not None and word.lower() == "last" and not neg and i < len(terms) and terms[i][6]:
+                key, op, value = "last", ":", terms[i][6]
+                i += 1
+            else:
+                if phrase.strip():
+                    fields["exclude_texts" if neg else "texts"].append(phrase)
+                continue
+        key = key.lower()
+        if value[:1] in "\"'" and len(value) >= 2 and value[-1] == value[0]:
+            value = value[1:-1]
+        if neg and key not in ("tag", "pid", "msg", "text"):
+            raise ValueError(f"{key} 不支持排除")
+        if op != ":" and key != "level":
+            raise ValueError(f"{key} 只支持 {key}:值")
+        if key == "tag":
+            fields["exclude_tags" if neg else "tags"].append(value)
+        elif key in ("pid", "tid"):
+            if not value.isdigit():
+                raise ValueError(f"{key} 应为数字：{value}")
+            fields["exclude_pids" if neg else key + "s"].append(int(value))
+        elif key == "level":
+            levels &= _level_mask(op, value)
+        elif key in ("msg", "text"):
+            fields["exclude_texts" if neg else "texts"].append(value)
+        elif key == "last":
+            ago = _parse_duration(value)
+            if ago is None:
+                raise ValueError(f"无法识别的时长：{value}（例如 30m、2h、1d）")
+            since = now - ago
+        elif key == "since":
+            since = _parse_time(value, now)
+        elif key == "until":
+            until = _parse_time(value, now)
+        else:
+            raise ValueError(f"未知的字段：{key}（可用 tag pid tid level msg last since until）")
+    return LogQuery(**{k: tuple(v) for k, v in fields.items()}, levels=levels, since=since, until=until)
+
+
+def _phrase_pattern(text: str) -> re.Pattern:
+    """整词匹配（与倒排表的切词一致）；不含单词字符的按子串匹配。"""
+    words = _WORD_RE.findall(text)
+    if not words:
+        return re.compile(re.escape(text), re.IGNORECASE)
+    return re.compile(r"(?<!\w)" + r"\W+".join(map(re.escape, words)) + r"(?!\w)", re.IGNORECASE)
+
+
+class LogSearch:
+    """
+    一次查询的结果游标：第一次 fetch 时补建索引并确定候选块，之后按块依次解压、逐行过滤，每次返回一页。
+    只在一个线程中依次调用（界面每次取页的后台线程可以不同）。
+    """
+
+    def __init__(self, directory: Path, query: LogQuery, newest_first: bool = False):
+        self.directory = Path(directory)
+        self.query = query
+        self.newest_first = newest_first
+        self.total = 0  # 候选块数
+        self.scanned = 0  # 已检查的块数
+        self.done = False
+        self._blocks: Optional[list[tuple]] = None
+        self._pending: list[LogEntry] = []
+        self._texts = [_phrase_pattern(t) for t in query.texts]
+        self._excludes = [_phrase_pattern(t) for t in query.exclude_texts]
+        self._lock = threading.Lock()
+
+    def fetch(self, count: int, budget: Optional[float] = None) -> list[LogEntry]:
+        """取最多 count 条；给了 budget（秒）时超时即返回已找到的部分（可能为空），之后接着找。"""
+        with self._lock:
+            if self._blocks is None:
+                index = ArchiveIndex(self.directory)
+                try:
+                    index_pending(index)
+                    self._blocks = index.candidate_blocks(self.query, self.newest_first)
+                finally:
+                    index.close()
+                self.total = len(self._blocks)
+            started = time.monotonic()
+            out, self._pending = self._pending[:count], self._pending[count:]
+            while len(out) < count and self.scanned < self.total:
+                if budget is not None and time.monotonic() - started >= budget:
+                    break
+                file, offset, length, t_end = self._blocks[self.scanned]
+                self.scanned += 1
+                entries = self._scan(read_block(self.directory / file, offset, length), t_end)
+                need = count - len(out)
+                out.extend(entries[:need])
+                self._pending = entries[need:]
+            self.done = self.scanned >= self.total and not self._pending
+            return out
+
+    def _scan(self, data: bytes, reference: float) -> list[LogEntry]:
+        q = self.query
+        loose = not q.has_line_filters()
+        times: dict[str, Optional[float]] = {}
+        last = reference
+        entries = []
+        for line in data.decode("utf-8", "replace").splitlines():
+            m = _LINE_RE.match(line)
+            if not m:
+                if loose and line and self._in_range(last):
+                    entries.append(LogEntry(last, 0, 0, "", "", line, line))
+                continue
+            stamp = m.group(1)
+            if stamp[:14] not in times:
+                times[stamp[:14]] = infer_time(stamp[:15] + "000", reference)
+            base = times[stamp[:14]]
+            t = last = base + int(stamp[15:18]) / 1000 if base is not None else last
+            if not self._in_range(t) or not _LEVEL_BITS[m.group(4)] & q.levels:
+                continue
+            tag, pid, tid, message = m.group(5), int(m.group(2)), int(m.group(3)), m.group(6)
+            if (q.tags and tag not in q.tags) or tag in q.exclude_tags:
+                continue
+            if (q.pids and pid not in q.pids) or pid in q.exclude_pids or (q.tids and tid not in q.tids):
+                continue
+            if not all(p.search(message) for p in self._texts) or any(p.search(message) for p in self._excludes):
+                continue
+            entries.append(LogEntry(t, pid, tid, m.group(4), tag, message, line))
+        if self.newest_first:
+            entries.reverse()
+        return entries
+
+    def _in_range(self, t: float) -> bool:
+        return (self.query.since is None or t >= self.query.since) and (self.query.until is None or t <= self.query.until)
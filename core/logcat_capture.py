@@ -0,0 +1,506 @@
+# -*- coding: utf-8 -*-
+"""
+后台 logcat 采集：把选中设备的 logcat 持续写入按大小或时间轮转的压缩文件，适合整夜测试时保留完整日志。
+
+- 各设备的 logcat -v threadtime 长连接都是 core.adb_async 共享事件循环上的协程，不为每台设备占用线程；
+  整块读取后交给唯一的写入线程，压缩、写盘与轮转都在写入线程中进行，读取不会被磁盘 I/O 卡住。
+- 文件：<目录>/<设备>/<开始时间>.log.gz（安装 zstandard 后可选 .log.zst），每隔几秒做一次同步刷新，
+  采集中途或程序崩溃时已写入的部分也能正常解压。每台设备的文件总大小超过上限时删除最旧的文件。
+  文件按块写入并同时建立检索索引（见 core.log_archive）。
+- 设备断开后每隔几秒重试；重连后用 `logcat -T <最后一行的时间>` 接着读，
+  并跳过该时间点上已经写过的行（按行内容的 CRC 记录），前后不重复也不遗漏。
+  续读位置随每次刷新保存到数据目录 logcat_capture.json，程序重启后同样接着读。
+"""
+
+import asyncio
+import queue
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from core import adb_async
+from core.log_archive import GZIP, SUFFIXES, ZSTD, ArchiveIndex, BlockFileWriter, log_files
+from core.storage import app_data_dir, load_json, save_json
+
+_STATE_FILE = "logcat_capture.json"
+_READ_SIZE = 64 * 1024
+_FLUSH_INTERVAL = 5.0  # 写入线程同步刷新并保存续读位置的间隔（秒）
+_RETRY_INTERVAL = 2.0  # 设备断开后重试 logcat 的间隔（秒）
+_RATE_ALPHA = 0.5
+
+CAPTURING = "capturing"
+WAITING = "waiting"
+STOPPED = "stopped"
+
+STATE_LABELS = {
+    CAPTURING: "采集中",
+    WAITING: "等待设备",
+    STOPPED: "已停止",
+}
+
+
+def zstd_available() -> bool:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def device_dir_name(serial: str) -> str:
+    """序列号转成可用作目录名的形式（无线设备的 host:port 等）。"""
+    return re.sub(r"[^\w.-]", "_", serial)
+
+
+def _timestamp(line: bytes) -> Optional[bytes]:
+    """threadtime 行首的 "MM-DD hh:mm:ss.mmm"（正是 logcat -T 接受的格式）；不是日志行返回 None。"""
+    if len(line) >= 18 and line[2:3] == b"-" and line[5:6] == b" " and line[14:15] == b".":
+        return line[:18]
+    return None
+
+
+class CaptureSettings(NamedTuple):
+    directory: str = ""  # 空串为数据目录下的 logcat/
+    compression: str = GZIP
+    rotate_bytes: int = 64 * 1024 * 1024  # 单个文件的未压缩大小上限
+    rotate_seconds: int = 3600  # 单个文件的时长上限
+    keep_bytes: int = 2 * 1024 * 1024 * 1024  # 每台设备保留的压缩文件总大小
+
+    def root(self) -> Path:
+        return Path(self.directory) if self.directory else app_data_dir() / "logcat"
+
+
+class CaptureStats(NamedTuple):
+    serial: str
+    state: str
+    error: str
+    lines: int  # 本次采集写入的行数
+    rate: float  # 最近的写入速率（未压缩字节/秒）
+    disk_bytes: int  # 该设备目录下采集文件的总大小（压缩后）
+    files: int
+    current_file: str
+    reconnects: int
+
+
+class _DeviceCapture:
+    """一台设备的 logcat 读取协程：断开后重试，重连时按时间点续读并去掉重复的行。"""
+
+    def __init__(self, serial: str, service: "LogcatCaptureService", last_ts: bytes = b"", seen=()):
+        self.serial = serial
+        self._service = service
+        self.last_ts = last_ts  # 已读到的最后一个时间点
+        self.seen: set[int] = set(seen)  # 该时间点上已读到的行（CRC32）
+        self.state = WAITING
+        self.error = ""
+        self.reconnects = 0
+        self._running = True
+        self._future: Optional[Future] = None
+
+    def start(self) -> None:
+        self._future = adb_async.submit(self._run())
+
+    def stop(self) -> None:
+        self._running = False
+        if self._future is not None:
+            self._future.cancel()  # 取消协程，流随之关闭
+
+    def join(self, timeout: float) -> None:
+        if self._future is None:
+            return
+        try:
+            self._future.result(timeout)
+        except Exception:
+            pass  # 已取消、超时或异常结束
+
+    async def _run(self):
+        try:
+            while self._running:
+                args = ["-v", "threadtime"]
+                if self.last_ts:
+                    args += ["-T", self.last_ts.decode("ascii")]
+                received, err = False, ""
+                try:
+                    received = await self._pump(adb_async.logcat(self.serial, *args, raw=True))
+                except (adb_async.AdbProtocolError, OSError) as e:
+                    err = str(e)
+                if not self._running:
+                    break
+                self.state, self.error = WAITING, err or "logcat 已断开"
+                self.reconnects += received
+                await asyncio.sleep(_RETRY_INTERVAL)
+        finally:
+            self.state = STOPPED
+
+    async def _pump(self, chunks) -> bool:
+        """读到 logcat 结束为止，整块交给写入线程，返回是否收到过数据。"""
+        resuming = bool(self.last_ts)
+        received = False
+        tail = b""
+        async for chunk in chunks:
+            data = tail + chunk
+            cut = data.rfind(b"\n") + 1
+            data, tail = data[:cut], data[cut:]
+            if not data:
+                continue
+            if b"\r" in data:
+                data = data.replace(b"\r\n", b"\n")  # 旧设备的 shell 经过 PTY
+            if not received:
+                received = True
+                self.state, self.error = CAPTURING, ""
+                if resuming:
+                    stamp = self.last_ts.decode("ascii")
+                    self._service._write(self.serial, f"--------- gui-adb: 重新连接，从 {stamp} 之后继续\n".encode())
+            if resuming:
+                data, resuming = self._skip_seen(data)
+            if data:
+                self._track(data)
+                self._service._write(self.serial, data, self.last_ts, self.seen)
+        return received
+
+    def _skip_seen(self, data: bytes) -> tuple[bytes, bool]:
+        """
+        logcat -T 从该时间点（含）开始输出：跳过时间点上已写过的行与开头的 "--------- beginning of" 提示，
+        遇到其他时间点的行即续读完成。返回 (保留的数据, 是否仍在续读)。
+        """
+        lines = data.split(b"\n")
+        lines.pop()
+        kept = []
+        for i, line in enumerate(lines):
+            ts = _timestamp(line)
+            if ts is None:
+                continue
+            if ts != self.last_ts:
+                kept.extend(lines[i:])
+                return b"\n".join(kept) + b"\n", False
+            if zlib.crc32(line) not in self.seen:
+                kept.append(line)
+        return (b"\n".join(kept) + b"\n" if kept else b""), True
+
+    def _track(self, data: bytes) -> None:
+        """从末尾往前找最后一个时间点及其所有行，更新续读位置。"""
+        newest = None
+        crcs = []
+        end = len(data) - 1  # data 以换行结尾
+        while end > 0:
+            start = data.rfind(b"\n", 0, end) + 1
+            line = data[start:end]
+            ts = _timestamp(line)
+            if ts is not None:
+                if newest is None:
+                    newest = ts
+                elif ts != newest:
+                    break
+                crcs.append(zlib.crc32(line))
+            end = start - 1
+        if newest is None:
+            return
+        if newest == self.last_ts:
+            self.seen.update(crcs)
+        else:
+            self.last_ts, self.seen = newest, set(crcs)
+
+
+class _Writer:
+    """唯一的写入线程：压缩写盘、轮转、清理与速率统计；刷新后保存各设备的续读位置。"""
+
+    def __init__(self, service: "LogcatCaptureService"):
+        self._service = service
+        self._queue: queue.Queue = queue.Queue()
+        self._outputs: dict[str, BlockFileWriter] = {}
+        self._indexes: dict[Path, Optional[ArchiveIndex]] = {}  # 设备目录 -> 检索索引（打不开时为 None）
+        self._closed_bytes: dict[str, int] = {}  # 设备目录下已关闭文件的总大小
+        self._closed_files: dict[str, int] = {}
+        self._counters: dict[str, list] = {}  # serial -> [行数, 字节数, 上次统计的字节数, 速率]
+        self._resume: dict[str, tuple[bytes, list[int]]] = {}  # 已写入数据对应的续读位置
+        self._dirty = False
+        self._lock = threading.Lock()  # 保护统计数据（界面线程读取）
+        self._thread = threading.Thread(target=self._run, name="logcat-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, serial: str, data: Optional[bytes], last_ts: bytes = b"", seen=()) -> None:
+        """data 为 None 表示关闭该设备的文件。"""
+        self._queue.put((serial, data, last_ts, list(seen) if last_ts else None))
+
+    def shutdown(self, timeout: float = 10) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def resume_points(self) -> dict[str, tuple[bytes, list[int]]]:
+        with self._lock:
+            return dict(self._resume)
+
+    def stats(self, serial: str) -> tuple[int, float, int, int, str]:
+        """(行数, 速率, 磁盘占用, 文件数, 当前文件名)"""
+        with self._lock:
+            lines, _, _, rate = self._counters.get(serial, (0, 0, 0, 0.0))
+            output = self._outputs.get(serial)
+            disk = self._closed_bytes.get(serial, 0) + (output.disk_size() if output else 0)
+            files = self._closed_files.get(serial, 0) + (1 if output else 0)
+            return lines, rate, disk, files, output.path.name if output else ""
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.1, _FLUSH_INTERVAL - (time.monotonic() - last_flush)))
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                self._handle(*item)
+            now = time.monotonic()
+            if now - last_flush >= _FLUSH_INTERVAL:
+                self._flush_all(now - last_flush)
+                last_flush = now
+        for serial in list(self._outputs):
+            self._close(serial)
+        for index in self._indexes.values():
+            if index is not None:
+                index.close()
+        self._service._save_state(self.resume_points())
+
+    def _handle(self, serial: str, data: Optional[bytes], last_ts: bytes, seen: Optional[list[int]]):
+        if data is None:
+            self._close(serial)
+            return
+        settings = self._service.settings
+        try:
+            output = self._outputs.get(serial)
+            if output is not None and (
+                output.raw_bytes >= settings.rotate_bytes or time.time() - output.opened_at >= settings.rotate_seconds
+            ):
+                self._close(serial)
+                output = None
+            if output is None:
+                output = self._open(serial, settings)
+            output.write(data)
+        except OSError as e:
+            self._service._set_error(serial, f"写入失败：{e}")
+            return
+        with self._lock:
+            counters = self._counters.setdefault(serial, [0, 0, 0, 0.0])
+            counters[0] += data.count(b"\n")
+            counters[1] += len(data)
+            if seen is not None:
+                self._resume[serial] = (last_ts, seen)
+                self._dirty = True
+
+    def _open(self, serial: str, settings: CaptureSettings) -> BlockFileWriter:
+        directory = settings.root() / device_dir_name(serial)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._enforce_quota(serial, directory, settings.keep_bytes)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        suffix = SUFFIXES.get(settings.compression, SUFFIXES[GZIP])
+        path = directory / f"{stamp}{suffix}"
+        n = 1
+        while path.exists():  # 同一秒内轮转多次；"~" 排在 "." 之后，文件名顺序仍是时间顺序
+            path = directory / f"{stamp}~{n:03d}{suffix}"
+            n += 1
+        output = BlockFileWriter(path, settings.compression, self._index(directory))
+        with self._lock:
+            self._outputs[serial] = output
+        return output
+
+    def _index(self, directory: Path) -> Optional[ArchiveIndex]:
+        """索引打不开时只写文件，之后查询时再补建。"""
+        if directory not in self._indexes:
+            try:
+                self._indexes[directory] = ArchiveIndex(directory)
+            except (OSError, sqlite3.Error):
+                self._indexes[directory] = None
+        return self._indexes[directory]
+
+    def _close(self, serial: str):
+        with self._lock:
+            output = self._outputs.pop(serial, None)
+        if output is None:
+            return
+        try:
+            output.close()
+        except OSError as e:
+            self._service._set_error(serial, f"写入失败：{e}")
+        self._enforce_quota(serial, output.path.parent, self._service.settings.keep_bytes)
+
+    def _enforce_quota(self, serial: str, directory: Path, keep_bytes: int):
+        """删除最旧的文件直到总大小不超过上限（正在写的文件不算在内，也不删），并更新占用统计。"""
+        files = [(p, p.stat().st_size) for p in log_files(directory)]
+        current = self._outputs.get(serial)
+        files = [(p, size) for p, size in files if current is None or p != current.path]
+        total = sum(size for _, size in files)
+        while files and total > keep_bytes:
+            path, size = files.pop(0)
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                break
+            index = self._index(directory)
+            if index is not None:
+                try:
+                    index.remove_file(path.name)
+                except sqlite3.Error:
+                    pass
+        with self._lock:
+            self._closed_bytes[serial] = total
+            self._closed_files[serial] = len(files)
+
+    def _flush_all(self, elapsed: float):
+        for serial, output in list(self._outputs.items()):
+            try:
+                output.flush()
+            except OSError as e:
+                self._service._set_error(serial, f"写入失败：{e}")
+        with self._lock:
+            for counters in self._counters.values():
+                rate = (counters[1] - counters[2]) / elapsed if elapsed > 0 else 0.0
+                counters[2] = counters[1]
+                counters[3] += _RATE_ALPHA * (rate - counters[3])
+            dirty, self._dirty = self._dirty, False
+            resume = dict(self._resume)
+        if dirty:
+            self._service._save_state(resume)  # 刷新后再保存：续读位置之前的数据都已落盘
+
+
+class LogcatCaptureService:
+    """进程内共享的采集服务（界面与命令行共用）。"""
+
+    def __init__(self, state_file: Optional[str] = _STATE_FILE):
+        self._state_file = state_file
+        self._lock = threading.Lock()
+        self._captures: dict[str, _DeviceCapture] = {}
+        self._errors: dict[str, str] = {}
+        state = load_json(state_file, {}) if state_file else {}
+        state = state if isinstance(state, dict) else {}
+        raw = state.get("settings", {})
+        try:
+            self.settings = CaptureSettings(**{k: v for k, v in raw.items() if k in CaptureSettings._fields})
+        except (TypeError, AttributeError):
+            self.settings = CaptureSettings()
+        self._devices: dict[str, dict] = {
+            k: v for k, v in state.get("devices", {}).items() if isinstance(v, dict)
+        }
+        self._writer = _Writer(self)
+
+    # ----- 设置与状态 -----
+
+    def set_settings(self, **changes) -> None:
+        """修改设置（目录、压缩方式、轮转与保留上限），新文件起生效。"""
+        if changes.get("compression") == ZSTD and not zstd_available():
+            raise ValueError("zstd 压缩需要安装 zstandard（pip install zstandard），或改用 gzip")
+        with self._lock:
+            self.settings = self.settings._replace(**changes)
+            self._save_locked()
+
+    def _save_state(self, resume: dict[str, tuple[bytes, list[int]]]) -> None:
+        with self._lock:
+            for serial, (last_ts, seen) in resume.items():
+                entry = self._devices.setdefault(serial, {})
+                entry["last_ts"], entry["seen"] = last_ts.decode("ascii"), seen
+            self._save_locked()
+
+    def _save_locked(self):
+        if self._state_file:
+            save_json(self._state_file, {"settings": self.settings._asdict(), "devices": self._devices})
+
+    def _write(self, serial: str, data: bytes, last_ts: bytes = b"", seen=()) -> None:
+        self._writer.put(serial, data, last_ts, seen)
+
+    def _set_error(self, serial: str, message: str) -> None:
+        with self._lock:
+            self._errors[serial] = message
+
+    # ----- 控制 -----
+
+    def start(self, serial: str) -> None:
+        """开始采集（已在采集时不变）。曾经采集过的设备从上次的位置接着读，否则从设备缓冲区中最早的一行开始。"""
+        with self._lock:
+            if serial in self._captures:
+                return
+            entry = self._devices.setdefault(serial, {})
+            entry["active"] = True
+            last_ts = entry.get("last_ts", "").encode("ascii", "ignore")
+            capture = _DeviceCapture(serial, self, last_ts, entry.get("seen", []) if last_ts else ())
+            self._captures[serial] = capture
+            self._errors.pop(serial, None)
+            self._save_locked()
+        capture.start()
+
+    def stop(self, serial: str) -> None:
+        with self._lock:
+            capture = self._captures.pop(serial, None)
+        if capture is not None:
+            capture.stop()
+            capture.join(3)
+            self._writer.put(serial, None)
+        with self._lock:
+            entry = self._devices.get(serial)
+            if entry is not None:
+                entry["active"] = False
+                if capture is not None and capture.last_ts:
+                    # 读取线程已结束，读到的数据都已交给写入线程；再次开始时从这里接着读
+                    entry["last_ts"], entry["seen"] = capture.last_ts.decode("ascii"), list(capture.seen)
+                self._save_locked()
+
+    def restore(self) -> list[str]:
+        """启动时恢复上次退出前正在采集的设备，返回这些设备。"""
+        with self._lock:
+            serials = [s for s, entry in self._devices.items() if entry.get("active")]
+        for serial in serials:
+            self.start(serial)
+        return serials
+
+    def shutdown(self, timeout: float = 10) -> None:
+        """程序退出：停止读取、关闭文件并保存续读位置；正在采集的设备保持 active，下次启动时 restore。"""
+        with self._lock:
+            captures, self._captures = list(self._captures.values()), {}
+        for capture in captures:
+            capture.stop()
+        for capture in captures:
+            capture.join(3)
+        self._writer.shutdown(timeout)
+
+    def active(self) -> list[str]:
+        with self._lock:
+            return list(self._captures)
+
+    def stats(self) -> list[CaptureStats]:
+        """正在采集与曾经采集过（有文件）的设备的统计。"""
+        with self._lock:
+            captures = dict(self._captures)
+            serials = list(dict.fromkeys([*captures, *self._devices]))
+            errors = dict(self._errors)
+        result = []
+        for serial in serials:
+            capture = captures.get(serial)
+            lines, rate, disk, files, current = self._writer.stats(serial)
+            if not files:
+                directory = self.settings.root() / device_dir_name(serial)
+                paths = log_files(directory)
+                files, disk = len(paths), sum(p.stat().st_size for p in paths)
+            if capture is None and not files:
+                continue
+            state = capture.state if capture else STOPPED
+            error = errors.get(serial) or (capture.error if capture and state == WAITING else "")
+            result.append(CaptureStats(
+                serial, state, error, lines, rate if capture else 0.0, disk, files, current,
+                capture.reconnects if capture else 0,
+            ))
+        return result
+
+
+_service: Optional[LogcatCaptureService] = None
+_service_lock = threading.Lock()
+
+
+def get_capture_service() -> LogcatCaptureService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = LogcatCaptureService()
+        return _service
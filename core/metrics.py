@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+命令耗时指标：每条 adb 命令（adb_helper.run_adb / run_adb_bytes 与 core.adb_async 原生调用）
+记录各阶段耗时、收发字节与结果，按 (操作, 设备) 聚合为直方图，可导出 Prometheus 文本或 JSON。
+
+阶段：
+    spawn      启动 adb 客户端进程（子进程方式）
+    wait       进程启动到结束：客户端与 server 握手、设备传输、命令执行都在其中
+    connect    连上 adb server 套接字（原生方式）
+    handshake  切换到设备传输通道（原生方式）
+    transfer   请求发出到结果收完（原生方式）
+    decode     输出解码
+    total      整条命令
+
+默认关闭，关闭时命令路径上只多一次 None 判断；设置环境变量 GUI_ADB_METRICS=1 或调用 enable() 开启。
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import adb_helper
+
+# 直方图桶上界（毫秒），最后一个桶为 +Inf
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+PHASES = ("spawn", "wait", "connect", "handshake", "transfer", "decode", "total")
+OUTCOMES = ("ok", "error", "timeout", "fail_fast", "exception")
+
+_NO_DEVICE = "-"
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q: float) -> float:
+        """按桶线性插值估算分位数（毫秒）。"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                low = BUCKETS_MS[i - 1] if i > 0 else 0.0
+                high = BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum, 3),
+            "max_ms": round(self.max, 3),
+            "p50_ms": round(self.quantile(0.5), 3),
+            "p95_ms": round(self.quantile(0.95), 3),
+            "buckets": dict(zip([str(b) for b in BUCKETS_MS] + ["+Inf"], self.counts)),
+        }
+
+
+class _Series:
+    """一个 (操作, 设备) 组合的全部指标。"""
+
+    __slots__ = ("phases", "outcomes", "bytes_in", "bytes_out")
+
+    def __init__(self):
+        self.phases: dict[str, Histogram] = {}
+        self.outcomes: dict[str, int] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, str], _Series] = {}
+        self.started_at = time.time()
+
+    def record(
+        self,
+        op: str,
+        device: Optional[str],
+        phases: dict[str, float],
+        bytes_in: int = 0,
+        bytes_out: int = 0,
+        outcome: str = "ok",
+    ) -> None:
+        """记录一条命令；phases 为 {阶段: 秒}。bytes_in 为发给设备的字节，bytes_out 为收到的字节。"""
+        key = (op or "?", device or _NO_DEVICE)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            for phase, seconds in phases.items():
+                hist = series.phases.get(phase)
+                if hist is None:
+                    hist = series.phases[phase] = Histogram()
+                hist.observe(seconds * 1000)
+            series.outcomes[outcome] = series.outcomes.get(outcome, 0) + 1
+            series.bytes_in += bytes_in
+            series.bytes_out += bytes_out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self.started_at = time.time()
+
+    def rows(self) -> list[dict]:
+        """诊断面板用的扁平行：每个 (操作, 设备) 一行，含总耗时分位数与各阶段平均值。"""
+        rows = []
+        with self._lock:
+            for (op, device), series in sorted(self._series.items()):
+                total = series.phases.get("total") or Histogram()
+                rows.append({
+                    "op": op,
+                    "device": device,
+                    "count": sum(series.outcomes.values()),
+                    "errors": sum(n for o, n in series.outcomes.items() if o != "ok"),
+                    "p50_ms": total.quantile(0.5),
+                    "p95_ms": total.quantile(0.95),
+                    "max_ms": total.max,
+                    "phase_avg_ms": {
+                        p: h.sum / h.count for p, h in series.phases.items() if h.count and p != "total"
+                    },
+                    "bytes_in": series.bytes_in,
+                    "bytes_out": series.bytes_out,
+                })
+        return rows
+
+    def to_json(self) -> dict:
+        with self._lock:
+            series = [
+                {
+                    "op": op,
+                    "device": device,
+                    "outcomes": dict(s.outcomes),
+                    "bytes_in": s.bytes_in,
+                    "bytes_out": s.bytes_out,
+                    "phases": {p: h.to_dict() for p, h in s.phases.items()},
+                }
+                for (op, device), s in sorted(self._series.items())
+            ]
+        return {"started_at": self.started_at, "buckets_ms": list(BUCKETS_MS), "series": series}
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式（耗时单位为秒，符合 Prometheus 约定）。"""
+        lines = [
+            "# HELP gui_adb_command_phase_seconds adb 命令各阶段耗时",
+            "# TYPE gui_adb_command_phase_seconds histogram",
+        ]
+        counters = [
+            "# HELP gui_adb_commands_total adb 命令数（按结果）",
+            "# TYPE gui_adb_commands_total counter",
+        ]
+        bytes_lines = [
+            "# HELP gui_adb_command_bytes_total adb 命令收发字节数",
+            "# TYPE gui_adb_command_bytes_total counter",
+        ]
+        with self._lock:
+            for (op, device), s in sorted(self._series.items()):
+                base = f'op="{_escape(op)}",device="{_escape(device)}"'
+                for phase, h in sorted(s.phases.items()):
+                    labels = f'{base},phase="{phase}"'
+                    cumulative = 0
+                    for bound, n in zip(BUCKETS_MS, h.counts):
+                        cumulative += n
+                        lines.append(f'gui_adb_command_phase_seconds_bucket{{{labels},le="{bound / 1000:g}"}} {cumulative}')
+                    lines.append(f'gui_adb_command_phase_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+                    lines.append(f"gui_adb_command_phase_seconds_sum{{{labels}}} {h.sum / 1000:.6f}")
+                    lines.append(f"gui_adb_command_phase_seconds_count{{{labels}}} {h.count}")
+                for outcome, n in sorted(s.outcomes.items()):
+                    counters.append(f'gui_adb_commands_total{{{base},outcome="{outcome}"}} {n}')
+                bytes_lines.append(f'gui_adb_command_bytes_total{{{base},direction="in"}} {s.bytes_in}')
+                bytes_lines.append(f'gui_adb_command_bytes_total{{{base},direction="out"}} {s.bytes_out}')
+        return "\n".join(lines + counters + bytes_lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
+
+
+def enable() -> None:
+    """开始记录（在 adb_helper 上挂记录钩子）。"""
+    adb_helper.set_metrics_hook(_registry.record)
+
+
+def disable() -> None:
+    adb_helper.set_metrics_hook(None)
+
+
+def is_enabled() -> bool:
+    return adb_helper.get_metrics_hook() is not None
+
+
+def export(path: str) -> None:
+    """按扩展名导出：.json 为 JSON，其余为 Prometheus 文本。"""
+    text = (
+        json.dumps(_registry.to_json(), ensure_ascii=False, indent=2)
+        if str(path).lower().endswith(".json") else _registry.to_prometheus()
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+if os.environ.get("GUI_ADB_METRICS", "").strip() not in ("", "0"):
+    enable()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+扫码配对会话：同一个二维码可被多台手机扫描，每台手机（按 IP 区分）各自走
+配对 → 等待连接服务 → 连接 的流水线，互不阻塞，并记录每一步耗时。
+本模块只维护状态，不执行命令；由弹窗为每台手机启动后台任务。
+"""
+
+import time
+from typing import Optional
+
+PAIRING = "pairing"
+WAIT_CONNECT = "wait_connect"
+CONNECTING = "connecting"
+CONNECTED = "connected"
+PAIRED_ONLY = "paired_only"
+FAILED = "failed"
+
+STATE_LABELS = {
+    PAIRING: "配对中",
+    WAIT_CONNECT: "等待连接端口",
+    CONNECTING: "连接中",
+    CONNECTED: "已连接",
+    PAIRED_ONLY: "已配对（未发现连接端口）",
+    FAILED: "失败",
+}
+
+_ACTIVE = (PAIRING, WAIT_CONNECT, CONNECTING)
+
+
+class PairingJob:
+    """一台手机的配对流水线状态。"""
+
+    __slots__ = (
+        "host", "pair_port", "connect_port", "service_name", "connect_name", "state", "message",
+        "started_at", "paired_at", "finished_at",
+    )
+
+    def __init__(self, host: str, pair_port: int, service_name: str = ""):
+        self.host = host
+        self.pair_port = pair_port
+        self.connect_port: Optional[int] = None
+        self.service_name = service_name
+        self.connect_name = ""  # _adb-tls-connect 服务名，登记表据此在 IP 变化后认出设备
+        self.state = PAIRING
+        self.message = ""
+        self.started_at = time.monotonic()
+        self.paired_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.state in _ACTIVE
+
+    @property
+    def pair_seconds(self) -> Optional[float]:
+        return None if self.paired_at is None else self.paired_at - self.started_at
+
+    @property
+    def connect_seconds(self) -> Optional[float]:
+        if self.paired_at is None or self.finished_at is None or self.state != CONNECTED:
+            return None
+        return self.finished_at - self.paired_at
+
+    @property
+    def total_seconds(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    def _finish(self, state: str, message: str = ""):
+        self.state = state
+        self.message = message
+        self.finished_at = time.monotonic()
+
+
+class PairingSession:
+    """
+    一个二维码对应的配对会话。
+    :param max_jobs: 最多接受几台手机；1 为单台模式（旧行为），None 为不限（批量模式）
+    """
+
+    def __init__(self, max_jobs: Optional[int] = 1):
+        self.max_jobs = max_jobs
+        self.jobs: dict[str, PairingJob] = {}
+        # 已发现但尚未用到的连接服务：手机可能先广播连接端口、后完成配对
+        self._connect_ports: dict[str, tuple[int, str]] = {}  # host -> (端口, 服务名)
+
+    def offer_pairing(self, host: str, port: int, service_name: str = "") -> Optional[PairingJob]:
+        """发现配对服务。返回需要启动 adb pair 的新任务；重复广播、已成功或超出上限时返回 None。"""
+        job = self.jobs.get(host)
+        if job is not None and job.state != FAILED:
+            return None
+        if job is None and self.max_jobs is not None and len(self.jobs) >= self.max_jobs:
+            return None
+        job = PairingJob(host, port, service_name)
+        self.jobs[host] = job
+        return job
+
+    def pair_finished(self, host: str, ok: bool, message: str = "") -> Optional[PairingJob]:
+        """adb pair 结束。成功时若已知连接端口，任务直接进入 CONNECTING，调用方据此启动 adb connect。"""
+        job = self.jobs.get(host)
+        if job is None or job.state != PAIRING:
+            return None
+        if not ok:
+            job._finish(FAILED, message or "配对失败")
+            return job
+        job.paired_at = time.monotonic()
+        job.state = WAIT_CONNECT
+        port, name = self._connect_ports.get(host, (0, ""))
+        if port:
+            job.connect_port, job.connect_name = port, name
+            job.state = CONNECTING
+        return job
+
+    def offer_connect(self, host: str, port: int, name: str = "") -> Optional[PairingJob]:
+        """发现连接服务。返回需要启动 adb connect 的任务，否则 None（端口与服务名会被记住备用）。"""
+        self._connect_ports[host] = (port, name)
+        job = self.jobs.get(host)
+        if job is None or job.state != WAIT_CONNECT:
+            return None
+        job.connect_port, job.connect_name = port, name
+        job.state = CONNECTING
+        return job
+
+    def connect_finished(self, host: str, ok: bool, message: str = "") -> Optional[PairingJob]:
+        job = self.jobs.get(host)
+        if job is None or job.state != CONNECTING:
+            return None
+        if ok:
+            job._finish(CONNECTED, message)
+        else:
+            # 配对已保存，仅连接失败：允许之后的连接广播再次触发连接
+            job.state = WAIT_CONNECT
+            job.message = message or "连接失败"
+        return job
+
+    def connect_timeout(self, host: str) -> Optional[PairingJob]:
+        """配对成功后迟迟未发现连接服务。"""
+        job = self.jobs.get(host)
+        if job is None or job.state != WAIT_CONNECT:
+            return None
+        job._finish(PAIRED_ONLY, "请用手动连接填写连接端口")
+        return job
+
+    def active_count(self) -> int:
+        return sum(1 for j in self.jobs.values() if j.active)
+
+    def counts(self) -> dict[str, int]:
+        result: dict[str, int] = {}
+        for job in self.jobs.values():
+            result[job.state] = result.get(job.state, 0) + 1
+        return result
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""性能监控：单次 shell 往返采集 CPU/内存/FPS/电量/温度，定长环形缓冲存储时间序列。"""
+
+import csv
+import time
+from array import array
+from typing import Optional
+
+from adb_helper import run_adb
+from core.shell_sections import SECTION_MARK, section, split_sections
+
+# 图表与 CSV 导出使用的指标及显示名（顺序即导出列顺序）
+METRICS = (
+    ("cpu_total", "整机 CPU %"),
+    ("cpu_app", "应用 CPU %"),
+    ("mem_used_mb", "已用内存 MB"),
+    ("app_rss_mb", "应用 RSS MB"),
+    ("fps", "FPS"),
+    ("jank_pct", "卡顿帧 %"),
+    ("battery_level", "电量 %"),
+    ("battery_temp", "电池温度 ℃"),
+    ("thermal_max", "最高温区 ℃"),
+)
+
+
+class RingBuffer:
+    """定长 float 环形缓冲（array('d') 预分配），写满后覆盖最旧数据，追加为 O(1)。"""
+
+    __slots__ = ("_data", "_capacity", "_start", "_size")
+
+    def __init__(self, capacity: int):
+        self._capacity = max(1, int(capacity))
+        self._data = array("d", bytes(8 * self._capacity))
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def append(self, value: float) -> None:
+        end = (self._start + self._size) % self._capacity
+        self._data[end] = value
+        if self._size < self._capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self._capacity
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
+
+    def values(self) -> list[float]:
+        """按时间顺序返回全部数据。"""
+        end = self._start + self._size
+        if end <= self._capacity:
+            return self._data[self._start:end].tolist()
+        return self._data[self._start:].tolist() + self._data[:end - self._capacity].tolist()
+
+    def last(self, default: float = float("nan")) -> float:
+        if not self._size:
+            return default
+        return self._data[(self._start + self._size - 1) % self._capacity]
+
+
+def downsample(values: list[float], width: int) -> list[tuple[float, float]]:
+    """
+    将序列按屏幕宽度分桶降采样，每桶保留 (min, max)，尖峰不会被平均掉。
+    :param values: 原始序列（NaN 视为缺失）
+    :param width: 目标桶数，通常为图表像素宽度
+    :return: [(min, max), ...]，长度不超过 width；全为缺失的桶为 (nan, nan)
+    """
+    n = len(values)
+    if n == 0 or width <= 0:
+        return []
+    nan = float("nan")
+    if n <= width:
+        return [(v, v) for v in values]
+    buckets = []
+    step = n / width
+    for i in range(width):
+        lo = int(i * step)
+        hi = max(lo + 1, int((i + 1) * step))
+        chunk = [v for v in values[lo:hi] if v == v]
+        buckets.append((min(chunk), max(chunk)) if chunk else (nan, nan))
+    return buckets
+
+
+def build_sample_command(package: str = "") -> str:
+    """
+    拼出一次采样所需的完整 shell 脚本：所有指标在同一次 adb shell 往返中读取。
+    package 为空时不采集进程与帧数据。
+    """
+    parts = [
+        f"{section('stat')}; head -n 1 /proc/stat",
+        f"{section('meminfo')}; cat /proc/meminfo",
+        f"{section('battery')}; cat /sys/class/power_supply/battery/capacity "
+        "/sys/class/power_supply/battery/temp 2>/dev/null",
+        f"{section('thermal')}; cat /sys/class/thermal/thermal_zone*/temp 2>/dev/null",
+    ]
+    if package:
+        parts += [
+            f"pid=$(pidof {package} | cut -d ' ' -f 1)",
+            f"{section('pidstat')}; [ -n \"$pid\" ] && cat /proc/$pid/stat",
+            f"{section('gfxinfo')}; dumpsys gfxinfo {package} | head -n 40",
+        ]
+    parts.append(section("end"))
+    return "; ".join(parts)
+
+
+def _parse_cpu_line(text: str) -> Optional[tuple[int, int]]:
+    """解析 /proc/stat 首行，返回 (总 jiffies, 空闲 jiffies)。"""
+    fields = text.split()
+    if len(fields) < 5 or fields[0] != "cpu":
+        return None
+    nums = [int(x) for x in fields[1:] if x.isdigit()]
+    idle = nums[3] + (nums[4] if len(nums) > 4 else 0)  # idle + iowait
+    return sum(nums), idle
+
+
+def _parse_meminfo(text: str) -> dict[str, int]:
+    """解析 /proc/meminfo，返回 {键: kB}。"""
+    mem = {}
+    for line in text.splitlines():
+        key, _, rest = line.partition(":")
+        value = rest.split()
+        if value and value[0].isdigit():
+            mem[key.strip()] = int(value[0])
+    return mem
+
+
+def _parse_pid_stat(text: str) -> Optional[tuple[int, int]]:
+    """解析 /proc/<pid>/stat，返回 (utime+stime jiffies, rss 页数)。进程名可含空格，从右括号后切分。"""
+    _, sep, rest = text.rpartition(")")
+    if not sep:
+        return None
+    fields = rest.split()
+    # rest 从 state(第 3 列) 开始：utime=14, stime=15, rss=24（1 起计）
+    if len(fields) < 22:
+        return None
+    try:
+        return int(fields[11]) + int(fields[12]), int(fields[21])
+    except ValueError:
+        return None
+
+
+def _parse_gfxinfo(text: str) -> Optional[tuple[int, int]]:
+    """解析 dumpsys gfxinfo，返回 (累计渲染帧数, 累计卡顿帧数)。"""
+    total = janky = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("Total frames rendered:"):
+            total = int(line.split(":", 1)[1].split()[0])
+        elif line.startswith("Janky frames:"):
+            janky = int(line.split(":", 1)[1].split()[0])
+    if total is None:
+        return None
+    return total, janky or 0
+
+
+def _to_celsius(raw: str) -> Optional[float]:
+    """温度节点单位不统一：电池为 0.1℃，温区多为 m℃，个别设备直接是 ℃。"""
+    try:
+        v = float(raw)
+    except ValueError:
+        return None
+    if abs(v) >= 1000:
+        return v / 1000.0
+    if abs(v) >= 200:
+        return v / 10.0
+    return v
+
+
+class PerfSampler:
+    """
+    保存上一次原始计数，把累计值（jiffies、帧数）换算成区间速率。
+    每次 sample() 只发起一次 adb shell 往返。
+    """
+
+    def __init__(self, device: str, package: str = ""):
+        self.device = device
+        self.package = package.strip()
+        self._command = build_sample_command(self.package)
+        self._prev_cpu: Optional[tuple[int, int]] = None
+        self._prev_proc: Optional[int] = None
+        self._prev_frames: Optional[tuple[int, int]] = None
+        self._prev_time: Optional[float] = None
+        self._page_kb = 4  # Android 上几乎都是 4K 页
+
+    def sample(self, timeout: int = 10) -> tuple[Optional[dict], str]:
+        """采一个点，返回 (指标字典, 错误信息)；首次采样没有区间值，对应指标为 NaN。"""
+        code, out, err = run_adb("shell", self._command, device=self.device, timeout=timeout)
+        now = time.time()
+        if code != 0 or SECTION_MARK not in out:
+            return None, err.strip() or out.strip() or "采样失败"
+        return self.parse(out, now), ""
+
+    def parse(self, out: str, now: float) -> dict:
+        nan = float("nan")
+        sections = split_sections(out)
+        metrics = {key: nan for key, _ in METRICS}
+        metrics["time"] = now
+
+        cpu = _parse_cpu_line(sections.get("stat", ""))
+        if cpu and self._prev_cpu:
+            d_total = cpu[0] - self._prev_cpu[0]
+            d_idle = cpu[1] - self._prev_cpu[1]
+            if d_total > 0:
+                metrics["cpu_total"] = 100.0 * (d_total - d_idle) / d_total
+
+        mem = _parse_meminfo(sections.get("meminfo", ""))
+        if "MemTotal" in mem:
+            avail = mem.get("MemAvailable", mem.get("MemFree", 0))
+            metrics["mem_used_mb"] = (mem["MemTotal"] - avail) / 1024.0
+
+        proc = _parse_pid_stat(sections.get("pidstat", ""))
+        if proc:
+            metrics["app_rss_mb"] = proc[1] * self._page_kb / 1024.0
+            if self._prev_proc is not None and cpu and self._prev_cpu:
+                d_total = cpu[0] - self._prev_cpu[0]
+                if d_total > 0:
+                    # /proc/stat 为全核累计，进程占用按整机比例换算
+                    metrics["cpu_app"] = 100.0 * max(0, proc[0] - self._prev_proc) / d_total
+        self._prev_proc = proc[0] if proc else None
+
+        frames = _parse_gfxinfo(sections.get("gfxinfo", ""))
+        if frames and self._prev_frames and self._prev_time is not None:
+            d_frames = frames[0] - self._prev_frames[0]
+            dt = now - self._prev_time
+            if d_frames >= 0 and dt > 0:
+                metrics["fps"] = d_frames / dt
+                if d_frames:
+                    metrics["jank_pct"] = 100.0 * max(0, frames[1] - self._prev_frames[1]) / d_frames
+        self._prev_frames = frames
+
+        battery = sections.get("battery", "").split()
+        if battery and battery[0].isdigit():
+            metrics["battery_level"] = float(battery[0])
+        if len(battery) > 1:
+            t = _to_celsius(battery[1])
+            if t is not None:
+                metrics["battery_temp"] = t
+
+        temps = [t for t in (_to_celsius(x) for x in sections.get("thermal", "").split()) if t is not None]
+        if temps:
+            metrics["thermal_max"] = max(temps)
+
+        self._prev_cpu = cpu
+        self._prev_time = now
+        return metrics
+
+
+class PerfSession:
+    """一次监控会话：每个指标一个定长环形缓冲，可导出 CSV。"""
+
+    def __init__(self, capacity: int = 3600):
+        self.capacity = capacity
+        self.times = RingBuffer(capacity)
+        self.series = {key: RingBuffer(capacity) for key, _ in METRICS}
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, metrics: dict) -> None:
+        nan = float("nan")
+        self.times.append(metrics.get("time", time.time()))
+        for key, buf in self.series.items():
+            buf.append(metrics.get(key, nan))
+
+    def clear(self) -> None:
+        self.times.clear()
+        for buf in self.series.values():
+            buf.clear()
+
+    def export_csv(self, path: str) -> int:
+        """导出为 CSV（缺失值留空），返回写入行数。"""
+        times = self.times.values()
+        columns = [self.series[key].values() for key, _ in METRICS]
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time"] + [key for key, _ in METRICS])
+            for i, t in enumerate(times):
+                row = [time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)) + f".{int(t * 1000) % 1000:03d}"]
+                for col in columns:
+                    v = col[i]
+                    row.append("" if v != v else f"{v:.2f}")
+                writer.writerow(row)
+        return len(times)
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+界面线程卡顿监控与性能剖析（按会话开启，默认关闭）。
+
+StallWatchdog：界面线程上的定时器周期性调用 heartbeat()，后台线程检查心跳间隔——
+超过阈值说明事件循环被某个处理函数阻塞，此时持续采样界面线程的调用栈，
+卡顿结束后记为一次卡顿事件（时长 + 采样到的栈）。同时统计定时器的延迟分布（事件循环延迟）。
+
+ProfilingSession：由环境变量开启，可同时启用卡顿监控、cProfile（界面线程）与 tracemalloc，
+退出时把报告写到数据目录 profiles/ 下，便于附在问题反馈里：
+
+    GUI_ADB_PROFILE=1                      只开卡顿监控
+    GUI_ADB_PROFILE=watchdog,cprofile,tracemalloc   （或 all）
+    GUI_ADB_STALL_MS=200                   卡顿阈值（毫秒）
+"""
+
+import io
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from core.metrics import Histogram
+from core.storage import app_data_dir
+
+DEFAULT_THRESHOLD_MS = 200
+HEARTBEAT_INTERVAL_MS = 50
+_MAX_EVENTS = 200
+_STACK_DEPTH = 30
+_STDLIB = sysconfig.get_paths()["stdlib"]
+
+
+class StallEvent:
+    __slots__ = ("started_at", "duration_ms", "samples")
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.duration_ms = 0.0
+        self.samples: Counter = Counter()  # 栈（帧元组）-> 采样次数
+
+    def top_stack(self) -> tuple:
+        return self.samples.most_common(1)[0][0] if self.samples else ()
+
+
+def _format_frame(frame: tuple) -> str:
+    filename, lineno, name = frame
+    return f"{_short_path(filename)}:{lineno} {name}"
+
+
+def _short_path(filename: str) -> str:
+    """项目内文件显示相对路径，库文件只显示文件名之后的部分，报告更易读。"""
+    root = str(Path(__file__).resolve().parent.parent)
+    if filename.startswith(root):
+        return os.path.relpath(filename, root)
+    parts = Path(filename).parts
+    return os.path.join(*parts[-2:]) if len(parts) >= 2 else filename
+
+
+def _is_library(filename: str) -> bool:
+    return filename.startswith(("<", _STDLIB)) or "site-packages" in filename
+
+
+def _blame(stack: tuple) -> str:
+    """栈中最内层的项目代码帧（跳过标准库与第三方库），没有则取栈顶。"""
+    project = [f for f in stack if not _is_library(f[0])]
+    return _format_frame((project or stack)[-1]) if stack else "?"
+
+
+class StallWatchdog:
+    """
+    :param threshold_ms: 心跳间隔超过该值判为卡顿
+    :param sample_interval_ms: 卡顿期间采样调用栈的间隔
+    :param thread_id: 被监控的线程（默认创建本对象的线程，即界面线程）
+    :param interval_ms: 心跳定时器的间隔，用于计算事件循环延迟
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = DEFAULT_THRESHOLD_MS,
+        sample_interval_ms: float = 20,
+        thread_id: Optional[int] = None,
+        interval_ms: float = HEARTBEAT_INTERVAL_MS,
+    ):
+        self.threshold = threshold_ms / 1000
+        self.sample_interval = sample_interval_ms / 1000
+        self.interval = interval_ms / 1000
+        self.thread_id = thread_id or threading.get_ident()
+        self.latency = Histogram()  # 心跳比预期晚到的毫秒数
+        self.events: list[StallEvent] = []
+        self.total_stalls = 0
+        self._lock = threading.Lock()
+        self._last = time.monotonic()
+        self._current: Optional[StallEvent] = None
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def heartbeat(self) -> None:
+        """由界面线程的定时器调用。"""
+        now = time.monotonic()
+        with self._lock:
+            self.latency.observe(max(0.0, now - self._last - self.interval) * 1000)
+            self._last = now
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._last = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="stall-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread:
+            self._thread.join(1)
+            self._thread = None
+        self._finish_current(time.monotonic())
+
+    def _run(self):
+        while self._running:
+            time.sleep(self.sample_interval)
+            now = time.monotonic()
+            with self._lock:
+                last = self._last
+            if now - last >= self.threshold:
+                if self._current is None:
+                    self._current = StallEvent(time.time() - (now - last))
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is not None:
+                    stack = tuple(
+                        (f.filename, f.lineno, f.name)
+                        for f in traceback.extract_stack(frame, limit=_STACK_DEPTH)
+                    )
+                    self._current.samples[stack] += 1
+                self._current.duration_ms = (now - last) * 1000
+            elif self._current is not None:
+                self._finish_current(now)
+
+    def _finish_current(self, now: float):
+        event, self._current = self._current, None
+        if event is None:
+            return
+        self.total_stalls += 1
+        if len(self.events) < _MAX_EVENTS:
+            self.events.append(event)
+        print(f"[GUI-ADB] 界面卡顿 {event.duration_ms:.0f}ms：{_blame(event.top_stack())}", file=sys.stderr, flush=True)
+
+    def report(self) -> str:
+        out = io.StringIO()
+        lat = self.latency
+        out.write("== 事件循环延迟 ==\n")
+        out.write(
+            f"心跳 {lat.count} 次，延迟 P50 {lat.quantile(0.5):.1f}ms，P95 {lat.quantile(0.95):.1f}ms，"
+            f"最大 {lat.max:.1f}ms\n\n"
+        )
+        out.write(f"== 界面卡顿（阈值 {self.threshold * 1000:.0f}ms）：共 {self.total_stalls} 次 ==\n")
+        # 汇总所有卡顿中采样最多的项目代码位置，最先看到最该修的地方
+        hot: Counter = Counter()
+        for event in self.events:
+            for stack, n in event.samples.items():
+                hot[_blame(stack)] += n
+        if hot:
+            out.write("采样最多的位置（次数）：\n")
+            for where, n in hot.most_common(15):
+                out.write(f"  {n:6d}  {where}\n")
+        for i, event in enumerate(sorted(self.events, key=lambda e: -e.duration_ms)[:20], 1):
+            stamp = time.strftime("%H:%M:%S", time.localtime(event.started_at))
+            out.write(f"\n-- #{i} {stamp} 持续 {event.duration_ms:.0f}ms，采样 {sum(event.samples.values())} 次\n")
+            for frame in event.top_stack():
+                out.write(f"    {_format_frame(frame)}\n")
+        return out.getvalue()
+
+
+class ProfilingSession:
+    """一次运行期间的剖析会话；features 为 {"watchdog", "cprofile", "tracemalloc"} 的子集。"""
+
+    def __init__(self, features: set[str], threshold_ms: float = DEFAULT_THRESHOLD_MS):
+        self.features = features
+        self.started_at = time.time()
+        self.watchdog = StallWatchdog(threshold_ms) if "watchdog" in features else None
+        self._profiler = None
+        self._tracemalloc_start = None
+        self._stopping = False
+
+    @classmethod
+    def from_env(cls) -> Optional["ProfilingSession"]:
+        value = os.environ.get("GUI_ADB_PROFILE", "").strip().lower()
+        if value in ("", "0", "false", "no"):
+            return None
+        if value in ("1", "true", "yes", "on"):
+            features = {"watchdog"}
+        elif value == "all":
+            features = {"watchdog", "cprofile", "tracemalloc"}
+        else:
+            features = {f.strip() for f in value.split(",") if f.strip()} & {"watchdog", "cprofile", "tracemalloc"}
+        threshold = os.environ.get("GUI_ADB_STALL_MS", "")
+        return cls(features, float(threshold) if threshold.isdigit() else DEFAULT_THRESHOLD_MS) if features else None
+
+    def start(self) -> None:
+        """在界面线程调用（cProfile 只剖析调用 start 的线程）。"""
+        if self.watchdog:
+            self.watchdog.start()
+        if "tracemalloc" in self.features:
+            import tracemalloc
+            tracemalloc.start(25)
+            self._tracemalloc_start = tracemalloc.take_snapshot()
+        if "cprofile" in self.features:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def write_report(self, directory: Optional[Path] = None) -> Path:
+        """写出当前报告（可在运行中多次调用）；开启 cProfile 时另存 .prof 原始数据。返回报告路径。"""
+        directory = Path(directory) if directory else app_data_dir() / "profiles"
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = time.strftime("session-%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        out = io.StringIO()
+        out.write(f"GUI-ADB 剖析报告  开始 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at))}，")
+        out.write(f"时长 {time.time() - self.started_at:.0f}s，功能 {', '.join(sorted(self.features))}\n")
+        out.write(f"Python {sys.version.split()[0]}，{sys.platform}\n\n")
+        if self.watchdog:
+            out.write(self.watchdog.report())
+            out.write("\n")
+        if self._profiler is not None:
+            self._profiler.disable()
+            import pstats
+            prof_path = directory / f"{stem}.prof"
+            self._profiler.dump_stats(str(prof_path))
+            out.write(f"== cProfile（界面线程，按累计耗时前 40，原始数据 {prof_path.name}）==\n")
+            stats_text = io.StringIO()
+            pstats.Stats(self._profiler, stream=stats_text).sort_stats("cumulative").print_stats(40)
+            out.write(stats_text.getvalue())
+            if not self._stopping:
+                self._profiler.enable()
+        if self._tracemalloc_start is not None:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            out.write(f"\n== tracemalloc：当前 {current / 1e6:.1f}MB，峰值 {peak / 1e6:.1f}MB ==\n")
+            out.write("相对会话开始增长最多的位置：\n")
+            for stat in snapshot.compare_to(self._tracemalloc_start, "lineno")[:25]:
+                out.write(f"  {stat}\n")
+        path = directory / f"{stem}.txt"
+        path.write_text(out.getvalue(), encoding="utf-8")
+        return path
+
+    def stop(self) -> Optional[Path]:
+        """停止并写出最终报告。"""
+        self._stopping = True
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self.watchdog:
+            self.watchdog.stop()
+        try:
+            path = self.write_report()
+        except OSError:
+            path = None
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler = None
+        if self._tracemalloc_start is not None:
+            import tracemalloc
+            tracemalloc.stop()
+            self._tracemalloc_start = None
+        return path
+
+
+_session: Optional[ProfilingSession] = None
+
+
+def get_session() -> Optional[ProfilingSession]:
+    """当前进程的剖析会话（未开启时为 None）。"""
+    return _session
+
+
+def set_session(session: Optional[ProfilingSession]) -> None:
+    global _session
+    _session = session
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+按设备排队的任务调度：同一台设备上的操作按提交顺序依次执行（默认每台同时 1 个），
+不同设备之间在共享线程池中并发。界面、控制接口等所有入口共用一个调度器，
+避免两边同时对一台设备安装/推送互相干扰。
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class _DeviceQueue:
+    __slots__ = ("pending", "running")
+
+    def __init__(self):
+        self.pending: deque = deque()
+        self.running = 0
+
+
+class DeviceScheduler:
+    """
+    :param max_workers: 共享线程池大小（所有设备合计的最大并发）
+    :param per_device: 每台设备同时执行的任务数
+    """
+
+    def __init__(self, max_workers: int = 32, per_device: int = 1):
+        self._per_device = max(1, per_device)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="device-sched")
+        self._lock = threading.Lock()
+        self._queues: dict[str, _DeviceQueue] = {}
+
+    def submit(self, device: Optional[str], func: Callable, *args, **kwargs) -> Future:
+        """
+        提交任务，返回 Future。device 为空的任务（如 adb devices、connect）不排队，直接进线程池。
+        """
+        if not device:
+            return self._pool.submit(func, *args, **kwargs)
+        future: Future = Future()
+        with self._lock:
+            queue = self._queues.setdefault(device, _DeviceQueue())
+            queue.pending.append((future, func, args, kwargs))
+            self._dispatch(device, queue)
+        return future
+
+    def run(self, device: Optional[str], func: Callable, *args, **kwargs):
+        """提交并等待结果（在后台线程中使用，如 Worker）。"""
+        return self.submit(device, func, *args, **kwargs).result()
+
+    def queued(self, device: str) -> int:
+        """某设备正在执行与等待中的任务数。"""
+        with self._lock:
+            queue = self._queues.get(device)
+            return 0 if queue is None else queue.running + len(queue.pending)
+
+    def _dispatch(self, device: str, queue: _DeviceQueue):
+        # 调用方持有 _lock
+        while queue.running < self._per_device and queue.pending:
+            future, func, args, kwargs = queue.pending.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue  # 排队期间已被取消
+            queue.running += 1
+            self._pool.submit(self._execute, device, future, func, args, kwargs)
+        if not queue.running and not queue.pending:
+            self._queues.pop(device, None)
+
+    def _execute(self, device: str, future: Future, func, args, kwargs):
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                queue = self._queues.get(device)
+                if queue is not None:
+                    queue.running -= 1
+                    self._dispatch(device, queue)
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            for queue in self._queues.values():
+                for future, *_ in queue.pending:
+                    future.cancel()
+            self._queues.clear()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_instance: Optional[DeviceScheduler] = None
+_instance_lock = threading.Lock()
+
+
+def get_scheduler() -> DeviceScheduler:
+    """进程内共享的设备调度器。"""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = DeviceScheduler()
+        return _instance
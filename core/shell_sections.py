@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+一次 shell 往返取多段输出：脚本中每段前 echo 一个分隔标记加段名，返回后按标记拆开。
+性能采样、设备元数据与设备墙行信息共用。
+"""
+
+SECTION_MARK = "@@GUIADB@@"
+
+
+def section(name: str) -> str:
+    """段开头的 shell 片段，如 section("getprop") + "; getprop"。"""
+    return f"echo {SECTION_MARK}{name}"
+
+
+def split_sections(out: str) -> dict[str, str]:
+    """按分隔标记把输出拆成 {段名: 文本}。"""
+    sections: dict[str, str] = {}
+    for chunk in out.split(SECTION_MARK)[1:]:
+        name, _, body = chunk.partition("\n")
+        sections[name.strip()] = body
+    return sections
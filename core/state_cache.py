@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+跨会话的本地状态缓存（SQLite，位于数据目录 state_cache.sqlite3）：上次在线的设备、最近浏览的目录列表、
+应用包列表。启动时先用缓存渲染，再在后台重新获取并回写。
+
+目录列表与包列表按 (序列号, 构建指纹) 归属：设备指纹变化（刷机、系统更新）时该设备的缓存全部作废。
+总大小超过上限时按最近使用时间淘汰；长期未出现的设备连同其缓存一并清除。
+缓存只是加速手段，读写失败一律当作未命中，不影响正常流程。
+
+环境变量：GUI_ADB_CACHE=0 关闭缓存；GUI_ADB_CACHE_MB 设置大小上限（默认 32 MB）。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from adb_helper import PARENT_ENTRY, DirEntry, get_installed_packages, list_device_path, run_adb
+from core.storage import app_data_dir
+
+_DB_NAME = "state_cache.sqlite3"
+_SCHEMA_VERSION = 1
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_MAX_DEVICES = 200
+DEFAULT_DEVICE_TTL = 30 * 24 * 3600  # 超过 30 天未出现的设备清除
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    serial TEXT PRIMARY KEY,
+    server TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    fingerprint TEXT NOT NULL DEFAULT '',
+    online INTEGER NOT NULL DEFAULT 0,
+    seen_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listings (
+    serial TEXT NOT NULL,
+    path TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (serial, path)
+);
+CREATE TABLE IF NOT EXISTS packages (
+    serial TEXT NOT NULL,
+    include_system INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (serial, include_system)
+);
+"""
+
+
+class StateCache:
+    """
+    线程安全：单个连接，所有操作持锁执行（语句都很短，界面线程直接读也只需几毫秒）。
+    path 为 None 时使用内存数据库（不落盘）。
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_devices: int = DEFAULT_MAX_DEVICES,
+        device_ttl: float = DEFAULT_DEVICE_TTL,
+    ):
+        self.path = Path(path) if path is not None else None
+        self.max_bytes = max_bytes
+        self.max_devices = max_devices
+        self.device_ttl = device_ttl
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._checked: set[str] = set()  # 本次运行已核对过指纹（且之后一直在线）的设备
+        self._lock_checked = threading.Lock()
+        try:
+            self._conn = self._open()
+        except sqlite3.DatabaseError:
+            # 文件损坏或版本不兼容：缓存可丢弃，删掉重建
+            self._discard_file()
+            try:
+                self._conn = self._open()
+            except sqlite3.Error:
+                self._conn = None
+
+    def _open(self) -> sqlite3.Connection:
+        target = str(self.path) if self.path is not None else ":memory:"
+        conn = sqlite3.connect(target, check_same_thread=False, isolation_level=None)
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] not in (0, _SCHEMA_VERSION):
+                raise sqlite3.DatabaseError("schema version mismatch")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def _discard_file(self) -> None:
+        if self.path is None:
+            return
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.unlink(f"{self.path}{suffix}")
+            except OSError:
+                pass
+
+    def _run(self, func: Callable[[sqlite3.Connection], Any], default: Any = None) -> Any:
+        """持锁执行；数据库不可用或出错时返回 default。写操作在一个事务里完成。"""
+        with self._lock:
+            if self._conn is None:
+                return default
+            try:
+                with self._conn:
+                    self._conn.execute("BEGIN")
+                    return func(self._conn)
+            except sqlite3.Error:
+                return default
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---------- 设备 ----------
+
+    def last_devices(self) -> list[dict]:
+        """上次刷新时在线的设备（格式同 get_devices()，另带 "cached": True），按序列号排序。"""
+        rows = self._run(
+            lambda c: c.execute(
+                "SELECT serial, server, model FROM devices WHERE online = 1 ORDER BY serial"
+            ).fetchall(),
+            [],
+        )
+        return [
+            {"serial": s, "status": "device", "model": m, "server": srv, "metadata": None, "cached": True}
+            for s, srv, m in rows
+        ]
+
+    def record_devices(self, devices: list[dict]) -> None:
+        """
+        记录本次在线的设备（其余标为离线），并清理长期未出现的设备。
+        重新上线的设备（可能刚经历重启或系统更新）需要再核对一次指纹。
+        """
+        now = time.time()
+
+        def write(c: sqlite3.Connection) -> None:
+            was_online = {s for (s,) in c.execute("SELECT serial FROM devices WHERE online = 1")}
+            with self._lock_checked:
+                self._checked.difference_update(d["serial"] for d in devices if d["serial"] not in was_online)
+            c.execute("UPDATE devices SET online = 0")
+            for d in devices:
+                md = d.get("metadata")
+                c.execute(
+                    "INSERT INTO devices (serial, server, model, fingerprint, online, seen_at) VALUES (?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT(serial) DO UPDATE SET server = excluded.server, model = excluded.model, "
+                    "online = 1, seen_at = excluded.seen_at",
+                    (d["serial"], d.get("server") or "", d.get("model") or "", md.fingerprint if md else "", now),
+                )
+            self._prune_devices(c, now)
+
+        self._run(write)
+
+    def needs_check(self, serial: str) -> bool:
+        """本次运行是否还未核对过该设备的指纹。"""
+        with self._lock_checked:
+            return serial not in self._checked
+
+    def check_fingerprint(self, serial: str, fingerprint: str) -> bool:
+        """
+        用设备当前的构建指纹核对缓存；与记录不一致时清掉该设备的目录与包列表缓存。
+        :return: 缓存仍然有效返回 True
+        """
+        fingerprint = fingerprint.strip()
+        if not fingerprint:
+            return True
+        with self._lock_checked:
+            self._checked.add(serial)
+
+        def write(c: sqlite3.Connection) -> bool:
+            row = c.execute("SELECT fingerprint FROM devices WHERE serial = ?", (serial,)).fetchone()
+            if row is not None and row[0] == fingerprint:
+                return True
+            if row is None:
+                c.execute(
+                    "INSERT INTO devices (serial, fingerprint, seen_at) VALUES (?, ?, ?)", (serial, fingerprint, time.time())
+                )
+            else:
+                c.execute("UPDATE devices SET fingerprint = ? WHERE serial = ?", (fingerprint, serial))
+            for table in ("listings", "packages"):
+                if row is not None and not row[0]:
+                    # 指纹此前未知（首次核对前写入的条目），归到当前指纹
+                    c.execute(f"UPDATE {table} SET fingerprint = ? WHERE serial = ? AND fingerprint = ''", (fingerprint, serial))
+                c.execute(f"DELETE FROM {table} WHERE serial = ? AND fingerprint != ?", (serial, fingerprint))
+            return row is None or not row[0]
+
+        return self._run(write, True)
+
+    # ---------- 目录列表 ----------
+
+    def get_listing(self, serial: str, path: str) -> Optional[tuple[list[DirEntry], float]]:
+        """缓存的目录列表及其获取时间；未命中返回 None。"""
+        row = self._touch(
+            "SELECT l.data, l.fetched_at FROM listings l JOIN devices d ON d.serial = l.serial "
+            "WHERE l.serial = ? AND l.path = ? AND l.fingerprint = d.fingerprint",
+            "UPDATE listings SET used_at = ? WHERE serial = ? AND path = ?",
+            (serial, path),
+        )
+        if row is None:
+            return None
+        try:
+            entries = [
+                PARENT_ENTRY if name == ".." else DirEntry(name, bool(is_dir), target)
+                for name, is_dir, target in json.loads(row[0])
+            ]
+            return entries, row[1]
+        except (ValueError, TypeError):
+            return None
+
+    def put_listing(self, serial: str, path: str, entries: list[DirEntry]) -> None:
+        data = json.dumps([[e.name, int(e.is_dir), e.target] for e in entries], ensure_ascii=False, separators=(",", ":"))
+        self._put("listings", "path", serial, path, data)
+
+    # ---------- 包列表 ----------
+
+    def get_packages(self, serial: str, include_system: bool = False) -> Optional[tuple[list[str], float]]:
+        """缓存的包名列表（已排序）及其获取时间；未命中返回 None。"""
+        row = self._touch(
+            "SELECT p.data, p.fetched_at FROM packages p JOIN devices d ON d.serial = p.serial "
+            "WHERE p.serial = ? AND p.include_system = ? AND p.fingerprint = d.fingerprint",
+            "UPDATE packages SET used_at = ? WHERE serial = ? AND include_system = ?",
+            (serial, int(include_system)),
+        )
+        if row is None:
+            return None
+        return [p for p in row[0].split("\n") if p], row[1]
+
+    def put_packages(self, serial: str, include_system: bool, packages: list[str]) -> None:
+        self._put("packages", "include_system", serial, int(include_system), "\n".join(packages))
+
+    # ---------- 公共 ----------
+
+    def _touch(self, select: str, update: str, key: tuple) -> Optional[tuple]:
+        def read(c: sqlite3.Connection) -> Optional[tuple]:
+            row = c.execute(select, key).fetchone()
+            if row is not None:
+                c.execute(update, (time.time(), *key))
+            return row
+
+        return self._run(read)
+
+    def _put(self, table: str, key_column: str, serial: str, key: Any, data: str) -> None:
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes // 4:
+            return  # 单条过大（如数十万文件的目录）不值得占用缓存
+        now = time.time()
+
+        def write(c: sqlite3.Connection) -> None:
+            # 指纹取设备记录里的；设备未记录时先建一条（指纹未知，核对时再补上）
+            c.execute("INSERT OR IGNORE INTO devices (serial, seen_at) VALUES (?, ?)", (serial, now))
+            fingerprint = c.execute("SELECT fingerprint FROM devices WHERE serial = ?", (serial,)).fetchone()[0]
+            c.execute(
+                f"INSERT OR REPLACE INTO {table} (serial, {key_column}, fingerprint, data, size, fetched_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (serial, key, fingerprint, data, size, now, now),
+            )
+            self._evict(c)
+
+        self._run(write)
+
+    def _evict(self, c: sqlite3.Connection) -> None:
+        """总大小超过上限时，按最近使用时间从旧到新淘汰目录与包列表。"""
+        total = c.execute(
+            "SELECT (SELECT IFNULL(SUM(size), 0) FROM listings) + (SELECT IFNULL(SUM(size), 0) FROM packages)"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = c.execute(
+            "SELECT 'listings', rowid, size, used_at FROM listings "
+            "UNION ALL SELECT 'packages', rowid, size, used_at FROM packages ORDER BY 4"
+        ).fetchall()
+        for table, rowid, size, _ in rows:
+            if total <= self.max_bytes:
+                break
+            c.execute(f"DELETE FROM {table} WHERE rowid = ?", (rowid,))
+            total -= size
+
+    def _prune_devices(self, c: sqlite3.Connection, now: float) -> None:
+        stale = [s for (s,) in c.execute("SELECT serial FROM devices WHERE seen_at < ?", (now - self.device_ttl,))]
+        stale += [
+            s for (s,) in c.execute(
+                "SELECT serial FROM devices ORDER BY seen_at DESC LIMIT -1 OFFSET ?", (self.max_devices,)
+            )
+        ]
+        for serial in set(stale):
+            self._delete_device(c, serial)
+
+    @staticmethod
+    def _delete_device(c: sqlite3.Connection, serial: str) -> None:
+        for table in ("listings", "packages", "devices"):
+            c.execute(f"DELETE FROM {table} WHERE serial = ?", (serial,))
+
+    def invalidate(self, serial: str) -> None:
+        """清掉某台设备的全部缓存（设备记录保留）。"""
+        def write(c: sqlite3.Connection) -> None:
+            for table in ("listings", "packages"):
+                c.execute(f"DELETE FROM {table} WHERE serial = ?", (serial,))
+
+        self._run(write)
+
+    def clear(self) -> None:
+        def write(c: sqlite3.Connection) -> None:
+            for table in ("listings", "packages", "devices"):
+                c.execute(f"DELETE FROM {table}")
+
+        self._run(write)
+        with self._lock_checked:
+            self._checked.clear()
+
+    def stats(self) -> dict:
+        """各表条目数与缓存数据总字节数（诊断用）。"""
+        def read(c: sqlite3.Connection) -> dict:
+            result = {t: c.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("devices", "listings", "packages")}
+            result["bytes"] = c.execute(
+                "SELECT (SELECT IFNULL(SUM(size), 0) FROM listings) + (SELECT IFNULL(SUM(size), 0) FROM packages)"
+            ).fetchone()[0]
+            result["max_bytes"] = self.max_bytes
+            return result
+
+        return self._run(read, {})
+
+
+# ---------- 先取缓存、后台回写 ----------
+
+
+def fetch_listing(device: str, path: str) -> tuple[list[DirEntry], Optional[str]]:
+    """同 list_device_path，成功时回写缓存。"""
+    path = path.strip().rstrip("/") or "/"
+    entries, err = list_device_path(device, path)
+    cache = get_state_cache()
+    if err is None and cache is not None:
+        cache.put_listing(device, path, entries)
+    return entries, err
+
+
+def fetch_packages(device: str, include_system: bool = False) -> tuple[int, str, str]:
+    """同 get_installed_packages，成功时回写缓存。"""
+    code, out, err = get_installed_packages(device, include_system)
+    cache = get_state_cache()
+    if code == 0 and cache is not None:
+        cache.put_packages(device, include_system, [p for p in out.split("\n") if p])
+    return code, out, err
+
+
+def revalidate_devices(devices: list[dict]) -> None:
+    """
+    记录本次在线的设备；本次运行尚未核对过的设备取一次构建指纹（已缓存元数据时直接用，否则 getprop），
+    指纹变化时作废该设备的缓存。在后台线程调用。
+    """
+    cache = get_state_cache()
+    if cache is None:
+        return
+    cache.record_devices(devices)
+    pending = [d for d in devices if cache.needs_check(d["serial"])]
+    if not pending:
+        return
+
+    def check(d: dict) -> None:
+        md = d.get("metadata")
+        if md is not None and md.fingerprint:
+            fingerprint = md.fingerprint
+        else:
+            code, out, _ = run_adb("shell", "getprop", "ro.build.fingerprint", device=d["serial"], timeout=10)
+            if code != 0:
+                return
+            fingerprint = out
+        cache.check_fingerprint(d["serial"], fingerprint)
+
+    with ThreadPoolExecutor(max_workers=min(8, len(pending))) as pool:
+        list(pool.map(check, pending))
+
+
+_cache: Optional[StateCache] = None
+_cache_lock = threading.Lock()
+_cache_opened = False
+
+
+def get_state_cache() -> Optional[StateCache]:
+    """进程内共享的状态缓存；GUI_ADB_CACHE=0 时返回 None。"""
+    global _cache, _cache_opened
+    with _cache_lock:
+        if not _cache_opened:
+            _cache_opened = True
+            if os.environ.get("GUI_ADB_CACHE", "").strip() != "0":
+                try:
+                    max_bytes = int(float(os.environ.get("GUI_ADB_CACHE_MB", "")) * 1024 * 1024)
+                except ValueError:
+                    max_bytes = DEFAULT_MAX_BYTES
+                _cache = StateCache(app_data_dir() / _DB_NAME, max_bytes=max_bytes)
+        return _cache
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""本地持久化：应用数据目录与 JSON 文件的原子读写。"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+
+_APP_DIR_NAME = "GUI-ADB"
+
+
+def app_data_dir() -> Path:
+    """
+    应用数据目录：可用环境变量 GUI_ADB_DATA_DIR 覆盖（CI/测试），
+    否则 Windows 为 %APPDATA%/GUI-ADB，其他系统为 $XDG_CONFIG_HOME/GUI-ADB。
+    """
+    override = os.environ.get("GUI_ADB_DATA_DIR")
+    if override:
+        base = Path(override)
+    elif os.name == "nt":
+        base = Path(os.environ.get("APPDATA") or Path.home()) / _APP_DIR_NAME
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Application Support" / _APP_DIR_NAME
+    else:
+        base = Path(os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config") / _APP_DIR_NAME
+    base.mkdir(parents=True, exist_ok=True)
+    return base
+
+
+def load_json(name: str, default: Any) -> Any:
+    """读取数据目录下的 JSON 文件；不存在或损坏时返回 default。"""
+    path = app_data_dir() / name
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(name: str, data: Any) -> None:
+    """先写临时文件再替换，避免写到一半崩溃导致文件损坏。"""
+    write_json_atomic(app_data_dir() / name, data)
+
+
+def write_json_atomic(path: Path, data: Any) -> None:
+    """把 JSON 原子地写到任意路径（父目录不存在时创建）。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
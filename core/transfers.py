@@ -0,0 +1,842 @@
+# -*- coding: utf-8 -*-
+"""
+传输队列：批量推送/拉取文件，按设备与总量限制并发，大文件支持断点续传与校验。
+
+- 小文件（不足 _RESUMABLE_MIN_SIZE）与文件夹：一条 adb push/pull 完成，文件夹整个作为一个条目，
+  不逐个文件起进程；中断后从头重传，完整性由 adb sync 协议保证，不另行计算摘要。
+- 拉取：数据先写到本地 "<目标>.part"，中断后从该文件的长度继续（exec-out tail -c +N），
+  完成并校验通过后改名为目标文件。
+- 推送：数据先追加到设备上的 "<目标>.part"（exec-in cat >>），中断后按设备上该文件的长度从本地对应偏移继续，
+  校验通过后在设备上 mv 为目标文件，并按本地文件恢复权限位（与 adb push 一致）。
+- 校验：设备上 sha256sum（没有时 md5sum）与本地同算法的摘要比较；不一致时删除半成品，下次重试从头开始。
+- 压缩（见 core.compression）：慢速链路上对可压缩的文件，从头传时优先 sync v2 压缩（adb push/pull -z），
+  续传或设备不支持时改走 gzip 流（拉取 exec-out "… | gzip -c"、推送 exec-in "gzip -d -c >> …"），
+  仍可从断点继续。完成后按链路基准速率记录有效提速倍数。
+
+队列保存在数据目录 transfers.json；程序退出时未完成的条目下次启动显示为「已暂停」，继续时从断点接着传。
+传输不经过 core.scheduler 的按设备排队（那里每台设备同时只执行一个任务），由本队列自行控制并发。
+"""
+
+import hashlib
+import itertools
+import os
+import shlex
+import stat
+import subprocess
+import threading
+import time
+import zlib
+from pathlib import Path, PurePosixPath
+from typing import Callable, NamedTuple, Optional
+
+from adb_helper import popen_adb, register_inflight, run_adb, unregister_inflight
+from core.compression import (
+    GZIP,
+    SYNC_CODECS,
+    Capabilities,
+    GzipDecoder,
+    GzipEncoder,
+    LinkEstimator,
+    choose_codec,
+    device_capabilities,
+)
+from core.storage import load_json, save_json
+
+_QUEUE_FILE = "transfers.json"
+_CHUNK = 256 * 1024
+_PART_SUFFIX = ".part"
+_NOTIFY_INTERVAL = 0.25  # 进度回调的最小间隔（秒）
+_SYNC_POLL = 0.5  # sync 压缩传输由 adb 自己读写文件，按此间隔轮询目标文件大小作为进度
+_MIN_RATE_SAMPLE = 1024 * 1024  # 不压缩传输超过该字节数才计入链路速率
+# 不小于该大小的文件才走可续传的 exec 流（每个文件 3~4 条 adb 命令）；更小的文件一条 adb push/pull
+_RESUMABLE_MIN_SIZE = 8 * 1024 * 1024
+
+COMPRESSION_AUTO = "auto"
+COMPRESSION_OFF = "off"
+
+PUSH = "push"
+PULL = "pull"
+
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+DONE = "done"
+FAILED = "failed"
+CANCELED = "canceled"
+
+STATE_LABELS = {
+    QUEUED: "等待中",
+    RUNNING: "传输中",
+    PAUSED: "已暂停",
+    DONE: "已完成",
+    FAILED: "失败",
+    CANCELED: "已取消",
+}
+
+_FINISHED = (DONE, CANCELED)
+REMOVED = "removed"  # 不是队列中的状态：正在传输的条目被移除后，以此状态通知一次
+
+
+class TransferError(Exception):
+    """传输失败；retry=False 表示重试无意义（如本地文件不存在）。"""
+
+    def __init__(self, message: str, retry: bool = True):
+        super().__init__(message)
+        self.retry = retry
+
+
+class _Stopped(Exception):
+    """暂停或取消，由调用方按条目状态处理。"""
+
+
+class TransferItem:
+    """
+    一个文件（is_dir 时为整个文件夹）的推送或拉取。
+    done 为已落地的字节数（续传起点），rate 为最近的速率（字节/秒）。
+    """
+
+    __slots__ = (
+        "id", "device", "direction", "local", "remote", "is_dir", "size", "done", "state",
+        "error", "checksum", "attempts", "created_at", "finished_at", "rate",
+        "codec", "wire_bytes", "elapsed", "gain",
+    )
+
+    _PERSISTED = (
+        "id", "device", "direction", "local", "remote", "is_dir", "size", "done", "state",
+        "error", "checksum", "attempts", "created_at", "finished_at",
+        "codec", "wire_bytes", "elapsed", "gain",
+    )
+
+    def __init__(self, item_id: int, device: str, direction: str, local: str, remote: str, is_dir: bool = False):
+        self.id = item_id
+        self.device = device
+        self.direction = direction
+        self.local = local
+        self.remote = remote
+        self.is_dir = is_dir
+        self.size: Optional[int] = None
+        self.done = 0
+        self.state = QUEUED
+        self.error = ""
+        self.checksum = ""
+        self.attempts = 0
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.rate = 0.0
+        self.codec = ""  # 最近一次传输的压缩方式：""、"gzip" 或 sync v2 算法名
+        self.wire_bytes = 0  # 最近一次传输在链路上的字节数（gzip 为压缩后大小；sync 压缩由 adb 完成，未知为 0）
+        self.elapsed = 0.0  # 最近一次传输的数据阶段耗时（秒，不含校验）
+        self.gain = 0.0  # 压缩带来的有效提速倍数；未压缩或无从比较时为 0
+
+    @property
+    def progress(self) -> float:
+        """0~1；大小未知时为 0。"""
+        return min(1.0, self.done / self.size) if self.size else (1.0 if self.state == DONE else 0.0)
+
+    def copy(self) -> "TransferItem":
+        other = TransferItem(self.id, self.device, self.direction, self.local, self.remote, self.is_dir)
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self._PERSISTED}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TransferItem":
+        item = cls(int(data["id"]), data["device"], data["direction"], data["local"], data["remote"])
+        for name in cls._PERSISTED:
+            if name in data:
+                setattr(item, name, data[name])
+        return item
+
+
+# ---------- 单个文件的传输 ----------
+
+
+class TransferResult(NamedTuple):
+    checksum: str  # "算法:摘要"，未校验为空串
+    moved: int  # 本次实际传输的原始字节数（不含续传前已有的部分）
+    wire_bytes: int  # 链路上的字节数；sync 压缩时未知，为 0
+    seconds: float  # 数据阶段耗时
+
+
+CodecChooser = Callable[[int, int], str]  # (文件大小, 续传起点) -> 压缩方式
+
+
+def _q(path: str) -> str:
+    return shlex.quote(path)
+
+
+def remote_size(device: str, path: str) -> Optional[int]:
+    """设备上文件的大小；不存在或不是普通文件时返回 None。"""
+    code, out, _ = run_adb("shell", f"[ -f {_q(path)} ] && stat -c %s {_q(path)}", device=device, timeout=15)
+    out = out.strip()
+    return int(out) if code == 0 and out.isdigit() else None
+
+
+def remote_checksum(device: str, path: str, timeout: int = 600) -> tuple[str, str]:
+    """
+    设备上文件的摘要，优先 sha256sum，老系统没有时用 md5sum。
+    :return: (算法名, 十六进制摘要)；失败时抛出 TransferError
+    """
+    command = f"sha256sum {_q(path)} 2>/dev/null || md5sum {_q(path)}"
+    code, out, err = run_adb("shell", command, device=device, timeout=timeout)
+    digest = out.split()[0].lower() if out.split() else ""
+    algorithm = {64: "sha256", 32: "md5"}.get(len(digest))
+    if code != 0 or algorithm is None:
+        raise TransferError(f"无法计算设备端校验值：{err.strip() or out.strip() or code}")
+    return algorithm, digest
+
+
+def local_checksum(path: str, algorithm: str, should_stop: Callable[[], bool] = lambda: False) -> str:
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        while True:
+            if should_stop():
+                raise _Stopped()
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class _Stream:
+    """exec-in / exec-out 子进程；登记为设备的进行中操作，设备被标记不可用时一并终止。"""
+
+    def __init__(self, device: str, args: tuple, **popen_kwargs):
+        self.device = device
+        self.proc = popen_adb(*args, device=device, stderr=subprocess.PIPE, **popen_kwargs)
+        register_inflight(device, None, self.proc)
+
+    def finish(self, timeout: float = 60) -> tuple[int, str]:
+        try:
+            _, err = self.proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            _, err = self.proc.communicate()
+        finally:
+            unregister_inflight(self.device, None, self.proc)
+        return self.proc.returncode, (err or b"").decode("utf-8", "replace").strip()
+
+    def kill(self) -> None:
+        try:
+            self.proc.kill()
+        except OSError:
+            pass
+        self.finish(timeout=5)
+
+
+def _run_sync(
+    device: str,
+    args: tuple,
+    current_size: Callable[[], Optional[int]],
+    on_progress: Callable[[int], None],
+    should_stop: Callable[[], bool],
+) -> None:
+    """adb push/pull（可带 -z）：文件由 adb 自己读写，按间隔轮询目标大小作为进度，进程一结束立即返回。"""
+    stream = _Stream(device, args, stdout=subprocess.DEVNULL)
+    while True:
+        try:
+            stream.proc.wait(timeout=_SYNC_POLL)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+        if should_stop():
+            stream.kill()
+            raise _Stopped()
+        size = current_size()
+        if size is not None:
+            on_progress(size)
+    code, err = stream.finish()
+    if code != 0:
+        what = f"压缩传输失败（{args[2]}）" if args[1] == "-z" else f"{args[0]} 失败"
+        raise TransferError(f"{what}：{err or code}")
+
+
+def _run_plain(
+    item: TransferItem,
+    src: str,
+    dst: str,
+    size: Optional[int],
+    current_size: Callable[[], Optional[int]],
+    on_progress: Callable[[int], None],
+    should_stop: Callable[[], bool],
+    choose: Optional[CodecChooser],
+) -> TransferResult:
+    """小文件与文件夹：一条 adb push/pull 完成，链路慢且设备支持时带 sync 压缩（gzip 流只用于续传路径）。"""
+    codec = choose(size, 0) if choose and size else ""
+    codec = item.codec = codec if codec in SYNC_CODECS else ""
+    args = (item.direction, "-z", codec, src, dst) if codec else (item.direction, src, dst)
+    on_progress(0)
+    started = time.monotonic()
+    _run_sync(item.device, args, current_size, on_progress, should_stop)
+    moved = size if size is not None else current_size() or 0
+    return TransferResult("", moved, 0 if codec else moved, time.monotonic() - started)
+
+
+def _local_size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _tree_size(path: Path) -> Optional[int]:
+    """本地文件夹内所有文件的总大小；不存在时返回 None。"""
+    if not path.is_dir():
+        return None
+    total = 0
+    for parent, _, files in os.walk(path):
+        for name in files:
+            total += _local_size(os.path.join(parent, name)) or 0
+    return total
+
+
+def pull_file(
+    item: TransferItem,
+    on_progress: Callable[[int], None],
+    should_stop: Callable[[], bool],
+    verify: bool = True,
+    choose: Optional[CodecChooser] = None,
+) -> TransferResult:
+    """
+    拉取 item.remote 到 item.local，从本地 .part 文件的长度续传。
+    :param choose: 按文件大小与续传起点选择压缩方式，结果写入 item.codec；None 时不压缩
+    """
+    size = remote_size(item.device, item.remote)
+    if size is None:
+        raise TransferError(f"设备上不存在该文件：{item.remote}", retry=False)
+    item.size = size
+    part = item.local + _PART_SUFFIX
+    Path(part).parent.mkdir(parents=True, exist_ok=True)
+    if size < _RESUMABLE_MIN_SIZE:
+        result = _run_plain(item, item.remote, part, size, lambda: _local_size(part), on_progress, should_stop, choose)
+        os.replace(part, item.local)
+        return result
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    if offset > size:
+        offset = 0  # 设备上的文件变小了，本地半成品作废
+        os.unlink(part)
+    on_progress(offset)
+    open(part, "ab").close()
+    codec = item.codec = choose(size, offset) if choose and offset < size else ""
+    started = time.monotonic()
+    done, wire = offset, 0
+    if codec in SYNC_CODECS:
+        _run_sync(item.device, ("pull", "-z", codec, item.remote, part), lambda: _local_size(part), on_progress, should_stop)
+        done = os.path.getsize(part)
+        if done != size:
+            raise TransferError(f"压缩传输结果大小不符（{done}/{size} 字节）")
+    elif offset < size:
+        command = f"tail -c +{offset + 1} {_q(item.remote)}" if offset else f"cat {_q(item.remote)}"
+        decoder = GzipDecoder() if codec == GZIP else None
+        if decoder:
+            command += " | gzip -c -1"
+        stream = _Stream(item.device, ("exec-out", command), stdout=subprocess.PIPE)
+        try:
+            with open(part, "ab") as f:
+                while decoder or done < size:
+                    if should_stop():
+                        stream.kill()
+                        raise _Stopped()
+                    # gzip 流读到结束为止；原始流按剩余大小读，设备上文件变大也不多收
+                    chunk = stream.proc.stdout.read1(_CHUNK) if decoder else stream.proc.stdout.read(min(_CHUNK, size - done))
+                    if not chunk:
+                        break
+                    wire += len(chunk)
+                    data = decoder.feed(chunk) if decoder else chunk
+                    f.write(data)
+                    done += len(data)
+                    on_progress(done)
+                if decoder:
+                    data = decoder.flush()
+                    f.write(data)
+                    done += len(data)
+        except zlib.error as e:
+            stream.kill()
+            raise TransferError(f"压缩数据损坏（已收到 {done}/{size} 字节）：{e}")
+        code, err = stream.finish()
+        if done < size:
+            raise TransferError(f"连接中断（已收到 {done}/{size} 字节）：{err or code}")
+    seconds = time.monotonic() - started
+    checksum = ""
+    if verify:
+        algorithm, expected = remote_checksum(item.device, item.remote)
+        actual = local_checksum(part, algorithm, should_stop)
+        if actual != expected:
+            os.unlink(part)
+            raise TransferError("校验不一致，已删除半成品，重试将从头开始")
+        checksum = f"{algorithm}:{actual}"
+    os.replace(part, item.local)
+    return TransferResult(checksum, done - offset, wire, seconds)
+
+
+def push_file(
+    item: TransferItem,
+    on_progress: Callable[[int], None],
+    should_stop: Callable[[], bool],
+    verify: bool = True,
+    choose: Optional[CodecChooser] = None,
+) -> TransferResult:
+    """
+    推送 item.local 到 item.remote，从设备上 .part 文件的长度续传（exec-in 追加写）。
+    :param choose: 按文件大小与续传起点选择压缩方式，结果写入 item.codec；None 时不压缩
+    """
+    try:
+        st = os.stat(item.local)
+    except OSError as e:
+        raise TransferError(f"无法读取本地文件：{e}", retry=False)
+    size = item.size = st.st_size
+    if size < _RESUMABLE_MIN_SIZE:
+        return _run_plain(item, item.local, item.remote, size, lambda: None, on_progress, should_stop, choose)
+    part = item.remote + _PART_SUFFIX
+    offset = remote_size(item.device, part) or 0
+    if offset > size:
+        offset = 0
+    on_progress(offset)
+    codec = item.codec = choose(size, offset) if choose and offset < size else ""
+    started = time.monotonic()
+    done, wire = offset, 0
+    if codec in SYNC_CODECS:
+        _run_sync(
+            item.device, ("push", "-z", codec, item.local, part),
+            lambda: remote_size(item.device, part), on_progress, should_stop,
+        )
+        done = size
+    elif offset < size or size == 0:
+        parent = str(PurePosixPath(item.remote).parent)
+        redirect = ">>" if offset else ">"
+        encoder = GzipEncoder() if codec == GZIP else None
+        writer = f"gzip -d -c {redirect} {_q(part)}" if encoder else f"cat {redirect} {_q(part)}"
+        command = f"mkdir -p {_q(parent)} && {writer}"
+        stream = _Stream(item.device, ("exec-in", command), stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+        try:
+            with open(item.local, "rb") as f:
+                f.seek(offset)
+                while done < size:
+                    if should_stop():
+                        stream.kill()
+                        raise _Stopped()
+                    chunk = f.read(_CHUNK)
+                    if not chunk:
+                        break
+                    data = encoder.feed(chunk) if encoder else chunk
+                    if data:
+                        stream.proc.stdin.write(data)
+                        wire += len(data)
+                    done += len(chunk)
+                    on_progress(done)
+                if encoder:
+                    data = encoder.flush()
+                    stream.proc.stdin.write(data)
+                    wire += len(data)
+        except OSError as e:  # 含 BrokenPipeError：adb 进程已退出
+            stream.kill()
+            raise TransferError(f"连接中断（已发送约 {done}/{size} 字节）：{e}")
+        code, err = stream.finish()
+        if code != 0:
+            raise TransferError(f"推送失败：{err or code}")
+    seconds = time.monotonic() - started
+    checksum = ""
+    if verify:
+        algorithm, actual = remote_checksum(item.device, part)
+        expected = local_checksum(item.local, algorithm, should_stop)
+        if actual != expected:
+            run_adb("shell", f"rm -f {_q(part)}", device=item.device, timeout=15)
+            raise TransferError("校验不一致，已删除设备上的半成品，重试将从头开始")
+        checksum = f"{algorithm}:{expected}"
+    # exec-in 新建的文件是设备默认权限，按本地文件恢复（adb push 也会带上本地权限位）
+    mode = f"{stat.S_IMODE(st.st_mode) & 0o777:o}"
+    command = f"mv -f {_q(part)} {_q(item.remote)} && chmod {mode} {_q(item.remote)}"
+    code, out, err = run_adb("shell", command, device=item.device, timeout=30)
+    if code != 0:
+        raise TransferError(f"重命名失败：{err.strip() or out.strip()}")
+    return TransferResult(checksum, done - offset, wire, seconds)
+
+
+def push_dir(
+    item: TransferItem,
+    on_progress: Callable[[int], None],
+    should_stop: Callable[[], bool],
+    verify: bool = True,
+    choose: Optional[CodecChooser] = None,
+) -> TransferResult:
+    """整个文件夹一条 adb push 推到 item.remote 的上级目录（adb 在其下按文件夹名创建 item.remote）。"""
+    size = item.size = _tree_size(Path(item.local))
+    if size is None:
+        raise TransferError(f"本地文件夹不存在：{item.local}", retry=False)
+    parent = str(PurePosixPath(item.remote).parent)
+    return _run_plain(item, item.local, parent, size, lambda: None, on_progress, should_stop, choose)
+
+
+def pull_dir(
+    item: TransferItem,
+    on_progress: Callable[[int], None],
+    should_stop: Callable[[], bool],
+    verify: bool = True,
+    choose: Optional[CodecChooser] = None,
+) -> TransferResult:
+    """整个文件夹一条 adb pull 拉到 item.local 的上级目录；大小事先未知，进度按本地已写入的总量。"""
+    target = Path(item.local)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    result = _run_plain(
+        item, item.remote, str(target.parent), None, lambda: _tree_size(target), on_progress, should_stop, choose
+    )
+    item.size = result.moved
+    return result
+
+
+# ---------- 队列 ----------
+
+
+class TransferQueue:
+    """
+    :param max_parallel: 所有设备合计同时传输的文件数
+    :param per_device: 每台设备同时传输的文件数
+    :param retries: 连接中断等可重试错误的自动重试次数（每次从断点继续）
+    :param compression: COMPRESSION_AUTO 按文件类型与链路速率自动选择压缩；COMPRESSION_OFF 不压缩
+    :param on_change: 条目状态或进度变化时回调 on_change(item 副本)，在传输线程中调用
+    """
+
+    def __init__(
+        self,
+        max_parallel: int = 3,
+        per_device: int = 2,
+        retries: int = 2,
+        verify: bool = True,
+        compression: str = COMPRESSION_AUTO,
+        filename: Optional[str] = _QUEUE_FILE,
+        on_change: Optional[Callable[[TransferItem], None]] = None,
+    ):
+        self._lock = threading.Lock()
+        self._filename = filename
+        self._items: dict[int, TransferItem] = {}
+        self._stop_flags: dict[int, str] = {}  # 条目 id -> 请求的目标状态（PAUSED / CANCELED）
+        self._listeners: list[Callable[[TransferItem], None]] = [on_change] if on_change else []
+        self.max_parallel = max(1, max_parallel)
+        self.per_device = max(1, per_device)
+        self.retries = retries
+        self.verify = verify
+        self.compression = compression
+        self._links = LinkEstimator()  # 按设备记录的不压缩传输速率，作为选择压缩与计算提速的基准
+        self._caps: dict[str, Capabilities] = {}  # 设备压缩能力，本次运行内缓存
+        self._load()
+        self._ids = itertools.count(max(self._items, default=0) + 1)
+
+    def _load(self):
+        if not self._filename:
+            return
+        data = load_json(self._filename, {})
+        settings = data.get("settings", {}) if isinstance(data, dict) else {}
+        self.max_parallel = max(1, int(settings.get("max_parallel", self.max_parallel)))
+        self.per_device = max(1, int(settings.get("per_device", self.per_device)))
+        if settings.get("compression") in (COMPRESSION_AUTO, COMPRESSION_OFF):
+            self.compression = settings["compression"]
+        if isinstance(settings.get("link_rates"), dict):
+            self._links = LinkEstimator(settings["link_rates"])
+        for raw in data.get("items", []) if isinstance(data, dict) else []:
+            try:
+                item = TransferItem.from_dict(raw)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if item.state in (QUEUED, RUNNING):
+                item.state = PAUSED  # 上次退出时未完成：等用户继续，设备此时未必在线
+            self._items[item.id] = item
+
+    def _save(self):
+        # 调用方持有 _lock
+        if self._filename:
+            save_json(self._filename, {
+                "settings": {
+                    "max_parallel": self.max_parallel,
+                    "per_device": self.per_device,
+                    "compression": self.compression,
+                    "link_rates": self._links.to_dict(),
+                },
+                "items": [item.to_dict() for item in self._items.values()],
+            })
+
+    def subscribe(self, callback: Callable[[TransferItem], None]) -> None:
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[TransferItem], None]) -> None:
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self, item: TransferItem):
+        with self._lock:
+            snapshot, listeners = item.copy(), list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(snapshot)
+            except Exception:
+                pass
+
+    def items(self) -> list[TransferItem]:
+        with self._lock:
+            return [item.copy() for item in self._items.values()]
+
+    def set_limits(self, max_parallel: int, per_device: int) -> None:
+        with self._lock:
+            self.max_parallel = max(1, max_parallel)
+            self.per_device = max(1, per_device)
+            self._save()
+            started = self._dispatch()
+        for item in started:
+            self._notify(item)
+
+    def set_compression(self, mode: str) -> None:
+        """COMPRESSION_AUTO / COMPRESSION_OFF；对之后开始的传输生效。"""
+        with self._lock:
+            self.compression = COMPRESSION_OFF if mode == COMPRESSION_OFF else COMPRESSION_AUTO
+            self._save()
+
+    def link_rate(self, device: str) -> Optional[float]:
+        """设备的实测链路速率（字节/秒，不压缩传输的移动平均）；没测过为 None。"""
+        return self._links.rate(device)
+
+    def _capabilities(self, device: str) -> Capabilities:
+        with self._lock:
+            caps = self._caps.get(device)
+        if caps is None:
+            caps = device_capabilities(device)  # 两条 adb 命令，不持锁
+            with self._lock:
+                self._caps[device] = caps
+        return caps
+
+    # ----- 添加 -----
+
+    def add(self, device: str, direction: str, local: str, remote: str) -> TransferItem:
+        return self._add_many(device, direction, [(local, remote)])[0]
+
+    def _add_many(
+        self, device: str, direction: str, pairs: list[tuple[str, str]], is_dir: bool = False
+    ) -> list[TransferItem]:
+        """批量入队，只保存一次。pairs 为 (本地路径, 设备路径)。"""
+        with self._lock:
+            added = []
+            for local, remote in pairs:
+                item = TransferItem(next(self._ids), device, direction, local, remote, is_dir)
+                self._items[item.id] = item
+                added.append(item)
+            self._save()
+            self._dispatch()
+        for item in added:
+            self._notify(item)
+        return [item.copy() for item in added]
+
+    def add_push(self, device: str, local: str, remote_dir: str) -> list[TransferItem]:
+        """推送本地文件或文件夹（整个文件夹作为一个条目，保留目录结构）到设备目录 remote_dir 下。"""
+        src = Path(local)
+        remote = str(PurePosixPath(remote_dir) / src.name)
+        if src.is_dir():
+            return self._add_many(device, PUSH, [(str(src), remote)], is_dir=True)
+        return self._add_many(device, PUSH, [(str(src), remote)])
+
+    def add_pull(self, device: str, remote: str, local: str, is_dir: bool = False) -> list[TransferItem]:
+        """
+        拉取设备文件到本地路径 local；is_dir 时 local 为本地文件夹，远端文件夹整个作为一个条目拉到其下。
+        :raises TransferError: 要拉取的是设备根目录
+        """
+        if not is_dir:
+            return [self.add(device, PULL, local, remote)]
+        root = PurePosixPath(remote.rstrip("/") or "/")
+        if not root.name:
+            raise TransferError("不支持拉取整个根目录", retry=False)
+        return self._add_many(device, PULL, [(str(Path(local) / root.name), str(root))], is_dir=True)
+
+    # ----- 控制 -----
+
+    def pause(self, item_id: int) -> None:
+        self._stop(item_id, PAUSED)
+
+    def cancel(self, item_id: int) -> None:
+        """取消：正在传输的立即停止；半成品保留（重新开始时可接着传）。"""
+        self._stop(item_id, CANCELED)
+
+    def _stop(self, item_id: int, state: str) -> None:
+        with self._lock:
+            item = self._items.get(item_id)
+            if item is None or item.state in _FINISHED:
+                return
+            if item.state == RUNNING:
+                self._stop_flags[item_id] = state  # 传输线程在下一个数据块前退出
+                return
+            item.state = state
+            self._save()
+        self._notify(item)
+
+    def resume(self, item_id: int) -> None:
+        """继续已暂停、失败或取消的条目（从断点接着传）。"""
+        with self._lock:
+            item = self._items.get(item_id)
+            if item is None or item.state in (RUNNING, QUEUED, DONE):
+                return
+            item.state, item.error, item.attempts = QUEUED, "", 0
+            self._save()
+            self._dispatch()
+        self._notify(item)
+
+    def resume_all(self) -> None:
+        for item in self.items():
+            if item.state in (PAUSED, FAILED):
+                self.resume(item.id)
+
+    def remove(self, item_id: int) -> None:
+        """从队列中移除；正在传输的先停止，停止后再移除。"""
+        with self._lock:
+            item = self._items.get(item_id)
+            if item is None:
+                return
+            if item.state == RUNNING:
+                self._stop_flags[item_id] = REMOVED
+                return
+            del self._items[item_id]
+            self._save()
+
+    def clear_finished(self) -> None:
+        with self._lock:
+            for item_id in [i for i, item in self._items.items() if item.state in _FINISHED]:
+                del self._items[item_id]
+            self._save()
+
+    def stop_all(self) -> None:
+        """暂停所有进行中与等待中的条目（程序退出时调用），下次启动可继续。"""
+        for item in self.items():
+            if item.state in (RUNNING, QUEUED):
+                self.pause(item.id)
+
+    def running(self) -> int:
+        with self._lock:
+            return sum(1 for item in self._items.values() if item.state == RUNNING)
+
+    # ----- 调度与执行 -----
+
+    def _dispatch(self) -> list[TransferItem]:
+        """按添加顺序启动满足并发限制的等待条目。调用方持有 _lock。"""
+        running = [item for item in self._items.values() if item.state == RUNNING]
+        per_device: dict[str, int] = {}
+        for item in running:
+            per_device[item.device] = per_device.get(item.device, 0) + 1
+        started = []
+        for item in self._items.values():
+            if len(running) + len(started) >= self.max_parallel:
+                break
+            if item.state != QUEUED or per_device.get(item.device, 0) >= self.per_device:
+                continue
+            item.state = RUNNING
+            item.attempts += 1
+            per_device[item.device] = per_device.get(item.device, 0) + 1
+            started.append(item)
+            threading.Thread(target=self._run, args=(item,), name=f"transfer-{item.id}", daemon=True).start()
+        if started:
+            self._save()
+        return started
+
+    def _run(self, item: TransferItem):
+        last_notify = [0.0]
+        rate_mark = [time.monotonic(), 0]
+
+        def on_progress(done: int):
+            now = time.monotonic()
+            with self._lock:
+                item.done = done
+                if now - rate_mark[0] >= 1.0:
+                    item.rate = (done - rate_mark[1]) / (now - rate_mark[0])
+                    rate_mark[0], rate_mark[1] = now, done
+            if now - last_notify[0] >= _NOTIFY_INTERVAL:
+                last_notify[0] = now
+                self._notify(item)
+
+        def should_stop() -> bool:
+            with self._lock:
+                return item.id in self._stop_flags
+
+        # 上次用 sync 压缩失败的，这次改走 gzip 流（也可能是本机 adb 与设备的 sync v2 实现不兼容）
+        allow_sync = not (item.error and item.codec in SYNC_CODECS)
+        push = item.direction == PUSH
+
+        def choose(size: int, offset: int) -> str:
+            if self.compression != COMPRESSION_AUTO:
+                return ""
+            return choose_codec(
+                item.device, item.remote, size, lambda: self._capabilities(item.device),
+                self._links.rate(item.device), offset, item.local if push else None, allow_sync,
+            )
+
+        if item.is_dir:
+            transfer = push_dir if push else pull_dir
+        else:
+            transfer = push_file if push else pull_file
+        error, retry, result = "", False, None
+        try:
+            rate_mark[1] = item.done
+            result = transfer(item, on_progress, should_stop, self.verify, choose)
+        except _Stopped:
+            pass
+        except TransferError as e:
+            error, retry = str(e), e.retry
+        except Exception as e:
+            error, retry = str(e) or type(e).__name__, True
+
+        retry = bool(error) and retry and item.attempts <= self.retries
+        if retry:
+            time.sleep(min(2.0 * item.attempts, 10.0))  # 连接抖动时稍等再从断点继续，期间仍占用并发名额
+        with self._lock:
+            stop_state = self._stop_flags.pop(item.id, None)
+            item.rate = 0.0
+            if stop_state == REMOVED:
+                item.state = REMOVED
+                del self._items[item.id]
+            elif stop_state:
+                item.state = stop_state
+            elif error:
+                item.error = error
+                item.state = QUEUED if retry else FAILED
+            else:
+                item.state, item.error, item.checksum = DONE, "", result.checksum
+                item.done = item.size or item.done
+                item.finished_at = time.time()
+                self._record_result(item, result)
+            self._save()
+            started = self._dispatch()
+        self._notify(item)
+        for other in started:
+            if other is not item:
+                self._notify(other)
+
+    def _record_result(self, item: TransferItem, result: TransferResult) -> None:
+        """
+        记录链路字节数、耗时与提速倍数，不压缩的传输计入链路速率。调用方持有 _lock。
+        提速倍数 = 本次有效速率（原始字节 / 耗时）÷ 该设备不压缩时的链路速率；
+        还没有基准时，gzip 流以压缩比代替（链路是瓶颈时两者相当），sync 压缩记为未知。
+        """
+        item.wire_bytes, item.elapsed, item.gain = result.wire_bytes, result.seconds, 0.0
+        if result.seconds <= 0 or not result.moved:
+            return
+        if not item.codec:
+            if result.moved >= _MIN_RATE_SAMPLE:
+                self._links.observe(item.device, result.wire_bytes, result.seconds)
+            return
+        baseline = self._links.rate(item.device)
+        if baseline:
+            item.gain = result.moved / result.seconds / baseline
+        elif item.codec == GZIP and result.wire_bytes:
+            item.gain = result.moved / result.wire_bytes
+
+
+_queue: Optional[TransferQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_transfer_queue() -> TransferQueue:
+    """进程内共享的传输队列（界面各入口共用）。"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = TransferQueue()
+        return _queue
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+界面控件树：通过 exec-out 流式取回 `uiautomator dump`，边接收边增量解析为紧凑节点表，
+并按 resource-id / text / class 建索引，选择器查询为 O(1) 或 O(log n)。
+控件树按设备缓存，界面焦点窗口变化（或显式失效）时才重新抓取。
+"""
+
+import bisect
+import subprocess
+import threading
+import time
+from typing import Iterable, NamedTuple, Optional
+from xml.etree.ElementTree import XMLPullParser, ParseError
+
+from adb_helper import popen_adb, run_adb
+
+_ROOT_END = b"</hierarchy>"
+
+
+class UiNode(NamedTuple):
+    """控件节点（元组存储，内存紧凑）。index 为节点在表中的下标，parent 为父节点下标，根为 -1。"""
+    index: int
+    parent: int
+    depth: int
+    class_name: str
+    resource_id: str
+    text: str
+    content_desc: str
+    package: str
+    bounds: tuple[int, int, int, int]  # left, top, right, bottom
+    clickable: bool
+    enabled: bool
+    scrollable: bool
+    checked: bool
+    selected: bool
+
+    @property
+    def center(self) -> tuple[int, int]:
+        l, t, r, b = self.bounds
+        return (l + r) // 2, (t + b) // 2
+
+
+def _parse_bounds(raw: str) -> tuple[int, int, int, int]:
+    """"[0,0][1080,2340]" -> (0, 0, 1080, 2340)。"""
+    try:
+        nums = raw.replace("][", ",").strip("[]").split(",")
+        return int(nums[0]), int(nums[1]), int(nums[2]), int(nums[3])
+    except (ValueError, IndexError):
+        return 0, 0, 0, 0
+
+
+class UiHierarchy:
+    """控件节点表及索引。"""
+
+    def __init__(self):
+        self.nodes: list[UiNode] = []
+        self._by_id: dict[str, list[int]] = {}
+        self._by_text: dict[str, list[int]] = {}
+        self._by_class: dict[str, list[int]] = {}
+        self._sorted_text: list[tuple[str, int]] = []
+        self.captured_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _add(self, parent: int, depth: int, attrib: dict) -> int:
+        index = len(self.nodes)
+        node = UiNode(
+            index,
+            parent,
+            depth,
+            attrib.get("class", ""),
+            attrib.get("resource-id", ""),
+            attrib.get("text", ""),
+            attrib.get("content-desc", ""),
+            attrib.get("package", ""),
+            _parse_bounds(attrib.get("bounds", "")),
+            attrib.get("clickable") == "true",
+            attrib.get("enabled") == "true",
+            attrib.get("scrollable") == "true",
+            attrib.get("checked") == "true",
+            attrib.get("selected") == "true",
+        )
+        self.nodes.append(node)
+        if node.resource_id:
+            self._by_id.setdefault(node.resource_id, []).append(index)
+        if node.text:
+            self._by_text.setdefault(node.text, []).append(index)
+        if node.class_name:
+            self._by_class.setdefault(node.class_name, []).append(index)
+        return index
+
+    def _finish(self):
+        self._sorted_text = sorted((text, i) for text, idx in self._by_text.items() for i in idx)
+        self.captured_at = time.time()
+
+    def by_resource_id(self, resource_id: str) -> list[UiNode]:
+        return [self.nodes[i] for i in self._by_id.get(resource_id, ())]
+
+    def by_text(self, text: str) -> list[UiNode]:
+        return [self.nodes[i] for i in self._by_text.get(text, ())]
+
+    def by_class(self, class_name: str) -> list[UiNode]:
+        return [self.nodes[i] for i in self._by_class.get(class_name, ())]
+
+    def by_text_prefix(self, prefix: str) -> list[UiNode]:
+        """文本前缀匹配：在有序文本表上二分定位，O(log n + k)。"""
+        start = bisect.bisect_left(self._sorted_text, (prefix, -1))
+        result = []
+        for text, i in self._sorted_text[start:]:
+            if not text.startswith(prefix):
+                break
+            result.append(self.nodes[i])
+        return sorted(result)
+
+    def query(
+        self,
+        resource_id: Optional[str] = None,
+        text: Optional[str] = None,
+        class_name: Optional[str] = None,
+        text_prefix: Optional[str] = None,
+        clickable: Optional[bool] = None,
+    ) -> list[UiNode]:
+        """
+        组合选择器：各条件取交集，从候选最少的索引开始过滤。
+        不给任何索引条件时按文档顺序遍历全表。
+        """
+        candidates: list[Iterable[int]] = []
+        if resource_id is not None:
+            candidates.append(self._by_id.get(resource_id, ()))
+        if text is not None:
+            candidates.append(self._by_text.get(text, ()))
+        if class_name is not None:
+            candidates.append(self._by_class.get(class_name, ()))
+        if text_prefix is not None:
+            candidates.append([n.index for n in self.by_text_prefix(text_prefix)])
+        if candidates:
+            candidates.sort(key=len)
+            result = set(candidates[0])
+            for other in candidates[1:]:
+                result.intersection_update(other)
+            indices = sorted(result)
+        else:
+            indices = range(len(self.nodes))
+        nodes = [self.nodes[i] for i in indices]
+        if clickable is not None:
+            nodes = [n for n in nodes if n.clickable == clickable]
+        return nodes
+
+    def first(self, **selector) -> Optional[UiNode]:
+        found = self.query(**selector)
+        return found[0] if found else None
+
+    def children(self, node: UiNode) -> list[UiNode]:
+        # 节点按文档序（先序）存放，子孙节点紧随其后
+        result = []
+        for n in self.nodes[node.index + 1:]:
+            if n.depth <= node.depth:
+                break
+            if n.parent == node.index:
+                result.append(n)
+        return result
+
+
+class _IncrementalBuilder:
+    """把流式 XML 片段增量喂给 XMLPullParser，start 事件即落表。"""
+
+    def __init__(self):
+        self.tree = UiHierarchy()
+        self._parser = XMLPullParser(events=("start", "end"))
+        self._stack: list[int] = []
+        self._started = False
+        self._tail = b""
+        self.done = False
+
+    def feed(self, chunk: bytes) -> None:
+        if self.done:
+            return
+        if not self._started:
+            # 跳过 XML 之前可能出现的告警输出
+            pos = chunk.find(b"<")
+            if pos < 0:
+                return
+            chunk = chunk[pos:]
+            self._started = True
+        # 结束标记可能跨块，带上上一块末尾一起查找
+        window = self._tail + chunk
+        end = window.find(_ROOT_END)
+        if end >= 0:
+            # 根元素之后还有 "UI hierchary dumped to: /dev/tty"，不能再喂给解析器
+            chunk = chunk[:end + len(_ROOT_END) - len(self._tail)]
+            self.done = True
+        self._tail = window[-(len(_ROOT_END) - 1):]
+        self._parser.feed(chunk)
+        for event, elem in self._parser.read_events():
+            if elem.tag != "node":
+                continue
+            if event == "start":
+                parent = self._stack[-1] if self._stack else -1
+                self._stack.append(self.tree._add(parent, len(self._stack), elem.attrib))
+            else:
+                self._stack.pop()
+                elem.clear()
+        if self.done:
+            self.tree._finish()
+
+
+def capture_hierarchy(
+    device: str, compressed: bool = False, timeout: float = 20.0
+) -> tuple[Optional[UiHierarchy], str]:
+    """
+    抓取当前界面控件树：uiautomator 直接写 /dev/tty，经 exec-out 流回主机，
+    不落盘、不需要 pull，收到根元素结束标记即返回。
+    :param compressed: 使用 --compressed，省略无意义的布局节点，体积更小
+    :return: (控件树, 错误信息)
+    """
+    args = ["exec-out", "uiautomator", "dump"] + (["--compressed"] if compressed else []) + ["/dev/tty"]
+    try:
+        proc = popen_adb(*args, device=device, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except (OSError, FileNotFoundError) as e:
+        return None, str(e)
+    # 超时后杀掉子进程，读循环随即结束
+    killer = threading.Timer(timeout, proc.kill)
+    killer.start()
+    builder = _IncrementalBuilder()
+    head = b""
+    try:
+        while not builder.done:
+            chunk = proc.stdout.read1(65536)
+            if not chunk:
+                break
+            if len(head) < 512:
+                head += chunk[:512]
+            builder.feed(chunk)
+    except ParseError as e:
+        return None, f"控件树解析失败：{e}"
+    finally:
+        killer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+    if not builder.done:
+        msg = head.decode("utf-8", "replace").strip() or proc.stderr.read().decode("utf-8", "replace").strip()
+        return None, msg or "未获取到控件树"
+    return builder.tree, ""
+
+
+def screen_signature(device: str) -> Optional[str]:
+    """界面签名：焦点窗口与焦点应用，一次 shell 往返；失败返回 None。"""
+    code, out, _ = run_adb(
+        "shell", "dumpsys window | grep -E 'mCurrentFocus|mFocusedApp'; true", device=device, timeout=10
+    )
+    if code != 0:
+        return None
+    return "\n".join(line.strip() for line in out.splitlines() if line.strip())
+
+
+class HierarchyCache:
+    """
+    按设备缓存控件树（完整与 --compressed 分别缓存）。get() 先比较廉价的界面签名，
+    签名未变且未超过 max_age 时直接复用；同一窗口内的内容变化（列表滚动等）靠注入输入后
+    invalidate()——InputChannel 每次点击/滑动/按键/输入都会使该设备的缓存失效。
+    """
+
+    def __init__(self, max_age: float = 30.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[str, bool], tuple[Optional[str], UiHierarchy]] = {}
+
+    def invalidate(self, device: Optional[str] = None) -> None:
+        with self._lock:
+            if device is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == device]:
+                    del self._entries[key]
+
+    def get(
+        self, device: str, force: bool = False, compressed: bool = False, timeout: float = 20.0
+    ) -> tuple[Optional[UiHierarchy], str]:
+        """参数同 capture_hierarchy；force 为 True 时不用缓存。"""
+        key = (device, compressed)
+        signature = screen_signature(device)
+        with self._lock:
+            cached = self._entries.get(key)
+        if (
+            cached
+            and not force
+            and signature is not None
+            and cached[0] == signature
+            and time.time() - cached[1].captured_at < self.max_age
+        ):
+            return cached[1], ""
+        tree, err = capture_hierarchy(device, compressed=compressed, timeout=timeout)
+        if tree is not None:
+            with self._lock:
+                self._entries[key] = (signature, tree)
+        return tree, err
+
+
+_cache: Optional[HierarchyCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_hierarchy_cache() -> HierarchyCache:
+    """进程内共享的控件树缓存。"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HierarchyCache()
+        return _cache
@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
 """工具函数：二维码、连接判断、配对+连接。"""
 
-from PyQt6.QtGui import QPixmap, QImage
+from typing import TYPE_CHECKING
 
 from adb_helper import run_adb, adb_pair
 
+if TYPE_CHECKING:
+    from PyQt6.QtGui import QPixmap
 
-def make_qr_pixmap(text: str, box_size: int = 8) -> QPixmap:
-    """根据字符串生成二维码 QPixmap。"""
+
+def make_qr_pixmap(text: str, box_size: int = 8) -> "QPixmap":
+    """根据字符串生成二维码 QPixmap。PyQt6 在此处才导入，命令行等无界面场景使用本模块不会加载 Qt。"""
     import qrcode
+    from PyQt6.QtGui import QPixmap, QImage
     qr = qrcode.QRCode(box_size=box_size, border=2)
     qr.add_data(text)
     qr.make(fit=True)
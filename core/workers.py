@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
-"""后台线程：Worker、Zeroconf 配对监听。"""
+"""后台线程与信号桥：把耗时的 adb 操作放到界面线程之外，结果以 Qt 信号发回。"""
 
-import socket
+import time
 from PyQt6.QtCore import QThread, pyqtSignal, QObject
 
 
@@ -26,121 +26,409 @@ class Worker(QThread):
             self.finished.emit(-1, "", str(e))
 
 
-class PairingNotifier(QObject):
-    """供 zeroconf 回调跨线程通知主线程：发现配对服务。"""
-    pair_found = pyqtSignal(str, int, str)  # host, port, password
+class DiscoveryNotifier(QObject):
+    """
+    把共享 mDNS 发现服务的回调（zeroconf 线程）转成 Qt 信号（跨线程自动排队到主线程）。
+    每个弹窗/面板持有自己的 notifier，关闭时 detach 即可，不影响发现服务本身。
+    """
+    service_added = pyqtSignal(str, str, str, int)  # 服务类型, 服务名, host, port
+    service_updated = pyqtSignal(str, str, str, int)
+    service_removed = pyqtSignal(str, str)  # 服务类型, 服务名
 
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._service = None
+        self._sub_id = None
 
-class PairingListener:
-    """mDNS 监听 _adb-tls-pairing，发现后通过 notifier 发出 host/port/密码。"""
-    def __init__(self, notifier: PairingNotifier, password: str):
-        self.notifier = notifier
-        self.password = password
+    def attach(self, service, service_types=None, replay: bool = True):
+        self.detach()
+        self._service = service
+        self._sub_id = service.subscribe(self._on_event, service_types, replay=replay)
+
+    def detach(self):
+        if self._service is not None and self._sub_id is not None:
+            self._service.unsubscribe(self._sub_id)
+        self._service = None
+        self._sub_id = None
+
+    def _on_event(self, event: str, svc):
+        from core.discovery import ADDED, UPDATED
+        if event == ADDED:
+            self.service_added.emit(svc.service_type, svc.name, svc.host, svc.port)
+        elif event == UPDATED:
+            self.service_updated.emit(svc.service_type, svc.name, svc.host, svc.port)
+        else:
+            self.service_removed.emit(svc.service_type, svc.name)
+
+
+class HealthNotifier(QObject):
+    """把 HealthMonitor 的状态变化回调（监控线程）转成 Qt 信号。"""
+    state_changed = pyqtSignal(str, str, str, str)  # 序列号, server, 新状态, 旧状态（首次发现为空）
+
+    def on_change(self, health, old_state: str):
+        self.state_changed.emit(health.serial, health.server, health.state, old_state)
 
-    def add_service(self, zeroconf, service_type, name):
-        info = zeroconf.get_service_info(service_type, name)
-        if not info or not info.addresses:
-            return
-        host = socket.inet_ntoa(info.addresses[0])
-        port = info.port
-        self.notifier.pair_found.emit(host, port, self.password)
 
-    def remove_service(self, zeroconf, service_type, name):
-        pass
+class TransferNotifier(QObject):
+    """把传输队列的变化回调（传输线程）转成 Qt 信号。"""
+    item_changed = pyqtSignal(object)  # TransferItem 副本
 
-    def update_service(self, zeroconf, service_type, name):
-        pass
+    def on_change(self, item):
+        self.item_changed.emit(item)
 
 
-class ZeroconfThread(QThread):
-    """在后台运行 zeroconf 监听配对服务，发现后由 notifier 发信号。"""
-    def __init__(self, notifier: PairingNotifier, password: str):
+class PerfMonitorThread(QThread):
+    """按固定间隔采样设备性能指标，每个点通过 sample_ready 发回主线程。"""
+    sample_ready = pyqtSignal(dict)
+    sample_failed = pyqtSignal(str)
+
+    def __init__(self, device: str, package: str = "", interval_ms: int = 1000):
         super().__init__()
-        self.notifier = notifier
-        self.password = password
+        self.device = device
+        self.package = package
+        self.interval_ms = max(200, interval_ms)
         self._running = True
-        self._zc = None
 
     def run(self):
-        try:
-            from zeroconf import Zeroconf, ServiceBrowser
-            self._zc = Zeroconf()
-            listener = PairingListener(self.notifier, self.password)
-            ServiceBrowser(
-                self._zc,
-                "_adb-tls-pairing._tcp.local.",
-                listener,
-            )
-            while self._running:
-                self.msleep(300)
-        except Exception:
-            pass
-        finally:
-            if self._zc is not None:
-                try:
-                    self._zc.close()
-                except Exception:
-                    pass
-                self._zc = None
+        from core.perf_monitor import PerfSampler
+        sampler = PerfSampler(self.device, self.package)
+        while self._running:
+            started = time.monotonic()
+            metrics, err = sampler.sample()
+            if not self._running:
+                break
+            if metrics is not None:
+                self.sample_ready.emit(metrics)
+            else:
+                self.sample_failed.emit(err)
+            # 扣除本次采样耗时，保持采样节拍稳定
+            remaining = self.interval_ms - int((time.monotonic() - started) * 1000)
+            while self._running and remaining > 0:
+                step = min(remaining, 100)
+                self.msleep(step)
+                remaining -= step
 
     def stop(self):
         self._running = False
 
 
-class ConnectNotifier(QObject):
-    """供 zeroconf 回调跨线程通知主线程：发现连接服务（配对后设备的 adb connect 端口）。"""
-    connect_found = pyqtSignal(str, int)  # host, port
+class ScreenCaptureThread(QThread):
+    """后台通过 exec-out 取回 PNG 截图字节，用于屏幕预览。"""
+    captured = pyqtSignal(int, bytes, str)
+
+    def __init__(self, device: str):
+        super().__init__()
+        self.device = device
 
+    def run(self):
+        from adb_helper import screencap_png
+        code, data, err = screencap_png(self.device)
+        self.captured.emit(code, data, err)
 
-class ConnectListener:
-    """mDNS 监听 _adb-tls-connect，发现后通过 notifier 发出 host/port（用于 adb connect）。"""
-    def __init__(self, notifier: ConnectNotifier):
-        self.notifier = notifier
 
-    def add_service(self, zeroconf, service_type, name):
-        info = zeroconf.get_service_info(service_type, name)
-        if not info or not info.addresses:
-            return
-        host = socket.inet_ntoa(info.addresses[0])
-        port = info.port
-        self.notifier.connect_found.emit(host, port)
+class DeviceListThread(QThread):
+    """后台查询设备列表（adb devices -l，多 server 时并发），避免 adb server 启动或响应慢时卡住界面。"""
+    devices_ready = pyqtSignal(object)  # list[dict]，格式同 get_devices()
 
-    def remove_service(self, zeroconf, service_type, name):
-        pass
+    def run(self):
+        from adb_helper import get_devices
+        try:
+            devices = get_devices()
+        except Exception:
+            devices = []
+        self.devices_ready.emit(devices)
+        # 界面拿到结果后再回写本地缓存并核对设备指纹，不拖慢列表显示
+        from core.state_cache import revalidate_devices
+        revalidate_devices(devices)
 
-    def update_service(self, zeroconf, service_type, name):
-        pass
 
+class ListingThread(QThread):
+    """后台列出设备目录并回写本地缓存，结果带上路径，便于界面丢弃已离开目录的结果。"""
+    listed = pyqtSignal(str, object, object)  # 路径, list[DirEntry], 错误（None 表示成功）
 
-class ZeroconfConnectThread(QThread):
-    """在后台运行 zeroconf 监听连接服务 _adb-tls-connect，发现后由 notifier 发 host/port。"""
-    def __init__(self, notifier: ConnectNotifier):
+    def __init__(self, device: str, path: str):
         super().__init__()
-        self.notifier = notifier
+        self.device = device
+        self.path = path
+
+    def run(self):
+        from core.state_cache import fetch_listing
+        try:
+            entries, err = fetch_listing(self.device, self.path)
+        except Exception as e:
+            entries, err = [], str(e)
+        self.listed.emit(self.path, entries, err)
+
+
+class ReconnectThread(QThread):
+    """后台并发重连已知无线设备，每台结束时发 device_result，全部结束发 all_done。"""
+    device_result = pyqtSignal(str, bool, str)  # host:port, ok, msg
+    all_done = pyqtSignal(int, int)  # 成功数, 总数
+
+    def __init__(self, entries: list[dict], attempts: int = 4):
+        super().__init__()
+        self.entries = entries
+        self.attempts = attempts
         self._running = True
-        self._zc = None
 
     def run(self):
+        from core.device_registry import reconnect_all
+        results = reconnect_all(
+            self.entries,
+            attempts=self.attempts,
+            on_result=lambda e, ok, msg: self.device_result.emit(f"{e['host']}:{e['connect_port']}", ok, msg),
+            should_stop=lambda: not self._running,
+        )
+        self.all_done.emit(sum(1 for _, ok, _ in results if ok), len(results))
+
+    def stop(self):
+        self._running = False
+
+
+class DeviceTrackerThread(QThread):
+    """
+    跟踪一个 adb server 的设备变化：优先用 `adb track-devices -l` 长连接（有变化才推送），
+    adb 不支持或连接断开时退回定时 `adb devices -l` 轮询。每次变化发出该 server 的完整设备列表。
+    """
+    devices_changed = pyqtSignal(str, list)  # server, [{"serial", "status", "model"}, ...]
+
+    def __init__(self, server: str = "", poll_interval_ms: int = 3000):
+        super().__init__()
+        self.server = server
+        self.poll_interval_ms = poll_interval_ms
+        self._running = True
+        self._proc = None
+
+    def run(self):
+        from adb_helper import run_adb, parse_devices_output
+        tracking = True
+        while self._running:
+            if tracking:
+                if self._track():
+                    continue  # 长连接正常结束（server 重启等），立即重连
+                tracking = False  # 从未收到帧：该 adb 不支持，之后只轮询
+            code, out, err = run_adb("devices", "-l", server=self.server, timeout=10)
+            if code == 0 and self._running:
+                self.devices_changed.emit(self.server, parse_devices_output(out))
+            remaining = self.poll_interval_ms
+            while self._running and remaining > 0:
+                step = min(remaining, 100)
+                self.msleep(step)
+                remaining -= step
+
+    def _track(self) -> bool:
+        """读取 track-devices 推送：每帧为 4 位十六进制长度 + 设备列表。返回是否至少收到过一帧。"""
+        import subprocess
+        from adb_helper import popen_adb, parse_devices_output
         try:
-            from zeroconf import Zeroconf, ServiceBrowser
-            self._zc = Zeroconf()
-            listener = ConnectListener(self.notifier)
-            ServiceBrowser(
-                self._zc,
-                "_adb-tls-connect._tcp.local.",
-                listener,
+            self._proc = popen_adb(
+                "track-devices", "-l", server=self.server, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
             )
+        except (OSError, ValueError):
+            return False
+        got_frame = False
+        stream = self._proc.stdout
+        try:
             while self._running:
-                self.msleep(300)
-        except Exception:
-            pass
-        finally:
-            if self._zc is not None:
+                header = stream.read(4)
+                if len(header) < 4:
+                    break
                 try:
-                    self._zc.close()
-                except Exception:
-                    pass
-                self._zc = None
+                    size = int(header, 16)
+                except ValueError:
+                    break  # 不是 track-devices 帧格式
+                payload = stream.read(size).decode("utf-8", "replace") if size else ""
+                got_frame = True
+                # 帧内没有 "List of devices attached" 标题行，补上后复用同一解析
+                self.devices_changed.emit(self.server, parse_devices_output("List of devices attached\n" + payload))
+        finally:
+            self._kill()
+        return got_frame and self._running
+
+    def _kill(self):
+        proc, self._proc = self._proc, None
+        if proc and proc.poll() is None:
+            try:
+                proc.kill()
+                proc.wait(2)
+            except Exception:
+                pass
+
+    def stop(self):
+        self._running = False
+        self._kill()
+
+
+class BulkCommandThread(QThread):
+    """对多台设备并发执行同一操作 func(device) -> (code, out, err)，每台结束发 device_result。"""
+    device_result = pyqtSignal(str, int, str, str)
+    all_done = pyqtSignal(int, int)  # 成功数, 总数
+
+    def __init__(self, devices: list[str], func, max_workers: int = 16):
+        super().__init__()
+        self.devices = devices
+        self.func = func
+        self.max_workers = max_workers
+
+    def run(self):
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        ok = 0
+        if self.devices:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.devices))) as pool:
+                futures = {pool.submit(self.func, d): d for d in self.devices}
+                for fut in as_completed(futures):
+                    try:
+                        code, out, err = fut.result()
+                    except Exception as e:
+                        code, out, err = -1, "", str(e)
+                    ok += code == 0
+                    self.device_result.emit(futures[fut], code, out, err)
+        self.all_done.emit(ok, len(self.devices))
+
+
+class WorkflowThread(QThread):
+    """在后台执行 WorkflowRunner，步骤状态变化转成信号；stop 后正在执行的步骤结束即返回。"""
+    step_changed = pyqtSignal(str, str, str, object)  # serial, step_id, 状态, StepResult 或 None
+    run_finished = pyqtSignal(int, int)  # 成功设备数, 设备总数
+
+    def __init__(self, runner):
+        super().__init__()
+        self.runner = runner
+        runner.on_event = self.step_changed.emit
+
+    def stop(self):
+        self.runner.stop()
+
+    def run(self):
+        try:
+            self.runner.run()
+        finally:
+            devices = self.runner.devices
+            self.run_finished.emit(sum(1 for d in devices if self.runner.succeeded(d)), len(devices))
+
+
+class LinkBenchThread(QThread):
+    """多台设备并发链路测速（经共享调度器按设备排队），每台结束发 device_result，全部结束后写入历史。"""
+    device_progress = pyqtSignal(str, str)  # serial, 正在测的项目
+    device_result = pyqtSignal(object)  # LinkResult
+    all_done = pyqtSignal(int, int)  # 成功数, 总数
+
+    def __init__(self, devices: list[str], size: int, max_workers: int = 8):
+        super().__init__()
+        self.devices = devices
+        self.size = size
+        self.max_workers = max_workers
+        self._running = True
 
     def stop(self):
         self._running = False
+
+    def run(self):
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from core.link_bench import STOPPED, LinkResult, run_link_bench, save_results
+        from core.scheduler import get_scheduler
+        scheduler = get_scheduler()
+        should_stop = lambda: not self._running
+
+        def bench(device: str):
+            try:
+                return scheduler.run(
+                    device, run_link_bench, device, self.size, should_stop=should_stop,
+                    on_progress=lambda label: self.device_progress.emit(device, label),
+                )
+            except Exception as e:
+                return LinkResult(device, "", "", time.time(), error=str(e) or type(e).__name__)
+
+        results = []
+        if self.devices:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.devices))) as pool:
+                for fut in as_completed([pool.submit(bench, d) for d in self.devices]):
+                    result = fut.result()
+                    results.append(result)
+                    self.device_result.emit(result)
+        save_results([r for r in results if r.error != STOPPED])
+        self.all_done.emit(sum(1 for r in results if not r.error), len(self.devices))
+
+
+class LogPageThread(QThread):
+    """在后台取一页日志检索结果（第一页还要补建索引、确定候选块）。"""
+    page_ready = pyqtSignal(object, str)  # list[LogEntry], 错误信息
+
+    def __init__(self, search, count: int, budget: float = 0.3):
+        super().__init__()
+        self.search = search
+        self.count = count
+        self.budget = budget
+
+    def run(self):
+        try:
+            self.page_ready.emit(self.search.fetch(self.count, self.budget), "")
+        except Exception as e:
+            self.page_ready.emit([], str(e) or type(e).__name__)
+
+
+class AsyncBridge(QObject):
+    """
+    把 core.adb_async 的协程与异步流接到 Qt：协程跑在共享的后台事件循环里（一个线程承载任意多个
+    设备流），结果与流数据经信号回到本对象所在线程（通常是主线程）再调用回调。
+    """
+    _deliver = pyqtSignal(object, object)  # 回调, 参数
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._deliver.connect(lambda callback, value: callback(value))
+
+    def call(self, coro, callback=None):
+        """
+        执行协程；callback(result) 在主线程调用，协程抛出的异常作为 result 传入。
+        返回 concurrent.futures.Future，可 cancel()。
+        """
+        from core import adb_async
+        future = adb_async.submit(coro)
+        if callback is not None:
+            future.add_done_callback(lambda f: self._on_done(f, callback))
+        return future
+
+    def _on_done(self, future, callback):
+        if future.cancelled():
+            return
+        error = future.exception()
+        self._deliver.emit(callback, error if error is not None else future.result())
+
+    def stream(self, agen, on_items, on_done=None, batch_ms: int = 100):
+        """
+        消费异步迭代器（如 adb_async.logcat）：数据按 batch_ms 攒成列表后 on_items(list) 一次送达，
+        避免高频流逐行触发界面刷新；结束或出错时 on_done(异常或 None)。返回 Future，cancel() 即停止。
+        """
+        from core import adb_async
+
+        async def pump():
+            import asyncio
+            batch: list = []
+
+            async def flush_periodically():
+                while True:
+                    await asyncio.sleep(batch_ms / 1000)
+                    if batch:
+                        self._deliver.emit(on_items, batch[:])
+                        batch.clear()
+
+            flusher = asyncio.ensure_future(flush_periodically())
+            try:
+                async for item in agen:
+                    batch.append(item)
+            except asyncio.CancelledError:
+                batch.clear()  # 调用方已取消（接收方可能已销毁），剩余数据不再送达
+                raise
+            finally:
+                flusher.cancel()
+                if batch:
+                    self._deliver.emit(on_items, batch[:])
+                await agen.aclose()
+
+        future = adb_async.submit(pump())
+        if on_done is not None:
+            future.add_done_callback(
+                lambda f: self._deliver.emit(on_done, None if f.cancelled() else f.exception())
+            )
+        return future
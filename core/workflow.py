@@ -0,0 +1,441 @@
+# -*- coding: utf-8 -*-
+"""
+声明式工作流：用 JSON（或装了 PyYAML 时用 YAML）描述一组 adb 步骤及其依赖，
+在每台设备上按依赖图（DAG）执行——无依赖关系的步骤可并行，多台设备之间并发；
+步骤可重试、逐步计时，每完成一步写入状态文件，中断后可从未完成的步骤续跑。
+发往设备的命令经共享调度器（core.scheduler）按设备排队，不会与界面、控制接口等同时对一台设备安装/推送；
+sleep 与 wait_boot 的等待不占队列。
+
+    {
+      "name": "provision",
+      "vars": {"pkg": "com.example.app"},
+      "defaults": {"retries": 1, "timeout": 120},
+      "steps": [
+        {"id": "app",    "action": "install", "apk": "apks/app.apk"},
+        {"id": "assets", "action": "push", "local": "assets/", "remote": "/sdcard/assets/"},
+        {"id": "locale", "action": "setting", "namespace": "system", "key": "font_scale", "value": "1.0"},
+        {"id": "reboot", "action": "reboot", "needs": ["app", "assets", "locale"]},
+        {"id": "boot",   "action": "wait_boot", "needs": "reboot", "timeout": 180},
+        {"id": "verify", "action": "shell", "command": "pm path {pkg}", "expect": "package:", "needs": "boot"}
+      ]
+    }
+
+字符串参数中的 {serial} 与 vars 中的 {名称} 会被替换；相对路径相对于工作流文件所在目录。
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+import adb_helper
+from core.device_metadata import read_boot_id
+from core.scheduler import get_scheduler
+from core.storage import app_data_dir, write_json_atomic
+
+# 步骤状态
+PENDING = "pending"
+RUNNING = "running"
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"  # 依赖失败，未执行
+
+STATUS_LABELS = {
+    PENDING: "等待",
+    RUNNING: "执行中",
+    OK: "完成",
+    FAILED: "失败",
+    SKIPPED: "跳过",
+}
+
+_VAR_RE = re.compile(r"\{(\w+)\}")
+
+# 每种动作的必填参数
+_ACTION_PARAMS = {
+    "shell": ("command",),
+    "install": ("apk",),
+    "uninstall": ("package",),
+    "push": ("local", "remote"),
+    "pull": ("remote", "local"),
+    "setting": ("namespace", "key", "value"),
+    "reboot": (),
+    "wait_boot": (),
+    "sleep": ("seconds",),
+}
+# 参数中表示本地路径的字段，相对路径按工作流文件目录解析
+_LOCAL_PATH_PARAMS = ("apk", "local")
+_STEP_KEYS = ("id", "action", "needs", "retries", "retry_delay", "timeout", "name")
+
+
+class WorkflowError(ValueError):
+    """工作流文件格式错误或状态文件与工作流不匹配。"""
+
+
+class Step:
+    __slots__ = ("id", "action", "needs", "retries", "retry_delay", "timeout", "name", "params")
+
+    def __init__(self, spec: dict, defaults: dict):
+        self.id = str(spec["id"])
+        self.action = spec["action"]
+        needs = spec.get("needs") or []
+        self.needs: tuple = (needs,) if isinstance(needs, str) else tuple(str(n) for n in needs)
+        self.retries = int(spec.get("retries", defaults.get("retries", 0)))
+        self.retry_delay = float(spec.get("retry_delay", defaults.get("retry_delay", 2)))
+        self.timeout = int(spec.get("timeout", defaults.get("timeout", 120)))
+        self.name = str(spec.get("name") or self.id)
+        self.params = {k: v for k, v in spec.items() if k not in _STEP_KEYS}
+
+
+class Workflow:
+    """已校验的工作流：steps 已按依赖拓扑排序。"""
+
+    def __init__(self, spec: dict, base_dir: Path, name: str = ""):
+        if not isinstance(spec, dict) or not isinstance(spec.get("steps"), list) or not spec["steps"]:
+            raise WorkflowError("工作流需要非空的 steps 列表")
+        self.spec = spec
+        self.base_dir = Path(base_dir)
+        self.name = str(spec.get("name") or name or "workflow")
+        self.vars = {str(k): str(v) for k, v in (spec.get("vars") or {}).items()}
+        defaults = spec.get("defaults") or {}
+        steps: dict[str, Step] = {}
+        for raw in spec["steps"]:
+            if not isinstance(raw, dict) or not raw.get("id") or not raw.get("action"):
+                raise WorkflowError(f"步骤缺少 id 或 action：{raw!r}")
+            required = _ACTION_PARAMS.get(raw["action"])
+            if required is None:
+                raise WorkflowError(f"步骤 {raw['id']}：未知动作 {raw['action']}")
+            missing = [p for p in required if raw.get(p) in (None, "")]
+            if missing:
+                raise WorkflowError(f"步骤 {raw['id']}：缺少参数 {', '.join(missing)}")
+            try:
+                step = Step(raw, defaults)
+            except (TypeError, ValueError) as e:
+                raise WorkflowError(f"步骤 {raw['id']}：{e}")
+            if step.id in steps:
+                raise WorkflowError(f"步骤 id 重复：{step.id}")
+            steps[step.id] = step
+        for step in steps.values():
+            unknown = [n for n in step.needs if n not in steps]
+            if unknown:
+                raise WorkflowError(f"步骤 {step.id} 依赖了不存在的步骤：{', '.join(unknown)}")
+        self.steps = _topological_order(steps)
+        self.digest = hashlib.sha1(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def step(self, step_id: str) -> Step:
+        return next(s for s in self.steps if s.id == step_id)
+
+
+def _topological_order(steps: dict[str, Step]) -> list[Step]:
+    """按依赖排序（同层保持文件中的顺序），有环时报错。"""
+    order: list[Step] = []
+    done: set[str] = set()
+    remaining = list(steps.values())
+    while remaining:
+        ready = [s for s in remaining if all(n in done for n in s.needs)]
+        if not ready:
+            raise WorkflowError(f"步骤依赖存在环：{', '.join(s.id for s in remaining)}")
+        order.extend(ready)
+        done.update(s.id for s in ready)
+        remaining = [s for s in remaining if s.id not in done]
+    return order
+
+
+def load_workflow(path) -> Workflow:
+    """读取 .json / .yaml / .yml 工作流文件。"""
+    path = Path(path)
+    try:
+        text = path.read_text(encoding="utf-8")
+    except OSError as e:
+        raise WorkflowError(f"无法读取工作流文件：{e}")
+    if path.suffix.lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise WorkflowError("读取 YAML 工作流需要安装 PyYAML（pip install pyyaml），或改用 JSON")
+        try:
+            spec = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise WorkflowError(f"YAML 格式错误：{e}")
+    else:
+        try:
+            spec = json.loads(text)
+        except ValueError as e:
+            raise WorkflowError(f"JSON 格式错误：{e}")
+    return Workflow(spec, path.resolve().parent, name=path.stem)
+
+
+def default_state_path(workflow: Workflow) -> Path:
+    safe = re.sub(r"[^\w.-]", "_", workflow.name)
+    return app_data_dir() / "workflows" / f"{safe}.state.json"
+
+
+class StepResult(NamedTuple):
+    status: str
+    attempts: int = 0
+    seconds: float = 0.0
+    message: str = ""
+    finished_at: float = 0.0
+
+
+# (serial, step_id, status, result)；status 为 RUNNING 时 result 为 None
+EventCallback = Callable[[str, str, str, Optional[StepResult]], None]
+
+
+class WorkflowRunner:
+    """
+    :param devices: 目标设备序列号
+    :param state_path: 状态文件，默认在数据目录 workflows/ 下按工作流名称命名
+    :param resume: 读取状态文件，已完成的步骤不再执行；为 False 时重新开始
+    :param max_workers: 所有设备合计同时执行的步骤数
+    :param per_device: 每台设备同时执行的步骤数（无依赖关系的步骤才会并行；adb 命令仍按共享调度器排队）
+    :param on_event: 步骤状态变化回调，在调用 run 的线程中调用
+    """
+
+    def __init__(
+        self,
+        workflow: Workflow,
+        devices: list[str],
+        state_path: Optional[Path] = None,
+        resume: bool = False,
+        max_workers: int = 16,
+        per_device: int = 2,
+        on_event: Optional[EventCallback] = None,
+    ):
+        self.workflow = workflow
+        self.devices = list(dict.fromkeys(devices))
+        self.state_path = Path(state_path) if state_path else default_state_path(workflow)
+        self.max_workers = max(1, max_workers)
+        self.per_device = max(1, per_device)
+        self.on_event = on_event
+        self._stop = threading.Event()
+        self._boot_ids: dict[str, str] = {}  # 序列号 -> reboot 步骤执行前的 boot_id，供 wait_boot 确认确实重启过
+        self.results: dict[str, dict[str, StepResult]] = {d: {} for d in self.devices}
+        self.resumed: set[tuple[str, str]] = set()  # 从状态文件恢复、本次不再执行的 (serial, step_id)
+        if resume:
+            self._load_state()
+
+    # ---------- 状态文件 ----------
+
+    def _load_state(self):
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            raise WorkflowError(f"无法读取状态文件：{e}")
+        if state.get("digest") != self.workflow.digest:
+            raise WorkflowError("工作流文件在上次运行后已修改，无法续跑；请去掉续跑选项重新开始")
+        for serial, steps in (state.get("devices") or {}).items():
+            if serial not in self.results:
+                continue
+            for step_id, data in steps.items():
+                result = StepResult(**data)
+                if result.status == OK:
+                    self.results[serial][step_id] = result
+                    self.resumed.add((serial, step_id))
+
+    def _save_state(self):
+        devices = {
+            serial: {step_id: r._asdict() for step_id, r in steps.items()}
+            for serial, steps in self.results.items()
+        }
+        write_json_atomic(self.state_path, {
+            "workflow": self.workflow.name,
+            "digest": self.workflow.digest,
+            "updated_at": time.time(),
+            "devices": devices,
+        })
+
+    # ---------- 执行 ----------
+
+    def stop(self) -> None:
+        """不再启动新步骤，正在执行的步骤结束后 run 返回；未执行的步骤下次可续跑。"""
+        self._stop.set()
+
+    def run(self) -> dict[str, dict[str, StepResult]]:
+        """阻塞执行到全部结束（或 stop），返回 {serial: {step_id: StepResult}}。"""
+        for serial, steps in self.results.items():
+            for step_id, result in steps.items():
+                self._notify(serial, step_id, result.status, result)
+        running: dict[Future, tuple[str, Step]] = {}
+        busy = {d: 0 for d in self.devices}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="workflow") as pool:
+            while True:
+                if not self._stop.is_set():
+                    self._schedule(pool, running, busy)
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    serial, step = running.pop(fut)
+                    busy[serial] -= 1
+                    try:
+                        result = fut.result()
+                    except Exception as e:
+                        result = StepResult(FAILED, 0, 0.0, str(e), time.time())
+                    self._record(serial, step.id, result)
+        return self.results
+
+    def succeeded(self, serial: str) -> bool:
+        done = self.results.get(serial, {})
+        return all(done.get(s.id, StepResult(PENDING)).status == OK for s in self.workflow.steps)
+
+    def _schedule(self, pool: ThreadPoolExecutor, running: dict, busy: dict):
+        started = {(serial, step.id) for serial, step in running.values()}
+        for serial in self.devices:
+            done = self.results[serial]
+            for step in self.workflow.steps:
+                if step.id in done or (serial, step.id) in started:
+                    continue
+                states = [done[n].status if n in done else PENDING for n in step.needs]
+                if any(s in (FAILED, SKIPPED) for s in states):
+                    failed = [n for n, s in zip(step.needs, states) if s in (FAILED, SKIPPED)]
+                    self._record(serial, step.id, StepResult(
+                        SKIPPED, 0, 0.0, f"依赖未完成：{', '.join(failed)}", time.time()
+                    ))
+                    continue
+                if any(s != OK for s in states) or busy[serial] >= self.per_device:
+                    continue
+                busy[serial] += 1
+                started.add((serial, step.id))
+                self._notify(serial, step.id, RUNNING, None)
+                running[pool.submit(self._run_step, serial, step)] = (serial, step)
+
+    def _record(self, serial: str, step_id: str, result: StepResult):
+        self.results[serial][step_id] = result
+        try:
+            self._save_state()
+        except OSError:
+            pass  # 状态文件写不了不影响本次执行，只是无法续跑
+        self._notify(serial, step_id, result.status, result)
+
+    def _notify(self, serial: str, step_id: str, status: str, result: Optional[StepResult]):
+        if self.on_event:
+            try:
+                self.on_event(serial, step_id, status, result)
+            except Exception:
+                pass
+
+    def _run_step(self, serial: str, step: Step) -> StepResult:
+        started = time.monotonic()
+        attempts = 0
+        message = ""
+        while True:
+            attempts += 1
+            try:
+                ok, message = self._execute(serial, step)
+            except Exception as e:
+                ok, message = False, str(e)
+            if ok or attempts > step.retries or self._stop.is_set():
+                break
+            # 退避后重试：2s、4s、8s…
+            if self._stop.wait(step.retry_delay * (2 ** (attempts - 1))):
+                break
+        return StepResult(
+            OK if ok else FAILED, attempts, round(time.monotonic() - started, 3),
+            message.strip()[-2000:], time.time(),
+        )
+
+    # ---------- 动作 ----------
+
+    def _param(self, step: Step, name: str, serial: str, default=None):
+        value = step.params.get(name, default)
+        if not isinstance(value, str):
+            return value
+        variables = dict(self.workflow.vars, serial=serial)
+        value = _VAR_RE.sub(lambda m: variables.get(m.group(1), m.group(0)), value)
+        if name in _LOCAL_PATH_PARAMS:
+            path = Path(value)
+            value = str(path if path.is_absolute() else self.workflow.base_dir / path)
+        return value
+
+    def _execute(self, serial: str, step: Step) -> tuple[bool, str]:
+        if step.action == "wait_boot":
+            return self._wait_boot(serial, step.timeout)
+        if step.action == "sleep":
+            self._stop.wait(float(self._param(step, "seconds", serial)))
+            return not self._stop.is_set(), ""
+        return get_scheduler().run(serial, self._run_action, serial, step)
+
+    def _run_action(self, serial: str, step: Step) -> tuple[bool, str]:
+        """发往设备的步骤，在共享调度器的设备队列中执行。"""
+        action, timeout = step.action, step.timeout
+
+        def p(name: str, default=None):
+            return self._param(step, name, serial, default)
+
+        if action == "shell":
+            code, out, err = adb_helper.run_adb("shell", p("command"), device=serial, timeout=timeout)
+            expect = p("expect")
+            if code == 0 and expect and expect not in out:
+                return False, f"输出中未找到 {expect!r}\n{out}"
+            return code == 0, out if code == 0 else err or out
+        if action == "install":
+            args = ["install"]
+            if p("replace", True):
+                args.append("-r")
+            if p("grant", False):
+                args.append("-g")
+            code, out, err = adb_helper.run_adb(*args, p("apk"), device=serial, timeout=timeout)
+            # 旧版 adb 安装失败时返回码仍为 0，以输出中的 Failure 判断
+            ok = code == 0 and "Failure" not in out
+            return ok, out if ok else err or out
+        if action == "uninstall":
+            code, out, err = adb_helper.run_adb("uninstall", p("package"), device=serial, timeout=timeout)
+            return code == 0, out if code == 0 else err or out
+        if action == "push":
+            code, out, err = adb_helper.run_adb("push", p("local"), p("remote"), device=serial, timeout=timeout)
+            return code == 0, out if code == 0 else err or out
+        if action == "pull":
+            local = p("local")
+            Path(local).parent.mkdir(parents=True, exist_ok=True)
+            code, out, err = adb_helper.run_adb("pull", p("remote"), local, device=serial, timeout=timeout)
+            return code == 0, out if code == 0 else err or out
+        if action == "setting":
+            code, out, err = adb_helper.run_adb(
+                "shell", "settings", "put", p("namespace"), p("key"), str(p("value")),
+                device=serial, timeout=timeout,
+            )
+            return code == 0, out if code == 0 else err or out
+        if action == "reboot":
+            boot_id = read_boot_id(serial)
+            if boot_id:
+                self._boot_ids[serial] = boot_id
+            code, out, err = adb_helper.reboot(serial, p("mode", "") or "")
+            return code == 0, out if code == 0 else err or out
+        return False, f"未知动作：{action}"
+
+    def _wait_boot(self, serial: str, timeout: int) -> tuple[bool, str]:
+        """
+        轮询直到 sys.boot_completed=1。重启期间设备会短暂消失或被健康监控标记为离线，
+        查询失败时继续等待而不是判为失败。
+        本次执行过 reboot 时，先等设备掉线或 boot_id 变化，确认已经重启后才看 sys.boot_completed，
+        否则 reboot 刚发出、设备还没关机时旧系统上的 boot_completed=1 会让这一步立即通过。
+        """
+        before = self._boot_ids.get(serial, "")
+        rebooted = not before
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            code, out, _ = adb_helper.run_adb("get-state", device=serial, timeout=5)
+            if code == 0 and out.strip() == "device":
+                if not rebooted:
+                    boot_id = read_boot_id(serial, force=True)
+                    rebooted = bool(boot_id) and boot_id != before
+                if rebooted:
+                    code, out, _ = adb_helper.run_adb(
+                        "shell", "getprop", "sys.boot_completed", device=serial, timeout=5, force=True
+                    )
+                    if code == 0 and out.strip() == "1":
+                        self._boot_ids.pop(serial, None)
+                        return True, "开机完成"
+            else:
+                rebooted = True  # 设备已掉线，重启已经开始
+            if self._stop.wait(2):
+                return False, "已停止"
+        if not rebooted:
+            return False, f"设备在 {timeout}s 内没有重启"
+        return False, f"等待开机超时（{timeout}s）"
@@ -8,6 +8,8 @@ from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QGuiApplication, QIcon
 
+import adb_helper
+from core import profiling
 from ui.theme import apply_modern_theme
 from ui.main_window import MainWindow
 
@@ -43,7 +45,31 @@ def _enable_high_dpi():
         pass
 
 
+def _start_profiling(app: QApplication):
+    """GUI_ADB_PROFILE 开启时：界面线程定时心跳供卡顿监控使用，退出时写出剖析报告。"""
+    session = profiling.ProfilingSession.from_env()
+    if session is None:
+        return
+    profiling.set_session(session)
+    session.start()
+    if session.watchdog:
+        timer = QTimer(app)
+        timer.setTimerType(Qt.TimerType.PreciseTimer)
+        timer.setInterval(profiling.HEARTBEAT_INTERVAL_MS)
+        timer.timeout.connect(session.watchdog.heartbeat)
+        timer.start()
+
+    def _finish():
+        path = session.stop()
+        if path:
+            print(f"[GUI-ADB] 剖析报告：{path}", file=sys.stderr)
+
+    app.aboutToQuit.connect(_finish)
+
+
 if __name__ == "__main__":
+    # adb server 冷启动要 1～3 秒，与界面初始化并行进行
+    adb_helper.warm_up_server()
     _enable_high_dpi()
     app = QApplication(sys.argv)
     icon_path = _icon_path()
@@ -51,6 +77,7 @@ if __name__ == "__main__":
         app.setWindowIcon(QIcon(str(icon_path)))
     app.setStyle("Fusion")
     apply_modern_theme(app)
+    _start_profiling(app)
     win = MainWindow()
     win.show()
     sys.exit(app.exec())
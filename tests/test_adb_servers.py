@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+多 adb server：GUI_ADB_SERVERS 的容错解析，以及两个模拟 server（benchmarks/fake_adb_server.py）上的设备合并与命令路由。
+运行：python -m pytest tests（或 python -m unittest discover tests）。
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import adb_helper  # noqa: E402
+from core import adb_async  # noqa: E402
+from fake_adb_server import FakeAdbServer, FakeConfig  # noqa: E402
+
+
+class ServersFromEnvTest(unittest.TestCase):
+    def test_malformed_entries_are_skipped_with_warning(self):
+        env = dict(os.environ, GUI_ADB_SERVERS="5038, foo:bar ,:x,192.168.1.20:5037,70000,")
+        proc = subprocess.run(
+            [sys.executable, "-c", "import adb_helper; print(adb_helper.get_adb_servers())"],
+            cwd=ROOT, env=env, capture_output=True, text=True, timeout=30,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(proc.stdout.strip(), repr(["", "127.0.0.1:5038", "192.168.1.20:5037"]))
+        self.assertIn("foo:bar", proc.stderr)
+        self.assertIn(":x", proc.stderr)
+        self.assertIn("70000", proc.stderr)
+
+
+class MultiServerTest(unittest.TestCase):
+    """本机默认 server 经 ANDROID_ADB_SERVER_PORT 指向第一个模拟 server，不碰真实的 adb server。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.first = FakeAdbServer(FakeConfig(devices=2, serial_prefix="alpha"))
+        cls.second = FakeAdbServer(FakeConfig(devices=3, serial_prefix="beta"))
+        cls.first_port = cls.first.start_in_thread()
+        cls.second_port = cls.second.start_in_thread()
+        cls.second_server = f"127.0.0.1:{cls.second_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.first.stop()
+        cls.second.stop()
+
+    def setUp(self):
+        env = mock.patch.dict(os.environ, {"ANDROID_ADB_SERVER_PORT": str(self.first_port)})
+        env.start()
+        self.addCleanup(env.stop)
+        self.addCleanup(adb_helper.set_adb_servers, adb_helper.get_adb_servers()[1:])
+        adb_helper.set_adb_servers([self.second_server])
+
+    def test_native_device_lists_and_explicit_routing(self):
+        first = adb_async.run_sync(adb_async.devices(), 10)
+        second = adb_async.run_sync(adb_async.devices(self.second_server), 10)
+        self.assertEqual([d["serial"] for d in first], ["alpha-000", "alpha-001"])
+        self.assertEqual([d["serial"] for d in second], ["beta-000", "beta-001", "beta-002"])
+        code, out, _ = adb_async.run_sync(
+            adb_async.shell(f"beta-001@{self.second_server}", "getprop ro.serialno"), 10
+        )
+        self.assertEqual((code, out.strip()), (0, "beta-001"))
+        code, out, _ = adb_async.run_sync(adb_async.shell("alpha-001", "getprop ro.serialno"), 10)
+        self.assertEqual((code, out.strip()), (0, "alpha-001"))
+
+    @unittest.skipUnless(adb_helper._find_adb(), "需要 adb 可执行文件")
+    def test_get_devices_merges_and_routes(self):
+        devices = {d["serial"]: d["server"] for d in adb_helper.get_devices()}
+        self.assertEqual(devices, {
+            "alpha-000": "", "alpha-001": "",
+            "beta-000": self.second_server, "beta-001": self.second_server, "beta-002": self.second_server,
+        })
+        for serial, server in devices.items():
+            self.assertEqual(adb_helper.resolve_target(serial), (serial, server))
+            code, out, err = adb_helper.run_adb("shell", "getprop", "ro.serialno", device=serial, timeout=10)
+            self.assertEqual((code, out.strip()), (0, serial), err)
+            code, out, _ = adb_async.run_sync(adb_async.shell(serial, "getprop ro.serialno"), 10)
+            self.assertEqual((code, out.strip()), (0, serial))
+
+
+if __name__ == "__main__":
+    unittest.main()
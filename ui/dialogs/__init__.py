@@ -1,10 +1,40 @@
 # -*- coding: utf-8 -*-
-"""业务弹窗：扫码连接、手动连接、设备路径选择。"""
+"""
+业务弹窗：扫码连接、手动连接、设备路径选择、性能监控、屏幕预览、设备墙、工作流、诊断、传输队列、链路测速、日志采集、日志检索。
 
-from ui.dialogs.pairing_dialog import PairingDialog
-from ui.dialogs.manual_connect_dialog import ManualConnectDialog
-from ui.dialogs.device_path_dialog import DevicePathDialog
+弹窗模块在首次访问时才导入（`from ui import dialogs` 后用 `dialogs.PairingDialog`），
+不拖慢主窗口启动；`from ui.dialogs import PairingDialog` 写法仍然可用，只是会立即导入对应模块。
+"""
 
-from ui.dialogs.app_selection_dialog import AppSelectionDialog
+import importlib
 
-__all__ = ["PairingDialog", "ManualConnectDialog", "DevicePathDialog", "AppSelectionDialog"]
+_MODULES = {
+    "PairingDialog": "pairing_dialog",
+    "ManualConnectDialog": "manual_connect_dialog",
+    "DevicePathDialog": "device_path_dialog",
+    "AppSelectionDialog": "app_selection_dialog",
+    "PerfMonitorDialog": "perf_monitor_dialog",
+    "ScreenPreviewDialog": "screen_preview_dialog",
+    "DeviceFarmDialog": "device_farm_dialog",
+    "WorkflowDialog": "workflow_dialog",
+    "DiagnosticsDialog": "diagnostics_dialog",
+    "TransferDialog": "transfer_dialog",
+    "LinkBenchDialog": "link_bench_dialog",
+    "LogCaptureDialog": "log_capture_dialog",
+    "LogSearchDialog": "log_search_dialog",
+}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name: str):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
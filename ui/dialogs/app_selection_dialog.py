@@ -8,6 +8,7 @@ from PyQt6.QtWidgets import (
     QListWidget,
     QDialogButtonBox,
 )
+from PyQt6.QtCore import Qt
 
 class AppSelectionDialog(QDialog):
     """应用列表选择对话框，带搜索功能。"""
@@ -42,6 +43,16 @@ class AppSelectionDialog(QDialog):
         self.button_box.rejected.connect(self.reject)
         layout.addWidget(self.button_box)
 
+    def set_packages(self, packages):
+        """替换包列表（如后台刷新完成），保留当前的过滤条件与选中项。"""
+        current = self.selected_package()
+        self._all_packages = list(packages)
+        self._filter_list(self.search_edit.text())
+        if current:
+            matches = self.list_widget.findItems(current, Qt.MatchFlag.MatchExactly)
+            if matches:
+                self.list_widget.setCurrentItem(matches[0])
+
     def _filter_list(self, text):
         self.list_widget.clear()
         text = text.lower()
@@ -0,0 +1,502 @@
+# -*- coding: utf-8 -*-
+"""
+设备墙：表格模型 + 视图（只渲染可见行），按 adb server 跟踪设备增量更新，
+行信息懒加载缓存；支持分组、过滤、标签与多选批量操作（含工作流）。
+"""
+
+from PyQt6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QComboBox,
+    QPushButton,
+    QTableView,
+    QAbstractItemView,
+    QHeaderView,
+    QFileDialog,
+)
+from PyQt6.QtCore import (
+    Qt,
+    QAbstractTableModel,
+    QModelIndex,
+    QSortFilterProxyModel,
+    QTimer,
+    pyqtSignal,
+)
+
+from adb_helper import get_adb_servers, last_command_latency, server_label, shell, reboot, install_apk
+from core.device_info import DeviceInfoCache, DeviceTags, link_type
+from core.device_metadata import get_metadata_cache
+from core.scheduler import get_scheduler
+from core.workers import DeviceTrackerThread, BulkCommandThread
+from ui.widgets import CustomInputDialog
+from ui.dialogs.workflow_dialog import WorkflowDialog
+from ui.dialogs.link_bench_dialog import LinkBenchDialog
+
+_BAR_HEIGHT = 40
+
+COL_GROUP, COL_SERIAL, COL_STATE, COL_MODEL, COL_RELEASE, COL_BATTERY, COL_LINK, COL_SERVER, COL_LATENCY, COL_TAGS = range(10)
+_HEADERS = ("分组", "设备", "状态", "型号", "Android", "电量", "连接", "服务器", "延迟", "标签")
+
+# (显示名, 分组字段)
+GROUP_BY = (
+    ("不分组", ""),
+    ("服务器", "server"),
+    ("型号", "model"),
+    ("Android 版本", "release"),
+    ("连接方式", "link"),
+    ("状态", "status"),
+    ("标签", "tags"),
+)
+
+SORT_ROLE = Qt.ItemDataRole.UserRole + 1
+
+# 弹窗关闭时仍在执行的批量操作线程，保留引用直到结束，避免 QThread 运行中被回收
+_detached_bulk: set[BulkCommandThread] = set()
+
+
+def device_key(serial: str, server: str) -> str:
+    """命令用的设备标识：非默认 server 的设备写作 serial@server，由 adb_helper 路由到对应 server。"""
+    return f"{serial}@{server}" if server else serial
+
+
+class DeviceFarmModel(QAbstractTableModel):
+    """
+    设备表模型。设备列表按 server 增量合并（只发增删改的行信号，不整表重置）；
+    型号/版本/电量在视图请求该行数据时才懒加载（DeviceInfoCache），加载完成后只刷新该行。
+    """
+    _info_ready = pyqtSignal(str)  # 工作线程 -> 主线程
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[dict] = []
+        self._index: dict[str, int] = {}
+        self._group_by = ""
+        self.tags = DeviceTags()
+        self._info = DeviceInfoCache(on_ready=self._info_ready.emit)
+        self._info_ready.connect(self._on_info_ready)
+
+    # ---------- 数据更新 ----------
+
+    def apply_server_devices(self, server: str, devices: list[dict]) -> None:
+        """用某个 server 的最新设备列表更新模型。"""
+        incoming = {}
+        for d in devices:
+            key = device_key(d["serial"], server)
+            incoming[key] = {"key": key, "serial": d["serial"], "server": server,
+                             "status": d["status"], "adb_model": d.get("model", "")}
+        # 删除：从后往前删，行号不会错位
+        gone = sorted((r for k, r in self._index.items()
+                       if self._rows[r]["server"] == server and k not in incoming), reverse=True)
+        for row in gone:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            removed = self._rows.pop(row)
+            self.endRemoveRows()
+            self._invalidate(removed["key"])
+        if gone:
+            self._reindex()
+        # 更新
+        new_rows = []
+        for key, item in incoming.items():
+            row = self._index.get(key)
+            if row is None:
+                new_rows.append(item)
+                continue
+            current = self._rows[row]
+            if current["status"] != item["status"] or current["adb_model"] != item["adb_model"]:
+                if item["status"] != "device":
+                    self._invalidate(key)  # 离线/未授权后重新上线需要重新获取
+                current.update(item)
+                self._emit_row_changed(row)
+        # 新增：一次性插入
+        if new_rows:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_rows) - 1)
+            self._rows.extend(new_rows)
+            self._reindex()
+            self.endInsertRows()
+
+    def _invalidate(self, key: str):
+        self._info.invalidate(key)
+        get_metadata_cache().invalidate(key)
+
+    def _reindex(self):
+        self._index = {r["key"]: i for i, r in enumerate(self._rows)}
+
+    def _emit_row_changed(self, row: int, first: int = 0, last: int = len(_HEADERS) - 1):
+        self.dataChanged.emit(self.index(row, first), self.index(row, last))
+
+    def _on_info_ready(self, key: str):
+        row = self._index.get(key)
+        if row is not None:
+            self._emit_row_changed(row)
+
+    def refresh_volatile(self):
+        """电量、延迟会变化：通知视图重取这两列（视图只会重取可见行）。"""
+        if self._rows:
+            for col in (COL_BATTERY, COL_LATENCY):
+                self.dataChanged.emit(self.index(0, col), self.index(len(self._rows) - 1, col))
+
+    def refresh_row(self, key: str):
+        row = self._index.get(key)
+        if row is not None:
+            self._emit_row_changed(row)
+
+    def set_group_by(self, field: str):
+        self._group_by = field
+        if self._rows:
+            self.dataChanged.emit(self.index(0, COL_GROUP), self.index(len(self._rows) - 1, COL_GROUP))
+
+    def row_data(self, row: int) -> dict:
+        return self._rows[row]
+
+    def shutdown(self):
+        self._info.shutdown()
+
+    # ---------- 取值 ----------
+
+    def _info_for(self, item: dict, fetch: bool) -> dict:
+        if item["status"] != "device":
+            return {}
+        info = self._info.get(item["key"]) if fetch else self._info.peek(item["key"])
+        return info or {}
+
+    def field(self, item: dict, name: str, fetch: bool = False) -> str:
+        if name == "server":
+            return server_label(item["server"])
+        if name == "model":
+            return self._info_for(item, fetch).get("model") or item["adb_model"].replace("_", " ")
+        if name == "release":
+            return self._info_for(item, fetch).get("release", "")
+        if name == "link":
+            return link_type(item["serial"])
+        if name == "status":
+            return item["status"]
+        if name == "tags":
+            return ", ".join(self.tags.get(item["serial"]))
+        return ""
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return _HEADERS[section]
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self._rows[index.row()]
+        col = index.column()
+        if role == SORT_ROLE:
+            # 排序/分组只读缓存，不因为点一下表头就把几百台设备全部拉取一遍
+            return self._sort_key(item, col)
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if col == COL_GROUP:
+            return self.field(item, self._group_by, fetch=True) if self._group_by else ""
+        if col == COL_SERIAL:
+            return item["serial"]
+        if col == COL_STATE:
+            return item["status"]
+        if col == COL_MODEL:
+            return self.field(item, "model", fetch=True)
+        if col == COL_RELEASE:
+            info = self._info_for(item, fetch=True)
+            return f"{info['release']} (API {info['sdk']})" if info.get("release") else ""
+        if col == COL_BATTERY:
+            level = self._info_for(item, fetch=True).get("battery")
+            return "" if level is None else f"{level}%"
+        if col == COL_LINK:
+            return link_type(item["serial"])
+        if col == COL_SERVER:
+            return server_label(item["server"])
+        if col == COL_LATENCY:
+            latency = last_command_latency(item["key"])
+            return "" if latency is None else f"{latency * 1000:.0f} ms"
+        if col == COL_TAGS:
+            return self.field(item, "tags")
+        return None
+
+    def _sort_key(self, item: dict, col: int):
+        if col == COL_GROUP:
+            return self.field(item, self._group_by) if self._group_by else ""
+        if col == COL_BATTERY:
+            level = self._info_for(item, fetch=False).get("battery")
+            return -1 if level is None else level
+        if col == COL_LATENCY:
+            return last_command_latency(item["key"]) or 0.0
+        if col == COL_RELEASE:
+            info = self._info_for(item, fetch=False)
+            return info.get("sdk", 0)
+        names = {COL_SERIAL: "serial", COL_STATE: "status", COL_MODEL: "model",
+                 COL_LINK: "link", COL_SERVER: "server", COL_TAGS: "tags"}
+        name = names.get(col)
+        return item["serial"] if name == "serial" else self.field(item, name) if name else ""
+
+
+class DeviceFarmProxy(QSortFilterProxyModel):
+    """过滤只看序列号、server、已缓存的型号与标签，不触发懒加载。"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._text = ""
+        self.setSortRole(SORT_ROLE)
+        self.setDynamicSortFilter(True)
+
+    def set_filter_text(self, text: str):
+        self._text = text.strip().lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        if not self._text:
+            return True
+        model: DeviceFarmModel = self.sourceModel()
+        item = model.row_data(source_row)
+        haystack = " ".join((
+            item["serial"], item["server"], item["status"],
+            model.field(item, "model"), model.field(item, "tags"),
+        )).lower()
+        return self._text in haystack
+
+    def lessThan(self, left: QModelIndex, right: QModelIndex) -> bool:
+        a, b = left.data(SORT_ROLE), right.data(SORT_ROLE)
+        if type(a) is not type(b):
+            return str(a) < str(b)
+        return a < b
+
+
+class DeviceFarmDialog(QDialog):
+    """设备墙：非模态窗口，关闭时停止跟踪线程与后台获取。"""
+    log_step = pyqtSignal(str)
+    command_output = pyqtSignal(int, str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("设备墙")
+        self.setMinimumSize(960, 600)
+        self._trackers: list[DeviceTrackerThread] = []
+        self._bulk: BulkCommandThread | None = None
+        self._model = DeviceFarmModel(self)
+        self._proxy = DeviceFarmProxy(self)
+        self._proxy.setSourceModel(self._model)
+        self._setup_ui()
+        self._model.rowsInserted.connect(self._update_status)
+        self._model.rowsRemoved.connect(self._update_status)
+        self._volatile_timer = QTimer(self)
+        self._volatile_timer.setInterval(5000)
+        self._volatile_timer.timeout.connect(self._model.refresh_volatile)
+        self._volatile_timer.start()
+        self._start_tracking()
+
+    def _setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(16, 16, 16, 16)
+
+        row = QHBoxLayout()
+        row.setSpacing(8)
+        self._filter_edit = QLineEdit()
+        self._filter_edit.setPlaceholderText("过滤：序列号 / 型号 / 服务器 / 标签")
+        self._filter_edit.setFixedHeight(_BAR_HEIGHT)
+        self._filter_edit.textChanged.connect(self._proxy.set_filter_text)
+        row.addWidget(self._filter_edit, 1)
+        row.addWidget(QLabel("分组："))
+        self._group_combo = QComboBox()
+        self._group_combo.setFixedHeight(_BAR_HEIGHT)
+        for label, field in GROUP_BY:
+            self._group_combo.addItem(label, field)
+        self._group_combo.currentIndexChanged.connect(self._on_group_changed)
+        row.addWidget(self._group_combo)
+        layout.addLayout(row)
+
+        self._view = QTableView()
+        self._view.setModel(self._proxy)
+        self._view.setSortingEnabled(True)
+        self._view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self._view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self._view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self._view.verticalHeader().setVisible(False)
+        # 固定行高，视图不必为计算行高去读取每一行
+        self._view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self._view.verticalHeader().setDefaultSectionSize(28)
+        self._view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self._view.horizontalHeader().setStretchLastSection(True)
+        self._view.setColumnHidden(COL_GROUP, True)
+        self._view.selectionModel().selectionChanged.connect(self._update_status)
+        layout.addWidget(self._view, 1)
+
+        actions = QHBoxLayout()
+        actions.setSpacing(8)
+        for text, slot in (
+            ("Shell 命令", self._on_bulk_shell),
+            ("安装 APK", self._on_bulk_install),
+            ("重启", self._on_bulk_reboot),
+            ("工作流…", self._on_workflow),
+            ("链路测速", self._on_link_bench),
+            ("添加标签", self._on_add_tag),
+            ("移除标签", self._on_remove_tag),
+        ):
+            btn = QPushButton(text)
+            btn.setFixedHeight(_BAR_HEIGHT)
+            btn.clicked.connect(slot)
+            actions.addWidget(btn)
+        actions.addStretch()
+        btn_all = QPushButton("全选")
+        btn_all.setFixedHeight(_BAR_HEIGHT)
+        btn_all.clicked.connect(self._view.selectAll)
+        actions.addWidget(btn_all)
+        layout.addLayout(actions)
+
+        self._status = QLabel("正在获取设备…")
+        self._status.setObjectName("statusLabel")
+        layout.addWidget(self._status)
+
+    # ---------- 设备跟踪 ----------
+
+    def _start_tracking(self):
+        for server in get_adb_servers():
+            tracker = DeviceTrackerThread(server)
+            tracker.devices_changed.connect(self._model.apply_server_devices)
+            tracker.start()
+            self._trackers.append(tracker)
+
+    def _stop_tracking(self):
+        for tracker in self._trackers:
+            tracker.stop()
+        for tracker in self._trackers:
+            tracker.wait(3000)
+        self._trackers.clear()
+
+    # ---------- 分组 / 选择 ----------
+
+    def _on_group_changed(self, index: int):
+        field = self._group_combo.itemData(index)
+        self._model.set_group_by(field)
+        self._view.setColumnHidden(COL_GROUP, not field)
+        if field:
+            self._view.sortByColumn(COL_GROUP, Qt.SortOrder.AscendingOrder)
+
+    def _selected_items(self) -> list[dict]:
+        rows = self._view.selectionModel().selectedRows()
+        return [self._model.row_data(self._proxy.mapToSource(i).row()) for i in rows]
+
+    def _update_status(self, *_):
+        total = self._model.rowCount()
+        online = sum(1 for r in range(total) if self._model.row_data(r)["status"] == "device")
+        selected = len(self._view.selectionModel().selectedRows())
+        self._status.setText(f"共 {total} 台，在线 {online} 台，已选 {selected} 台")
+
+    def _require_selection(self, online_only: bool = True) -> list[dict]:
+        items = self._selected_items()
+        if online_only:
+            items = [i for i in items if i["status"] == "device"]
+        if not items:
+            self._status.setText("请先选择在线设备")
+        return items
+
+    # ---------- 批量操作 ----------
+
+    def _run_bulk(self, title: str, items: list[dict], func):
+        if self._bulk and self._bulk.isRunning():
+            self._status.setText("请等待当前批量操作完成")
+            return
+        keys = [i["key"] for i in items]
+        self.log_step.emit(f"设备墙：{title}（{len(keys)} 台）")
+        self._status.setText(f"{title}：执行中 0/{len(keys)}")
+        self._bulk_done = 0
+        # 经共享调度器按设备排队，与主窗口、控制接口对同一设备的操作互不干扰
+        scheduler = get_scheduler()
+        self._bulk = BulkCommandThread(keys, lambda d: scheduler.run(d, func, d))
+        self._bulk.device_result.connect(self._on_bulk_result)
+        self._bulk.all_done.connect(lambda ok, total: self._on_bulk_done(title, ok, total))
+        self._bulk.start()
+
+    def _on_bulk_result(self, key: str, code: int, out: str, err: str):
+        self._bulk_done += 1
+        self._model.refresh_row(key)
+        self.command_output.emit(code, f"[{key}]\n{out}" if out else "", f"[{key}] {err}" if err else "")
+        self._status.setText(f"执行中 {self._bulk_done}/{len(self._bulk.devices)}")
+
+    def _on_bulk_done(self, title: str, ok: int, total: int):
+        self._status.setText(f"{title}完成：成功 {ok}/{total}")
+        self.log_step.emit(f"设备墙：{title}完成，成功 {ok}/{total}")
+
+    def _on_bulk_shell(self):
+        items = self._require_selection()
+        if not items:
+            return
+        cmd, ok = CustomInputDialog.getText(self, "批量 Shell", f"在 {len(items)} 台设备上执行：")
+        if ok and cmd.strip():
+            self._run_bulk("Shell 命令", items, lambda d: shell(d, cmd.strip()))
+
+    def _on_bulk_install(self):
+        items = self._require_selection()
+        if not items:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "选择 APK", "", "APK (*.apk);;所有文件 (*)")
+        if path:
+            self._run_bulk("安装 APK", items, lambda d: install_apk(d, path))
+
+    def _on_bulk_reboot(self):
+        items = self._require_selection()
+        if items:
+            self._run_bulk("重启", items, reboot)
+
+    def _on_workflow(self):
+        items = self._require_selection()
+        if not items:
+            return
+        dlg = WorkflowDialog([i["key"] for i in items], self)
+        dlg.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.log_step.connect(self.log_step)
+        dlg.show()
+
+    def _on_link_bench(self):
+        items = self._require_selection()
+        if not items:
+            return
+        dlg = LinkBenchDialog([i["key"] for i in items], self)
+        dlg.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.log_step.connect(self.log_step)
+        dlg.show()
+
+    def _on_add_tag(self):
+        items = self._require_selection(online_only=False)
+        if not items:
+            return
+        tag, ok = CustomInputDialog.getText(self, "添加标签", f"给 {len(items)} 台设备添加标签：")
+        if ok and tag.strip():
+            self._model.tags.add([i["serial"] for i in items], tag.strip())
+            for i in items:
+                self._model.refresh_row(i["key"])
+
+    def _on_remove_tag(self):
+        items = self._require_selection(online_only=False)
+        if not items:
+            return
+        tag, ok = CustomInputDialog.getText(
+            self, "移除标签", f"从 {len(items)} 台设备移除标签：", ", ".join(self._model.tags.all_tags())
+        )
+        if ok and tag.strip():
+            self._model.tags.remove([i["serial"] for i in items], tag.strip())
+            for i in items:
+                self._model.refresh_row(i["key"])
+
+    def done(self, result: int):
+        self._volatile_timer.stop()
+        self._stop_tracking()
+        bulk, self._bulk = self._bulk, None
+        if bulk and bulk.isRunning():
+            bulk.device_result.disconnect()
+            bulk.all_done.disconnect()
+            _detached_bulk.add(bulk)
+            bulk.finished.connect(lambda b=bulk: _detached_bulk.discard(b))
+        self._model.shutdown()
+        super().done(result)
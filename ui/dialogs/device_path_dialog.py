@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 """设备路径浏览对话框：列出设备目录与文件，路径可编辑，可选文件或文件夹。"""
 
+import time
+from operator import itemgetter
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QDialog,
@@ -13,10 +15,15 @@ from PyQt6.QtWidgets import (
     QListWidgetItem,
     QWidget,
 )
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtGui import QFont
 
-from adb_helper import list_device_path
+from adb_helper import PARENT_ENTRY, DirEntry
+from core.state_cache import get_state_cache
+from core.workers import ListingThread
+
+# 弹窗关闭时仍在列目录的线程，保留引用直到结束，避免 QThread 运行中被回收
+_detached_listings: set[ListingThread] = set()
 
 
 def _norm_path(p: str) -> str:
@@ -25,6 +32,31 @@ def _norm_path(p: str) -> str:
     return p or "/"
 
 
+def _sorted_entries(entries: list[DirEntry]) -> list[DirEntry]:
+    """".." 最前，然后文件夹、文件，各自按名称（不区分大小写）排序。"""
+    # 先按名称排，再按是否目录稳定排序：第二次排序的键是 C 层的 itemgetter，比元组键快得多
+    ordered = sorted((e for e in entries if e is not PARENT_ENTRY), key=_lower_name)
+    ordered.sort(key=itemgetter(1), reverse=True)
+    if len(ordered) != len(entries):
+        ordered.insert(0, PARENT_ENTRY)
+    return ordered
+
+
+def _lower_name(e: DirEntry) -> str:
+    return e.name.lower()
+
+
+def _age_text(fetched_at: float) -> str:
+    seconds = max(0, int(time.time() - fetched_at))
+    if seconds < 60:
+        return f"{seconds} 秒"
+    if seconds < 3600:
+        return f"{seconds // 60} 分钟"
+    if seconds < 86400:
+        return f"{seconds // 3600} 小时"
+    return f"{seconds // 86400} 天"
+
+
 def _parent_path(p: str) -> str:
     """父路径。"""
     p = _norm_path(p)
@@ -46,6 +78,9 @@ class DevicePathDialog(QDialog):
         self._device = device
         self._mode = mode  # "pull" 可选文件或文件夹；"push" 选目标文件夹
         self._current_path = _norm_path(initial_path)
+        self._entries: list[DirEntry] = []
+        self._showing_cache = False
+        self._listings: list[ListingThread] = []
         self._selected_path: str | None = None
         self._selected_is_dir = True
         self.setWindowTitle("选择设备路径" if mode == "pull" else "选择目标文件夹")
@@ -89,6 +124,10 @@ class DevicePathDialog(QDialog):
         self._list.itemSelectionChanged.connect(self._on_selection_changed)
         layout.addWidget(self._list)
 
+        self._status = QLabel("")
+        self._status.setObjectName("statusLabel")
+        layout.addWidget(self._status)
+
         # 底部三个按钮（统一高度、最小宽度、间距，右对齐与上方控件对齐）
         btn_row = QHBoxLayout()
         btn_row.addStretch()
@@ -135,33 +174,61 @@ class DevicePathDialog(QDialog):
         self._navigate_to(parent)
 
     def _load_list(self):
-        self._list.clear()
-        entries, err = list_device_path(self._device, self._current_path)
+        """先显示本地缓存的列表（有的话），同时后台重新列目录，结果不同时再替换。"""
+        cache = get_state_cache()
+        cached = cache.get_listing(self._device, self._current_path) if cache is not None else None
+        self._showing_cache = cached is not None
+        if cached is not None:
+            entries, fetched_at = cached
+            self._show_entries(_sorted_entries(entries))
+            self._status.setText(f"显示 {_age_text(fetched_at)}前的缓存，正在刷新…")
+        else:
+            self._list.clear()
+            self._entries = []
+            self._status.setText("正在加载…")
+        thread = ListingThread(self._device, self._current_path)
+        thread.listed.connect(self._on_listed)
+        thread.finished.connect(lambda t=thread: self._listings.remove(t) if t in self._listings else None)
+        self._listings.append(thread)
+        thread.start()
+
+    def _on_listed(self, path: str, entries: list[DirEntry], err: str | None):
+        if path != self._current_path:
+            return  # 已经离开该目录
         if err:
-            self._list.addItem(QListWidgetItem(f"[错误] {err}"))
+            if self._showing_cache:
+                self._status.setText(f"刷新失败，显示的是缓存：{err}")
+            else:
+                self._list.clear()
+                self._entries = []
+                self._list.addItem(QListWidgetItem(f"[错误] {err}"))
+                self._status.setText("")
             return
-        # 文件夹在前，然后文件；".." 放最前
-        dirs = [e for e in entries if e["is_dir"] and e["name"] != ".."]
-        files = [e for e in entries if not e["is_dir"]]
-        up = [e for e in entries if e["name"] == ".."]
-        for e in up:
-            self._add_item(e)
-        for e in sorted(dirs, key=lambda x: x["name"].lower()):
-            self._add_item(e)
-        for e in sorted(files, key=lambda x: x["name"].lower()):
-            self._add_item(e)
-
-    def _add_item(self, entry: dict):
-        name = entry["name"]
-        is_dir = entry["is_dir"]
-        target = entry.get("target")
-        item = QListWidgetItem(("📁 " if is_dir else "📄 ") + name)
-        item.setData(Qt.ItemDataRole.UserRole, (name, is_dir, target))
-        self._list.addItem(item)
+        self._showing_cache = False
+        ordered = _sorted_entries(entries)
+        if ordered != self._entries:
+            self._show_entries(ordered)
+        self._status.setText(f"共 {len(ordered) - (1 if ordered and ordered[0] is PARENT_ENTRY else 0)} 项")
+
+    def _show_entries(self, entries: list[DirEntry]):
+        """替换列表内容，尽量保留当前选中的条目。"""
+        current = self._entry_at(self._list.currentItem())
+        self._list.clear()
+        # 条目按行号对应 self._entries；addItems 一次插入数万行比逐个建 QListWidgetItem 快一个数量级
+        self._entries = entries
+        self._list.addItems([("📁 " if e.is_dir else "📄 ") + e.name for e in entries])
+        if current is not None and current in entries:
+            self._list.setCurrentRow(entries.index(current))
+
+    def _entry_at(self, item: QListWidgetItem | None) -> DirEntry | None:
+        row = self._list.row(item) if item is not None else -1
+        return self._entries[row] if 0 <= row < len(self._entries) else None
 
     def _on_item_double_clicked(self, item: QListWidgetItem):
-        data = item.data(Qt.ItemDataRole.UserRole) or ("", False, None)
-        name, is_dir, target = data if len(data) >= 3 else (data[0], data[1], None)
+        entry = self._entry_at(item)
+        if entry is None:
+            return
+        name, is_dir, target = entry
         if name == "..":
             self._go_parent()
             return
@@ -174,11 +241,10 @@ class DevicePathDialog(QDialog):
             self._navigate_to(new_path)
 
     def _on_selection_changed(self):
-        item = self._list.currentItem()
-        if not item:
+        entry = self._entry_at(self._list.currentItem())
+        if entry is None:
             return
-        data = item.data(Qt.ItemDataRole.UserRole) or ("", False, None)
-        name, is_dir, target = data if len(data) >= 3 else (data[0], data[1], None)
+        name, is_dir, target = entry
         if name == "..":
             self._path_edit.setText(_parent_path(self._current_path))
             return
@@ -193,14 +259,20 @@ class DevicePathDialog(QDialog):
         path = self._norm(path or self._current_path)
         self._selected_path = path
         item = self._list.currentItem()
-        if item:
-            data = item.data(Qt.ItemDataRole.UserRole) or ("", True, None)
-            self._selected_is_dir = data[1] if len(data) >= 2 else True
-        else:
-            self._selected_is_dir = False
+        entry = self._entry_at(item)
+        self._selected_is_dir = entry.is_dir if entry is not None else item is not None
         self.path_selected.emit(path)
         self.accept()
 
+    def done(self, result: int):
+        for thread in self._listings:
+            if thread.isRunning():
+                thread.listed.disconnect()
+                _detached_listings.add(thread)
+                thread.finished.connect(lambda t=thread: _detached_listings.discard(t))
+        self._listings.clear()
+        super().done(result)
+
     def selected_path(self) -> str | None:
         """对话框关闭后，若用户点了「选择」则返回选中的路径，否则为 None。"""
         return self._selected_path
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""诊断弹窗：按操作 / 设备查看 adb 命令耗时分布与各阶段平均耗时，可导出 Prometheus 文本或 JSON。"""
+
+from PyQt6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QCheckBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QAbstractItemView,
+    QHeaderView,
+    QFileDialog,
+)
+from PyQt6.QtCore import Qt, QTimer
+
+from core import metrics, profiling
+
+_BAR_HEIGHT = 40
+_COLUMNS = ("操作", "设备", "次数", "失败", "P50", "P95", "最大", "阶段平均", "发送", "接收")
+_PHASE_LABELS = {
+    "spawn": "启动",
+    "wait": "等待",
+    "connect": "连接",
+    "handshake": "握手",
+    "transfer": "传输",
+    "decode": "解码",
+}
+
+
+def _format_ms(ms: float) -> str:
+    return f"{ms / 1000:.2f}s" if ms >= 1000 else f"{ms:.1f}ms"
+
+
+def _format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
+
+
+class _NumericItem(QTableWidgetItem):
+    """按数值排序的单元格。"""
+
+    def __init__(self, text: str, value: float):
+        super().__init__(text)
+        self.setData(Qt.ItemDataRole.UserRole, value)
+        self.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+
+    def __lt__(self, other):
+        return (self.data(Qt.ItemDataRole.UserRole) or 0) < (other.data(Qt.ItemDataRole.UserRole) or 0)
+
+
+class DiagnosticsDialog(QDialog):
+    """非模态窗口，每 2 秒刷新一次。"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("诊断：adb 命令耗时")
+        self.setMinimumSize(900, 480)
+        self._setup_ui()
+        self._timer = QTimer(self)
+        self._timer.setInterval(2000)
+        self._timer.timeout.connect(self._refresh)
+        self._timer.start()
+        self._refresh()
+
+    def _setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(16, 16, 16, 16)
+
+        self._enable_check = QCheckBox("记录每条 adb 命令的阶段耗时（也可用环境变量 GUI_ADB_METRICS=1 开启）")
+        self._enable_check.setChecked(metrics.is_enabled())
+        self._enable_check.toggled.connect(self._on_toggled)
+        layout.addWidget(self._enable_check)
+
+        self._table = QTableWidget(0, len(_COLUMNS))
+        self._table.setHorizontalHeaderLabels(_COLUMNS)
+        self._table.verticalHeader().setVisible(False)
+        self._table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self._table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self._table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self._table.horizontalHeader().setStretchLastSection(True)
+        self._table.setSortingEnabled(True)
+        layout.addWidget(self._table, 1)
+
+        actions = QHBoxLayout()
+        actions.setSpacing(8)
+        for text, slot in (
+            ("清空", self._on_reset),
+            ("导出 Prometheus…", lambda: self._on_export("prom")),
+            ("导出 JSON…", lambda: self._on_export("json")),
+        ):
+            btn = QPushButton(text)
+            btn.setFixedHeight(_BAR_HEIGHT)
+            btn.clicked.connect(slot)
+            actions.addWidget(btn)
+        actions.addStretch()
+        if profiling.get_session() is not None:
+            btn_profile = QPushButton("写出剖析报告")
+            btn_profile.setFixedHeight(_BAR_HEIGHT)
+            btn_profile.setToolTip("界面卡顿与剖析报告（GUI_ADB_PROFILE 开启时可用），退出时也会自动写出")
+            btn_profile.clicked.connect(self._on_profile_report)
+            actions.addWidget(btn_profile)
+        layout.addLayout(actions)
+
+        self._status = QLabel("")
+        self._status.setObjectName("statusLabel")
+        layout.addWidget(self._status)
+
+    def _on_toggled(self, checked: bool):
+        if checked:
+            metrics.enable()
+        else:
+            metrics.disable()
+        self._refresh()
+
+    def _on_reset(self):
+        metrics.get_registry().reset()
+        self._refresh()
+
+    def _on_export(self, kind: str):
+        suffix = "json" if kind == "json" else "prom"
+        path, _ = QFileDialog.getSaveFileName(
+            self, "导出指标", f"adb_metrics.{suffix}", "JSON (*.json)" if kind == "json" else "Prometheus (*.prom *.txt)"
+        )
+        if not path:
+            return
+        if kind == "json" and not path.lower().endswith(".json"):
+            path += ".json"
+        try:
+            metrics.export(path)
+            self._status.setText(f"已导出：{path}")
+        except OSError as e:
+            self._status.setText(f"导出失败：{e}")
+
+    def _on_profile_report(self):
+        try:
+            path = profiling.get_session().write_report()
+            self._status.setText(f"剖析报告已写出：{path}")
+        except OSError as e:
+            self._status.setText(f"写出失败：{e}")
+
+    def _refresh(self):
+        rows = metrics.get_registry().rows()
+        self._table.setSortingEnabled(False)
+        self._table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            phases = " · ".join(
+                f"{_PHASE_LABELS.get(p, p)} {_format_ms(ms)}" for p, ms in row["phase_avg_ms"].items()
+            )
+            cells = (
+                QTableWidgetItem(row["op"]),
+                QTableWidgetItem(row["device"]),
+                _NumericItem(str(row["count"]), row["count"]),
+                _NumericItem(str(row["errors"]), row["errors"]),
+                _NumericItem(_format_ms(row["p50_ms"]), row["p50_ms"]),
+                _NumericItem(_format_ms(row["p95_ms"]), row["p95_ms"]),
+                _NumericItem(_format_ms(row["max_ms"]), row["max_ms"]),
+                QTableWidgetItem(phases),
+                _NumericItem(_format_bytes(row["bytes_in"]), row["bytes_in"]),
+                _NumericItem(_format_bytes(row["bytes_out"]), row["bytes_out"]),
+            )
+            for c, item in enumerate(cells):
+                self._table.setItem(r, c, item)
+        self._table.setSortingEnabled(True)
+        total = sum(row["count"] for row in rows)
+        state = "记录中" if metrics.is_enabled() else "未开启"
+        self._status.setText(f"{state}：共 {total} 条命令，{len(rows)} 组")
+
+    def done(self, result: int):
+        self._timer.stop()
+        super().done(result)
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""链路测速弹窗：对选中的设备并发测量延迟、上下行吞吐与 sync 速率，与历史比较，查看历史记录与各 USB 端口汇总。"""
+
+import time
+
+from PyQt6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QComboBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QAbstractItemView,
+    QHeaderView,
+)
+from PyQt6.QtCore import pyqtSignal
+
+from core.link_bench import (
+    STOPPED,
+    LinkResult,
+    clear_history,
+    compare_with_history,
+    format_rate,
+    load_history,
+    port_summary,
+)
+from core.workers import LinkBenchThread
+
+_BAR_HEIGHT = 40
+_COLUMNS = ("设备", "连接", "端口", "往返延迟", "命令延迟", "下行", "上行", "sync 推送", "sync 拉取", "结果")
+_HISTORY_COLUMNS = ("时间",) + _COLUMNS[:-1]
+_HISTORY_ROWS = 200
+_SIZES = (("4 MB", 4), ("16 MB", 16), ("64 MB", 64))
+
+# 弹窗关闭时仍在测速的线程，保留引用直到结束
+_detached_benches: set[LinkBenchThread] = set()
+
+
+def _metric_texts(result: LinkResult) -> list[str]:
+    rtt = f"{result.rtt_ms:.1f} / {result.rtt_p95_ms:.1f}ms" if result.rtt_ms else ""
+    return [
+        result.serial,
+        result.link,
+        result.port,
+        rtt,
+        f"{result.command_ms:.0f}ms" if result.command_ms else "",
+        *(format_rate(v) if v else "" for v in (result.download, result.upload, result.sync_push, result.sync_pull)),
+    ]
+
+
+class LinkBenchDialog(QDialog):
+    """非模态窗口；关闭时停止测速，正在进行的一项结束后线程退出。"""
+    log_step = pyqtSignal(str)
+
+    def __init__(self, devices: list[str], parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("链路测速")
+        self.setMinimumSize(980, 560)
+        self._devices = devices
+        self._rows = {serial: r for r, serial in enumerate(devices)}
+        self._thread: LinkBenchThread | None = None
+        self._setup_ui()
+        self._load_history()
+
+    def _setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(16, 16, 16, 16)
+
+        row = QHBoxLayout()
+        row.setSpacing(8)
+        row.addWidget(QLabel("吞吐测试数据量"))
+        self._size_combo = QComboBox()
+        for text, mb in _SIZES:
+            self._size_combo.addItem(text, mb)
+        self._size_combo.setCurrentIndex(1)
+        self._size_combo.setFixedHeight(_BAR_HEIGHT)
+        row.addWidget(self._size_combo)
+        row.addStretch()
+        self._btn_stop = QPushButton("停止")
+        self._btn_stop.setFixedHeight(_BAR_HEIGHT)
+        self._btn_stop.setEnabled(False)
+        self._btn_stop.clicked.connect(self._on_stop)
+        row.addWidget(self._btn_stop)
+        self._btn_start = QPushButton("开始测试")
+        self._btn_start.setObjectName("btnPrimary")
+        self._btn_start.setFixedHeight(_BAR_HEIGHT)
+        self._btn_start.setEnabled(bool(self._devices))
+        self._btn_start.clicked.connect(self._on_start)
+        row.addWidget(self._btn_start)
+        layout.addLayout(row)
+
+        self._table = self._make_table(_COLUMNS, len(self._devices))
+        for serial, r in self._rows.items():
+            for c in range(len(_COLUMNS)):
+                self._table.setItem(r, c, QTableWidgetItem(serial if c == 0 else ""))
+        layout.addWidget(self._table, 1)
+
+        history_bar = QHBoxLayout()
+        history_bar.setSpacing(8)
+        history_bar.addWidget(QLabel("历史记录（最近在前）"))
+        history_bar.addStretch()
+        btn_clear = QPushButton("清空历史")
+        btn_clear.setFixedHeight(_BAR_HEIGHT)
+        btn_clear.clicked.connect(self._on_clear_history)
+        history_bar.addWidget(btn_clear)
+        layout.addLayout(history_bar)
+
+        self._history_table = self._make_table(_HISTORY_COLUMNS, 0)
+        layout.addWidget(self._history_table, 1)
+
+        self._ports_label = QLabel("")
+        self._ports_label.setWordWrap(True)
+        layout.addWidget(self._ports_label)
+
+        self._status = QLabel(f"将测试 {len(self._devices)} 台设备" if self._devices else "没有在线设备")
+        self._status.setObjectName("statusLabel")
+        layout.addWidget(self._status)
+
+    @staticmethod
+    def _make_table(columns: tuple, rows: int) -> QTableWidget:
+        table = QTableWidget(rows, len(columns))
+        table.setHorizontalHeaderLabels(list(columns))
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        header = table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        header.setStretchLastSection(True)
+        return table
+
+    # ---------- 测试 ----------
+
+    def _on_start(self):
+        if self._thread and self._thread.isRunning():
+            return
+        size = self._size_combo.currentData() * 1024 * 1024
+        for r in self._rows.values():
+            for c in range(1, len(_COLUMNS)):
+                self._table.item(r, c).setText("")
+                self._table.item(r, c).setToolTip("")
+        self._history = load_history()
+        self._finished = 0
+        self._thread = LinkBenchThread(self._devices, size)
+        self._thread.device_progress.connect(self._on_progress)
+        self._thread.device_result.connect(self._on_result)
+        self._thread.all_done.connect(self._on_all_done)
+        self._btn_start.setEnabled(False)
+        self._btn_stop.setEnabled(True)
+        self._status.setText(f"测试中 0/{len(self._devices)}")
+        self.log_step.emit(f"链路测速：{len(self._devices)} 台设备，数据量 {self._size_combo.currentText()}")
+        self._thread.start()
+
+    def _on_stop(self):
+        if self._thread:
+            self._thread.stop()
+            self._btn_stop.setEnabled(False)
+            self._status.setText("正在停止（当前一项结束后退出）…")
+
+    def _on_progress(self, serial: str, label: str):
+        row = self._rows.get(serial)
+        if row is not None:
+            self._table.item(row, len(_COLUMNS) - 1).setText(f"正在测：{label}")
+
+    def _on_result(self, result: LinkResult):
+        self._finished += 1
+        row = self._rows.get(result.serial)
+        if row is None:
+            return
+        for c, text in enumerate(_metric_texts(result)):
+            self._table.item(row, c).setText(text)
+        notes = [] if result.error else compare_with_history(result, self._history)
+        if result.error:
+            verdict = f"失败：{result.error}" if result.error != STOPPED else STOPPED
+        elif notes:
+            verdict = "比历史变差：" + "；".join(notes)
+            self.log_step.emit(f"链路测速：{result.serial} {verdict}")
+        else:
+            verdict = "正常" if any(r.serial == result.serial for r in self._history) else "完成（首次测试）"
+        cell = self._table.item(row, len(_COLUMNS) - 1)
+        cell.setText(verdict)
+        cell.setToolTip(verdict)
+        self._status.setText(f"测试中 {self._finished}/{len(self._devices)}")
+
+    def _on_all_done(self, ok: int, total: int):
+        self._btn_start.setEnabled(True)
+        self._btn_stop.setEnabled(False)
+        self._status.setText(f"测试完成：成功 {ok}/{total}")
+        self.log_step.emit(f"链路测速完成：成功 {ok}/{total}")
+        self._load_history()
+
+    # ---------- 历史 ----------
+
+    def _load_history(self):
+        history = load_history()
+        recent = history[::-1][:_HISTORY_ROWS]
+        self._history_table.setRowCount(len(recent))
+        for r, result in enumerate(recent):
+            stamp = time.strftime("%m-%d %H:%M", time.localtime(result.timestamp))
+            for c, text in enumerate([stamp] + _metric_texts(result)):
+                self._history_table.setItem(r, c, QTableWidgetItem(text))
+            if result.error:
+                self._history_table.item(r, 0).setToolTip(result.error)
+        ports = port_summary(history)
+        if ports:
+            parts = [f"{port}：{count} 次，下行 {format_rate(down)}，上行 {format_rate(up)}" for port, count, down, up in ports]
+            self._ports_label.setText("各 USB 端口中位数（慢的在前）：" + "；".join(parts))
+        else:
+            self._ports_label.setText("")
+
+    def _on_clear_history(self):
+        clear_history()
+        self._load_history()
+
+    def done(self, result: int):
+        thread, self._thread = self._thread, None
+        if thread and thread.isRunning():
+            thread.stop()
+            thread.device_progress.disconnect()
+            thread.device_result.disconnect()
+            thread.all_done.disconnect()
+            _detached_benches.add(thread)
+            thread.finished.connect(lambda t=thread: _detached_benches.discard(t))
+        super().done(result)
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+日志采集弹窗：选择设备开始/停止后台 logcat 采集，设置目录、压缩方式与轮转、保留上限，查看各设备写入速率与磁盘占用；
+选中一台设备时下方实时预览它的 logcat（经 AsyncBridge 跑在共享事件循环上，不另开线程）。
+"""
+
+from PyQt6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QComboBox,
+    QSpinBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QAbstractItemView,
+    QHeaderView,
+    QFileDialog,
+    QPlainTextEdit,
+)
+from PyQt6.QtCore import QTimer, QUrl, pyqtSignal
+from PyQt6.QtGui import QDesktopServices, QFont
+
+from core import adb_async
+from core.workers import AsyncBridge
+from core.logcat_capture import GZIP, STATE_LABELS, ZSTD, device_dir_name, get_capture_service, zstd_available
+
+_BAR_HEIGHT = 40
+_COLUMNS = ("设备", "状态", "写入速率", "行数", "文件", "磁盘占用", "当前文件", "重连")
+_MB = 1024 * 1024
+_PREVIEW_LINES = 2000  # 预览区保留的行数
+_PREVIEW_BACKLOG = "200"  # 开始预览时先显示最近的行数（logcat -T）
+
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return ""
+
+
+class LogCaptureDialog(QDialog):
+    """非模态窗口；关闭不影响采集，采集在后台持续到手动停止或程序退出（下次启动自动恢复）。"""
+    log_step = pyqtSignal(str)
+
+    def __init__(self, devices: list[str], parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("日志采集")
+        self.setMinimumSize(900, 460)
+        self._service = get_capture_service()
+        self._devices = devices
+        self._rows: dict[str, int] = {}
+        self._bridge = AsyncBridge(self)
+        self._preview = None  # 预览流的 Future
+        self._preview_serial = ""
+        self._setup_ui()
+        self._timer = QTimer(self)
+        self._timer.setInterval(1000)
+        self._timer.timeout.connect(self._refresh)
+        self._timer.start()
+        self._refresh()
+
+    def _setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(16, 16, 16, 16)
+        settings = self._service.settings
+
+        row = QHBoxLayout()
+        row.setSpacing(8)
+        self._dir_edit = QLineEdit(settings.directory)
+        self._dir_edit.setPlaceholderText(f"默认：{settings.root()}")
+        self._dir_edit.setFixedHeight(_BAR_HEIGHT)
+        self._dir_edit.editingFinished.connect(self._apply_settings)
+        row.addWidget(self._dir_edit, 1)
+        btn_browse = QPushButton("选择…")
+        btn_browse.setFixedHeight(_BAR_HEIGHT)
+        btn_browse.clicked.connect(self._on_browse)
+        row.addWidget(btn_browse)
+        btn_open = QPushButton("打开目录")
+        btn_open.setFixedHeight(_BAR_HEIGHT)
+        btn_open.clicked.connect(self._on_open_dir)
+        row.addWidget(btn_open)
+        layout.addLayout(row)
+
+        row = QHBoxLayout()
+        row.setSpacing(8)
+        row.addWidget(QLabel("压缩"))
+        self._compression_combo = QComboBox()
+        self._compression_combo.addItem("gzip", GZIP)
+        if zstd_available():
+            self._compression_combo.addItem("zstd", ZSTD)
+        self._compression_combo.setCurrentIndex(max(0, self._compression_combo.findData(settings.compression)))
+        self._compression_combo.setFixedHeight(_BAR_HEIGHT)
+        self._compression_combo.currentIndexChanged.connect(self._apply_settings)
+        row.addWidget(self._compression_combo)
+        row.addWidget(QLabel("每个文件最多"))
+        self._rotate_mb_spin = self._spin(1, 4096, settings.rotate_bytes // _MB)
+        row.addWidget(self._rotate_mb_spin)
+        row.addWidget(QLabel("MB（未压缩）或"))
+        self._rotate_min_spin = self._spin(1, 24 * 60, settings.rotate_seconds // 60)
+        row.addWidget(self._rotate_min_spin)
+        row.addWidget(QLabel("分钟，每台设备保留"))
+        self._keep_mb_spin = self._spin(16, 1024 * 1024, settings.keep_bytes // _MB)
+        self._keep_mb_spin.setSingleStep(256)
+        row.addWidget(self._keep_mb_spin)
+        row.addWidget(QLabel("MB"))
+        row.addStretch()
+        layout.addLayout(row)
+
+        self._table = QTableWidget(0, len(_COLUMNS))
+        self._table.setHorizontalHeaderLabels(list(_COLUMNS))
+        self._table.verticalHeader().setVisible(False)
+        self._table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self._table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        header = self._table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        header.setStretchLastSection(True)
+        self._table.itemSelectionChanged.connect(self._on_selection_changed)
+        layout.addWidget(self._table, 1)
+
+        self._preview_label = QLabel("实时预览：在表格中选中一台设备")
+        layout.addWidget(self._preview_label)
+        self._preview_text = QPlainTextEdit()
+        self._preview_text.setReadOnly(True)
+        self._preview_text.setMaximumBlockCount(_PREVIEW_LINES)
+        self._preview_text.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self._preview_text.setFont(QFont("Consolas", 9))
+        self._preview_text.setMinimumHeight(160)
+        layout.addWidget(self._preview_text, 1)
+
+        actions = QHBoxLayout()
+        actions.setSpacing(8)
+        btn_stop = QPushButton("停止")
+        btn_stop.setFixedHeight(_BAR_HEIGHT)
+        btn_stop.clicked.connect(self._on_stop)
+        actions.addWidget(btn_stop)
+        btn_stop_all = QPushButton("全部停止")
+        btn_stop_all.setFixedHeight(_BAR_HEIGHT)
+        btn_stop_all.clicked.connect(self._on_stop_all)
+        actions.addWidget(btn_stop_all)
+        actions.addStretch()
+        btn_start = QPushButton("开始采集")
+        btn_start.setObjectName("btnPrimary")
+        btn_start.setFixedHeight(_BAR_HEIGHT)
+        btn_start.clicked.connect(self._on_start)
+        actions.addWidget(btn_start)
+        layout.addLayout(actions)
+
+        self._status = QLabel("")
+        self._status.setObjectName("statusLabel")
+        layout.addWidget(self._status)
+
+    def _spin(self, low: int, high: int, value: int) -> QSpinBox:
+        spin = QSpinBox()
+        spin.setRange(low, high)
+        spin.setValue(max(low, min(high, value)))
+        spin.setFixedHeight(_BAR_HEIGHT)
+        spin.editingFinished.connect(self._apply_settings)
+        return spin
+
+    # ---------- 设置 ----------
+
+    def _apply_settings(self):
+        try:
+            self._service.set_settings(
+                directory=self._dir_edit.text().strip(),
+                compression=self._compression_combo.currentData(),
+                rotate_bytes=self._rotate_mb_spin.value() * _MB,
+                rotate_seconds=self._rotate_min_spin.value() * 60,
+                keep_bytes=self._keep_mb_spin.value() * _MB,
+            )
+        except ValueError as e:
+            self._status.setText(str(e))
+
+    def _on_browse(self):
+        path = QFileDialog.getExistingDirectory(self, "选择日志保存目录", str(self._service.settings.root()))
+        if path:
+            self._dir_edit.setText(path)
+            self._apply_settings()
+
+    def _on_open_dir(self):
+        root = self._service.settings.root()
+        root.mkdir(parents=True, exist_ok=True)
+        QDesktopServices.openUrl(QUrl.fromLocalFile(str(root)))
+
+    # ---------- 采集 ----------
+
+    def _selected_serials(self) -> list[str]:
+        rows = {index.row() for index in self._table.selectionModel().selectedRows()}
+        return [serial for serial, row in self._rows.items() if row in rows]
+
+    def _on_start(self):
+        serials = self._selected_serials()
+        if not serials:
+            self._status.setText("请先在表格中选择设备")
+            return
+        self._apply_settings()
+        for serial in serials:
+            self._service.start(serial)
+        self.log_step.emit(f"开始采集 logcat：{', '.join(serials)} → {self._service.settings.root()}")
+        self._refresh()
+
+    def _on_stop(self):
+        serials = [s for s in self._selected_serials() if s in self._service.active()]
+        for serial in serials:
+            self._service.stop(serial)
+        if serials:
+            self.log_step.emit(f"停止采集 logcat：{', '.join(serials)}")
+        self._refresh()
+
+    def _on_stop_all(self):
+        serials = self._service.active()
+        for serial in serials:
+            self._service.stop(serial)
+        if serials:
+            self.log_step.emit(f"停止采集 logcat：{', '.join(serials)}")
+        self._refresh()
+
+    # ---------- 实时预览 ----------
+
+    def _on_selection_changed(self):
+        serials = self._selected_serials()
+        serial = serials[0] if len(serials) == 1 else ""
+        if serial == self._preview_serial:
+            return
+        self._stop_preview()
+        self._preview_text.clear()
+        self._preview_serial = serial
+        if not serial:
+            self._preview_label.setText("实时预览：在表格中选中一台设备")
+            return
+        self._preview_label.setText(f"实时预览：{serial}")
+        self._preview = self._bridge.stream(
+            adb_async.logcat(serial, "-v", "threadtime", "-T", _PREVIEW_BACKLOG),
+            lambda lines, s=serial: self._on_preview_lines(s, lines),
+            lambda error, s=serial: self._on_preview_done(s, error),
+        )
+
+    def _on_preview_lines(self, serial: str, lines: list):
+        if serial == self._preview_serial:
+            self._preview_text.appendPlainText("\n".join(lines))
+
+    def _on_preview_done(self, serial: str, error):
+        if serial == self._preview_serial and self._preview is not None and not self._preview.cancelled():
+            self._preview_label.setText(f"实时预览：{serial} 已断开" + (f"（{error}）" if error else ""))
+
+    def _stop_preview(self):
+        preview, self._preview = self._preview, None
+        if preview is not None:
+            preview.cancel()
+
+    def done(self, result: int):
+        self._stop_preview()
+        self._preview_serial = ""
+        super().done(result)
+
+    def _refresh(self):
+        stats = {s.serial: s for s in self._service.stats()}
+        for serial in [*self._devices, *stats]:
+            if serial not in self._rows:
+                row = self._table.rowCount()
+                self._table.insertRow(row)
+                self._rows[serial] = row
+                for c in range(len(_COLUMNS)):
+                    self._table.setItem(row, c, QTableWidgetItem(serial if c == 0 else ""))
+        total_rate = total_disk = 0
+        for serial, row in self._rows.items():
+            s = stats.get(serial)
+            if s is None:
+                values = ("", "未采集", "", "", "", "", "", "")
+                tip = ""
+            else:
+                total_rate += s.rate
+                total_disk += s.disk_bytes
+                values = (
+                    serial,
+                    STATE_LABELS.get(s.state, s.state),
+                    f"{_fmt_bytes(s.rate)}/s" if s.rate else "",
+                    str(s.lines) if s.lines else "",
+                    str(s.files),
+                    _fmt_bytes(s.disk_bytes),
+                    s.current_file,
+                    str(s.reconnects) if s.reconnects else "",
+                )
+                tip = s.error
+            for c, text in enumerate(values[1:], start=1):
+                self._table.item(row, c).setText(text)
+            self._table.item(row, 1).setToolTip(tip)
+            self._table.item(row, 6).setToolTip(
+                str(self._service.settings.root() / device_dir_name(serial) / s.current_file) if s and s.current_file else ""
+            )
+        active = len(self._service.active())
+        self._status.setText(
+            f"采集中 {active} 台，合计写入 {_fmt_bytes(total_rate)}/s，占用 {_fmt_bytes(total_disk)}" if active
+            else f"未在采集，已有日志占用 {_fmt_bytes(total_disk)}"
+        )
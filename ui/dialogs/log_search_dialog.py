@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""日志检索弹窗：在采集下来的 logcat 归档中按 tag / pid / 级别 / 文本 / 时间查询，结果随滚动分页加载。"""
+
+import time
+
+from PyQt6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QComboBox,
+    QCheckBox,
+    QPushButton,
+    QTableView,
+    QAbstractItemView,
+    QApplication,
+)
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, pyqtSignal
+
+from core.log_archive import LogEntry, LogSearch, archived_devices, parse_query
+from core.logcat_capture import device_dir_name, get_capture_service
+from core.workers import LogPageThread
+
+_BAR_HEIGHT = 40
+_HEADERS = ("时间", "PID", "TID", "级别", "Tag", "消息")
+_PAGE_SIZE = 500
+_EXAMPLE = "tag:ActivityManager level>=W pid:1234 'ANR' last 2h"
+
+# 弹窗关闭或重新查询时仍在取页的线程，保留引用直到结束
+_detached_pages: set[LogPageThread] = set()
+
+
+def _detach(thread: LogPageThread) -> None:
+    thread.page_ready.disconnect()
+    if thread.isRunning():
+        _detached_pages.add(thread)
+        thread.finished.connect(lambda t=thread: _detached_pages.discard(t))
+
+
+class LogResultModel(QAbstractTableModel):
+    """
+    检索结果模型：视图滚到底部时 canFetchMore/fetchMore 在后台线程取下一页并追加，
+    已取到的行留在内存里，之前的页不会重新解压。
+    """
+    page_loaded = pyqtSignal(int, str)  # 本页条数, 错误信息
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[LogEntry] = []
+        self._search: LogSearch | None = None
+        self._thread: LogPageThread | None = None
+
+    @property
+    def search(self) -> LogSearch | None:
+        return self._search
+
+    def set_search(self, search: LogSearch | None) -> None:
+        self.stop()
+        self.beginResetModel()
+        self._rows = []
+        self._search = search
+        self.endResetModel()
+
+    def stop(self) -> None:
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            _detach(thread)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return _HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            col = index.column()
+            if col == 0:
+                stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.time))
+                return f"{stamp}.{int(entry.time * 1000) % 1000:03d}"
+            if not entry.level:  # 非日志行（"--------- beginning of"、断线标记等）
+                return entry.line if col == 5 else ""
+            return (None, str(entry.pid), str(entry.tid), entry.level, entry.tag, entry.message)[col]
+        if role == Qt.ItemDataRole.ToolTipRole and index.column() == 5:
+            return entry.line
+        return None
+
+    def entry(self, row: int) -> LogEntry:
+        return self._rows[row]
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._search is not None and not self._search.done and self._thread is None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._thread = LogPageThread(self._search, _PAGE_SIZE)
+        self._thread.page_ready.connect(self._on_page)
+        self._thread.start()
+
+    def _on_page(self, entries: list, error: str):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            _detach(thread)  # run() 发出信号后才返回，结束前仍需保留引用
+        if entries:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+            self._rows.extend(entries)
+            self.endInsertRows()
+        self.page_loaded.emit(len(entries), error)
+
+
+class LogSearchDialog(QDialog):
+    """非模态窗口；查询只读归档，不影响正在进行的采集（采集中的日志约一分钟后可查到）。"""
+    log_step = pyqtSignal(str)
+
+    def __init__(self, device: str = "", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("日志检索")
+        self.setMinimumSize(1000, 620)
+        self._root = get_capture_service().settings.root()
+        self._model = LogResultModel(self)
+        self._model.page_loaded.connect(self._on_page_loaded)
+        self._setup_ui()
+        self._load_devices(device_dir_name(device) if device else "")
+
+    def _setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(16, 16, 16, 16)
+
+        row = QHBoxLayout()
+        row.setSpacing(8)
+        self._device_combo = QComboBox()
+        self._device_combo.setMinimumWidth(180)
+        self._device_combo.setFixedHeight(_BAR_HEIGHT)
+        row.addWidget(self._device_combo)
+        self._query_edit = QLineEdit()
+        self._query_edit.setPlaceholderText(f"例如：{_EXAMPLE}")
+        self._query_edit.setToolTip(
+            "tag:名称  pid:数字  tid:数字  level>=W（或 level:W，= > < <=）\n"
+            "'文本' 或 \"多个 词\"：按整词匹配消息，不区分大小写；前缀 - 表示排除（-tag: -pid: -'文本'）\n"
+            "last 2h / since:2026-10-19T08:00 / since:08:00 / until:30m\n"
+            "条件之间为“且”，同一字段写多次为“或”"
+        )
+        self._query_edit.setFixedHeight(_BAR_HEIGHT)
+        self._query_edit.returnPressed.connect(self._on_search)
+        row.addWidget(self._query_edit, 1)
+        self._newest_check = QCheckBox("最新在前")
+        row.addWidget(self._newest_check)
+        btn_search = QPushButton("搜索")
+        btn_search.setObjectName("btnPrimary")
+        btn_search.setFixedHeight(_BAR_HEIGHT)
+        btn_search.clicked.connect(self._on_search)
+        row.addWidget(btn_search)
+        layout.addLayout(row)
+
+        self._view = QTableView()
+        self._view.setModel(self._model)
+        self._view.verticalHeader().setVisible(False)
+        self._view.verticalHeader().setDefaultSectionSize(22)
+        self._view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self._view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self._view.setWordWrap(False)
+        header = self._view.horizontalHeader()
+        for col, width in enumerate((190, 60, 60, 40, 160)):
+            header.resizeSection(col, width)
+        header.setStretchLastSection(True)
+        self._view.verticalScrollBar().valueChanged.connect(self._maybe_fetch)
+        layout.addWidget(self._view, 1)
+
+        actions = QHBoxLayout()
+        actions.setSpacing(8)
+        self._status = QLabel("")
+        self._status.setObjectName("statusLabel")
+        actions.addWidget(self._status, 1)
+        btn_copy = QPushButton("复制选中行")
+        btn_copy.setFixedHeight(_BAR_HEIGHT)
+        btn_copy.clicked.connect(self._on_copy)
+        actions.addWidget(btn_copy)
+        layout.addLayout(actions)
+
+    def _load_devices(self, preferred: str):
+        devices = archived_devices(self._root)
+        for name in devices:
+            self._device_combo.addItem(name, name)
+        if preferred in devices:
+            self._device_combo.setCurrentIndex(devices.index(preferred))
+        if not devices:
+            self._status.setText(f"{self._root} 下还没有采集的日志，先在「日志采集」中开始采集")
+
+    # ---------- 查询 ----------
+
+    def _on_search(self):
+        name = self._device_combo.currentData()
+        if not name:
+            return
+        text = self._query_edit.text().strip()
+        try:
+            query = parse_query(text)
+        except ValueError as e:
+            self._status.setText(str(e))
+            return
+        self._started = time.monotonic()
+        self._model.set_search(LogSearch(self._root / name, query, self._newest_check.isChecked()))
+        self._status.setText("正在检索…")
+        self.log_step.emit(f"日志检索 {name}：{text or '全部'}")
+        self._model.fetchMore()
+
+    def _maybe_fetch(self, *_):
+        """本页不够填满窗口或已滚到底部时继续取（后台线程一次最多取 0.3 秒，稀疏的结果也能逐步显示进度）。"""
+        bar = self._view.verticalScrollBar()
+        if self._model.canFetchMore() and bar.value() >= bar.maximum() - 2:
+            self._model.fetchMore()
+
+    def _on_page_loaded(self, count: int, error: str):
+        search = self._model.search
+        if error:
+            self._status.setText(f"检索失败：{error}")
+            return
+        if search is None:
+            return
+        rows = self._model.rowCount()
+        if search.done:
+            elapsed = time.monotonic() - self._started
+            self._status.setText(f"共 {rows} 条，检查了 {search.total} 个候选块，用时 {elapsed:.1f} 秒")
+        else:
+            self._status.setText(f"已显示 {rows} 条（已检查 {search.scanned}/{search.total} 个块），向下滚动加载更多")
+        QTimer.singleShot(0, self._maybe_fetch)
+
+    def _on_copy(self):
+        rows = sorted({index.row() for index in self._view.selectionModel().selectedRows()})
+        if rows:
+            QApplication.clipboard().setText("\n".join(self._model.entry(r).line for r in rows))
+
+    def done(self, result: int):
+        self._model.stop()
+        super().done(result)
@@ -1,45 +1,76 @@
 # -*- coding: utf-8 -*-
-"""手机扫码连接弹窗：显示二维码，mDNS 发现后自动 adb pair，再发现连接服务后 adb connect。"""
+"""手机扫码连接弹窗：显示二维码，mDNS 发现后自动 adb pair，再发现连接服务后 adb connect；支持多台手机批量扫码。"""
 
 import random
 import string
-from PyQt6.QtWidgets import QMainWindow, QLabel, QPushButton
+from PyQt6.QtWidgets import (
+    QMainWindow,
+    QLabel,
+    QPushButton,
+    QCheckBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QAbstractItemView,
+)
 from PyQt6.QtCore import Qt, pyqtSignal, QTimer
 
 from adb_helper import adb_pair, adb_connect, qr_string_for_phone_scan
-from core.workers import (
-    Worker,
-    PairingNotifier,
-    ZeroconfThread,
-    ConnectNotifier,
-    ZeroconfConnectThread,
+from core.workers import Worker, DiscoveryNotifier
+from core.discovery import get_discovery_service, SERVICE_PAIRING, SERVICE_CONNECT
+from core.pairing import (
+    PairingSession,
+    PairingJob,
+    STATE_LABELS,
+    CONNECTING,
+    CONNECTED,
+    FAILED,
+    PAIRED_ONLY,
 )
-from core.utils import make_qr_pixmap, is_success_connect_output
+from core.utils import make_qr_pixmap, is_success_connect_output, is_success_pair_output
 from ui.widgets import FramelessDialog
 
+# 配对成功后等待 _adb-tls-connect 广播的时间
+_CONNECT_TIMEOUT_MS = 15000
+
+_COLUMNS = ("手机 IP", "状态", "配对耗时", "连接耗时", "总耗时", "说明")
+
+# 弹窗关闭时仍在执行的 adb pair/connect 线程，保留引用直到结束，避免 QThread 运行中被回收
+_detached_workers: set[Worker] = set()
+
+
+def _fmt_seconds(value: float | None) -> str:
+    return "" if value is None else f"{value:.1f}s"
+
 
 class PairingDialog(FramelessDialog):
-    """显示供手机扫描的二维码，监听 mDNS，手机扫码后自动执行 adb pair，再发现 _adb-tls-connect 后执行 adb connect。"""
+    """
+    显示供手机扫描的二维码，监听 mDNS，手机扫码后自动执行 adb pair，再发现 _adb-tls-connect 后执行 adb connect。
+    批量模式下二维码一直保留，任意多台手机扫描后各自并行走配对→连接流程，表格实时显示每台状态与耗时。
+    """
     pairing_success = pyqtSignal()
+    device_connected = pyqtSignal(str, int, str)  # 连接成功的 host, port, mDNS 服务名，供登记表持久化
     log_step = pyqtSignal(str)
     command_output = pyqtSignal(int, str, str)
 
-    def __init__(self, parent: QMainWindow):
+    def __init__(self, parent: QMainWindow, batch: bool = False):
         super().__init__(parent, "手机扫码连接", min_width=340, min_height=420)
         self._main_parent = parent
-        self._notifier = PairingNotifier(self)
-        self._zeroconf_thread: ZeroconfThread | None = None
-        self._pair_worker: Worker | None = None
-        self._paired = False
-        self._pair_host: str | None = None  # 配对时的设备 IP，用于匹配连接服务
-        self._connect_notifier = ConnectNotifier(self)
-        self._zeroconf_connect_thread: ZeroconfConnectThread | None = None
-        self._connect_worker: Worker | None = None
-        self._connect_finish_called = False
-        self._connect_timeout_timer: QTimer | None = None
+        # 共享的常驻 mDNS 发现服务；本弹窗只订阅，不创建自己的 Zeroconf 实例
+        self._discovery = get_discovery_service()
+        self._pair_notifier = DiscoveryNotifier(self)
+        self._connect_notifier = DiscoveryNotifier(self)
+        self._session = PairingSession(max_jobs=None if batch else 1)
+        self._workers: dict[str, Worker] = {}  # host -> 正在执行的 pair/connect
+        self._connect_timers: dict[str, QTimer] = {}
+        self._rows: dict[str, int] = {}
         self._password = "".join(random.choices(string.digits, k=6))
         self._name = "adb"
-        self._setup_content()
+        # 批量模式下刷新进行中任务的总耗时
+        self._tick = QTimer(self)
+        self._tick.setInterval(500)
+        self._tick.timeout.connect(self._refresh_active_rows)
+        self._setup_content(batch)
         self._start_listener()
 
     def _emit_step(self, msg: str):
@@ -53,7 +84,7 @@ class PairingDialog(FramelessDialog):
         self._emit_step("生成二维码，等待手机扫描…")
         self._emit_step("已启动 mDNS 监听 _adb-tls-pairing")
 
-    def _setup_content(self):
+    def _setup_content(self, batch: bool):
         layout = self.content_layout()
         layout.setSpacing(16)
         qr_text = qr_string_for_phone_scan(self._name, self._password)
@@ -70,6 +101,20 @@ class PairingDialog(FramelessDialog):
         hint.setWordWrap(True)
         hint.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(hint)
+        self._batch_check = QCheckBox("批量配对：多台手机扫描同一二维码")
+        self._batch_check.setChecked(batch)
+        self._batch_check.toggled.connect(self._on_batch_toggled)
+        layout.addWidget(self._batch_check, 0, Qt.AlignmentFlag.AlignCenter)
+        self._table = QTableWidget(0, len(_COLUMNS))
+        self._table.setHorizontalHeaderLabels(_COLUMNS)
+        self._table.verticalHeader().setVisible(False)
+        self._table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self._table.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self._table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self._table.horizontalHeader().setStretchLastSection(True)
+        self._table.setMinimumHeight(160)
+        self._table.setVisible(batch)
+        layout.addWidget(self._table)
         self._status = QLabel("等待手机扫描…")
         self._status.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(self._status)
@@ -77,117 +122,204 @@ class PairingDialog(FramelessDialog):
         close_btn.setMinimumWidth(88)
         close_btn.clicked.connect(self.accept)
         layout.addWidget(close_btn)
-        self._notifier.pair_found.connect(self._on_pair_found)
+        self._pair_notifier.service_added.connect(self._on_pair_service)
+        self._pair_notifier.service_updated.connect(self._on_pair_service)
+        self._connect_notifier.service_added.connect(self._on_connect_service)
+        self._connect_notifier.service_updated.connect(self._on_connect_service)
+        if batch:
+            self.resize(640, self.height())
 
     def _start_listener(self):
-        self._zeroconf_thread = ZeroconfThread(self._notifier, self._password)
-        self._zeroconf_thread.start()
+        if not self._discovery.start():
+            self._emit_step(f"mDNS 发现服务不可用：{self._discovery.last_error}")
+        # 连接服务从一开始就订阅（含回放）：手机可能先广播连接端口、后完成配对
+        self._connect_notifier.attach(self._discovery, [SERVICE_CONNECT])
+        self._pair_notifier.attach(self._discovery, [SERVICE_PAIRING])
+
+    def _is_batch(self) -> bool:
+        return self._session.max_jobs is None
+
+    def _on_batch_toggled(self, checked: bool):
+        self._session.max_jobs = None if checked else max(1, len(self._session.jobs))
+        self._table.setVisible(checked)
+        if checked:
+            self.resize(max(self.width(), 640), self.height())
+            self._emit_step("已切换为批量配对模式，可让多台手机依次扫描")
+
+    # ---------- 表格 ----------
+
+    def _update_row(self, job: PairingJob):
+        row = self._rows.get(job.host)
+        if row is None:
+            row = self._table.rowCount()
+            self._table.insertRow(row)
+            self._rows[job.host] = row
+        values = (
+            job.host,
+            STATE_LABELS.get(job.state, job.state),
+            _fmt_seconds(job.pair_seconds),
+            _fmt_seconds(job.connect_seconds),
+            _fmt_seconds(job.total_seconds),
+            job.message,
+        )
+        for col, value in enumerate(values):
+            item = self._table.item(row, col)
+            if item is None:
+                self._table.setItem(row, col, QTableWidgetItem(value))
+            elif item.text() != value:
+                item.setText(value)
+        if self._session.active_count() and not self._tick.isActive():
+            self._tick.start()
+        self._update_summary()
+
+    def _refresh_active_rows(self):
+        active = [j for j in self._session.jobs.values() if j.active]
+        for job in active:
+            row = self._rows.get(job.host)
+            item = self._table.item(row, 4) if row is not None else None
+            if item is not None:
+                item.setText(_fmt_seconds(job.total_seconds))
+        if not active:
+            self._tick.stop()
+
+    def _update_summary(self):
+        if not self._is_batch():
+            return
+        counts = self._session.counts()
+        self._status.setText(
+            f"已发现 {len(self._session.jobs)} 台：进行中 {self._session.active_count()}，"
+            f"已连接 {counts.get(CONNECTED, 0)}，仅配对 {counts.get(PAIRED_ONLY, 0)}，失败 {counts.get(FAILED, 0)}"
+        )
+
+    # ---------- 流水线 ----------
+
+    def _start_worker(self, host: str, func, *args, on_finished):
+        worker = Worker(func, *args)
+        worker.finished.connect(lambda c, o, e, h=host: on_finished(h, c, o, e))
+        self._workers[host] = worker
+        worker.start()
+
+    def _take_worker(self, host: str):
+        self._workers.pop(host, None)
 
-    def _on_pair_found(self, host: str, port: int, password: str):
-        if self._paired:
+    def _on_pair_service(self, service_type: str, name: str, host: str, port: int):
+        job = self._session.offer_pairing(host, port, name)
+        if job is None:
             return
-        self._paired = True
-        self._pair_host = host
         self._emit_step(f"发现设备 {host}:{port}，正在执行 adb pair…")
-        self._status.setText(f"发现设备 {host}:{port}，正在配对…")
-        self._pair_worker = Worker(adb_pair, host, port, password)
-        self._pair_worker.finished.connect(self._on_pair_finished)
-        self._pair_worker.start()
-
-    def _on_pair_finished(self, code: int, out: str, err: str):
-        if self._pair_worker:
-            try:
-                self._pair_worker.finished.disconnect(self._on_pair_finished)
-            except Exception:
-                pass
-            self._pair_worker = None
+        if not self._is_batch():
+            self._status.setText(f"发现设备 {host}:{port}，正在配对…")
+        self._update_row(job)
+        self._start_worker(host, adb_pair, host, port, self._password, on_finished=self._on_pair_finished)
+
+    def _on_pair_finished(self, host: str, code: int, out: str, err: str):
+        self._take_worker(host)
         try:
             self.command_output.emit(code, out, err)
         except Exception:
             pass
-        if code == 0 and "Successfully paired" in out:
-            self._emit_step("配对成功，正在监听连接服务 _adb-tls-connect…")
-            self._status.setText("配对成功，正在查找连接端口…")
-            self._connect_finish_called = False
-            self._connect_notifier.connect_found.connect(self._on_connect_found)
-            self._zeroconf_connect_thread = ZeroconfConnectThread(self._connect_notifier)
-            self._zeroconf_connect_thread.start()
-            self._connect_timeout_timer = QTimer(self)
-            self._connect_timeout_timer.setSingleShot(True)
-            self._connect_timeout_timer.timeout.connect(self._on_connect_timeout)
-            self._connect_timeout_timer.start(15000)
-        else:
-            self._paired = False
-            self._emit_step("配对失败，请重试或关闭后再次打开")
-            self._status.setText("配对失败，请重试或关闭后再次打开")
-
-    def _on_connect_found(self, host: str, port: int):
-        if self._connect_finish_called or self._pair_host is None or host != self._pair_host:
+        ok = code == 0 and is_success_pair_output(out)
+        job = self._session.pair_finished(host, ok, (err or out).strip())
+        if job is None:
+            return
+        self._update_row(job)
+        if job.state == FAILED:
+            self._emit_step(f"{host} 配对失败，请重试或关闭后再次打开")
+            if not self._is_batch():
+                self._status.setText("配对失败，请重试或关闭后再次打开")
             return
-        self._connect_finish_called = True
-        self._stop_connect_listener()
-        self._emit_step(f"发现连接服务 {host}:{port}，正在执行 adb connect…")
-        self._status.setText("正在连接…")
-        self._connect_worker = Worker(adb_connect, host, port)
-        self._connect_worker.finished.connect(self._on_connect_finished)
-        self._connect_worker.start()
-
-    def _on_connect_finished(self, code: int, out: str, err: str):
-        if self._connect_worker:
-            try:
-                self._connect_worker.finished.disconnect(self._on_connect_finished)
-            except Exception:
-                pass
-            self._connect_worker = None
+        if job.state == CONNECTING:
+            self._emit_step(f"{host} 配对成功，已知连接端口 {job.connect_port}")
+            self._start_connect(job)
+            return
+        self._emit_step(f"{host} 配对成功，正在监听连接服务 _adb-tls-connect…")
+        if not self._is_batch():
+            self._status.setText("配对成功，正在查找连接端口…")
+        self._arm_connect_timeout(host)
+
+    def _arm_connect_timeout(self, host: str):
+        timer = self._connect_timers.get(host)
+        if timer is None:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda h=host: self._on_connect_timeout(h))
+            self._connect_timers[host] = timer
+        timer.start(_CONNECT_TIMEOUT_MS)
+
+    def _disarm_connect_timeout(self, host: str):
+        timer = self._connect_timers.pop(host, None)
+        if timer:
+            timer.stop()
+            timer.deleteLater()
+
+    def _on_connect_service(self, service_type: str, name: str, host: str, port: int):
+        job = self._session.offer_connect(host, port, name)
+        if job is not None:
+            self._start_connect(job)
+
+    def _start_connect(self, job: PairingJob):
+        self._disarm_connect_timeout(job.host)
+        self._emit_step(f"发现连接服务 {job.host}:{job.connect_port}，正在执行 adb connect…")
+        if not self._is_batch():
+            self._status.setText("正在连接…")
+        self._update_row(job)
+        self._start_worker(
+            job.host, adb_connect, job.host, job.connect_port, on_finished=self._on_connect_finished
+        )
+
+    def _on_connect_finished(self, host: str, code: int, out: str, err: str):
+        self._take_worker(host)
         try:
             self.command_output.emit(code, out, err)
         except Exception:
             pass
-        if code == 0 and is_success_connect_output(out):
-            self._emit_step("连接成功，设备已加入列表")
-            self._status.setText("连接成功")
-            self._finish_pairing()
-        else:
-            self._connect_finish_called = False
-            self._emit_step("连接失败，请用手动连接填写连接端口重试")
+        ok = code == 0 and is_success_connect_output(out)
+        job = self._session.connect_finished(host, ok, (out or err).strip())
+        if job is None:
+            return
+        self._update_row(job)
+        if ok:
+            self.device_connected.emit(job.host, job.connect_port, job.connect_name)
+            self._emit_step(f"{host} 连接成功，设备已加入列表（总耗时 {job.total_seconds:.1f}s）")
+            if self._is_batch():
+                self.pairing_success.emit()
+            else:
+                self._finish_pairing()
+            return
+        self._emit_step(f"{host} 连接失败，等待新的连接广播；也可用手动连接填写连接端口重试")
+        if not self._is_batch():
             self._status.setText("连接失败，请用手动连接重试")
+        self._arm_connect_timeout(host)
 
-    def _on_connect_timeout(self):
-        if self._connect_finish_called:
+    def _on_connect_timeout(self, host: str):
+        self._disarm_connect_timeout(host)
+        job = self._session.connect_timeout(host)
+        if job is None:
             return
-        self._connect_finish_called = True
-        self._stop_connect_listener()
-        self._emit_step("未发现连接服务，配对已保存；若设备未出现请用手动连接填写连接端口")
-        self._status.setText("配对成功，请用手动连接填写连接端口")
-        self._finish_pairing()
-
-    def _stop_connect_listener(self):
-        if self._connect_timeout_timer:
-            try:
-                self._connect_timeout_timer.stop()
-            except Exception:
-                pass
-            self._connect_timeout_timer = None
-        try:
-            self._connect_notifier.connect_found.disconnect(self._on_connect_found)
-        except Exception:
-            pass
-        if self._zeroconf_connect_thread and self._zeroconf_connect_thread.isRunning():
-            self._zeroconf_connect_thread.stop()
-            self._zeroconf_connect_thread.wait(1000)
-        self._zeroconf_connect_thread = None
+        self._update_row(job)
+        self._emit_step(f"{host} 未发现连接服务，配对已保存；若设备未出现请用手动连接填写连接端口")
+        if not self._is_batch():
+            self._status.setText("配对成功，请用手动连接填写连接端口")
+            self._finish_pairing()
 
     def _finish_pairing(self):
-        self._stop_connect_listener()
         self._emit_step("配对与连接流程完成")
         self._status.setText("连接成功")
         self.pairing_success.emit()
         self.accept()
 
-    def accept(self):
+    def done(self, result: int):
+        # accept/reject（含窗口关闭按钮）都会走到这里，确保取消订阅
         self._emit_step("停止 mDNS 监听")
-        self._stop_connect_listener()
-        if self._zeroconf_thread and self._zeroconf_thread.isRunning():
-            self._zeroconf_thread.stop()
-            self._zeroconf_thread.wait(1000)
-        super().accept()
+        self._pair_notifier.detach()
+        self._connect_notifier.detach()
+        self._tick.stop()
+        for host in list(self._connect_timers):
+            self._disarm_connect_timeout(host)
+        for worker in self._workers.values():
+            if worker.isRunning():
+                worker.finished.disconnect()
+                _detached_workers.add(worker)
+                worker.finished.connect(lambda *_, w=worker: _detached_workers.discard(w))
+        self._workers.clear()
+        super().done(result)
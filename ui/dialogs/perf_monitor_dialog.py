@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""性能监控弹窗：按秒采样 CPU/内存/FPS/电量/温度并实时绘图，可导出 CSV。"""
+
+from PyQt6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QGridLayout,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QFileDialog,
+)
+from PyQt6.QtCore import Qt
+
+from core.perf_monitor import METRICS, PerfSession
+from core.workers import PerfMonitorThread
+from ui.widgets import LineChart
+
+_BAR_HEIGHT = 40
+
+# 停止或关闭时仍卡在一次采样里的线程（adb 无响应时最长 10 秒），保留引用直到结束
+_detached_samplers: set[PerfMonitorThread] = set()
+
+
+class PerfMonitorDialog(QDialog):
+    """设备性能监控：非模态窗口，关闭时停止采样。"""
+
+    def __init__(self, parent, device: str, package: str = ""):
+        super().__init__(parent)
+        self._device = device
+        self._thread: PerfMonitorThread | None = None
+        self._session = PerfSession()
+        self._charts: dict[str, LineChart] = {}
+        self.setWindowTitle(f"性能监控 - {device}")
+        self.setMinimumSize(760, 560)
+        self._setup_ui(package)
+
+    def _setup_ui(self, package: str):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(16, 16, 16, 16)
+
+        row = QHBoxLayout()
+        row.setSpacing(8)
+        row.addWidget(QLabel("应用包名："))
+        self._package_edit = QLineEdit(package)
+        self._package_edit.setPlaceholderText("留空则只采集整机指标，如 com.example.app")
+        self._package_edit.setFixedHeight(_BAR_HEIGHT)
+        row.addWidget(self._package_edit, 1)
+        self._btn_toggle = QPushButton("开始")
+        self._btn_toggle.setObjectName("btnPrimary")
+        self._btn_toggle.setFixedHeight(_BAR_HEIGHT)
+        self._btn_toggle.clicked.connect(self._on_toggle)
+        row.addWidget(self._btn_toggle)
+        btn_export = QPushButton("导出 CSV")
+        btn_export.setFixedHeight(_BAR_HEIGHT)
+        btn_export.clicked.connect(self._on_export)
+        row.addWidget(btn_export)
+        btn_clear = QPushButton("清空")
+        btn_clear.setFixedHeight(_BAR_HEIGHT)
+        btn_clear.clicked.connect(self._on_clear)
+        row.addWidget(btn_clear)
+        layout.addLayout(row)
+
+        grid = QGridLayout()
+        grid.setSpacing(8)
+        for i, (key, title) in enumerate(METRICS):
+            chart = LineChart(title)
+            self._charts[key] = chart
+            grid.addWidget(chart, i // 3, i % 3)
+        layout.addLayout(grid, 1)
+
+        self._status = QLabel("未开始")
+        self._status.setObjectName("statusLabel")
+        self._status.setAlignment(Qt.AlignmentFlag.AlignLeft)
+        layout.addWidget(self._status)
+
+    def _on_toggle(self):
+        if self._thread and self._thread.isRunning():
+            self._stop()
+            return
+        package = self._package_edit.text().strip()
+        self._thread = PerfMonitorThread(self._device, package)
+        self._thread.sample_ready.connect(self._on_sample)
+        self._thread.sample_failed.connect(self._on_sample_failed)
+        self._thread.start()
+        self._package_edit.setEnabled(False)
+        self._btn_toggle.setText("停止")
+        self._status.setText("采样中…")
+
+    def _stop(self):
+        thread, self._thread = self._thread, None
+        if thread:
+            thread.stop()
+            thread.sample_ready.disconnect()
+            thread.sample_failed.disconnect()
+            if thread.isRunning():
+                _detached_samplers.add(thread)
+                thread.finished.connect(lambda t=thread: _detached_samplers.discard(t))
+        self._package_edit.setEnabled(True)
+        self._btn_toggle.setText("开始")
+        self._status.setText(f"已停止，共 {len(self._session)} 个采样点")
+
+    def _on_sample(self, metrics: dict):
+        self._session.append(metrics)
+        # 数据由环形缓冲按时间顺序取出
+        for key, chart in self._charts.items():
+            chart.set_values(self._session.series[key].values())
+        self._status.setText(f"采样中… 已采集 {len(self._session)} 个点")
+
+    def _on_sample_failed(self, err: str):
+        self._status.setText(f"采样失败：{err}")
+
+    def _on_clear(self):
+        self._session.clear()
+        for chart in self._charts.values():
+            chart.set_values([])
+
+    def _on_export(self):
+        if not len(self._session):
+            self._status.setText("暂无数据可导出")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "导出 CSV", f"perf_{self._device[:8]}.csv", "CSV (*.csv)")
+        if not path:
+            return
+        try:
+            rows = self._session.export_csv(path)
+        except OSError as e:
+            self._status.setText(f"导出失败：{e}")
+            return
+        self._status.setText(f"已导出 {rows} 行到 {path}")
+
+    def done(self, result: int):
+        self._stop()
+        super().done(result)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""屏幕预览弹窗：显示设备截图，点击即点击、拖动即滑动，经由长驻输入通道低延迟注入。"""
+
+from PyQt6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QSizePolicy,
+)
+from PyQt6.QtCore import Qt, QPoint, QTimer, pyqtSignal
+from PyQt6.QtGui import QPixmap, QMouseEvent
+
+from core.input_channel import InputChannel, KEYCODE_BACK, KEYCODE_HOME, KEYCODE_APP_SWITCH
+from core.workers import Worker, ScreenCaptureThread
+
+_BAR_HEIGHT = 40
+# 位移小于该像素（控件坐标）视为点击，否则视为滑动
+_DRAG_THRESHOLD = 8
+
+# 弹窗关闭时仍在截图或建立输入通道的线程，保留引用直到结束
+_detached_threads: set[Worker | ScreenCaptureThread] = set()
+
+
+class _ScreenLabel(QLabel):
+    """按比例显示截图，把鼠标点击/拖动换算回设备像素坐标。"""
+    tapped = pyqtSignal(int, int)
+    swiped = pyqtSignal(int, int, int, int, int)  # x1, y1, x2, y2, duration_ms
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._source: QPixmap | None = None
+        self._press_pos: QPoint | None = None
+        self._press_ms = 0
+        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        self.setMinimumSize(240, 400)
+        self.setCursor(Qt.CursorShape.CrossCursor)
+
+    def set_source(self, pixmap: QPixmap):
+        self._source = pixmap
+        self._rescale()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._rescale()
+
+    def _rescale(self):
+        if self._source is None or self._source.isNull():
+            return
+        self.setPixmap(self._source.scaled(
+            self.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation
+        ))
+
+    def _to_device(self, pos: QPoint) -> tuple[int, int] | None:
+        shown = self.pixmap()
+        if self._source is None or shown is None or shown.isNull():
+            return None
+        off_x = (self.width() - shown.width()) / 2
+        off_y = (self.height() - shown.height()) / 2
+        x = (pos.x() - off_x) / shown.width()
+        y = (pos.y() - off_y) / shown.height()
+        if not (0 <= x <= 1 and 0 <= y <= 1):
+            return None
+        return int(x * (self._source.width() - 1)), int(y * (self._source.height() - 1))
+
+    def mousePressEvent(self, event: QMouseEvent):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._press_pos = event.position().toPoint()
+            self._press_ms = event.timestamp()
+        super().mousePressEvent(event)
+
+    def mouseReleaseEvent(self, event: QMouseEvent):
+        if event.button() != Qt.MouseButton.LeftButton or self._press_pos is None:
+            return super().mouseReleaseEvent(event)
+        start, end = self._press_pos, event.position().toPoint()
+        self._press_pos = None
+        p1, p2 = self._to_device(start), self._to_device(end)
+        if p1 is None:
+            return
+        if p2 is None or (end - start).manhattanLength() < _DRAG_THRESHOLD:
+            self.tapped.emit(*p1)
+        else:
+            self.swiped.emit(p1[0], p1[1], p2[0], p2[1], max(50, event.timestamp() - self._press_ms))
+
+
+class ScreenPreviewDialog(QDialog):
+    """设备屏幕预览与输入：非模态，关闭时断开输入通道。"""
+    log_step = pyqtSignal(str)
+
+    def __init__(self, parent, device: str):
+        super().__init__(parent)
+        self._device = device
+        self._channel = InputChannel(device)
+        self._open_worker: Worker | None = None
+        self._capture: ScreenCaptureThread | None = None
+        self._refresh_pending = False
+        # 注入事件后稍等界面响应再截图，连续操作时合并为一次刷新
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(400)
+        self._refresh_timer.timeout.connect(self._refresh)
+        self.setWindowTitle(f"屏幕预览 - {device}")
+        self.setMinimumSize(420, 640)
+        self._setup_ui()
+        self._open_channel()
+        self._refresh()
+
+    def _setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(16, 16, 16, 16)
+
+        self._screen = _ScreenLabel()
+        self._screen.setText("正在截取屏幕…")
+        self._screen.tapped.connect(self._on_tapped)
+        self._screen.swiped.connect(self._on_swiped)
+        layout.addWidget(self._screen, 1)
+
+        keys = QHBoxLayout()
+        keys.setSpacing(8)
+        for text, code in (("返回", KEYCODE_BACK), ("主页", KEYCODE_HOME), ("多任务", KEYCODE_APP_SWITCH)):
+            btn = QPushButton(text)
+            btn.setFixedHeight(_BAR_HEIGHT)
+            btn.clicked.connect(lambda _=False, c=code: self._on_key(c))
+            keys.addWidget(btn)
+        btn_refresh = QPushButton("刷新")
+        btn_refresh.setObjectName("btnPrimary")
+        btn_refresh.setFixedHeight(_BAR_HEIGHT)
+        btn_refresh.clicked.connect(self._refresh)
+        keys.addWidget(btn_refresh)
+        layout.addLayout(keys)
+
+        text_row = QHBoxLayout()
+        text_row.setSpacing(8)
+        self._text_edit = QLineEdit()
+        self._text_edit.setPlaceholderText("输入文本，回车发送到设备")
+        self._text_edit.setFixedHeight(_BAR_HEIGHT)
+        self._text_edit.returnPressed.connect(self._on_send_text)
+        text_row.addWidget(self._text_edit, 1)
+        layout.addLayout(text_row)
+
+        self._status = QLabel("正在建立输入通道…")
+        self._status.setObjectName("statusLabel")
+        layout.addWidget(self._status)
+
+    def _open_channel(self):
+        self._open_worker = Worker(self._channel.open)
+        self._open_worker.finished.connect(self._on_channel_opened)
+        self._open_worker.start()
+
+    def _on_channel_opened(self, code: int, out: str, err: str):
+        if code != 0:
+            self._status.setText(f"输入通道建立失败：{err}")
+            self.log_step.emit(f"输入通道建立失败：{err}")
+            return
+        self._status.setText(f"输入通道：{out}")
+        self.log_step.emit(f"输入通道已就绪：{out}")
+
+    def _inject(self, action: str, func, *args):
+        if not self._channel.is_open():
+            self._status.setText("输入通道未就绪")
+            return
+        try:
+            func(*args)
+        except RuntimeError as e:
+            self._status.setText(str(e))
+            return
+        self._status.setText(f"{action}（{self._channel.mode}）")
+        self._refresh_timer.start()
+
+    def _on_tapped(self, x: int, y: int):
+        self._inject(f"点击 {x},{y}", self._channel.tap, x, y)
+
+    def _on_swiped(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int):
+        self._inject(f"滑动 {x1},{y1} → {x2},{y2}", self._channel.swipe, x1, y1, x2, y2, duration_ms)
+
+    def _on_key(self, keycode: int):
+        self._inject(f"按键 {keycode}", self._channel.key, keycode)
+
+    def _on_send_text(self):
+        text = self._text_edit.text()
+        if text:
+            self._inject("输入文本", self._channel.text, text)
+            self._text_edit.clear()
+
+    def _refresh(self):
+        if self._capture and self._capture.isRunning():
+            self._refresh_pending = True
+            return
+        self._capture = ScreenCaptureThread(self._device)
+        self._capture.captured.connect(self._on_captured)
+        self._capture.start()
+
+    def _on_captured(self, code: int, data: bytes, err: str):
+        pixmap = QPixmap()
+        if code != 0 or not pixmap.loadFromData(data, "PNG"):
+            self._screen.setText(f"截图失败：{err or '无法解析截图数据'}")
+        else:
+            self._screen.set_source(pixmap)
+        if self._refresh_pending:
+            self._refresh_pending = False
+            QTimer.singleShot(0, self._refresh)
+
+    def done(self, result: int):
+        self._refresh_timer.stop()
+        self._channel.close()
+        worker, self._open_worker = self._open_worker, None
+        if worker and worker.isRunning():
+            worker.finished.disconnect()
+            _detached_threads.add(worker)
+            # 关闭后才建立好的通道也要关掉
+            worker.finished.connect(lambda *_, w=worker, ch=self._channel: (ch.close(), _detached_threads.discard(w)))
+        capture, self._capture = self._capture, None
+        if capture and capture.isRunning():
+            capture.captured.disconnect()
+            _detached_threads.add(capture)
+            capture.finished.connect(lambda t=capture: _detached_threads.discard(t))
+        super().done(result)
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""传输队列弹窗：列出推送/拉取条目的进度、速度、压缩与状态，可暂停、继续、取消、移除，调整并发数与压缩方式。"""
+
+from PyQt6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QSpinBox,
+    QComboBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QAbstractItemView,
+    QHeaderView,
+)
+from PyQt6.QtCore import pyqtSignal
+
+from core.transfers import (
+    COMPRESSION_AUTO,
+    COMPRESSION_OFF,
+    DONE,
+    FAILED,
+    PUSH,
+    QUEUED,
+    REMOVED,
+    RUNNING,
+    STATE_LABELS,
+    TransferItem,
+    get_transfer_queue,
+)
+from core.workers import TransferNotifier
+
+_BAR_HEIGHT = 40
+
+_COLUMNS = ("设备", "方向", "文件", "进度", "速度", "压缩", "状态")
+_COMPRESSION_MODES = (("自动压缩（慢速链路）", COMPRESSION_AUTO), ("不压缩", COMPRESSION_OFF))
+
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return ""
+
+
+class TransferDialog(QDialog):
+    """非模态窗口；关闭只是不再显示，队列在后台继续传输。"""
+    log_step = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("传输队列")
+        self.setMinimumSize(820, 420)
+        self._queue = get_transfer_queue()
+        self._rows: dict[int, int] = {}  # 条目 id -> 行号
+        self._states: dict[int, str] = {}  # 条目 id -> 状态，用于状态栏计数（不必每次复制整个队列）
+        self._gains: dict[int, float] = {}  # 条目 id -> 已完成压缩传输的提速倍数，用于状态栏汇总
+        self._notifier = TransferNotifier(self)
+        self._setup_ui()
+        for item in self._queue.items():
+            self._update_row(item)
+        self._notifier.item_changed.connect(self._on_item_changed)
+        self._queue.subscribe(self._notifier.on_change)
+        self._update_status()
+
+    def _setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(16, 16, 16, 16)
+
+        limits = QHBoxLayout()
+        limits.setSpacing(8)
+        limits.addWidget(QLabel("同时传输"))
+        self._parallel_spin = QSpinBox()
+        self._parallel_spin.setRange(1, 16)
+        self._parallel_spin.setValue(self._queue.max_parallel)
+        self._parallel_spin.setFixedHeight(_BAR_HEIGHT)
+        limits.addWidget(self._parallel_spin)
+        limits.addWidget(QLabel("个，每台设备最多"))
+        self._per_device_spin = QSpinBox()
+        self._per_device_spin.setRange(1, 8)
+        self._per_device_spin.setValue(self._queue.per_device)
+        self._per_device_spin.setFixedHeight(_BAR_HEIGHT)
+        limits.addWidget(self._per_device_spin)
+        limits.addWidget(QLabel("个"))
+        limits.addStretch()
+        self._compression_combo = QComboBox()
+        for text, mode in _COMPRESSION_MODES:
+            self._compression_combo.addItem(text, mode)
+        self._compression_combo.setCurrentIndex(self._compression_combo.findData(self._queue.compression))
+        self._compression_combo.setFixedHeight(_BAR_HEIGHT)
+        self._compression_combo.setToolTip(
+            "自动：无线等慢速链路上压缩可压缩的文件；设备支持时用 adb 的 zstd/lz4/brotli，否则用设备上的 gzip"
+        )
+        self._compression_combo.currentIndexChanged.connect(
+            lambda: self._queue.set_compression(self._compression_combo.currentData())
+        )
+        limits.addWidget(self._compression_combo)
+        self._parallel_spin.valueChanged.connect(self._on_limits_changed)
+        self._per_device_spin.valueChanged.connect(self._on_limits_changed)
+        layout.addLayout(limits)
+
+        self._table = QTableWidget(0, len(_COLUMNS))
+        self._table.setHorizontalHeaderLabels(list(_COLUMNS))
+        self._table.verticalHeader().setVisible(False)
+        self._table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self._table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        header = self._table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self._table, 1)
+
+        actions = QHBoxLayout()
+        actions.setSpacing(8)
+        for text, slot in (
+            ("暂停", self._queue.pause),
+            ("继续", self._queue.resume),
+            ("取消", self._queue.cancel),
+            ("移除", self._remove),
+        ):
+            btn = QPushButton(text)
+            btn.setFixedHeight(_BAR_HEIGHT)
+            btn.clicked.connect(lambda _=False, f=slot: self._apply_selected(f))
+            actions.addWidget(btn)
+        actions.addStretch()
+        btn_clear = QPushButton("清除已完成")
+        btn_clear.setFixedHeight(_BAR_HEIGHT)
+        btn_clear.clicked.connect(self._on_clear_finished)
+        actions.addWidget(btn_clear)
+        btn_resume_all = QPushButton("全部继续")
+        btn_resume_all.setObjectName("btnPrimary")
+        btn_resume_all.setFixedHeight(_BAR_HEIGHT)
+        btn_resume_all.clicked.connect(self._queue.resume_all)
+        actions.addWidget(btn_resume_all)
+        layout.addLayout(actions)
+
+        self._status = QLabel("")
+        self._status.setObjectName("statusLabel")
+        layout.addWidget(self._status)
+
+    # ---------- 表格 ----------
+
+    def _update_row(self, item: TransferItem):
+        row = self._rows.get(item.id)
+        if row is None:
+            row = self._table.rowCount()
+            self._table.insertRow(row)
+            self._rows[item.id] = row
+            for c in range(len(_COLUMNS)):
+                self._table.setItem(row, c, QTableWidgetItem(""))
+        self._states[item.id] = item.state
+        if item.state == DONE and item.gain:
+            self._gains[item.id] = item.gain
+        else:
+            self._gains.pop(item.id, None)
+        push = item.direction == PUSH
+        progress = f"{item.progress * 100:.0f}%"
+        if item.size:
+            progress += f"（{_fmt_bytes(item.done)} / {_fmt_bytes(item.size)}）"
+        values = (
+            item.device,
+            "推送" if push else "拉取",
+            f"{item.local} → {item.remote}" if push else f"{item.remote} → {item.local}",
+            progress,
+            f"{_fmt_bytes(item.rate)}/s" if item.rate else "",
+            f"{item.codec} ×{item.gain:.1f}" if item.codec and item.gain and item.state == DONE else item.codec,
+            STATE_LABELS.get(item.state, item.state),
+        )
+        for c, text in enumerate(values):
+            self._table.item(row, c).setText(text)
+        tip = item.error or (f"校验 {item.checksum}" if item.checksum else "")
+        self._table.item(row, 6).setToolTip(tip)
+        self._table.item(row, 5).setToolTip(self._compression_tip(item))
+        self._table.item(row, 2).setToolTip(values[2])
+
+    def _compression_tip(self, item: TransferItem) -> str:
+        if item.state != DONE or not item.elapsed:
+            return ""
+        moved = item.done if item.size is None else item.size
+        lines = [f"耗时 {item.elapsed:.1f} 秒，有效速率 {_fmt_bytes(moved / item.elapsed)}/s"]
+        if item.codec and item.wire_bytes:
+            lines.append(f"链路传输 {_fmt_bytes(item.wire_bytes)}（压缩比 ×{moved / item.wire_bytes:.1f}）")
+        baseline = self._queue.link_rate(item.device)
+        if baseline:
+            lines.append(f"该设备不压缩时约 {_fmt_bytes(baseline)}/s")
+        if item.gain:
+            lines.append(f"有效提速 ×{item.gain:.2f}")
+        return "\n".join(lines)
+
+    def _on_item_changed(self, item: TransferItem):
+        if item.state == REMOVED:
+            self._reload()
+            return
+        previous = self._states.get(item.id)
+        self._update_row(item)
+        if item.state == FAILED and previous != FAILED:
+            name = item.remote if item.direction == PUSH else item.local
+            self.log_step.emit(f"传输失败：{name}（{item.error}）")
+        if item.state in (DONE, FAILED) and previous != item.state:
+            if not any(state in (QUEUED, RUNNING) for state in self._states.values()):
+                done = sum(1 for state in self._states.values() if state == DONE)
+                self.log_step.emit(f"传输队列已空闲：完成 {done}/{len(self._states)} 项")
+        self._update_status()
+
+    def _reload(self):
+        self._table.setRowCount(0)
+        self._rows.clear()
+        self._states.clear()
+        self._gains.clear()
+        for item in self._queue.items():
+            self._update_row(item)
+        self._update_status()
+
+    def _update_status(self):
+        if not self._states:
+            self._status.setText("队列为空，在主窗口点「推送文件」「拉取文件」添加")
+            return
+        counts: dict[str, int] = {}
+        for state in self._states.values():
+            counts[state] = counts.get(state, 0) + 1
+        parts = [f"{STATE_LABELS[s]} {n}" for s, n in counts.items()]
+        text = f"共 {len(self._states)} 项：" + "，".join(parts)
+        if self._gains:
+            average = sum(self._gains.values()) / len(self._gains)
+            text += f"；压缩传输 {len(self._gains)} 项，平均有效提速 ×{average:.1f}"
+        self._status.setText(text)
+
+    # ---------- 操作 ----------
+
+    def _selected_ids(self) -> list[int]:
+        rows = {index.row() for index in self._table.selectionModel().selectedRows()}
+        return [item_id for item_id, row in self._rows.items() if row in rows]
+
+    def _apply_selected(self, func):
+        for item_id in self._selected_ids():
+            func(item_id)
+
+    def _remove(self, item_id: int):
+        self._queue.remove(item_id)
+        self._reload()
+
+    def _on_clear_finished(self):
+        self._queue.clear_finished()
+        self._reload()
+
+    def _on_limits_changed(self):
+        self._queue.set_limits(self._parallel_spin.value(), self._per_device_spin.value())
+
+    def done(self, result: int):
+        self._queue.unsubscribe(self._notifier.on_change)
+        super().done(result)
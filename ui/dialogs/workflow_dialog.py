@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""工作流弹窗：选择工作流文件，在选中的设备上执行，表格按设备 × 步骤显示状态与耗时。"""
+
+from PyQt6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QCheckBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QAbstractItemView,
+    QHeaderView,
+    QFileDialog,
+)
+from PyQt6.QtCore import pyqtSignal
+
+from core.workers import WorkflowThread
+from core.workflow import OK, RUNNING, STATUS_LABELS, WorkflowError, WorkflowRunner, load_workflow
+
+_BAR_HEIGHT = 40
+
+# 弹窗关闭时仍在收尾的工作流线程，保留引用直到结束
+_detached_runs: set[WorkflowThread] = set()
+
+
+class WorkflowDialog(QDialog):
+    """非模态窗口；关闭时停止启动新步骤，正在执行的步骤在后台结束，之后可续跑。"""
+    log_step = pyqtSignal(str)
+
+    def __init__(self, devices: list[str], parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("工作流")
+        self.setMinimumSize(760, 460)
+        self._devices = devices
+        self._thread: WorkflowThread | None = None
+        self._workflow = None
+        self._setup_ui()
+
+    def _setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(16, 16, 16, 16)
+
+        row = QHBoxLayout()
+        row.setSpacing(8)
+        self._path_edit = QLineEdit()
+        self._path_edit.setPlaceholderText("工作流文件（.json / .yaml）")
+        self._path_edit.setFixedHeight(_BAR_HEIGHT)
+        self._path_edit.editingFinished.connect(self._load)
+        row.addWidget(self._path_edit, 1)
+        btn_browse = QPushButton("选择…")
+        btn_browse.setFixedHeight(_BAR_HEIGHT)
+        btn_browse.clicked.connect(self._on_browse)
+        row.addWidget(btn_browse)
+        layout.addLayout(row)
+
+        self._table = QTableWidget(len(self._devices), 1)
+        self._table.setHorizontalHeaderLabels(["设备"])
+        self._table.verticalHeader().setVisible(False)
+        self._table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self._table.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self._table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        for r, serial in enumerate(self._devices):
+            self._table.setItem(r, 0, QTableWidgetItem(serial))
+        layout.addWidget(self._table, 1)
+
+        actions = QHBoxLayout()
+        actions.setSpacing(8)
+        self._resume_check = QCheckBox("续跑（跳过上次已完成的步骤）")
+        actions.addWidget(self._resume_check)
+        actions.addStretch()
+        self._btn_stop = QPushButton("停止")
+        self._btn_stop.setFixedHeight(_BAR_HEIGHT)
+        self._btn_stop.setEnabled(False)
+        self._btn_stop.clicked.connect(self._on_stop)
+        actions.addWidget(self._btn_stop)
+        self._btn_start = QPushButton("开始")
+        self._btn_start.setObjectName("btnPrimary")
+        self._btn_start.setFixedHeight(_BAR_HEIGHT)
+        self._btn_start.clicked.connect(self._on_start)
+        actions.addWidget(self._btn_start)
+        layout.addLayout(actions)
+
+        self._status = QLabel(f"已选 {len(self._devices)} 台设备，请选择工作流文件")
+        self._status.setObjectName("statusLabel")
+        layout.addWidget(self._status)
+
+    # ---------- 工作流文件 ----------
+
+    def _on_browse(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "选择工作流", "", "工作流 (*.json *.yaml *.yml);;所有文件 (*)"
+        )
+        if path:
+            self._path_edit.setText(path)
+            self._load()
+
+    def _load(self) -> bool:
+        path = self._path_edit.text().strip()
+        if not path:
+            return False
+        try:
+            self._workflow = load_workflow(path)
+        except WorkflowError as e:
+            self._workflow = None
+            self._status.setText(str(e))
+            return False
+        steps = self._workflow.steps
+        self._table.setColumnCount(len(steps) + 1)
+        self._table.setHorizontalHeaderLabels(["设备"] + [s.name for s in steps])
+        for r in range(len(self._devices)):
+            for c in range(1, len(steps) + 1):
+                self._table.setItem(r, c, QTableWidgetItem(""))
+        self._status.setText(f"工作流 {self._workflow.name}：{len(steps)} 个步骤，{len(self._devices)} 台设备")
+        return True
+
+    # ---------- 执行 ----------
+
+    def _on_start(self):
+        if self._thread and self._thread.isRunning():
+            return
+        if not self._load():
+            if not self._path_edit.text().strip():
+                self._status.setText("请先选择工作流文件")
+            return
+        try:
+            runner = WorkflowRunner(self._workflow, self._devices, resume=self._resume_check.isChecked())
+        except WorkflowError as e:
+            self._status.setText(str(e))
+            return
+        self._columns = {s.id: c + 1 for c, s in enumerate(self._workflow.steps)}
+        self._rows = {d: r for r, d in enumerate(self._devices)}
+        self._thread = WorkflowThread(runner)
+        self._thread.step_changed.connect(self._on_step_changed)
+        self._thread.run_finished.connect(self._on_finished)
+        self._btn_start.setEnabled(False)
+        self._btn_stop.setEnabled(True)
+        self._status.setText("执行中…")
+        self.log_step.emit(f"工作流 {self._workflow.name}：开始（{len(self._devices)} 台设备）")
+        self._thread.start()
+
+    def _on_step_changed(self, serial: str, step_id: str, status: str, result):
+        item = self._table.item(self._rows.get(serial, -1), self._columns.get(step_id, -1))
+        if item is None:
+            return
+        text = STATUS_LABELS.get(status, status)
+        if status != RUNNING and result is not None:
+            if (serial, step_id) in self._thread.runner.resumed:
+                text += "（上次）"
+            elif result.attempts:
+                text += f" {result.seconds:.1f}s"
+                if result.attempts > 1:
+                    text += f" ×{result.attempts}"
+            item.setToolTip(result.message)
+        item.setText(text)
+
+    def _on_stop(self):
+        if self._thread and self._thread.isRunning():
+            self._thread.stop()
+            self._btn_stop.setEnabled(False)
+            self._status.setText("正在停止：等待执行中的步骤结束…")
+
+    def _on_finished(self, ok: int, total: int):
+        self._btn_start.setEnabled(True)
+        self._btn_stop.setEnabled(False)
+        runner = self._thread.runner
+        done = sum(1 for steps in runner.results.values() for r in steps.values() if r.status == OK)
+        msg = f"工作流 {self._workflow.name} 结束：成功 {ok}/{total} 台"
+        if ok < total:
+            msg += "，可勾选续跑重新执行未完成的步骤"
+        self._status.setText(f"{msg}（完成步骤 {done}）")
+        self.log_step.emit(msg)
+
+    def done(self, result: int):
+        thread, self._thread = self._thread, None
+        if thread and thread.isRunning():
+            thread.stop()
+            thread.step_changed.disconnect()
+            thread.run_finished.disconnect()
+            _detached_runs.add(thread)
+            thread.finished.connect(lambda t=thread: _detached_runs.discard(t))
+        super().done(result)
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """主窗口：组合 panels、连接信号、调用 adb_helper / core。"""
 
+import os
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QMainWindow,
@@ -11,18 +12,25 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QTimer
 
 from adb_helper import (
-    get_devices,
+    get_adb_servers,
+    set_adb_servers,
+    server_label,
     install_apk,
-    get_installed_packages,
     get_package_path,
     screenshot,
     shell,
     logcat,
     reboot,
-    push,
-    pull,
 )
-from core.workers import Worker
+from core.workers import Worker, DeviceListThread, ReconnectThread, DiscoveryNotifier, HealthNotifier
+from core.health import HealthMonitor, STATE_LABELS, ONLINE
+from core.discovery import get_discovery_service, SERVICE_CONNECT, SERVICE_PAIRING, SERVICE_ADB
+from core.device_registry import DeviceRegistry
+from core.scheduler import get_scheduler
+from core.state_cache import get_state_cache, fetch_packages
+from core.storage import load_json, save_json
+from core.logcat_capture import get_capture_service
+from core.transfers import PAUSED, TransferError, get_transfer_queue
 from core.utils import (
     pair_then_connect,
     connect_only,
@@ -31,7 +39,9 @@ from core.utils import (
 )
 from ui.widgets import CustomMessageBox, CustomInputDialog
 from ui.panels import DeviceBarPanel, QuickActionsPanel, ShellPanel, OutputPanel
-from ui.dialogs import PairingDialog, ManualConnectDialog, DevicePathDialog, AppSelectionDialog
+from ui import dialogs  # 弹窗模块按需导入，见 ui/dialogs/__init__.py
+
+_SERVERS_FILE = "adb_servers.json"
 
 
 class MainWindow(QMainWindow):
@@ -42,9 +52,62 @@ class MainWindow(QMainWindow):
         self.resize(880, 640)
         self._worker = None
         self._auto_prompted_connect = False
+        self._registry = DeviceRegistry()
+        self._reconnect_thread: ReconnectThread | None = None
+        self._pending_reconnect: dict[str, dict] = {}  # 重连进行中又请求的设备，host:port -> 条目
+        self._pending_auto_prompt = False
+        self._online_serials: set[str] = set()
+        self._discovery = get_discovery_service()
+        self._discovery_notifier = DiscoveryNotifier(self)
+        self._health_notifier = HealthNotifier(self)
+        self._health = HealthMonitor(on_change=self._health_notifier.on_change)
+        # 健康状态变化可能连续到来（一次插拔多台），合并成一次设备列表刷新
+        self._health_refresh_timer = QTimer(self)
+        self._health_refresh_timer.setSingleShot(True)
+        self._health_refresh_timer.setInterval(300)
+        self._health_refresh_timer.timeout.connect(self._refresh_devices)
+        saved_servers = load_json(_SERVERS_FILE, [])
+        if saved_servers:
+            set_adb_servers(get_adb_servers() + [s for s in saved_servers if isinstance(s, str)])
+        self._devices_thread: DeviceListThread | None = None
+        self._refresh_pending = False
+        self._refresh_prompt = False
+        self._discovery_worker: Worker | None = None
+        self._packages_worker: Worker | None = None
+        self._app_dialog = None
+        self._transfer_dialog = None
+        self._control_server = None
         self._setup_ui()
         self._connect_signals()
-        self._refresh_devices(allow_auto_prompt=True)
+        self._show_cached_devices()
+        # 窗口先显示，设备查询、重连、mDNS 与健康监控在事件循环开始后再启动
+        QTimer.singleShot(0, self._start_services)
+
+    def _show_cached_devices(self):
+        """先显示上次在线的设备（本地缓存，标注「上次」），后台查询完成后整体替换。"""
+        cache = get_state_cache()
+        devices = cache.last_devices() if cache is not None else []
+        for d in devices:
+            self._device_bar.add_device(f"{self._device_label(d)} · 上次", d["serial"])
+        if devices:
+            self._set_status(f"显示上次的 {len(devices)} 台设备，正在刷新…")
+
+    def _start_services(self):
+        known = self._registry.entries()
+        # 有已知无线设备时先并发重连，重连结束后再决定是否弹出扫码窗口
+        self._refresh_devices(allow_auto_prompt=not known)
+        if known:
+            self._reconnect_known(known, allow_auto_prompt=True)
+        self._start_discovery()
+        self._health_notifier.state_changed.connect(self._on_health_changed)
+        self._health.start()
+        self._start_control_server()
+        paused = sum(1 for item in get_transfer_queue().items() if item.state == PAUSED)
+        if paused:
+            self._log_step(f"传输队列中有 {paused} 个未完成的传输，可在「传输队列」中继续")
+        restored = get_capture_service().restore()
+        if restored:
+            self._log_step(f"继续后台采集 logcat：{', '.join(restored)}")
 
     def _setup_ui(self):
         container = QWidget()
@@ -80,6 +143,8 @@ class MainWindow(QMainWindow):
         self._device_bar.refresh_clicked.connect(self._refresh_devices)
         self._device_bar.scan_connect_clicked.connect(self._on_scan_connect)
         self._device_bar.manual_connect_clicked.connect(self._on_manual_connect)
+        self._device_bar.servers_clicked.connect(self._on_edit_servers)
+        self._device_bar.farm_clicked.connect(self._on_device_farm)
 
         self._quick_actions.install_apk_clicked.connect(self._on_install_apk)
         self._quick_actions.screenshot_clicked.connect(self._on_screenshot)
@@ -89,9 +154,132 @@ class MainWindow(QMainWindow):
         self._quick_actions.pull_clicked.connect(self._on_pull)
         self._quick_actions.pull_apk_clicked.connect(self._on_pull_apk)
         self._quick_actions.shell_dialog_clicked.connect(self._on_shell_dialog)
+        self._quick_actions.perf_monitor_clicked.connect(self._on_perf_monitor)
+        self._quick_actions.screen_preview_clicked.connect(self._on_screen_preview)
+        self._quick_actions.diagnostics_clicked.connect(self._on_diagnostics)
+        self._quick_actions.transfers_clicked.connect(self._on_transfers)
+        self._quick_actions.link_bench_clicked.connect(self._on_link_bench)
+        self._quick_actions.log_capture_clicked.connect(self._on_log_capture)
+        self._quick_actions.log_search_clicked.connect(self._on_log_search)
 
         self._shell_panel.shell_requested.connect(self._on_shell_requested)
 
+    def _start_discovery(self):
+        """启动全局共享的 mDNS 发现服务：已知设备重新开启无线调试（端口改变）时自动重连，设备栏显示发现数量。"""
+        self._discovery_notifier.service_added.connect(self._on_service_announced)
+        self._discovery_notifier.service_updated.connect(self._on_service_announced)
+        self._discovery_notifier.service_removed.connect(lambda *_: self._update_discovered_count())
+        # 导入 zeroconf 并绑定组播套接字需要上百毫秒，放到后台线程
+        discovery = self._discovery
+        self._discovery_worker = Worker(lambda: (0 if discovery.start() else 1, "", discovery.last_error))
+        self._discovery_worker.finished.connect(self._on_discovery_started)
+        self._discovery_worker.start()
+
+    def _on_discovery_started(self, code: int, out: str, err: str):
+        if code != 0:
+            self._log_step(f"mDNS 发现服务不可用：{err}")
+            return
+        self._discovery_notifier.attach(self._discovery)
+
+    def _start_control_server(self):
+        """设置了环境变量 GUI_ADB_API_PORT 时启动本机控制接口，与界面共用设备调度器。"""
+        port = os.environ.get("GUI_ADB_API_PORT", "").strip()
+        if not port:
+            return
+        from core.control_server import ControlServer
+        try:
+            server = ControlServer(port=int(port), token=os.environ.get("GUI_ADB_API_TOKEN"))
+            actual = server.start_in_thread()
+        except (ValueError, OSError) as e:
+            self._log_step(f"控制接口启动失败：{e}")
+            return
+        self._control_server = server
+        self._log_step(f"控制接口已启动：http://127.0.0.1:{actual}（访问令牌见数据目录 api_token）")
+
+    def _update_discovered_count(self):
+        hosts = {s.host for s in self._discovery.services() if s.service_type in (SERVICE_CONNECT, SERVICE_ADB)}
+        pairing = len(self._discovery.services(SERVICE_PAIRING))
+        self._device_bar.set_discovered(len(hosts), pairing)
+
+    def _on_service_announced(self, service_type: str, name: str, host: str, port: int):
+        self._update_discovered_count()
+        if service_type == SERVICE_CONNECT:
+            self._on_connect_announced(name, host, port)
+
+    def _on_connect_announced(self, name: str, host: str, port: int):
+        entry = self._registry.update_from_announcement(name, host, port)
+        if entry is None or f"{host}:{port}" in self._online_serials:
+            return
+        self._log_step(f"发现已知设备 {host}:{port}，正在自动重连…")
+        self._reconnect_known([entry])
+
+    def _reconnect_known(self, entries: list[dict], *, allow_auto_prompt: bool = False):
+        if self._reconnect_thread and self._reconnect_thread.isRunning():
+            # 本轮结束后再重连，不丢弃期间发现或掉线的设备
+            for e in entries:
+                self._pending_reconnect[f"{e['host']}:{e['connect_port']}"] = e
+            self._pending_auto_prompt = self._pending_auto_prompt or allow_auto_prompt
+            return
+        self._log_step(f"正在并发重连 {len(entries)} 台已知无线设备…")
+        self._reconnect_thread = ReconnectThread(entries)
+        self._reconnect_thread.device_result.connect(self._on_reconnect_result)
+        self._reconnect_thread.all_done.connect(
+            lambda ok, total: self._on_reconnect_done(ok, total, allow_auto_prompt)
+        )
+        self._reconnect_thread.finished.connect(self._run_pending_reconnect)
+        self._reconnect_thread.start()
+
+    def _run_pending_reconnect(self):
+        """上一轮线程结束后重连排队的设备（已在线的跳过）。"""
+        pending = [e for addr, e in self._pending_reconnect.items() if addr not in self._online_serials]
+        allow_auto_prompt = self._pending_auto_prompt
+        self._pending_reconnect = {}
+        self._pending_auto_prompt = False
+        if pending:
+            self._reconnect_known(pending, allow_auto_prompt=allow_auto_prompt)
+
+    def _on_reconnect_result(self, address: str, ok: bool, msg: str):
+        self._log_step(f"重连 {address}：{'成功' if ok else '失败'} {msg}")
+
+    def _on_reconnect_done(self, ok: int, total: int, allow_auto_prompt: bool):
+        self._log_step(f"已知设备重连完成：{ok}/{total} 台成功")
+        self._refresh_devices(allow_auto_prompt=allow_auto_prompt)
+
+    def _remember_connection(self, host: str, port: int, mdns_name: str = ""):
+        self._registry.remember(host, port, mdns_name)
+
+    def closeEvent(self, event):
+        self._pending_reconnect.clear()
+        if self._reconnect_thread and self._reconnect_thread.isRunning():
+            self._reconnect_thread.finished.disconnect(self._run_pending_reconnect)
+            self._reconnect_thread.stop()
+            # stop() 只阻止新的尝试，正在进行的 adb connect 最长 15 秒才返回
+            self._reconnect_thread.wait(16000)
+        for thread in (self._devices_thread, self._discovery_worker, self._packages_worker):
+            if thread and thread.isRunning():
+                thread.wait(2000)
+        self._discovery_notifier.detach()
+        self._discovery.stop()
+        self._health.stop()
+        if self._control_server:
+            self._control_server.stop()
+        get_transfer_queue().stop_all()  # 未完成的传输保存为「已暂停」，下次从断点继续
+        get_capture_service().shutdown()  # 关闭日志文件并保存续读位置，下次启动接着采集
+        super().closeEvent(event)
+
+    def _on_health_changed(self, serial: str, server: str, state: str, old_state: str):
+        """设备上线、离线、未授权、无响应或断开：提示并刷新设备列表（首次发现的在线设备不提示）。"""
+        if not old_state and state == ONLINE:
+            return
+        where = f" @{server}" if server else ""
+        label = STATE_LABELS.get(state, state)
+        if state == ONLINE:
+            self._log_step(f"设备 {serial}{where} 已恢复在线")
+        else:
+            self._log_step(f"设备 {serial}{where} {label}，发往该设备的命令将立即失败")
+            self._set_status(f"设备 {serial} {label}")
+        self._health_refresh_timer.start()
+
     def _on_device_changed(self, index: int):
         pass  # 当前设备由 current_serial() 实时获取
 
@@ -105,14 +293,41 @@ class MainWindow(QMainWindow):
         self._output_panel.set_status(msg)
 
     def _refresh_devices(self, *, allow_auto_prompt: bool = False):
+        """后台查询设备列表；查询进行中再次请求时，结束后补查一次（多次请求合并）。"""
+        self._refresh_prompt = self._refresh_prompt or allow_auto_prompt
+        if self._devices_thread and self._devices_thread.isRunning():
+            self._refresh_pending = True
+            return
         self._log_step("正在刷新设备列表…")
+        self._devices_thread = DeviceListThread()
+        self._devices_thread.devices_ready.connect(self._on_devices_ready)
+        self._devices_thread.finished.connect(self._on_devices_thread_finished)
+        self._devices_thread.start()
+
+    def _on_devices_thread_finished(self):
+        if self._refresh_pending:
+            self._refresh_pending = False
+            self._refresh_devices()
+
+    def _on_devices_ready(self, devices: list[dict]):
+        allow_auto_prompt, self._refresh_prompt = self._refresh_prompt, False
+        previous = self._device()
         self._device_bar.clear_devices()
-        devices = get_devices()
+        serials = {d["serial"] for d in devices}
+        self._registry.mark_seen(serials)
+        # 上次在线、这次消失的已知无线设备视为掉线，后台重连
+        dropped = [
+            e for e in self._registry.entries()
+            if f"{e['host']}:{e['connect_port']}" in self._online_serials - serials
+        ]
+        self._online_serials = serials
+        if dropped:
+            self._reconnect_known(dropped)
         for d in devices:
-            label = f"{d['serial']} ({d['model']})" if d.get("model") else d["serial"]
-            self._device_bar.add_device(label, d["serial"])
+            self._device_bar.add_device(self._device_label(d), d["serial"])
         if devices:
-            self._device_bar.set_current_index(0)
+            keep = next((i for i, d in enumerate(devices) if d["serial"] == previous), 0)
+            self._device_bar.set_current_index(keep)
             self._log_step(f"已检测到 {len(devices)} 台设备")
             self._set_status(f"已连接 {len(devices)} 台设备")
         else:
@@ -122,6 +337,66 @@ class MainWindow(QMainWindow):
                 self._auto_prompted_connect = True
                 QTimer.singleShot(150, self._on_scan_connect)
 
+    @staticmethod
+    def _device_label(d: dict) -> str:
+        label = f"{d['serial']} ({d['model']})" if d.get("model") else d["serial"]
+        if d.get("server"):
+            label = f"{label} @{d['server']}"
+        return label
+
+    def _on_edit_servers(self):
+        """编辑额外的 adb server 列表（本机默认 server 始终包含），保存后立即刷新设备。"""
+        current = ", ".join(s for s in get_adb_servers() if s)
+        text, ok = CustomInputDialog.getText(
+            self, "adb 服务器", "额外的 adb server，逗号分隔（如 5038, 192.168.1.20:5037）:", current
+        )
+        if not ok:
+            self._log_step("已取消")
+            return
+        specs = [x for x in text.replace("，", ",").split(",") if x.strip()]
+        try:
+            servers = set_adb_servers(specs)
+        except ValueError as e:
+            CustomMessageBox.warning(self, "提示", str(e))
+            return
+        save_json(_SERVERS_FILE, [s for s in servers if s])
+        self._log_step(f"adb server：{', '.join(server_label(s) for s in servers)}")
+        self._refresh_devices()
+
+    def _on_device_farm(self):
+        self._log_step("打开设备墙")
+        dlg = dialogs.DeviceFarmDialog(self)
+        dlg.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.log_step.connect(self._log_step)
+        dlg.command_output.connect(self._output_panel.append_output)
+        dlg.show()
+
+    def _on_diagnostics(self):
+        dlg = dialogs.DiagnosticsDialog(self)
+        dlg.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.show()
+
+    def _on_link_bench(self):
+        """测当前设备；多台设备一起测从设备墙选中后进入。"""
+        if not self._ensure_device():
+            return
+        dlg = dialogs.LinkBenchDialog([self._device()], self)
+        dlg.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.log_step.connect(self._log_step)
+        dlg.show()
+
+    def _on_log_capture(self):
+        dlg = dialogs.LogCaptureDialog(self._device_bar.serials(), self)
+        dlg.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.log_step.connect(self._log_step)
+        dlg.show()
+
+    def _on_log_search(self):
+        dlg = dialogs.LogSearchDialog(self._device(), self)
+        dlg.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.log_step.connect(self._log_step)
+        dlg.show()
+
     def _ensure_device(self) -> bool:
         if not self._device():
             CustomMessageBox.warning(self, "提示", "请先选择设备")
@@ -130,9 +405,10 @@ class MainWindow(QMainWindow):
 
     def _on_scan_connect(self):
         self._log_step("打开扫码连接窗口")
-        dlg = PairingDialog(self)
+        dlg = dialogs.PairingDialog(self)
         dlg.log_step.connect(self._log_step)
         dlg.command_output.connect(self._output_panel.append_output)
+        dlg.device_connected.connect(self._remember_connection)
         dlg.pairing_success.connect(self._refresh_devices)
         dlg.pairing_success.connect(lambda: self._set_status("无线连接成功，已刷新设备列表"))
         dlg.exec()
@@ -140,7 +416,7 @@ class MainWindow(QMainWindow):
 
     def _on_manual_connect(self):
         self._log_step("打开手动连接窗口")
-        dlg = ManualConnectDialog(self)
+        dlg = dialogs.ManualConnectDialog(self)
         dlg.connect_requested.connect(self._on_manual_connect_requested)
         dlg.exec()
         self._log_step("手动连接窗口已关闭")
@@ -157,11 +433,28 @@ class MainWindow(QMainWindow):
                 payload["code"],
                 payload["connect_host"],
                 payload["connect_port"],
+                callback=lambda c, o, e: self._remember_if_connected(
+                    c, o, payload["connect_host"], payload["connect_port"]
+                ),
             )
             return
         if mode == "connect_only":
             self._log_step(f"手动连接：连接 {payload['host']}:{payload['port']}")
-            self._run_worker(connect_only, payload["host"], payload["port"])
+            self._run_worker(
+                connect_only,
+                payload["host"],
+                payload["port"],
+                callback=lambda c, o, e: self._remember_if_connected(c, o, payload["host"], payload["port"]),
+            )
+
+    def _remember_if_connected(self, code: int, out: str, host: str, port: int):
+        if code == 0 and is_success_connect_output(out):
+            self._remember_connection(host, port)
+
+    def _run_device_op(self, func, *args, callback=None, **kwargs):
+        """对当前设备执行 func(device, *args)，经共享调度器按设备排队（与控制接口等其他入口互不干扰）。"""
+        device = self._device()
+        self._run_worker(get_scheduler().run, device, func, device, *args, callback=callback, **kwargs)
 
     def _run_worker(self, func, *args, callback=None, **kwargs):
         if self._worker and self._worker.isRunning():
@@ -202,7 +495,7 @@ class MainWindow(QMainWindow):
             self._log_step("已取消选择")
             return
         self._log_step(f"安装 APK: {path}")
-        self._run_worker(install_apk, self._device(), path)
+        self._run_device_op(install_apk, path)
 
     def _on_screenshot(self):
         if not self._ensure_device():
@@ -215,13 +508,13 @@ class MainWindow(QMainWindow):
             self._log_step("已取消保存")
             return
         self._log_step(f"截图并保存到: {path}")
-        self._run_worker(screenshot, self._device(), path)
+        self._run_device_op(screenshot, path)
 
     def _on_logcat(self):
         if not self._ensure_device():
             return
         self._log_step("获取 Logcat（最近 500 行）…")
-        self._run_worker(logcat, self._device(), clear=False, max_lines=500)
+        self._run_device_op(logcat, clear=False, max_lines=500)
 
     def _on_reboot(self):
         if not self._ensure_device():
@@ -231,32 +524,34 @@ class MainWindow(QMainWindow):
             self._log_step("已取消重启")
             return
         self._log_step("正在重启设备…")
-        self._run_worker(reboot, self._device())
+        self._run_device_op(reboot)
 
     def _on_push(self):
         if not self._ensure_device():
             return
         self._log_step("选择要推送的本地文件…")
-        local, _ = QFileDialog.getOpenFileName(self, "选择本地文件", "", "所有文件 (*)")
-        if not local:
+        locals_, _ = QFileDialog.getOpenFileNames(self, "选择本地文件（可多选）", "", "所有文件 (*)")
+        if not locals_:
             self._log_step("已取消推送")
             return
         self._log_step("选择设备上的目标路径（文件夹）…")
-        dlg = DevicePathDialog(self, self._device(), initial_path="/storage/emulated/0", mode="push")
+        dlg = dialogs.DevicePathDialog(self, self._device(), initial_path="/storage/emulated/0", mode="push")
         dlg.exec()
         remote_dir = dlg.selected_path()
         if not remote_dir:
             self._log_step("已取消推送")
             return
-        remote = f"{remote_dir.rstrip('/')}/{Path(local).name}"
-        self._log_step(f"推送文件: {local} -> {remote}")
-        self._run_worker(push, self._device(), local, remote)
+        queue = get_transfer_queue()
+        for local in locals_:
+            queue.add_push(self._device(), local, remote_dir)
+        self._log_step(f"已加入传输队列：推送 {len(locals_)} 个文件到 {remote_dir}")
+        self._on_transfers()
 
     def _on_pull(self):
         if not self._ensure_device():
             return
         self._log_step("选择设备上的文件或文件夹…")
-        dlg = DevicePathDialog(self, self._device(), initial_path="/storage/emulated/0", mode="pull")
+        dlg = dialogs.DevicePathDialog(self, self._device(), initial_path="/storage/emulated/0", mode="pull")
         dlg.exec()
         remote = dlg.selected_path()
         if not remote:
@@ -264,15 +559,38 @@ class MainWindow(QMainWindow):
             return
         default_name = Path(remote).name or "device_file"
         self._log_step("选择保存到本地的位置…")
-        if dlg.selected_is_dir():
+        is_dir = dlg.selected_is_dir()
+        if is_dir:
             local = QFileDialog.getExistingDirectory(self, "选择保存到的文件夹", default_name)
         else:
             local, _ = QFileDialog.getSaveFileName(self, "保存到", default_name, "所有文件 (*)")
         if not local:
             self._log_step("已取消保存")
             return
-        self._log_step(f"拉取文件: {remote} -> {local}")
-        self._run_worker(pull, self._device(), remote, local)
+        self._log_step(f"拉取: {remote} -> {local}")
+        try:
+            get_transfer_queue().add_pull(self._device(), remote, local, is_dir)
+        except TransferError as e:
+            self._log_step(str(e))
+            return
+        self._log_step("已加入传输队列")
+        self._on_transfers()
+
+    def _on_transfers(self):
+        """传输队列窗口只开一个，已打开时提到前面。"""
+        if self._transfer_dialog is not None:
+            self._transfer_dialog.raise_()
+            self._transfer_dialog.activateWindow()
+            return
+        dlg = dialogs.TransferDialog(self)
+        dlg.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.log_step.connect(self._log_step)
+        dlg.destroyed.connect(self._on_transfer_dialog_closed)
+        self._transfer_dialog = dlg
+        dlg.show()
+
+    def _on_transfer_dialog_closed(self):
+        self._transfer_dialog = None
 
     def _on_shell_dialog(self):
         if not self._ensure_device():
@@ -294,16 +612,60 @@ class MainWindow(QMainWindow):
 
     def _run_shell(self, cmd: str):
         self._log_step(f"执行 Shell: {cmd}")
-        self._run_worker(shell, self._device(), cmd)
+        self._run_device_op(shell, cmd)
+
+    def _on_perf_monitor(self):
+        if not self._ensure_device():
+            return
+        self._log_step(f"打开性能监控：{self._device()}")
+        # 非模态：监控期间主窗口仍可操作；采样线程独立于 _run_worker 的单任务限制
+        dlg = dialogs.PerfMonitorDialog(self, self._device())
+        dlg.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.show()
+
+    def _on_screen_preview(self):
+        if not self._ensure_device():
+            return
+        self._log_step(f"打开屏幕预览：{self._device()}")
+        dlg = dialogs.ScreenPreviewDialog(self, self._device())
+        dlg.log_step.connect(self._log_step)
+        dlg.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.show()
 
     def _on_pull_apk(self):
         if not self._ensure_device():
             return
+        device = self._device()
+        cache = get_state_cache()
+        cached = cache.get_packages(device) if cache is not None else None
+        if cached is not None:
+            # 先用本地缓存的列表打开选择框，同时后台刷新，刷新结果到达时更新仍打开的选择框
+            self._log_step(f"使用缓存的应用列表（{len(cached[0])} 个），后台刷新中…")
+            self._refresh_packages(device)
+            self._choose_package(cached[0])
+            return
         self._log_step("获取应用列表…")
         # 传递 callback 处理列表数据，同时 _on_worker_finished 也会被调用来恢复 UI 状态 (device bar enabled)
         # 注意：_on_worker_finished 也会在 log pane 打印所有 package list，稍微有点乱但也可以接受，
         # 或者我们可以稍微改造 _on_worker_finished 不打印太长的 output。暂时保持原样。
-        self._run_worker(get_installed_packages, self._device(), callback=self._handle_packages_loaded)
+        self._run_device_op(fetch_packages, callback=self._handle_packages_loaded)
+
+    def _refresh_packages(self, device: str):
+        """后台重新获取包列表并回写缓存；不占用 self._worker，选择框打开期间其他命令照常执行。"""
+        if self._packages_worker and self._packages_worker.isRunning():
+            return
+        self._packages_worker = Worker(get_scheduler().run, device, fetch_packages, device)
+        self._packages_worker.finished.connect(self._on_packages_refreshed)
+        self._packages_worker.start()
+
+    def _on_packages_refreshed(self, code: int, out: str, err: str):
+        if code != 0:
+            self._log_step(f"刷新应用列表失败：{err.strip() or out.strip()}")
+            return
+        packages = [p for p in out.splitlines() if p.strip()]
+        if self._app_dialog is not None:
+            self._app_dialog.set_packages(packages)
+        self._log_step(f"应用列表已刷新（{len(packages)} 个）")
 
     def _handle_packages_loaded(self, code: int, out: str, err: str):
         if code != 0:
@@ -313,9 +675,16 @@ class MainWindow(QMainWindow):
         if not packages:
             self._log_step("并未找到已安装的第三方应用")
             return
-            
-        dlg = AppSelectionDialog(self, packages)
-        if dlg.exec() == AppSelectionDialog.DialogCode.Accepted:
+        self._choose_package(packages)
+
+    def _choose_package(self, packages: list[str]):
+        dlg = dialogs.AppSelectionDialog(self, packages)
+        self._app_dialog = dlg
+        try:
+            accepted = dlg.exec() == dialogs.AppSelectionDialog.DialogCode.Accepted
+        finally:
+            self._app_dialog = None
+        if accepted:
             pkg = dlg.selected_package()
             if pkg:
                 self._log_step(f"已选择应用: {pkg}，正在获取 APK 路径…")
@@ -331,7 +700,7 @@ class MainWindow(QMainWindow):
         # 不，Worker 线程已经结束 run。但 `self._worker` 引用还在。
         # _run_worker 会检查 isRunning。Finished 信号发出时，isRunning 为 False。
         # 但是为了避免冲突，我们可以用 QTimer.singleShot 0ms 来跳出当前调用栈。
-        QTimer.singleShot(0, lambda: self._run_worker(get_package_path, self._device(), package, callback=lambda c, o, e: self._handle_apk_path(c, o, e, package)))
+        QTimer.singleShot(0, lambda: self._run_device_op(get_package_path, package, callback=lambda c, o, e: self._handle_apk_path(c, o, e, package)))
 
     def _handle_apk_path(self, code: int, out: str, err: str, package: str):
         if code != 0:
@@ -351,4 +720,4 @@ class MainWindow(QMainWindow):
         self._log_step(f"开始下载: {remote_path} -> {local_path}")
         # 这里同样需要跳出栈以启动第三个 Worker
         from adb_helper import pull
-        QTimer.singleShot(0, lambda: self._run_worker(pull, self._device(), remote_path, local_path))
+        QTimer.singleShot(0, lambda: self._run_device_op(pull, remote_path, local_path))
@@ -112,6 +112,8 @@ class DeviceBarPanel(QWidget):
     refresh_clicked = pyqtSignal()
     scan_connect_clicked = pyqtSignal()
     manual_connect_clicked = pyqtSignal()
+    servers_clicked = pyqtSignal()
+    farm_clicked = pyqtSignal()
     device_changed = pyqtSignal(int)  # currentIndexChanged
 
     def __init__(self, parent=None):
@@ -147,8 +149,22 @@ class DeviceBarPanel(QWidget):
         self.btn_manual_connect.clicked.connect(self.manual_connect_clicked.emit)
         layout.addWidget(self.btn_manual_connect, 0, Qt.AlignmentFlag.AlignVCenter)
 
+        self.btn_servers = QPushButton("adb 服务器")
+        self.btn_servers.setToolTip("聚合多个 adb server（本机其他端口或远程主机）的设备")
+        self.btn_servers.clicked.connect(self.servers_clicked.emit)
+        layout.addWidget(self.btn_servers, 0, Qt.AlignmentFlag.AlignVCenter)
+
+        self.btn_farm = QPushButton("设备墙")
+        self.btn_farm.setToolTip("表格查看全部设备，支持分组、标签与批量操作")
+        self.btn_farm.clicked.connect(self.farm_clicked.emit)
+        layout.addWidget(self.btn_farm, 0, Qt.AlignmentFlag.AlignVCenter)
+
         layout.addStretch()
 
+        self._discovered_label = QLabel("")
+        self._discovered_label.setObjectName("statusLabel")
+        layout.addWidget(self._discovered_label, 0, Qt.AlignmentFlag.AlignVCenter)
+
     def clear_devices(self):
         self.device_combo.clear()
 
@@ -161,9 +177,19 @@ class DeviceBarPanel(QWidget):
     def current_serial(self) -> str:
         return self.device_combo.currentData() or ""
 
+    def serials(self) -> list[str]:
+        return [self.device_combo.itemData(i) for i in range(self.device_combo.count()) if self.device_combo.itemData(i)]
+
     def set_refresh_enabled(self, enabled: bool):
         self.btn_refresh.setEnabled(enabled)
 
+    def set_discovered(self, devices: int, pairing: int):
+        """显示局域网 mDNS 发现的无线调试设备数与正在等待配对的设备数。"""
+        text = f"局域网 {devices} 台" if devices else ""
+        if pairing:
+            text = f"{text} · 待配对 {pairing}".strip(" ·")
+        self._discovered_label.setText(text)
+
 
 class QuickActionsPanel(QWidget):
     """快捷操作按钮网格。"""
@@ -175,6 +201,13 @@ class QuickActionsPanel(QWidget):
     pull_clicked = pyqtSignal()
     pull_apk_clicked = pyqtSignal()
     shell_dialog_clicked = pyqtSignal()
+    perf_monitor_clicked = pyqtSignal()
+    screen_preview_clicked = pyqtSignal()
+    diagnostics_clicked = pyqtSignal()
+    transfers_clicked = pyqtSignal()
+    link_bench_clicked = pyqtSignal()
+    log_capture_clicked = pyqtSignal()
+    log_search_clicked = pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -193,6 +226,13 @@ class QuickActionsPanel(QWidget):
             ("拉取文件", self.pull_clicked),
             ("提取 APK", self.pull_apk_clicked),
             ("自定义 Shell", self.shell_dialog_clicked),
+            ("性能监控", self.perf_monitor_clicked),
+            ("屏幕预览", self.screen_preview_clicked),
+            ("诊断", self.diagnostics_clicked),
+            ("传输队列", self.transfers_clicked),
+            ("链路测速", self.link_bench_clicked),
+            ("日志采集", self.log_capture_clicked),
+            ("日志检索", self.log_search_clicked),
         ]
         row, col = 0, 0
         for text, sig in actions:
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-"""通用 UI 组件：标题栏、无边框对话框、消息框、输入框。"""
+"""通用 UI 组件：标题栏、无边框对话框、消息框、输入框、折线图。"""
 
 import os
 from PyQt6.QtWidgets import (
@@ -12,7 +12,7 @@ from PyQt6.QtWidgets import (
     QPushButton,
     QLineEdit,
 )
-from PyQt6.QtCore import Qt, QPoint, QRectF
+from PyQt6.QtCore import Qt, QPoint, QPointF, QRectF
 from PyQt6.QtGui import (
     QMouseEvent,
     QPainter,
@@ -21,6 +21,7 @@ from PyQt6.QtGui import (
     QPen,
     QBrush,
     QRegion,
+    QPolygonF,
 )
 
 # 圆角半径常量
@@ -378,3 +379,68 @@ class CustomInputDialog(FramelessDialog):
         dlg = CustomInputDialog(parent, title, label, default_text)
         dlg.exec()
         return dlg.get_text()
+
+
+class LineChart(QWidget):
+    """
+    轻量折线图：数据按控件像素宽度分桶降采样（每桶 min/max），
+    数据量再大每次重绘也只画 width 个点。
+    """
+
+    def __init__(self, title: str = "", color: str = "#ea580c", parent=None):
+        super().__init__(parent)
+        self._title = title
+        self._color = QColor(color)
+        self._values: list[float] = []
+        self.setMinimumHeight(90)
+
+    def set_values(self, values: list[float]):
+        self._values = values
+        self.update()
+
+    def paintEvent(self, event):
+        from core.perf_monitor import downsample
+
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        rect = QRectF(self.rect()).adjusted(1, 1, -1, -1)
+        painter.setPen(QPen(QColor("#e4e4e7"), 1))
+        painter.setBrush(QBrush(QColor("#ffffff")))
+        painter.drawRoundedRect(rect, 6, 6)
+
+        plot = rect.adjusted(8, 22, -8, -8)
+        buckets = downsample(self._values, max(1, int(plot.width())))
+        valid = [b for b in buckets if b[0] == b[0]]
+        last = next((v for v in reversed(self._values) if v == v), None)
+        painter.setPen(QColor("#71717a"))
+        caption = self._title if last is None else f"{self._title}  {last:.1f}"
+        painter.drawText(rect.adjusted(8, 4, -8, 0), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop, caption)
+        if not valid:
+            return
+        lo = min(b[0] for b in valid)
+        hi = max(b[1] for b in valid)
+        if hi - lo < 1e-9:
+            hi, lo = hi + 1, lo - 1
+        painter.drawText(rect.adjusted(8, 4, -8, 0), Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignTop,
+                         f"{lo:.0f} – {hi:.0f}")
+
+        def y_of(v: float) -> float:
+            return plot.bottom() - (v - lo) / (hi - lo) * plot.height()
+
+        x_step = plot.width() / max(1, len(buckets) - 1) if len(buckets) > 1 else 0
+        painter.setPen(QPen(self._color, 1.5))
+        line = QPolygonF()
+        for i, (b_lo, b_hi) in enumerate(buckets):
+            if b_lo != b_lo:
+                if line.size() > 1:
+                    painter.drawPolyline(line)
+                line = QPolygonF()
+                continue
+            x = plot.left() + i * x_step
+            line.append(QPointF(x, y_of(b_hi)))
+            if b_lo != b_hi:
+                line.append(QPointF(x, y_of(b_lo)))
+        if line.size() > 1:
+            painter.drawPolyline(line)
+        elif line.size() == 1:
+            painter.drawPoint(line.at(0))